@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк пропускной способности OptimizedCommandParser
+
+Сравнивается прежний путь (re.sub на каждый синоним и поиск по каждому
+шаблону по очереди) с заменой синонимов одним выражением и единым
+выражением для всех шаблонов. Кэш парсера отключен, чтобы измерять сам
+разбор. Также выводится число команд, распознанных иначе, чем прежде.
+
+Запуск: python benchmarks/bench_command_parser.py [--commands N]
+"""
+
+import argparse
+import logging
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src.parser.optimized_command_parser import OptimizedCommandParser, ParsedCommand
+
+TEMPLATES = [
+    'создай файл {file}', 'создать {file}', 'удали файл {file}', 'сотри файл {file}',
+    'открой файл {file}', 'открыть файл {file}', 'скопируй файл {file}', 'дублируй файл {file}',
+    'прочитай файл {file}', 'переименуй файл {file}', 'сохрани {word} в файл {file}',
+    'открой {app}', 'запусти {app}', 'закрой {app}', 'открывай {app}', 'браузер',
+    'напиши {word} {word}', 'введи {word}', 'напишите {word}', 'клик по {word}', 'кликни по {word}',
+    'прокрути {direction}', 'скролл {direction}', 'сделай скриншот', 'снимок экрана',
+    'сфотографируй экран', 'найди {word}', 'поищи {word} в {app}', 'ищи {file}', 'помощь',
+    'справка', 'что ты можешь делать', 'подскажи как {word}', 'пожалуйста   Открой  {app}',
+    'расскажи анекдот про {word}', 'какая сегодня погода', 'включи {word} музыку',
+]
+FILES = ['отчет.txt', 'main.py', 'index.html', 'notes.md', 'data.json', 'style.css']
+APPS = ['браузер', 'терминал', 'блокнот', 'калькулятор', 'почту', 'редактор кода']
+WORDS = ['привет', 'документы', 'кнопку ок', 'настройки', 'погоду', 'новости', 'таблицу']
+DIRECTIONS = ['вниз', 'вверх', 'влево', 'вправо']
+
+
+def build_corpus(count, seed=1):
+    rng = random.Random(seed)
+    return [
+        rng.choice(TEMPLATES).format(
+            file=rng.choice(FILES), app=rng.choice(APPS), word=rng.choice(WORDS),
+            direction=rng.choice(DIRECTIONS))
+        for _ in range(count)
+    ]
+
+
+class LegacyParser(OptimizedCommandParser):
+    """Прежние реализации _normalize_text и _quick_parse"""
+
+    def _normalize_text(self, text):
+        text = text.lower().strip()
+        text = re.sub(r'\s+', ' ', text)
+        for key, synonyms in self.synonyms.items():
+            for synonym in synonyms:
+                text = re.sub(r'\b' + synonym + r'\b', key, text)
+        return text
+
+    def _quick_parse(self, text):
+        normalized_text = self._normalize_text(text)
+        for command_type, patterns in self.quick_patterns.items():
+            for pattern, action_type in patterns:
+                match = pattern.search(normalized_text)
+                if match:
+                    parameters = {}
+                    if match.groups():
+                        if len(match.groups()) == 1:
+                            parameters['target'] = match.group(1)
+                        else:
+                            for i, group in enumerate(match.groups()):
+                                parameters[f'param_{i}'] = group
+                    command = ParsedCommand(command_type, action_type, parameters, confidence=0.95)
+                    command.raw_text = text
+                    return command
+        return None
+
+
+def summary(parser, text):
+    command = parser._quick_parse(text)
+    if command is None:
+        return None
+    return command.command_type, command.action, tuple(command.parameters.values())
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--commands', type=int, default=20_000)
+    args = parser.parse_args()
+    logging.disable(logging.CRITICAL)
+
+    corpus = build_corpus(args.commands)
+    print(f"Команд: {len(corpus)}, шаблонов корпуса: {len(TEMPLATES)}")
+
+    for name, parser_class in (('прежний парсер', LegacyParser), ('единое выражение', OptimizedCommandParser)):
+        command_parser = parser_class()
+        start = time.perf_counter()
+        for text in corpus:
+            command_parser.parse(text, use_cache=False, use_ai=False)
+        elapsed = time.perf_counter() - start
+        print(f"  {name:<20} {len(corpus) / elapsed:10.0f} команд/с  "
+              f"({elapsed / len(corpus) * 1e6:.1f} мкс на команду)")
+
+    legacy, current = LegacyParser(), OptimizedCommandParser()
+    differences = [text for text in set(corpus) if summary(legacy, text) != summary(current, text)]
+    print(f"  распознано иначе: {len(differences)} из {len(set(corpus))} различных команд")
+    for text in sorted(differences)[:5]:
+        print(f"    {text!r}: {summary(legacy, text)} -> {summary(current, text)}")
+
+
+if __name__ == '__main__':
+    main()
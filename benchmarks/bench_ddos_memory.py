@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк памяти DDoSDetector и AdvancedRateLimiter под синтетическим
+потоком запросов с миллиона уникальных IP
+
+Точный режим хранит счетчик на каждый IP окна, ограниченный режим
+(Count-Min Sketch + Space-Saving) - фиксированный набор счетчиков.
+Периодически печатается объем памяти, выделенной под структуры, и
+проверяется, что реальные источники флуда попадают в top-N.
+Счетчики AdvancedRateLimiter удаляются только после окна неактивности,
+поэтому в пределах окна их число растет с числом источников.
+
+Запуск: python benchmarks/bench_ddos_memory.py [--ips N] [--threshold N]
+"""
+
+import argparse
+import gc
+import logging
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src.security.advanced_rate_limiter import AdvancedRateLimiter, DDoSDetector
+
+HEAVY_HITTERS = [f"10.66.0.{i}" for i in range(5)]
+
+
+def flood(ips: int, heavy_every: int = 10):
+    """Уникальные IP вперемешку с несколькими постоянными источниками"""
+    for i in range(ips):
+        yield f"{(i >> 16) & 255}.{(i >> 8) & 255}.{i & 255}.{(i >> 24) + 1}"
+        if i % heavy_every == 0:
+            yield HEAVY_HITTERS[(i // heavy_every) % len(HEAVY_HITTERS)]
+
+
+def measure(name, record, ips, checkpoints, report=None):
+    gc.collect()
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    start = time.perf_counter()
+    for count, ip in enumerate(flood(ips), 1):
+        record(ip)
+        if count in checkpoints:
+            current = tracemalloc.get_traced_memory()[0] - base
+            print(f"  {name:>10} {count:>9} запросов: {current / 1024 / 1024:8.2f} MB")
+    elapsed = time.perf_counter() - start
+    tracemalloc.stop()
+    print(f"  {name:>10} итого {elapsed:.1f} с ({ips / elapsed / 1000:.0f}k IP/с)")
+    if report:
+        report()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--ips', type=int, default=1_000_000)
+    parser.add_argument('--threshold', type=int, default=1_000_000)
+    args = parser.parse_args()
+    logging.disable(logging.CRITICAL)
+    checkpoints = {args.ips // 10, args.ips // 4, args.ips // 2, args.ips}
+
+    print(f"DDoSDetector, окно 60 с, порог {args.threshold}")
+    for bounded in (False, True):
+        detector = DDoSDetector(window_size=60, threshold=args.threshold,
+                                memory_bounded=bounded)
+
+        def report():
+            top = [ip for ip, _ in detector.get_suspicious_ips(len(HEAVY_HITTERS))]
+            found = len(set(top) & set(HEAVY_HITTERS))
+            print(f"  источников флуда в top-{len(HEAVY_HITTERS)}: {found}/{len(HEAVY_HITTERS)}")
+            if detector.heavy_hitters is not None:
+                print(f"  счетчики скетчей (выделены заранее): "
+                      f"{detector.heavy_hitters.nbytes / 1024:.0f} KB")
+
+        measure('sketch' if bounded else 'exact', detector.record_request,
+                args.ips, checkpoints, report)
+
+    print("AdvancedRateLimiter, max_history=10000")
+    limiter = AdvancedRateLimiter(max_history=10000)
+    measure('limiter', lambda ip: limiter.check_limit("api", ip), args.ips, checkpoints,
+            lambda: print(f"  отслеживается идентификаторов: {len(limiter.user_tracker)}, "
+                          f"в хранилище: {len(limiter.backend)}"))
+
+
+if __name__ == '__main__':
+    main()
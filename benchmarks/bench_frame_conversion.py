@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Микробенчмарк конвертации кадров драйверов экрана и камеры
+Сравнивает прежние реализации (копия из mmap, поканальная сборка RGB565,
+промежуточное YUV-изображение) с текущими (представление поверх mmap,
+cv2.cvtColor BGR5652BGR, прямой YUYV -> BGR) на разрешениях 1080p и 4K.
+
+Прежний путь YUYV использовал COLOR_YUV2BGR (полный диапазон), текущий -
+COLOR_YUV2BGR_YUYV (BT.601, Y 16-235), поэтому цвета путей различаются.
+
+Запуск: python benchmarks/bench_frame_conversion.py [--repeat N]
+"""
+
+import argparse
+import mmap
+import os
+import sys
+import time
+
+import numpy as np
+import cv2
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src.drivers.camera_driver import yuyv_to_bgr
+from src.drivers.screen_driver import ScreenDriver, rgb565_to_bgr
+
+RESOLUTIONS = {'1080p': (1920, 1080), '4K': (3840, 2160)}
+
+
+def legacy_framebuffer_565(fb_map, width, height):
+    """Прежний путь: read() копирует буфер, затем поканальная сборка BGR"""
+    fb_map.seek(0)
+    frame = np.frombuffer(fb_map.read(width * height * 2), dtype=np.uint16).reshape((height, width))
+    bgr = np.zeros((height, width, 3), dtype=np.uint8)
+    bgr[:, :, 0] = (frame & 0x001F) << 3
+    bgr[:, :, 1] = ((frame & 0x07E0) >> 5) << 2
+    bgr[:, :, 2] = ((frame & 0xF800) >> 11) << 3
+    return bgr
+
+
+def legacy_framebuffer_32(fb_map, width, height):
+    fb_map.seek(0)
+    frame = np.frombuffer(fb_map.read(width * height * 4), dtype=np.uint8).reshape((height, width, 4))
+    return cv2.cvtColor(frame, cv2.COLOR_BGRA2BGR)
+
+
+def legacy_yuyv(frame_data, width, height):
+    """Прежний путь: промежуточное YUV-изображение и четыре strided-присваивания"""
+    yuyv = np.frombuffer(frame_data, dtype=np.uint8).reshape((height, width // 2, 4))
+    yuv = np.zeros((height, width, 3), dtype=np.uint8)
+    yuv[:, 0::2, 0] = yuyv[:, :, 0]
+    yuv[:, 1::2, 0] = yuyv[:, :, 2]
+    yuv[:, 0::2, 1] = yuyv[:, :, 1]
+    yuv[:, 1::2, 1] = yuyv[:, :, 1]
+    yuv[:, 0::2, 2] = yuyv[:, :, 3]
+    yuv[:, 1::2, 2] = yuyv[:, :, 3]
+    return cv2.cvtColor(yuv, cv2.COLOR_YUV2BGR)
+
+
+def timeit(func, repeat):
+    func()  # прогрев
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def anonymous_map(data: bytes) -> mmap.mmap:
+    """Анонимный mmap с содержимым кадра - замена /dev/fb0"""
+    fb_map = mmap.mmap(-1, len(data))
+    fb_map.write(data)
+    return fb_map
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк конвертации кадров")
+    parser.add_argument('--repeat', type=int, default=20, help="Число повторов на замер")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f"{'кадр':<24}{'было, мс':>12}{'стало, мс':>12}{'ускорение':>12}")
+
+    for name, (width, height) in RESOLUTIONS.items():
+        cases = []
+
+        fb565 = anonymous_map(rng.integers(0, 65536, width * height, dtype=np.uint16).tobytes())
+        view565 = ScreenDriver._wrap_framebuffer(fb565, width, height, 16)
+        cases.append((f"fb RGB565 {name}",
+                      lambda: legacy_framebuffer_565(fb565, width, height),
+                      lambda: rgb565_to_bgr(view565)))
+
+        fb32 = anonymous_map(rng.integers(0, 256, width * height * 4, dtype=np.uint8).tobytes())
+        view32 = ScreenDriver._wrap_framebuffer(fb32, width, height, 32)
+        cases.append((f"fb BGRA {name}",
+                      lambda: legacy_framebuffer_32(fb32, width, height),
+                      lambda: cv2.cvtColor(view32, cv2.COLOR_BGRA2BGR)))
+
+        yuyv = rng.integers(0, 256, width * height * 2, dtype=np.uint8).tobytes()
+        cases.append((f"camera YUYV {name}",
+                      lambda: legacy_yuyv(yuyv, width, height),
+                      lambda: yuyv_to_bgr(yuyv, width, height)))
+
+        for label, before, after in cases:
+            old_ms = timeit(before, args.repeat)
+            new_ms = timeit(after, args.repeat)
+            print(f"{label:<24}{old_ms:>12.2f}{new_ms:>12.2f}{old_ms / new_ms:>11.1f}x")
+
+        del view565, view32
+        fb565.close()
+        fb32.close()
+
+
+if __name__ == '__main__':
+    main()
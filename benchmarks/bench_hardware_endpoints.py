@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк задержки чтения метрик оборудования
+
+Сравнивается прежний путь, где каждый запрос к API сам опрашивал систему
+(psutil.cpu_percent с интервалом 0.1 с дважды, разделы, сеть, процессы),
+с чтением последнего HardwareSnapshot, который формирует фоновый поток.
+
+Запуск: python benchmarks/bench_hardware_endpoints.py [--requests N]
+"""
+
+import argparse
+import logging
+import os
+import statistics
+import sys
+import time
+
+import psutil
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src.hardware.real_hardware_monitor import RealHardwareMonitor
+
+
+def legacy_status():
+    """Прежний блокирующий опрос на каждый запрос"""
+    psutil.cpu_percent(interval=0.1)
+    psutil.cpu_percent(interval=0.1, percpu=True)
+    psutil.cpu_freq()
+    psutil.virtual_memory()
+    for partition in psutil.disk_partitions():
+        try:
+            psutil.disk_usage(partition.mountpoint)
+            psutil.disk_io_counters(perdisk=True)
+        except Exception:
+            pass
+    psutil.net_io_counters(pernic=True)
+    sorted(
+        (p.info for p in psutil.process_iter(['pid', 'name', 'cpu_percent', 'memory_percent'])),
+        key=lambda info: info['cpu_percent'] or 0, reverse=True
+    )[:5]
+
+
+def measure(name, call, requests):
+    timings = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        call()
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    p99 = timings[min(len(timings) - 1, int(len(timings) * 0.99))]
+    print(f"  {name:>10}: p50 {statistics.median(timings):9.3f} ms, p99 {p99:9.3f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--requests', type=int, default=20)
+    args = parser.parse_args()
+    logging.disable(logging.CRITICAL)
+
+    print(f"Запросов статуса оборудования: {args.requests}")
+    measure('legacy', legacy_status, args.requests)
+
+    monitor = RealHardwareMonitor()
+    monitor.start_monitoring(interval=1)
+    time.sleep(1.5)
+    measure('snapshot', monitor.get_full_status, args.requests * 100)
+    stats = monitor.sampler_stats
+    print(f"  фоновый опрос: тиков {stats['ticks']}, последний {stats['last_duration'] * 1000:.1f} ms, "
+          f"перегрузок {stats['overruns']}")
+    monitor.stop_monitoring()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк пакетной генерации OptimizedModelManager
+
+Локальная модель заменена моделью-заглушкой: вызов стоит фиксированную
+задержку плюс небольшую добавку за каждый запрос пакета, как у пакетной
+генерации на GPU. Сравнивается прежний последовательный batch_generate с
+очередью пакетной обработки; часть запросов повторяется.
+
+Запуск: python benchmarks/bench_model_batching.py [--prompts N] [--latency MS]
+"""
+
+import argparse
+import logging
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src.ai.optimized_model_manager import ModelType, OptimizedModelManager
+
+
+class StandInModel:
+    """Заглушка локальной модели"""
+
+    def __init__(self, latency, per_item, batch=True):
+        self.latency = latency
+        self.per_item = per_item
+        self.calls = 0
+        self.lock = threading.Lock()
+        if not batch:
+            # Без пакетного API, как у Ollama
+            self.generate_batch = None
+
+    def generate_text(self, prompt, max_tokens=256):
+        return self._run([prompt])[0]
+
+    def generate_batch(self, prompts, max_tokens=256):
+        return self._run(prompts)
+
+    def _run(self, prompts):
+        with self.lock:
+            self.calls += 1
+        time.sleep(self.latency + self.per_item * len(prompts))
+        return [prompt.upper() for prompt in prompts]
+
+
+class BenchManager(OptimizedModelManager):
+    def __init__(self, model_type, model, **batching):
+        self.bench_model = (model_type, model)
+        super().__init__({'ai_models': {'batching': batching}})
+
+    def _initialize_models(self):
+        model_type, model = self.bench_model
+        self.models[model_type] = model
+        self.active_model = model
+        self.active_model_type = model_type
+
+
+def legacy_batch_generate(manager, prompts):
+    """Прежняя реализация batch_generate"""
+    return [manager.generate_response(prompt, use_cache=False) for prompt in prompts]
+
+
+def timed(name, func, model):
+    model.calls = 0
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    print(f"  {name:<44} {elapsed * 1000:9.1f} ms  {model.calls:5d} вызовов модели")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--prompts', type=int, default=64)
+    parser.add_argument('--latency', type=float, default=20.0)
+    args = parser.parse_args()
+    logging.disable(logging.CRITICAL)
+
+    latency = args.latency / 1000
+    # Каждый четвертый запрос повторяет один из предыдущих
+    prompts = [f"prompt {i // 4 if i % 4 == 3 else i}" for i in range(args.prompts)]
+
+    print(f"{args.prompts} запросов, задержка модели {args.latency:.0f} мс")
+
+    model = StandInModel(latency, latency / 20)
+    manager = BenchManager(ModelType.LOCAL, model, window=0.005, max_batch_size=16)
+    timed("локальная: последовательно (прежний)", lambda: legacy_batch_generate(manager, prompts), model)
+    timed("локальная: пакеты по 16", lambda: manager.batch_generate(prompts, use_cache=False), model)
+    manager.shutdown()
+
+    model = StandInModel(latency, 0, batch=False)
+    manager = BenchManager(ModelType.OLLAMA, model, concurrency={'ollama': 4})
+    timed("ollama: последовательно (прежний)", lambda: legacy_batch_generate(manager, prompts), model)
+    timed("ollama: 4 параллельных запроса", lambda: manager.batch_generate(prompts, use_cache=False), model)
+
+    # Запросы из разных потоков попадают в одну очередь
+    def request(prompt):
+        manager.submit(prompt, use_cache=False).result()
+
+    def threaded():
+        threads = [threading.Thread(target=request, args=(prompt,)) for prompt in prompts]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    timed("ollama: запросы из потоков", threaded, model)
+    manager.shutdown()
+
+
+if __name__ == '__main__':
+    main()
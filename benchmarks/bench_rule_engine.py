@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк LogicEngine на 10 000 правил
+
+Сравниваются прежний проход по всем правилам с вызовом каждого условия,
+оценка контекста через сеть правил (общие проверки ключей вычисляются один
+раз) и инкрементальное обновление одного ключа через update_context.
+
+Запуск: python benchmarks/bench_rule_engine.py [--rules N] [--sensors N]
+"""
+
+import argparse
+import logging
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src.logic.rule_network import when
+from src.logic.workflow_engine import LogicEngine, LogicRule
+
+
+LEGACY_LOGGER = logging.getLogger('daur_ai.logic_engine')
+
+
+def legacy_evaluate(rules, context):
+    """Прежняя реализация LogicEngine.evaluate"""
+    result = context.copy()
+    for rule in sorted([r for r in rules if r.enabled], key=lambda r: r.priority, reverse=True):
+        try:
+            if rule.condition(result):
+                result = rule.action(result)
+                LEGACY_LOGGER.info(f"Правило применено: {rule.rule_id}")
+        except Exception:
+            pass
+    return result
+
+
+def make_action(rule_id):
+    def action(context):
+        fired = context.get('fired', 0)
+        context['fired'] = fired + 1
+        return context
+    return action
+
+
+def build_rules(count, sensors, declarative):
+    rng = random.Random(1)
+    rules = []
+    for i in range(count):
+        sensor = f"sensor_{i % sensors}"
+        threshold = rng.choice(range(50, 100, 5))
+        mode = rng.choice(('auto', 'manual', 'eco'))
+        if declarative:
+            condition = when(sensor, '>', threshold) & when('mode', '==', mode)
+        else:
+            condition = (lambda s, t, m: lambda c: c.get(s, 0) > t and c.get('mode') == m)(sensor, threshold, mode)
+        rules.append(LogicRule(f"rule_{i}", f"rule {i}", condition, make_action(i), priority=rng.randint(1, 9)))
+    return rules
+
+
+def timed(name, func, repeat):
+    start = time.perf_counter()
+    for i in range(repeat):
+        func(i)
+    elapsed = (time.perf_counter() - start) / repeat * 1000
+    print(f"  {name:<42} {elapsed:9.3f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rules', type=int, default=10_000)
+    parser.add_argument('--sensors', type=int, default=500)
+    args = parser.parse_args()
+    logging.disable(logging.CRITICAL)
+
+    rng = random.Random(2)
+    context = {f"sensor_{i}": rng.randint(0, 100) for i in range(args.sensors)}
+    context['mode'] = 'auto'
+    print(f"Правил: {args.rules}, ключей контекста: {len(context)}")
+
+    legacy_rules = build_rules(args.rules, args.sensors, declarative=False)
+    timed('прежний evaluate (все условия)', lambda i: legacy_evaluate(legacy_rules, context), 5)
+
+    for declarative in (False, True):
+        engine = LogicEngine()
+        for rule in build_rules(args.rules, args.sensors, declarative):
+            engine.add_rule(rule)
+        kind = 'when()' if declarative else 'функции'
+        timed(f'evaluate, условия-{kind}', lambda i: engine.evaluate(context), 5)
+
+        engine.update_context(context)
+        timed(f'update_context одного ключа, условия-{kind}',
+              lambda i: engine.update_context({f"sensor_{i % args.sensors}": rng.randint(0, 100)}), 1000)
+        print(f"    общих проверок ключей: {engine.network.alpha_count}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк TaskManager на 100 000 задач
+
+Сравниваются прежние выборки полным проходом по задачам с индексами по
+статусу и сроку, а также выдача задач из очереди готовых задач, когда
+половина задач ждет зависимостей.
+
+Запуск: python benchmarks/bench_task_manager.py [--tasks N]
+"""
+
+import argparse
+import logging
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src.planning.task_scheduler import TaskManager, TaskPriority, TaskStatus
+
+
+def legacy_by_status(manager, status):
+    """Прежняя реализация get_tasks_by_status"""
+    return [task for task in manager.tasks.values() if task.status == status]
+
+
+def legacy_overdue(manager):
+    """Прежняя реализация get_overdue_tasks"""
+    now = datetime.now()
+    return [
+        task for task in manager.tasks.values()
+        if task.due_date and task.due_date < now and task.status != TaskStatus.COMPLETED
+    ]
+
+
+def timed(name, func, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    elapsed = (time.perf_counter() - start) / repeat * 1000
+    print(f"  {name:<44} {elapsed:9.3f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--tasks', type=int, default=100_000)
+    args = parser.parse_args()
+    logging.disable(logging.CRITICAL)
+
+    rng = random.Random(1)
+    now = datetime.now()
+    manager = TaskManager()
+    start = time.perf_counter()
+    for i in range(args.tasks):
+        due = now + timedelta(hours=rng.randint(-24, 24 * 30)) if i % 4 == 0 else None
+        manager.create_task(f"task_{i}", f"task {i}", priority=rng.choice(list(TaskPriority)), due_date=due)
+        if i % 2 == 1:
+            manager.add_dependency(f"task_{i}", f"task_{i - 1}")
+    print(f"Задач: {args.tasks}, создание {time.perf_counter() - start:.2f} s")
+
+    timed('прежний get_tasks_by_status(RUNNING)', lambda: legacy_by_status(manager, TaskStatus.RUNNING), 20)
+    timed('get_tasks_by_status(RUNNING)', lambda: manager.get_tasks_by_status(TaskStatus.RUNNING), 20)
+    timed('прежний get_overdue_tasks', lambda: legacy_overdue(manager), 20)
+    timed('get_overdue_tasks', manager.get_overdue_tasks, 20)
+    timed('get_status', manager.get_status, 20)
+
+    def run_next():
+        task = manager.get_next_task()
+        manager.update_task_status(task.task_id, TaskStatus.RUNNING)
+        manager.update_task_status(task.task_id, TaskStatus.COMPLETED, progress=100)
+
+    timed('get_next_task + завершение задачи', run_next, 10_000)
+    print(f"  записей в очереди: {len(manager.task_queue)}, готовых задач: {manager.get_status()['ready_tasks']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -12,6 +12,9 @@ import asyncio
 from pathlib import Path
 import json
 
+from src.ai.response_cache import cache_from_config
+from src.ai.streaming import StreamStats, TokenStream, iter_ollama_stream, iter_transformers_stream
+
 try:
     import torch
     from transformers import pipeline, AutoTokenizer, AutoModel
@@ -62,6 +65,10 @@ class ModelManager:
         self.max_tokens = config.get("max_tokens", 512)
         self.temperature = config.get("temperature", 0.7)
         self.streaming = config.get("streaming", True)
+        self.stream_stats = StreamStats()
+        
+        # Persistent response cache shared with other managers (optional)
+        self.response_cache = cache_from_config(config)
         
         # Initialize models
         self._initialize_models()
@@ -150,14 +157,21 @@ class ModelManager:
         """
         max_tokens = max_tokens or self.max_tokens
         temperature = temperature or self.temperature
+        cache_model = f"{self.model_type}:{self._model_name()}"
+        cache_params = {"max_tokens": max_tokens, "temperature": temperature, "stop": stop}
+        
+        if self.response_cache is not None:
+            cached = self.response_cache.get(prompt, cache_model, cache_params)
+            if cached is not None:
+                return cached
         
         try:
             if self.model_type == ModelType.TRANSFORMERS:
-                return await self._generate_transformers(prompt, max_tokens, temperature)
+                response = await self._generate_transformers(prompt, max_tokens, temperature)
             elif self.model_type == ModelType.LLAMA:
-                return await self._generate_llama(prompt, max_tokens, temperature)
+                response = await self._generate_llama(prompt, max_tokens, temperature)
             elif self.model_type == ModelType.OLLAMA:
-                return await self._generate_ollama(prompt, max_tokens, temperature, stop)
+                response = await self._generate_ollama(prompt, max_tokens, temperature, stop)
             else:
                 raise ValueError(f"Unknown model type: {self.model_type}")
                 
@@ -165,6 +179,18 @@ class ModelManager:
             self.logger.error(f"Generation failed: {e}")
             raise
             
+        if self.response_cache is not None:
+            self.response_cache.set(prompt, cache_model, response, cache_params)
+        return response
+        
+    def _model_name(self) -> str:
+        """Name of the loaded model for cache keys."""
+        if self.model_type == ModelType.OLLAMA:
+            return self.ollama_model
+        if self.model_type == ModelType.LLAMA:
+            return self.config.get("model_file", "model.gguf")
+        return self.config.get("model_name", "gpt2")
+        
     async def _generate_transformers(self, prompt: str, max_tokens: int, temperature: float) -> str:
         """Generate text using Transformers."""
         outputs = self.models["generator"](
@@ -210,6 +236,66 @@ class ModelManager:
                 result = await response.json()
                 return result["response"]
                 
+    def stream_generate(self,
+                        prompt: str,
+                        max_tokens: Optional[int] = None,
+                        temperature: Optional[float] = None,
+                        stop: Optional[List[str]] = None) -> TokenStream:
+        """
+        Generate text chunk by chunk.
+        
+        Args:
+            prompt: Input prompt
+            max_tokens: Maximum tokens to generate
+            temperature: Sampling temperature
+            stop: Stop sequences
+            
+        Returns:
+            Async iterator over generated text chunks
+        """
+        max_tokens = max_tokens or self.max_tokens
+        temperature = temperature or self.temperature
+        
+        if self.model_type == ModelType.TRANSFORMERS:
+            generator = self.models["generator"]
+            
+            def produce(stream):
+                return iter_transformers_stream(
+                    stream, generator.model, self.models["tokenizer"], prompt,
+                    device=generator.device,
+                    max_new_tokens=max_tokens,
+                    temperature=temperature,
+                    do_sample=temperature > 0
+                )
+        elif self.model_type == ModelType.LLAMA:
+            def produce(stream):
+                for output in self.models["llama"](
+                    prompt,
+                    max_tokens=max_tokens,
+                    temperature=temperature,
+                    stop=["</s>", "\n\n"],
+                    stream=True
+                ):
+                    yield output["choices"][0]["text"]
+        elif self.model_type == ModelType.OLLAMA:
+            payload = {
+                "model": self.ollama_model,
+                "prompt": prompt,
+                "options": {
+                    "num_predict": max_tokens,
+                    "temperature": temperature,
+                    "stop": stop or []
+                }
+            }
+            
+            def produce(stream):
+                return iter_ollama_stream(stream, f"{self.ollama_url}/api/generate", payload,
+                                          timeout=self.config.get("timeout", 60))
+        else:
+            raise ValueError(f"Unknown model type: {self.model_type}")
+            
+        return TokenStream(produce, on_finish=self.stream_stats.record)
+                
     async def start(self):
         """Start model manager."""
         self.logger.info("Model manager started")
@@ -304,6 +390,7 @@ class AIModelManager:
         self.model_type = None
         self.is_loaded = False
         self.loading_lock = threading.Lock()
+        self.stream_stats = StreamStats()
         
         # Проверка доступности модели
         if not os.path.exists(model_path):
@@ -532,9 +619,109 @@ class AIModelManager:
         
         generated_text = result[0]
         self.logger.debug(f"Текст сгенерирован: {generated_text[:50]}...")
-        
+
         return generated_text
 
+    def generate_batch(self, prompts: List[str], max_tokens: int = 256,
+                       temperature: float = 0.7, top_p: float = 0.95) -> List[Union[str, None]]:
+        """
+        Пакетная генерация текста
+
+        Для transformers-моделей все запросы выполняются одним вызовом generate
+        (входы дополняются слева до общей длины), для остальных - по очереди.
+
+        Args:
+            prompts (List[str]): Входные тексты-запросы
+            max_tokens (int): Максимальное количество токенов для генерации
+            temperature (float): Температура семплирования (0.0-1.0)
+            top_p (float): Параметр Top-p для семплирования (0.0-1.0)
+
+        Returns:
+            List: Сгенерированные тексты (None для запросов с ошибкой)
+        """
+        if self.model_type != "transformers" or len(prompts) < 2:
+            return [self.generate_text(prompt, max_tokens, temperature, top_p) for prompt in prompts]
+
+        if not self.is_loaded and not self.load_model():
+            self.logger.error("Не удалось загрузить модель для пакетной генерации")
+            return [None] * len(prompts)
+
+        padding_side = self.tokenizer.padding_side
+        try:
+            self.tokenizer.padding_side = "left"
+            if self.tokenizer.pad_token is None:
+                self.tokenizer.pad_token = self.tokenizer.eos_token
+
+            inputs = self.tokenizer(prompts, return_tensors="pt", padding=True).to(self.device)
+            prompt_length = inputs['input_ids'].shape[1]
+
+            with torch.no_grad():
+                outputs = self.model.generate(
+                    **inputs,
+                    max_new_tokens=max(1, min(max_tokens, self.context_length - prompt_length)),
+                    temperature=temperature if temperature > 0 else 1.0,
+                    top_p=top_p,
+                    do_sample=temperature > 0,
+                    pad_token_id=self.tokenizer.pad_token_id
+                )
+
+            return [self.tokenizer.decode(output[prompt_length:], skip_special_tokens=True)
+                    for output in outputs]
+
+        except Exception as e:
+            self.logger.error(f"Ошибка при пакетной генерации текста: {e}", exc_info=True)
+            return [None] * len(prompts)
+        finally:
+            self.tokenizer.padding_side = padding_side
+
+    def stream_generate(self, prompt: str, max_tokens: int = 256,
+                        temperature: float = 0.7, top_p: float = 0.95) -> TokenStream:
+        """
+        Потоковая генерация текста
+
+        Модель загружается при первом чтении потока. Отмена потока
+        останавливает генерацию llama.cpp и transformers после текущего токена.
+
+        Args:
+            prompt (str): Входной текст-запрос для модели
+            max_tokens (int): Максимальное количество токенов для генерации
+            temperature (float): Температура семплирования (0.0-1.0)
+            top_p (float): Параметр Top-p для семплирования (0.0-1.0)
+
+        Returns:
+            TokenStream: Асинхронный итератор фрагментов текста
+        """
+        def produce(stream):
+            if not self.is_loaded and not self.load_model():
+                raise RuntimeError("Не удалось загрузить модель для генерации текста")
+
+            if self.model_type == "llama_cpp":
+                for output in self.model(
+                    prompt=prompt,
+                    max_tokens=max_tokens,
+                    temperature=temperature,
+                    top_p=top_p,
+                    echo=False,
+                    stream=True
+                ):
+                    yield output['choices'][0]['text']
+
+            elif self.model_type == "transformers":
+                yield from iter_transformers_stream(
+                    stream, self.model, self.tokenizer, prompt,
+                    device=self.device,
+                    max_new_tokens=max_tokens,
+                    temperature=temperature if temperature > 0 else 1.0,
+                    top_p=top_p,
+                    do_sample=temperature > 0,
+                    pad_token_id=self.tokenizer.eos_token_id
+                )
+
+            else:
+                raise RuntimeError(f"Неподдерживаемый тип модели: {self.model_type}")
+
+        return TokenStream(produce, on_finish=self.stream_stats.record)
+
     def parse_command(self, command_text: str) -> List[Dict[str, Any]]:
         """
         Парсинг команды пользователя в структурированный формат
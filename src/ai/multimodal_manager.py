@@ -565,8 +565,10 @@ class MultimodalAIManager:
         try:
             import hashlib
             
-            # Создание хэша из данных
-            data_str = str(data) + query
+            from src.ai.response_cache import normalize_prompt
+            
+            # Создание хэша из данных (запрос без учета регистра и пробелов)
+            data_str = str(data) + normalize_prompt(query)
             cache_key = f"{media_type}_{hashlib.md5(data_str.encode()).hexdigest()}"
             
             return cache_key
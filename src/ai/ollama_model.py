@@ -16,6 +16,9 @@ import time
 from typing import Dict, List, Any, Optional, Union
 from dataclasses import dataclass
 
+from src.ai.response_cache import ResponseCache, cache_from_config
+from src.ai.streaming import StreamStats, TokenStream, iter_ollama_stream
+
 
 @dataclass
 class OllamaConfig:
@@ -34,15 +37,17 @@ class OllamaModelManager:
     Обеспечивает интеграцию с локальными LLM моделями
     """
     
-    def __init__(self, config: OllamaConfig = None):
+    def __init__(self, config: OllamaConfig = None, response_cache: Optional[ResponseCache] = None):
         """
         Инициализация менеджера Ollama
         
         Args:
             config (OllamaConfig): Конфигурация подключения
+            response_cache (ResponseCache): Постоянный кэш ответов (опционально)
         """
         self.logger = logging.getLogger('daur_ai.ollama')
         self.config = config or OllamaConfig()
+        self.response_cache = response_cache
         
         # Системный промпт для парсинга команд
         self.system_prompt = """Ты - помощник для парсинга команд пользователя в структурированный JSON формат.
@@ -83,6 +88,7 @@ class OllamaModelManager:
 
         self.available_models = []
         self.current_model = None
+        self.stream_stats = StreamStats()
         
         # Проверка доступности Ollama
         self._check_ollama_availability()
@@ -187,6 +193,17 @@ class OllamaModelManager:
             str: Сгенерированный текст
         """
         model = model or self.config.model
+        options = {
+            "temperature": kwargs.get('temperature', self.config.temperature),
+            "num_predict": kwargs.get('max_tokens', self.config.max_tokens),
+        }
+        cache_params = {"system": self.system_prompt, **options}
+        
+        if self.response_cache is not None:
+            cached = self.response_cache.get(prompt, f"ollama:{model}", cache_params)
+            if cached is not None:
+                self.logger.debug(f"Ответ Ollama получен из кэша: модель={model}")
+                return cached
         
         try:
             payload = {
@@ -194,10 +211,7 @@ class OllamaModelManager:
                 "prompt": prompt,
                 "system": self.system_prompt,
                 "stream": False,
-                "options": {
-                    "temperature": kwargs.get('temperature', self.config.temperature),
-                    "num_predict": kwargs.get('max_tokens', self.config.max_tokens),
-                }
+                "options": options
             }
             
             self.logger.debug(f"Отправка запроса к Ollama: модель={model}")
@@ -212,6 +226,8 @@ class OllamaModelManager:
                 data = response.json()
                 generated_text = data.get('response', '')
                 self.logger.debug(f"Получен ответ от Ollama: {len(generated_text)} символов")
+                if self.response_cache is not None:
+                    self.response_cache.set(prompt, f"ollama:{model}", generated_text, cache_params)
                 return generated_text
             else:
                 self.logger.error(f"Ошибка генерации: HTTP {response.status_code}")
@@ -221,6 +237,34 @@ class OllamaModelManager:
             self.logger.error(f"Ошибка при генерации текста: {e}")
             return f"Ошибка: {str(e)}"
     
+    def stream_generate(self, prompt: str, model: str = None, **kwargs) -> TokenStream:
+        """
+        Потоковая генерация текста через Ollama API
+        
+        Args:
+            prompt (str): Входной промпт
+            model (str): Название модели (по умолчанию из конфига)
+            **kwargs: Дополнительные параметры (temperature, max_tokens)
+            
+        Returns:
+            TokenStream: Асинхронный итератор фрагментов ответа
+        """
+        payload = {
+            "model": model or self.config.model,
+            "prompt": prompt,
+            "system": self.system_prompt,
+            "options": {
+                "temperature": kwargs.get('temperature', self.config.temperature),
+                "num_predict": kwargs.get('max_tokens', self.config.max_tokens),
+            }
+        }
+        
+        return TokenStream(
+            lambda stream: iter_ollama_stream(stream, f"{self.config.host}/api/generate",
+                                              payload, self.config.timeout),
+            on_finish=self.stream_stats.record
+        )
+    
     def parse_command(self, command: str) -> List[Dict[str, Any]]:
         """
         Парсинг команды пользователя с помощью LLM
@@ -372,4 +416,4 @@ def create_ollama_manager(config_dict: Dict[str, Any] = None) -> OllamaModelMana
     else:
         config = OllamaConfig()
     
-    return OllamaModelManager(config)
+    return OllamaModelManager(config, response_cache=cache_from_config(config_dict))
@@ -15,19 +15,24 @@ import os
 import requests
 from typing import Dict, List, Any, Optional
 
+from src.ai.response_cache import ResponseCache, messages_prompt
+from src.ai.streaming import StreamStats, TokenStream, iter_openai_stream
+
 
 class OpenAIClient:
     """
     Simplified OpenAI API client for intelligent agent
     """
     
-    def __init__(self, api_key: str = None, model: str = "gpt-4"):
+    def __init__(self, api_key: str = None, model: str = "gpt-4",
+                 response_cache: Optional[ResponseCache] = None):
         """
         Initialize OpenAI client
         
         Args:
             api_key (str): OpenAI API key (defaults to OPENAI_API_KEY env var)
             model (str): Model to use (default: gpt-4)
+            response_cache (ResponseCache): Persistent response cache (optional)
         """
         self.logger = logging.getLogger('daur_ai.openai_client')
         
@@ -43,6 +48,8 @@ class OpenAIClient:
             "Authorization": f"Bearer {self.api_key}",
             "Content-Type": "application/json"
         }
+        self.stream_stats = StreamStats()
+        self.response_cache = response_cache
         
         self.logger.info(f"OpenAI client initialized with model: {self.model}")
     
@@ -85,6 +92,14 @@ class OpenAIClient:
         Raises:
             Exception: If API request fails
         """
+        cache_params = {"temperature": temperature, "max_tokens": max_tokens,
+                        "json_mode": json_mode, **kwargs}
+        if self.response_cache is not None:
+            cached = self.response_cache.get(messages_prompt(messages), f"openai:{self.model}", cache_params)
+            if cached is not None:
+                self.logger.debug(f"Chat response served from cache: model={self.model}")
+                return cached
+        
         try:
             payload = {
                 "model": self.model,
@@ -120,6 +135,10 @@ class OpenAIClient:
                         f"completion: {usage.get('completion_tokens', 0)})"
                     )
                 
+                if self.response_cache is not None:
+                    self.response_cache.set(messages_prompt(messages), f"openai:{self.model}",
+                                            content, cache_params)
+                
                 return content
             else:
                 error_msg = f"OpenAI API error: HTTP {response.status_code}"
@@ -148,6 +167,49 @@ class OpenAIClient:
             self.logger.error(error_msg)
             raise Exception(error_msg)
     
+    def stream_chat(self, messages: List[Dict[str, str]],
+                    temperature: float = 0.7,
+                    max_tokens: int = 2000,
+                    json_mode: bool = False,
+                    **kwargs) -> TokenStream:
+        """
+        Send streaming chat completion request
+        
+        Args:
+            messages (List[Dict]): List of message dicts with 'role' and 'content'
+            temperature (float): Sampling temperature (0-2)
+            max_tokens (int): Maximum tokens to generate
+            json_mode (bool): Enable JSON mode for structured output
+            **kwargs: Additional parameters
+            
+        Returns:
+            TokenStream: Async iterator over response text chunks
+        """
+        payload = {
+            "model": self.model,
+            "messages": messages,
+            "temperature": temperature,
+            "max_tokens": max_tokens,
+            **kwargs
+        }
+        
+        if json_mode:
+            payload["response_format"] = {"type": "json_object"}
+        
+        return TokenStream(
+            lambda stream: iter_openai_stream(stream, f"{self.base_url}/chat/completions",
+                                              self.headers, payload, self.timeout),
+            on_finish=self.stream_stats.record
+        )
+    
+    def stream_generate(self, prompt: str,
+                        temperature: float = 0.7,
+                        max_tokens: int = 2000,
+                        json_mode: bool = False) -> TokenStream:
+        """Streaming counterpart of chat_async for a simple prompt string"""
+        messages = [{"role": "user", "content": prompt}]
+        return self.stream_chat(messages, temperature, max_tokens, json_mode=json_mode)
+    
     def simple_chat(self, user_message: str, 
                     system_message: str = None,
                     temperature: float = 0.7,
@@ -17,6 +17,8 @@ import time
 from typing import Dict, List, Any, Optional
 from dataclasses import dataclass
 
+from src.ai.streaming import StreamStats, TokenStream, iter_openai_stream
+
 
 @dataclass
 class OpenAIConfig:
@@ -89,6 +91,7 @@ class OpenAIModelManager:
             "Authorization": f"Bearer {self.config.api_key}",
             "Content-Type": "application/json"
         }
+        self.stream_stats = StreamStats()
         
         # Проверка доступности API
         self._check_api_availability()
@@ -171,6 +174,33 @@ class OpenAIModelManager:
             self.logger.error(f"Ошибка при генерации текста: {e}")
             return f"Ошибка: {str(e)}"
     
+    def stream_generate(self, prompt: str, **kwargs) -> TokenStream:
+        """
+        Потоковая генерация текста через OpenAI API
+        
+        Args:
+            prompt (str): Входной промпт
+            **kwargs: Дополнительные параметры (model, max_tokens, temperature)
+            
+        Returns:
+            TokenStream: Асинхронный итератор фрагментов ответа
+        """
+        payload = {
+            "model": kwargs.get('model', self.config.model),
+            "messages": [
+                {"role": "system", "content": self.system_prompt},
+                {"role": "user", "content": prompt}
+            ],
+            "max_tokens": kwargs.get('max_tokens', self.config.max_tokens),
+            "temperature": kwargs.get('temperature', self.config.temperature)
+        }
+        
+        return TokenStream(
+            lambda stream: iter_openai_stream(stream, f"{self.config.base_url}/chat/completions",
+                                              self.headers, payload, self.config.timeout),
+            on_finish=self.stream_stats.record
+        )
+    
     def parse_command(self, command: str) -> List[Dict[str, Any]]:
         """
         Парсинг команды пользователя с помощью OpenAI
@@ -20,9 +20,13 @@ from enum import Enum
 from datetime import datetime, timedelta
 from collections import OrderedDict
 import threading
-from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import Future, ThreadPoolExecutor
 import json
 
+from src.ai.request_batcher import RequestBatcher
+from src.ai.response_cache import cache_from_config
+from src.ai.streaming import StreamStats, TokenStream
+
 
 class ModelType(Enum):
     """Типы поддерживаемых моделей"""
@@ -32,6 +36,16 @@ class ModelType(Enum):
     SIMPLE = "simple"
 
 
+# Одновременных вызовов на модель по умолчанию: локальная модель обрабатывает
+# пакет целиком на одном устройстве, серверы Ollama и OpenAI - параллельные запросы
+DEFAULT_CONCURRENCY = {
+    ModelType.OLLAMA: 4,
+    ModelType.OPENAI: 8,
+    ModelType.LOCAL: 1,
+    ModelType.SIMPLE: 4
+}
+
+
 class CacheEntry:
     """Запись в кэше с метаданными"""
     
@@ -93,6 +107,9 @@ class OptimizedModelManager:
         self.cache_misses = 0
         self.cache_lock = threading.RLock()
         
+        # Постоянный кэш на диске - второй уровень после кэша в памяти
+        self.persistent_cache = cache_from_config(config.get('ai_models', {}))
+        
         # Пулинг потоков для асинхронной обработки
         self.executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="daur_ai_model_")
         
@@ -104,6 +121,18 @@ class OptimizedModelManager:
             'total_processing_time': 0,
             'model_switch_count': 0
         }
+        self.stats_lock = threading.Lock()
+        self.stream_stats = StreamStats()
+        
+        # Очереди запросов с пакетной обработкой (по одной на модель)
+        batching = config.get('ai_models', {}).get('batching', {})
+        self.batch_window = batching.get('window', 0.01)
+        self.max_batch_size = batching.get('max_batch_size', 8)
+        self.concurrency_limits = dict(DEFAULT_CONCURRENCY)
+        for name, limit in batching.get('concurrency', {}).items():
+            self.concurrency_limits[ModelType(name)] = limit
+        self.batchers: Dict[ModelType, RequestBatcher] = {}
+        self.batchers_lock = threading.Lock()
         
         # Инициализация доступных моделей
         self._initialize_models()
@@ -152,7 +181,19 @@ class OptimizedModelManager:
         except Exception as e:
             self.logger.warning(f"Ошибка инициализации OpenAI: {e}")
         
-        # 3. Попытка инициализации локальных моделей
+        # 3. Попытка инициализации локальной модели
+        local_model_path = self.config.get('ai_models', {}).get('local_model_path')
+        if local_model_path:
+            try:
+                from src.ai.model_manager import AIModelManager
+                
+                self.models[ModelType.LOCAL] = AIModelManager(local_model_path)
+                self.logger.info("✓ Локальная модель доступна")
+                
+            except Exception as e:
+                self.logger.warning(f"Ошибка инициализации локальной модели: {e}")
+        
+        # 4. Простая модель
         try:
             from src.ai.simple_model import MockModelManager
             
@@ -171,18 +212,21 @@ class OptimizedModelManager:
                 self.logger.info(f"Активная модель: {model_type.value}")
                 break
     
-    def _generate_cache_key(self, prompt: str, model_type: Optional[str] = None) -> str:
+    def _generate_cache_key(self, prompt: str, model_type: Optional[ModelType] = None,
+                            max_tokens: Optional[int] = None) -> str:
         """
         Генерация ключа кэша на основе prompt и параметров
         
         Args:
             prompt: Текст запроса
-            model_type: Тип модели (опционально)
+            model_type: Тип модели (по умолчанию активная)
+            max_tokens: Максимальное количество токенов
             
         Returns:
             str: Хэш-ключ
         """
-        key_data = f"{prompt}:{model_type or self.active_model_type.value}"
+        model = self._cache_model(model_type or self.active_model_type)
+        key_data = f"{prompt}:{model}:{self._max_tokens(max_tokens)}"
         return hashlib.md5(key_data.encode()).hexdigest()
     
     def _get_from_cache(self, cache_key: str) -> Optional[Any]:
@@ -228,25 +272,98 @@ class OptimizedModelManager:
             
             self.response_cache[cache_key] = CacheEntry(value, ttl)
     
-    def _switch_model(self, reason: str = ""):
+    def _switch_model(self, reason: str = "", failed_model: Optional[ModelType] = None):
         """
         Переключиться на следующую доступную модель
         
         Args:
             reason: Причина переключения
+            failed_model: Модель, вызвавшая ошибку (если другой поток уже
+                          переключился с нее, повторного переключения нет)
         """
-        current_index = self.model_priority.index(self.active_model_type)
+        with self.stats_lock:
+            if failed_model is not None and self.active_model_type != failed_model:
+                return self.active_model is not None
+            
+            current_index = self.model_priority.index(self.active_model_type)
+            
+            for i in range(current_index + 1, len(self.model_priority)):
+                model_type = self.model_priority[i]
+                if model_type in self.models:
+                    self.active_model = self.models[model_type]
+                    self.active_model_type = model_type
+                    self.model_stats['model_switch_count'] += 1
+                    self.logger.warning(f"Переключение на модель {model_type.value}. Причина: {reason}")
+                    return True
+            
+            return False
+    
+    def _max_tokens(self, max_tokens: Optional[int]) -> int:
+        return max_tokens or self.config.get('ai_models', {}).get('max_tokens', 1000)
+    
+    def _cache_model(self, model_type: ModelType) -> str:
+        """Имя конкретной модели для ключа постоянного кэша (например, "ollama:llama3.2")"""
+        model = self.models.get(model_type)
+        name = getattr(getattr(model, 'config', None), 'model', None) or getattr(model, 'model_path', None)
+        return f"{model_type.value}:{name}" if name else model_type.value
+    
+    def _cached_result(self, prompt: str, start_time: float,
+                       max_tokens: Optional[int] = None) -> Optional[Dict[str, Any]]:
+        cache_key = self._generate_cache_key(prompt, max_tokens=max_tokens)
+        cached_response = self._get_from_cache(cache_key)
+        if cached_response is None and self.persistent_cache is not None:
+            cached_response = self.persistent_cache.get(prompt, self._cache_model(self.active_model_type),
+                                                        {'max_tokens': self._max_tokens(max_tokens)})
+            if cached_response is not None:
+                self._set_cache(cache_key, cached_response)
+        if cached_response is None:
+            return None
         
-        for i in range(current_index + 1, len(self.model_priority)):
-            model_type = self.model_priority[i]
-            if model_type in self.models:
-                self.active_model = self.models[model_type]
-                self.active_model_type = model_type
-                self.model_stats['model_switch_count'] += 1
-                self.logger.warning(f"Переключение на модель {model_type.value}. Причина: {reason}")
-                return True
+        return {
+            'success': True,
+            'response': cached_response,
+            'model': self.active_model_type.value,
+            'from_cache': True,
+            'processing_time': time.time() - start_time
+        }
+    
+    def _record_success(self, prompt: str, response: Any, model_type: ModelType,
+                        use_cache: bool, start_time: float,
+                        max_tokens: Optional[int] = None) -> Dict[str, Any]:
+        # Сохраняем в кэш
+        if use_cache:
+            self._set_cache(self._generate_cache_key(prompt, model_type, max_tokens), response)
+            if self.persistent_cache is not None:
+                self.persistent_cache.set(prompt, self._cache_model(model_type), response,
+                                          {'max_tokens': self._max_tokens(max_tokens)})
+        
+        processing_time = time.time() - start_time
+        with self.stats_lock:
+            self.model_stats['successful_requests'] += 1
+            self.model_stats['total_processing_time'] += processing_time
         
-        return False
+        return {
+            'success': True,
+            'response': response,
+            'model': model_type.value,
+            'from_cache': False,
+            'processing_time': processing_time
+        }
+    
+    def _record_failure(self, model_type: Optional[ModelType], error: Exception):
+        self.logger.error(f"Ошибка при использовании модели {model_type.value if model_type else None}: {error}")
+        with self.stats_lock:
+            self.model_stats['failed_requests'] += 1
+    
+    @staticmethod
+    def _failure_result(start_time: float) -> Dict[str, Any]:
+        return {
+            'success': False,
+            'error': 'Все доступные модели недоступны',
+            'model': None,
+            'from_cache': False,
+            'processing_time': time.time() - start_time
+        }
     
     def generate_response(self, prompt: str, use_cache: bool = True, 
                          max_tokens: Optional[int] = None) -> Dict[str, Any]:
@@ -262,73 +379,131 @@ class OptimizedModelManager:
             Dict: Результат с ответом и метаданными
         """
         start_time = time.time()
-        self.model_stats['total_requests'] += 1
+        with self.stats_lock:
+            self.model_stats['total_requests'] += 1
         
         # Проверка кэша
         if use_cache:
-            cache_key = self._generate_cache_key(prompt)
-            cached_response = self._get_from_cache(cache_key)
-            
-            if cached_response is not None:
-                return {
-                    'success': True,
-                    'response': cached_response,
-                    'model': self.active_model_type.value,
-                    'from_cache': True,
-                    'processing_time': time.time() - start_time
-                }
+            cached = self._cached_result(prompt, start_time, max_tokens)
+            if cached is not None:
+                return cached
         
+        return self._generate_with_fallback(prompt, use_cache, max_tokens, start_time)
+    
+    def _generate_with_fallback(self, prompt: str, use_cache: bool,
+                                max_tokens: Optional[int], start_time: float) -> Dict[str, Any]:
         # Попытка генерации ответа
         max_attempts = len(self.models)
         attempt = 0
         
         while attempt < max_attempts:
+            model, model_type = self.active_model, self.active_model_type
             try:
-                if not self.active_model:
+                if not model:
                     raise Exception("Нет доступных моделей")
                 
                 # Генерируем ответ
-                response = self.active_model.generate(
-                    prompt=prompt,
-                    max_tokens=max_tokens or self.config.get('ai_models', {}).get('max_tokens', 1000)
-                )
-                
-                # Сохраняем в кэш
-                if use_cache:
-                    cache_key = self._generate_cache_key(prompt)
-                    self._set_cache(cache_key, response)
-                
-                processing_time = time.time() - start_time
-                self.model_stats['successful_requests'] += 1
-                self.model_stats['total_processing_time'] += processing_time
-                
-                return {
-                    'success': True,
-                    'response': response,
-                    'model': self.active_model_type.value,
-                    'from_cache': False,
-                    'processing_time': processing_time
-                }
+                response = model.generate_text(prompt, max_tokens=self._max_tokens(max_tokens))
+                if response is None:
+                    raise Exception("Модель не вернула ответ")
                 
             except Exception as e:
-                self.logger.error(f"Ошибка при использовании модели {self.active_model_type.value}: {e}")
-                self.model_stats['failed_requests'] += 1
+                self._record_failure(model_type, e)
                 
                 # Пытаемся переключиться на другую модель
-                if not self._switch_model(f"Ошибка: {str(e)}"):
+                if not self._switch_model(f"Ошибка: {str(e)}", failed_model=model_type):
                     break
                 
                 attempt += 1
+                continue
+            
+            return self._record_success(prompt, response, model_type, use_cache, start_time, max_tokens)
         
         # Если все модели не сработали
-        processing_time = time.time() - start_time
-        return {
-            'success': False,
-            'error': 'Все доступные модели недоступны',
-            'model': None,
-            'from_cache': False,
-            'processing_time': processing_time
-        }
+        return self._failure_result(start_time)
+    
+    def _get_batcher(self, model_type: ModelType) -> RequestBatcher:
+        with self.batchers_lock:
+            batcher = self.batchers.get(model_type)
+            if batcher is None:
+                batcher = RequestBatcher(
+                    self.models[model_type],
+                    name=model_type.value,
+                    max_batch_size=self.max_batch_size,
+                    batch_window=self.batch_window,
+                    max_concurrency=self.concurrency_limits.get(model_type, 1)
+                )
+                self.batchers[model_type] = batcher
+            return batcher
+    
+    def submit(self, prompt: str, use_cache: bool = True,
+               max_tokens: Optional[int] = None) -> Future:
+        """
+        Поставить запрос в очередь активной модели
+        
+        Запросы из разных потоков объединяются в пакеты, одинаковые
+        выполняющиеся запросы не дублируются. При ошибке модели запрос
+        повторяется на резервной модели, как в generate_response.
+        
+        Args:
+            prompt: Текст запроса
+            use_cache: Использовать кэш
+            max_tokens: Максимальное количество токенов
+            
+        Returns:
+            Future: Будущий результат в формате generate_response
+        """
+        start_time = time.time()
+        with self.stats_lock:
+            self.model_stats['total_requests'] += 1
+        future = Future()
+        
+        if use_cache:
+            cached = self._cached_result(prompt, start_time, max_tokens)
+            if cached is not None:
+                future.set_result(cached)
+                return future
+        
+        model_type = self.active_model_type
+        if model_type is None:
+            future.set_result(self._failure_result(start_time))
+            return future
+        
+        def _fallback(done: Future):
+            if future.cancelled():
+                return
+            try:
+                future.set_result(done.result())
+            except Exception as e:
+                future.set_exception(e)
+        
+        def _done(request: Future):
+            if future.cancelled():
+                return
+            try:
+                response = request.result()
+            except Exception as e:
+                self._record_failure(model_type, e)
+                if not self._switch_model(f"Ошибка: {str(e)}", failed_model=model_type):
+                    future.set_result(self._failure_result(start_time))
+                    return
+                try:
+                    self.executor.submit(
+                        self._generate_with_fallback, prompt, use_cache, max_tokens, start_time
+                    ).add_done_callback(_fallback)
+                except RuntimeError:
+                    # Менеджер уже завершает работу
+                    future.set_result(self._failure_result(start_time))
+                return
+            
+            future.set_result(self._record_success(prompt, response, model_type, use_cache,
+                                                   start_time, max_tokens))
+        
+        request = self._get_batcher(model_type).submit(prompt, self._max_tokens(max_tokens))
+        # Отмена вызывающим отменяет только его собственный запрос в очереди
+        future.add_done_callback(lambda done: request.cancel() if done.cancelled() else None)
+        request.add_done_callback(_done)
+        return future
     
     def generate_response_async(self, prompt: str, use_cache: bool = True) -> asyncio.Future:
         """
@@ -341,27 +516,61 @@ class OptimizedModelManager:
         Returns:
             asyncio.Future: Будущий результат
         """
-        return asyncio.wrap_future(
-            self.executor.submit(self.generate_response, prompt, use_cache)
-        )
+        return asyncio.wrap_future(self.submit(prompt, use_cache))
     
-    def batch_generate(self, prompts: List[str], use_cache: bool = True) -> List[Dict[str, Any]]:
+    def batch_generate(self, prompts: List[str], use_cache: bool = True,
+                       max_tokens: Optional[int] = None) -> List[Dict[str, Any]]:
         """
         Пакетная генерация ответов
         
+        Все запросы ставятся в очередь сразу и выполняются пакетами
+        (или параллельно, если модель не поддерживает пакетную генерацию).
+        
         Args:
             prompts: Список запросов
             use_cache: Использовать кэш
+            max_tokens: Максимальное количество токенов
+            
+        Returns:
+            List[Dict]: Список результатов в порядке запросов
+        """
+        futures = [self.submit(prompt, use_cache, max_tokens) for prompt in prompts]
+        return [future.result() for future in futures]
+    
+    def stream_generate(self, prompt: str, use_cache: bool = True,
+                        max_tokens: Optional[int] = None) -> TokenStream:
+        """
+        Потоковая генерация ответа активной моделью
+        
+        Кэшированный ответ и ответ модели без потокового API
+        возвращаются одним фрагментом.
+        
+        Args:
+            prompt: Текст запроса
+            use_cache: Использовать кэш
+            max_tokens: Максимальное количество токенов
             
         Returns:
-            List[Dict]: Список результатов
+            TokenStream: Асинхронный итератор фрагментов ответа
         """
-        results = []
-        for prompt in prompts:
-            result = self.generate_response(prompt, use_cache)
-            results.append(result)
+        model, model_type = self.active_model, self.active_model_type
+        cached = self._cached_result(prompt, time.time(), max_tokens) if use_cache and model_type else None
+        
+        if cached is not None:
+            stream = TokenStream(lambda stream: iter([cached['response']]))
+        elif model is not None and callable(getattr(model, 'stream_generate', None)):
+            stream = model.stream_generate(prompt, max_tokens=self._max_tokens(max_tokens))
+        else:
+            def produce(stream):
+                result = self.generate_response(prompt, use_cache, max_tokens)
+                if not result['success']:
+                    raise RuntimeError(result['error'])
+                yield result['response']
+            
+            stream = TokenStream(produce)
         
-        return results
+        stream.add_done_callback(self.stream_stats.record)
+        return stream
     
     def clear_cache(self):
         """Очистить кэш"""
@@ -387,7 +596,8 @@ class OptimizedModelManager:
             'cache_hits': self.cache_hits,
             'cache_misses': self.cache_misses,
             'hit_rate': round(hit_rate, 2),
-            'total_requests': total_requests
+            'total_requests': total_requests,
+            'persistent': self.persistent_cache.get_stats() if self.persistent_cache is not None else None
         }
     
     def get_model_stats(self) -> Dict[str, Any]:
@@ -408,7 +618,9 @@ class OptimizedModelManager:
             'average_processing_time': round(avg_time, 3),
             'model_switch_count': self.model_stats['model_switch_count'],
             'active_model': self.active_model_type.value if self.active_model_type else None,
-            'available_models': [m.value for m in self.models.keys()]
+            'available_models': [m.value for m in self.models.keys()],
+            'batching': {model_type.value: batcher.get_stats() for model_type, batcher in self.batchers.items()},
+            'streaming': self.stream_stats.get_stats()
         }
     
     def get_full_stats(self) -> Dict[str, Any]:
@@ -426,6 +638,10 @@ class OptimizedModelManager:
     
     def shutdown(self):
         """Корректное завершение работы"""
+        with self.batchers_lock:
+            batchers = list(self.batchers.values())
+        for batcher in batchers:
+            batcher.shutdown(wait=True)
         self.executor.shutdown(wait=True)
         self.logger.info("Оптимизированный менеджер моделей завершил работу")
 
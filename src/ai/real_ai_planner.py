@@ -5,11 +5,13 @@ Real AI Planner with Task Planning
 
 import logging
 import json
+import time
 from typing import Dict, List, Optional, Tuple, Any, Callable
 from dataclasses import dataclass, asdict, field
 from enum import Enum
 from datetime import datetime, timedelta
-from collections import deque
+from collections import defaultdict, deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 import heapq
 
 logging.basicConfig(level=logging.INFO)
@@ -43,6 +45,14 @@ class PlanningStrategy(Enum):
     DYNAMIC_PROGRAMMING = "dynamic_programming"
 
 
+class PlanCycleError(ValueError):
+    """Циклическая зависимость между задачами плана"""
+    
+    def __init__(self, cycle: List[str]):
+        self.cycle = cycle
+        super().__init__("Dependency cycle: " + " -> ".join(cycle))
+
+
 @dataclass
 class Task:
     """Задача"""
@@ -227,8 +237,9 @@ class RealAIPlanner:
             # Вычисляем общую длительность
             total_duration = sum(t.estimated_duration for t in task_objects)
             
-            # Определяем приоритет плана
-            plan_priority = max((t.priority for t in task_objects), default=TaskPriority.MEDIUM)
+            # Приоритет плана - самый высокий приоритет задач (меньшее значение)
+            plan_priority = min((t.priority for t in task_objects), key=lambda p: p.value,
+                                default=TaskPriority.MEDIUM)
             
             # Создаём план
             plan_id = f"plan_{datetime.now().timestamp()}"
@@ -446,13 +457,8 @@ class RealAIPlanner:
             # Обновляем статус
             self.update_task_status(task.task_id, TaskStatus.RUNNING)
             
-            # Имитируем выполнение
-            # В реальной системе здесь будет вызов реальной функции
-            import time
-            time.sleep(min(task.estimated_duration / 1000, 0.1))  # Максимум 100ms
-            
             # Завершаем задачу
-            task.result = f"Task {task.task_id} completed successfully"
+            task.result = self._simulate_task(task)
             self.update_task_status(task.task_id, TaskStatus.COMPLETED)
             
             self.logger.info(f"Task executed: {task.task_id}")
@@ -464,6 +470,183 @@ class RealAIPlanner:
             self.update_task_status(task.task_id, TaskStatus.FAILED)
             return False
     
+    def _simulate_task(self, task: Task) -> str:
+        """Имитация выполнения задачи (в реальной системе - вызов реальной функции)"""
+        time.sleep(min(task.estimated_duration / 1000, 0.1))  # Максимум 100ms
+        return f"Task {task.task_id} completed successfully"
+    
+    @staticmethod
+    def _timed_call(runner: Callable[[Task], Any], task: Task,
+                    origin: float) -> Tuple[Any, Optional[str], float, float]:
+        """Выполнить задачу в потоке пула, замерив время относительно начала плана"""
+        start = time.perf_counter()
+        try:
+            result, error = runner(task), None
+        except Exception as e:
+            result, error = None, str(e)
+        return result, error, start - origin, time.perf_counter() - origin
+    
+    def execute_plan_parallel(self, plan_id: str, max_workers: int = 4,
+                              resource_limits: Optional[Dict[str, int]] = None,
+                              runner: Optional[Callable[[Task], Any]] = None) -> Optional[Dict[str, Any]]:
+        """
+        Выполнить план параллельно
+        
+        Задача запускается, как только выполнены все ее зависимости в плане
+        (без ожидания остальных задач своего уровня). Из готовых задач
+        первыми запускаются более приоритетные и лежащие на самом длинном
+        пути до конца плана. Задачи, зависящие от невыполненной, получают
+        статус BLOCKED.
+        
+        Args:
+            plan_id: ID плана
+            max_workers: Число одновременно выполняемых задач
+            resource_limits: Лимиты ресурсов, например {'gpu': 1}; потребность
+                задачи задается в task.metadata['resources']
+            runner: Функция выполнения задачи (по умолчанию имитация)
+        
+        Returns:
+            Optional[Dict]: Отчет: время каждой задачи, общее время и ускорение
+                относительно последовательного выполнения
+        """
+        plan = self.plans.get(plan_id)
+        if not plan:
+            self.logger.error(f"Plan not found: {plan_id}")
+            return None
+        
+        try:
+            levels = self._dependency_levels(plan.tasks)
+        except PlanCycleError as e:
+            self.logger.error(f"Cannot execute plan {plan_id}: {e}")
+            return None
+        
+        runner = runner or self._simulate_task
+        limits = resource_limits or {}
+        tasks = {task.task_id: task for task in plan.tasks}
+        position = {task_id: index for index, task_id in enumerate(tasks)}
+        rank = self._path_rank(plan.tasks)
+        waiting = {task_id: 0 for task_id in tasks}
+        dependents: Dict[str, List[str]] = defaultdict(list)
+        for task in plan.tasks:
+            for dep_id in set(task.dependencies):
+                if dep_id in tasks:
+                    waiting[task.task_id] += 1
+                    dependents[dep_id].append(task.task_id)
+        
+        timings: Dict[str, Dict[str, Any]] = {}
+        ready: List[Tuple[int, float, int, str]] = []
+        
+        def push(task_id: str):
+            task = tasks[task_id]
+            heapq.heappush(ready, (task.priority.value, -rank[task_id], position[task_id], task_id))
+        
+        def block(task_id: str, reason: str):
+            # Блокируем задачу и все задачи, которые от нее зависят
+            stack = [task_id]
+            while stack:
+                current = stack.pop()
+                if current in timings:
+                    continue
+                tasks[current].error = reason
+                self.update_task_status(current, TaskStatus.BLOCKED)
+                timings[current] = {'status': TaskStatus.BLOCKED.value, 'error': reason}
+                stack.extend(dependents[current])
+        
+        for task_id, count in waiting.items():
+            if count == 0:
+                push(task_id)
+        
+        in_use: Dict[str, int] = defaultdict(int)
+        running: Dict[Any, str] = {}
+        origin = time.perf_counter()
+        
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='daur-planner') as pool:
+            while ready or running:
+                deferred = []
+                while ready and len(running) < max_workers:
+                    entry = heapq.heappop(ready)
+                    task = tasks[entry[-1]]
+                    
+                    external = [dep_id for dep_id in task.dependencies if dep_id not in tasks
+                                and dep_id in self.tasks
+                                and self.tasks[dep_id].status != TaskStatus.COMPLETED]
+                    if external:
+                        block(task.task_id, f"blocked by {external[0]}")
+                        continue
+                    
+                    needs = task.metadata.get('resources', {})
+                    if any(amount > limits[name] for name, amount in needs.items() if name in limits):
+                        task.error = f"resources {needs} exceed limits {limits}"
+                        self.update_task_status(task.task_id, TaskStatus.FAILED)
+                        timings[task.task_id] = {'status': TaskStatus.FAILED.value, 'error': task.error}
+                        for dependent_id in dependents[task.task_id]:
+                            block(dependent_id, f"blocked by {task.task_id}")
+                        continue
+                    if any(in_use[name] + amount > limits[name]
+                           for name, amount in needs.items() if name in limits):
+                        deferred.append(entry)
+                        continue
+                    
+                    for name, amount in needs.items():
+                        in_use[name] += amount
+                    self.update_task_status(task.task_id, TaskStatus.RUNNING)
+                    running[pool.submit(self._timed_call, runner, task, origin)] = task.task_id
+                
+                for entry in deferred:
+                    heapq.heappush(ready, entry)
+                if not running:
+                    break
+                
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    task_id = running.pop(future)
+                    task = tasks[task_id]
+                    for name, amount in task.metadata.get('resources', {}).items():
+                        in_use[name] -= amount
+                    
+                    result, error, start, end = future.result()
+                    task.actual_duration = int(end - start)
+                    timings[task_id] = {'start': start, 'end': end, 'duration': end - start}
+                    
+                    if error is None:
+                        task.result = result if isinstance(result, str) or result is None else str(result)
+                        self.update_task_status(task_id, TaskStatus.COMPLETED)
+                        timings[task_id]['status'] = TaskStatus.COMPLETED.value
+                        for dependent_id in dependents[task_id]:
+                            waiting[dependent_id] -= 1
+                            if waiting[dependent_id] == 0:
+                                push(dependent_id)
+                    else:
+                        self.logger.error(f"Error executing task {task_id}: {error}")
+                        task.error = error
+                        self.update_task_status(task_id, TaskStatus.FAILED)
+                        timings[task_id].update(status=TaskStatus.FAILED.value, error=error)
+                        for dependent_id in dependents[task_id]:
+                            block(dependent_id, f"blocked by {task_id}")
+        
+        wall_time = time.perf_counter() - origin
+        task_time = sum(timing.get('duration', 0.0) for timing in timings.values())
+        completed = sum(1 for timing in timings.values() if timing['status'] == TaskStatus.COMPLETED.value)
+        
+        plan.completed_at = datetime.now().isoformat()
+        plan.success_rate = completed / len(plan.tasks) if plan.tasks else 0
+        
+        report = {
+            'plan_id': plan_id,
+            'levels': levels,
+            'max_workers': max_workers,
+            'wall_time': wall_time,
+            'total_task_time': task_time,
+            'speedup': task_time / wall_time if wall_time > 0 else 1.0,
+            'completed': completed,
+            'failed': sum(1 for t in timings.values() if t['status'] == TaskStatus.FAILED.value),
+            'blocked': sum(1 for t in timings.values() if t['status'] == TaskStatus.BLOCKED.value),
+            'tasks': timings
+        }
+        self.logger.info(f"Plan executed in parallel: {plan_id} "
+                         f"(success rate: {plan.success_rate:.1%}, speedup: {report['speedup']:.2f}x)")
+        return report
+    
     # ===== OPTIMIZATION =====
     
     def optimize_plan(self, plan_id: str) -> Optional[Plan]:
@@ -507,33 +690,96 @@ class RealAIPlanner:
             if not plan:
                 return None
             
-            groups = []
-            remaining = set(t.task_id for t in plan.tasks)
-            
-            while remaining:
-                # Находим задачи без зависимостей в оставшихся
-                current_group = []
-                for task_id in remaining:
-                    task = self.tasks.get(task_id)
-                    if task and not any(dep in remaining for dep in task.dependencies):
-                        current_group.append(task_id)
-                
-                if not current_group:
-                    # Если нет задач без зависимостей, берём первую
-                    current_group = [remaining.pop()]
-                else:
-                    for task_id in current_group:
-                        remaining.discard(task_id)
-                
-                groups.append(current_group)
+            groups = self._dependency_levels(plan.tasks)
             
             self.logger.info(f"Plan parallelized: {plan_id} ({len(groups)} groups)")
             return groups
         
+        except PlanCycleError as e:
+            self.logger.error(f"Cannot parallelize plan {plan_id}: {e}")
+            return None
+        
         except Exception as e:
             self.logger.error(f"Error parallelizing plan: {e}")
             return None
     
+    def _dependency_levels(self, tasks: List[Task]) -> List[List[str]]:
+        """
+        Разбить задачи на уровни алгоритмом Кана
+        
+        Задачи одного уровня не зависят друг от друга; внутри уровня
+        задачи упорядочены по приоритету. Зависимости от задач вне списка
+        не учитываются.
+        
+        Args:
+            tasks: Задачи плана
+        
+        Returns:
+            List[List[str]]: Уровни задач
+        
+        Raises:
+            PlanCycleError: Если зависимости образуют цикл
+        """
+        by_id = {task.task_id: task for task in tasks}
+        position = {task_id: index for index, task_id in enumerate(by_id)}
+        indegree = {task_id: 0 for task_id in by_id}
+        dependents: Dict[str, List[str]] = defaultdict(list)
+        for task in by_id.values():
+            for dep_id in set(task.dependencies):
+                if dep_id in by_id:
+                    indegree[task.task_id] += 1
+                    dependents[dep_id].append(task.task_id)
+        
+        def key(task_id: str) -> Tuple[int, int]:
+            return by_id[task_id].priority.value, position[task_id]
+        
+        levels = []
+        level = sorted((task_id for task_id, degree in indegree.items() if degree == 0), key=key)
+        while level:
+            levels.append(level)
+            following = []
+            for task_id in level:
+                for dependent_id in dependents[task_id]:
+                    indegree[dependent_id] -= 1
+                    if indegree[dependent_id] == 0:
+                        following.append(dependent_id)
+            level = sorted(following, key=key)
+        
+        if sum(len(level) for level in levels) < len(by_id):
+            raise PlanCycleError(self._find_cycle(by_id, indegree))
+        return levels
+    
+    @staticmethod
+    def _find_cycle(by_id: Dict[str, Task], indegree: Dict[str, int]) -> List[str]:
+        """Найти цикл среди задач, не попавших ни на один уровень"""
+        remaining = {task_id for task_id, degree in indegree.items() if degree > 0}
+        path: List[str] = []
+        index: Dict[str, int] = {}
+        current = next(task_id for task_id in by_id if task_id in remaining)
+        # У каждой оставшейся задачи есть оставшаяся зависимость - идем по ним до повтора
+        while current not in index:
+            index[current] = len(path)
+            path.append(current)
+            current = next(dep_id for dep_id in by_id[current].dependencies if dep_id in remaining)
+        return path[index[current]:] + [current]
+    
+    def _path_rank(self, tasks: List[Task]) -> Dict[str, float]:
+        """Оценка длительности самого длинного пути от задачи до конца плана"""
+        levels = self._dependency_levels(tasks)
+        by_id = {task.task_id: task for task in tasks}
+        dependents: Dict[str, List[str]] = defaultdict(list)
+        for task in tasks:
+            for dep_id in set(task.dependencies):
+                if dep_id in by_id:
+                    dependents[dep_id].append(task.task_id)
+        
+        rank: Dict[str, float] = {}
+        for level in reversed(levels):
+            for task_id in level:
+                rank[task_id] = by_id[task_id].estimated_duration + max(
+                    (rank[dependent_id] for dependent_id in dependents[task_id]), default=0)
+        return rank
+    
     # ===== STATISTICS =====
     
     def get_plan_statistics(self, plan_id: str) -> Dict[str, Any]:
@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Daur-AI: Пакетная обработка запросов к AI модели
+Очередь запросов с окном сбора пакета и ограничением параллелизма
+
+Запросы, пришедшие в течение окна batch_window, объединяются в один вызов
+generate_batch, если модель его поддерживает (пакетная генерация
+transformers). Для остальных моделей (Ollama, OpenAI) запросы выполняются
+параллельно, но не более max_concurrency одновременно. Одинаковые запросы,
+которые уже выполняются, не отправляются повторно: Future каждого
+вызывающего связан с общим результатом запроса, поэтому отмена одного
+вызывающего не затрагивает остальных.
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, InvalidStateError, ThreadPoolExecutor
+from typing import Any, Deque, Dict, List, Tuple
+
+
+class _Request:
+    """Запрос в очереди"""
+
+    __slots__ = ('key', 'prompt', 'max_tokens', 'future', 'enqueued')
+
+    def __init__(self, key, prompt, max_tokens, future):
+        self.key = key
+        self.prompt = prompt
+        self.max_tokens = max_tokens
+        self.future = future
+        self.enqueued = time.monotonic()
+
+
+def _chain(shared: Future) -> Future:
+    """Future вызывающего, получающий результат общего Future запроса"""
+    future = Future()
+
+    def _copy(done: Future):
+        if future.cancelled():
+            return
+        try:
+            if done.cancelled():
+                future.cancel()
+            elif done.exception() is not None:
+                future.set_exception(done.exception())
+            else:
+                future.set_result(done.result())
+        except InvalidStateError:
+            pass
+
+    shared.add_done_callback(_copy)
+    return future
+
+
+class RequestBatcher:
+    """Очередь запросов к одной модели"""
+
+    def __init__(self, model: Any, name: str = "model", max_batch_size: int = 8,
+                 batch_window: float = 0.01, max_concurrency: int = 1):
+        """
+        Args:
+            model: Модель с методом generate_text (и, возможно, generate_batch)
+            name: Имя модели для логов и имен потоков
+            max_batch_size: Максимальный размер пакета
+            batch_window: Время ожидания остальных запросов пакета в секундах
+            max_concurrency: Максимальное число одновременных вызовов модели
+        """
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be at least 1")
+
+        self.model = model
+        self.name = name
+        self.logger = logging.getLogger('daur_ai.request_batcher')
+        self.supports_batch = callable(getattr(model, 'generate_batch', None))
+        # Без пакетного API каждый запрос - отдельный вызов, ждать пакет незачем
+        self.max_batch_size = max(1, max_batch_size) if self.supports_batch else 1
+        self.batch_window = batch_window if self.supports_batch else 0.0
+        self.max_concurrency = max_concurrency
+
+        self.condition = threading.Condition()
+        self.pending: Deque[_Request] = deque()
+        self.in_flight: Dict[Tuple[str, int], Future] = {}
+        self.slots = threading.BoundedSemaphore(max_concurrency)
+        self.executor = ThreadPoolExecutor(max_workers=max_concurrency,
+                                           thread_name_prefix=f"daur_ai_batch_{name}_")
+        self.running = True
+        self.dispatcher = None
+
+        self.stats = {
+            'requests': 0,
+            'deduplicated': 0,
+            'backend_calls': 0,
+            'batched_prompts': 0,
+            'max_batch_size': 0,
+            'errors': 0
+        }
+
+    def submit(self, prompt: str, max_tokens: int) -> Future:
+        """
+        Поставить запрос в очередь
+
+        Args:
+            prompt: Текст запроса
+            max_tokens: Максимальное количество токенов
+
+        Returns:
+            Future: Результат generate_text для запроса
+        """
+        key = (prompt, max_tokens)
+        with self.condition:
+            if not self.running:
+                raise RuntimeError(f"Очередь модели {self.name} остановлена")
+            self.stats['requests'] += 1
+
+            shared = self.in_flight.get(key)
+            if shared is not None:
+                self.stats['deduplicated'] += 1
+                return _chain(shared)
+
+            shared = Future()
+            self.in_flight[key] = shared
+            self.pending.append(_Request(key, prompt, max_tokens, shared))
+            if self.dispatcher is None:
+                self.dispatcher = threading.Thread(target=self._dispatch_loop,
+                                                   name=f"daur_ai_batch_{self.name}", daemon=True)
+                self.dispatcher.start()
+            self.condition.notify()
+        return _chain(shared)
+
+    def _dispatch_loop(self):
+        while True:
+            with self.condition:
+                while not self.pending and self.running:
+                    self.condition.wait()
+                if not self.pending:
+                    return
+
+                # Окно отсчитывается от первого запроса пакета
+                deadline = self.pending[0].enqueued + self.batch_window
+                while len(self.pending) < self.max_batch_size and self.running:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self.condition.wait(remaining)
+
+                count = min(len(self.pending), self.max_batch_size)
+                batch = [self.pending.popleft() for _ in range(count)]
+
+            # Пока все слоты заняты, новые запросы копятся в очереди следующего пакета
+            self.slots.acquire()
+            try:
+                self.executor.submit(self._run_batch, batch)
+            except RuntimeError as e:
+                self.slots.release()
+                self._finish(batch, error=e)
+
+    def _run_batch(self, batch: List[_Request]):
+        try:
+            groups: Dict[int, List[_Request]] = {}
+            for request in batch:
+                groups.setdefault(request.max_tokens, []).append(request)
+
+            for max_tokens, requests in groups.items():
+                try:
+                    if len(requests) > 1:
+                        outputs = self.model.generate_batch([r.prompt for r in requests], max_tokens=max_tokens)
+                    else:
+                        outputs = [self.model.generate_text(requests[0].prompt, max_tokens=max_tokens)]
+                    with self.condition:
+                        self.stats['backend_calls'] += 1
+                        self.stats['batched_prompts'] += len(requests)
+                        self.stats['max_batch_size'] = max(self.stats['max_batch_size'], len(requests))
+                except Exception as e:
+                    self.logger.error(f"Ошибка вызова модели {self.name}: {e}")
+                    self._finish(requests, error=e)
+                    continue
+
+                self._finish(requests, outputs=outputs)
+        finally:
+            self.slots.release()
+
+    def _finish(self, requests: List[_Request], outputs: List[Any] = None, error: Exception = None):
+        with self.condition:
+            for request in requests:
+                self.in_flight.pop(request.key, None)
+            if error is not None:
+                self.stats['errors'] += len(requests)
+
+        for index, request in enumerate(requests):
+            # Завершенный Future не должен оставить без ответа остальные запросы пакета
+            if request.future.done():
+                continue
+            try:
+                if error is not None:
+                    request.future.set_exception(error)
+                elif index >= len(outputs) or outputs[index] is None:
+                    request.future.set_exception(RuntimeError(f"Модель {self.name} не вернула ответ"))
+                else:
+                    request.future.set_result(outputs[index])
+            except InvalidStateError:
+                pass
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self.condition:
+            calls = self.stats['backend_calls']
+            return {
+                **self.stats,
+                'pending': len(self.pending),
+                'in_flight': len(self.in_flight),
+                'average_batch_size': round(self.stats['batched_prompts'] / calls, 2) if calls else 0,
+                'supports_batch': self.supports_batch,
+                'max_concurrency': self.max_concurrency
+            }
+
+    def shutdown(self, wait: bool = True):
+        """Остановить очередь; уже принятые запросы будут выполнены"""
+        with self.condition:
+            self.running = False
+            self.condition.notify_all()
+            dispatcher = self.dispatcher
+        if dispatcher is not None and wait:
+            dispatcher.join()
+        self.executor.shutdown(wait=wait)
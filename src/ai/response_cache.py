@@ -0,0 +1,353 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Daur-AI: Постоянный кэш ответов языковых моделей
+Общий для менеджеров моделей кэш в SQLite с TTL и вытеснением по размеру
+
+Ключ - хеш нормализованного промпта (регистр, пробелы, Unicode), имени
+модели и параметров генерации, поэтому кэш переживает перезапуск и не
+различает промпты, отличающиеся только форматированием. Если передан
+embedder, при промахе ищется ответ на близкий по смыслу промпт той же
+модели с теми же параметрами (косинусное сходство эмбеддингов).
+"""
+
+import hashlib
+import json
+import logging
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+SCHEMA = (
+    '''CREATE TABLE IF NOT EXISTS responses (
+        key TEXT PRIMARY KEY,
+        scope TEXT NOT NULL,
+        model TEXT NOT NULL,
+        prompt TEXT NOT NULL,
+        response TEXT NOT NULL,
+        size INTEGER NOT NULL,
+        embedding BLOB,
+        created_at REAL NOT NULL,
+        expires_at REAL,
+        last_accessed REAL NOT NULL,
+        hits INTEGER NOT NULL DEFAULT 0
+    )''',
+    'CREATE INDEX IF NOT EXISTS idx_responses_scope ON responses (scope)',
+    'CREATE INDEX IF NOT EXISTS idx_responses_expires ON responses (expires_at)',
+    'CREATE INDEX IF NOT EXISTS idx_responses_accessed ON responses (last_accessed)',
+)
+
+_WHITESPACE = re.compile(r'\s+')
+
+# Пути к базам открытых общих кэшей
+_shared: Dict[str, 'ResponseCache'] = {}
+_shared_lock = threading.Lock()
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Привести промпт к каноническому виду для ключа кэша"""
+    return _WHITESPACE.sub(' ', unicodedata.normalize('NFKC', prompt)).strip().casefold()
+
+
+def messages_prompt(messages: Sequence[Dict[str, Any]]) -> str:
+    """Текст диалога (список сообщений chat API) для ключа кэша"""
+    return '\n'.join(f"{message.get('role', '')}: {message.get('content', '')}" for message in messages)
+
+
+def _digest(data: Any) -> str:
+    encoded = json.dumps(data, sort_keys=True, default=repr, ensure_ascii=False)
+    return hashlib.sha256(encoded.encode('utf-8')).hexdigest()
+
+
+class ResponseCache:
+    """Кэш ответов моделей в SQLite"""
+
+    def __init__(self, db_path: str = 'response_cache.db', ttl: Optional[float] = 86400,
+                 max_entries: int = 10000, max_bytes: Optional[int] = None,
+                 embedder: Optional[Callable[[str], Sequence[float]]] = None,
+                 similarity_threshold: float = 0.95, purge_interval: int = 100):
+        """
+        Args:
+            db_path: Путь к файлу базы данных (':memory:' - без сохранения на диск)
+            ttl: Время жизни ответа в секундах по умолчанию (None - бессрочно)
+            max_entries: Максимальное число ответов (вытесняются давно не использованные)
+            max_bytes: Максимальный суммарный размер ответов в байтах (None - без ограничения)
+            embedder: Функция эмбеддинга текста для поиска близких промптов
+            similarity_threshold: Минимальное косинусное сходство для попадания по смыслу
+            purge_interval: Через сколько записей удалять истекшие ответы
+        """
+        self.db_path = db_path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.embedder = embedder
+        self.similarity_threshold = similarity_threshold
+        self.purge_interval = purge_interval
+        self.logger = logging.getLogger('daur_ai.response_cache')
+        self.lock = threading.RLock()
+
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        if db_path != ':memory:':
+            self.conn.execute('PRAGMA journal_mode = WAL')
+        self.conn.execute('PRAGMA synchronous = NORMAL')
+        with self.conn:
+            for statement in SCHEMA:
+                self.conn.execute(statement)
+
+        # Матрицы нормированных эмбеддингов по областям (модель + параметры)
+        self._vectors: Dict[str, Tuple[List[str], np.ndarray]] = {}
+        self._writes = 0
+        self.stats = {'hits': 0, 'semantic_hits': 0, 'misses': 0, 'stores': 0,
+                      'evictions': 0, 'expired': 0}
+
+    @staticmethod
+    def make_key(prompt: str, model: str, params: Optional[Dict[str, Any]] = None) -> Tuple[str, str]:
+        """
+        Ключ ответа и область поиска по смыслу
+
+        Args:
+            prompt: Текст промпта
+            model: Имя модели (например, "ollama:llama3.2")
+            params: Параметры генерации, влияющие на ответ
+
+        Returns:
+            Tuple[str, str]: Ключ записи и ключ области (модель + параметры)
+        """
+        scope = _digest({'model': model, 'params': params or {}})
+        return _digest({'scope': scope, 'prompt': normalize_prompt(prompt)}), scope
+
+    def _embed(self, prompt: str) -> Optional[np.ndarray]:
+        if self.embedder is None:
+            return None
+        try:
+            vector = np.asarray(self.embedder(normalize_prompt(prompt)), dtype=np.float32).ravel()
+        except Exception as e:
+            self.logger.warning(f"Ошибка вычисления эмбеддинга: {e}")
+            return None
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else None
+
+    def get(self, prompt: str, model: str, params: Optional[Dict[str, Any]] = None) -> Optional[Any]:
+        """
+        Найти сохраненный ответ
+
+        Args:
+            prompt: Текст промпта
+            model: Имя модели
+            params: Параметры генерации
+
+        Returns:
+            Optional[Any]: Ответ или None
+        """
+        key, scope = self.make_key(prompt, model, params)
+        now = time.time()
+        with self.lock:
+            row = self.conn.execute('SELECT response, expires_at FROM responses WHERE key = ?',
+                                    (key,)).fetchone()
+            if row is not None and row[1] is not None and row[1] <= now:
+                self._delete([key], scope)
+                self.stats['expired'] += 1
+                row = None
+
+            if row is None:
+                key = self._similar(prompt, scope, now)
+                if key is None:
+                    self.stats['misses'] += 1
+                    return None
+                row = self.conn.execute('SELECT response FROM responses WHERE key = ?', (key,)).fetchone()
+                self.stats['semantic_hits'] += 1
+            else:
+                self.stats['hits'] += 1
+
+            with self.conn:
+                self.conn.execute('UPDATE responses SET last_accessed = ?, hits = hits + 1 WHERE key = ?',
+                                  (now, key))
+        return json.loads(row[0])
+
+    def _similar(self, prompt: str, scope: str, now: float) -> Optional[str]:
+        if self.embedder is None:
+            return None
+        query = self._embed(prompt)
+        if query is None:
+            return None
+
+        keys, matrix = self._scope_vectors(scope)
+        if not keys or matrix.shape[1] != query.shape[0]:
+            return None
+        scores = matrix @ query
+        for index in np.argsort(-scores):
+            if scores[index] < self.similarity_threshold:
+                return None
+            row = self.conn.execute('SELECT expires_at FROM responses WHERE key = ?',
+                                    (keys[index],)).fetchone()
+            if row is not None and (row[0] is None or row[0] > now):
+                return keys[index]
+        return None
+
+    def _scope_vectors(self, scope: str) -> Tuple[List[str], np.ndarray]:
+        cached = self._vectors.get(scope)
+        if cached is None:
+            rows = self.conn.execute(
+                'SELECT key, embedding FROM responses WHERE scope = ? AND embedding IS NOT NULL',
+                (scope,)
+            ).fetchall()
+            keys = [row[0] for row in rows]
+            matrix = (np.vstack([np.frombuffer(row[1], dtype=np.float32) for row in rows])
+                      if rows else np.empty((0, 0), dtype=np.float32))
+            cached = self._vectors[scope] = (keys, matrix)
+        return cached
+
+    def set(self, prompt: str, model: str, response: Any, params: Optional[Dict[str, Any]] = None,
+            ttl: Optional[float] = None):
+        """
+        Сохранить ответ
+
+        Args:
+            prompt: Текст промпта
+            model: Имя модели
+            response: Ответ (сериализуемый в JSON)
+            params: Параметры генерации
+            ttl: Время жизни в секундах (по умолчанию ttl кэша)
+        """
+        try:
+            encoded = json.dumps(response, ensure_ascii=False)
+        except (TypeError, ValueError):
+            self.logger.warning("Ответ модели не сериализуется в JSON и не кэшируется")
+            return
+
+        key, scope = self.make_key(prompt, model, params)
+        embedding = self._embed(prompt)
+        ttl = self.ttl if ttl is None else ttl
+        now = time.time()
+        with self.lock:
+            with self.conn:
+                self.conn.execute(
+                    '''INSERT OR REPLACE INTO responses (key, scope, model, prompt, response, size,
+                                                         embedding, created_at, expires_at, last_accessed)
+                       VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''',
+                    (key, scope, model, normalize_prompt(prompt), encoded, len(encoded.encode('utf-8')),
+                     embedding.tobytes() if embedding is not None else None,
+                     now, now + ttl if ttl else None, now)
+                )
+            self._vectors.pop(scope, None)
+            self.stats['stores'] += 1
+            self._writes += 1
+            if self._writes % self.purge_interval == 0:
+                self.purge_expired(now)
+            self._evict()
+
+    def _delete(self, keys: List[str], scope: Optional[str] = None):
+        with self.conn:
+            self.conn.executemany('DELETE FROM responses WHERE key = ?', [(key,) for key in keys])
+        if scope is None:
+            self._vectors.clear()
+        else:
+            self._vectors.pop(scope, None)
+
+    def _evict(self):
+        count, total = self.conn.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses').fetchone()
+        excess = max(0, count - self.max_entries)
+        if self.max_bytes is None and not excess:
+            return
+
+        victims = []
+        if self.max_bytes is not None and total > self.max_bytes:
+            for key, size in self.conn.execute('SELECT key, size FROM responses ORDER BY last_accessed'):
+                if total <= self.max_bytes and len(victims) >= excess:
+                    break
+                victims.append(key)
+                total -= size
+        elif excess:
+            victims = [row[0] for row in self.conn.execute(
+                'SELECT key FROM responses ORDER BY last_accessed LIMIT ?', (excess,))]
+
+        if victims:
+            self._delete(victims)
+            self.stats['evictions'] += len(victims)
+
+    def purge_expired(self, now: Optional[float] = None) -> int:
+        """Удалить истекшие ответы, возвращает их число"""
+        now = time.time() if now is None else now
+        with self.lock:
+            with self.conn:
+                removed = self.conn.execute('DELETE FROM responses WHERE expires_at IS NOT NULL '
+                                            'AND expires_at <= ?', (now,)).rowcount
+            if removed:
+                self._vectors.clear()
+                self.stats['expired'] += removed
+            return removed
+
+    def __len__(self) -> int:
+        with self.lock:
+            return self.conn.execute('SELECT COUNT(*) FROM responses').fetchone()[0]
+
+    def clear(self):
+        with self.lock:
+            with self.conn:
+                self.conn.execute('DELETE FROM responses')
+            self._vectors.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self.lock:
+            count, total = self.conn.execute(
+                'SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses').fetchone()
+            lookups = self.stats['hits'] + self.stats['semantic_hits'] + self.stats['misses']
+            return {
+                'entries': count,
+                'bytes': total,
+                'hit_rate': round((lookups - self.stats['misses']) / lookups * 100, 2) if lookups else 0,
+                **self.stats
+            }
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+def get_shared_cache(db_path: str = 'response_cache.db', **kwargs) -> ResponseCache:
+    """
+    Общий кэш для базы данных: менеджеры моделей с одинаковым путем
+    используют один объект и одно соединение
+
+    Args:
+        db_path: Путь к файлу базы данных
+        **kwargs: Параметры ResponseCache при первом открытии
+
+    Returns:
+        ResponseCache: Кэш ответов
+    """
+    with _shared_lock:
+        cache = _shared.get(db_path)
+        if cache is None:
+            cache = _shared[db_path] = ResponseCache(db_path, **kwargs)
+        return cache
+
+
+def cache_from_config(config: Optional[Dict[str, Any]]) -> Optional[ResponseCache]:
+    """
+    Кэш из параметра конфигурации response_cache
+
+    Значение - готовый ResponseCache, путь к базе данных или словарь
+    с ключом path и параметрами ResponseCache.
+
+    Args:
+        config: Конфигурация менеджера модели
+
+    Returns:
+        Optional[ResponseCache]: Общий кэш или None, если кэш не настроен
+    """
+    setting = (config or {}).get('response_cache')
+    if isinstance(setting, ResponseCache):
+        return setting
+    if not setting:
+        return None
+    if isinstance(setting, str):
+        return get_shared_cache(setting)
+    options = dict(setting)
+    return get_shared_cache(options.pop('path', 'response_cache.db'), **options)
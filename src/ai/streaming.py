@@ -0,0 +1,332 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Daur-AI: Потоковая генерация текста
+Общий асинхронный итератор фрагментов ответа для всех менеджеров моделей
+
+Генерация выполняется в отдельном потоке, фрагменты передаются в цикл
+asyncio по мере появления. Поэтому ответ можно показывать пользователю
+сразу после первого токена. Отмена (cancel, aclose, выход из async with
+или отмена задачи asyncio) закрывает HTTP-соединение или останавливает
+generate, и модель прекращает генерацию.
+"""
+
+import asyncio
+import json
+import logging
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+import requests
+
+logger = logging.getLogger('daur_ai.streaming')
+
+
+class TokenStream:
+    """Асинхронный итератор фрагментов сгенерированного текста"""
+
+    def __init__(self, produce: Callable[['TokenStream'], Iterator[str]],
+                 on_finish: Optional[Callable[[Dict[str, Any]], None]] = None):
+        """
+        Args:
+            produce: Функция, возвращающая синхронный итератор фрагментов;
+                     получает сам поток для проверки отмены и on_cancel
+            on_finish: Вызывается с метриками после завершения генерации
+        """
+        self._produce = produce
+        self._finish_callbacks = [on_finish] if on_finish is not None else []
+        self._queue: Optional[asyncio.Queue] = None
+        self._thread: Optional[threading.Thread] = None
+        self._exhausted = False
+        self._cancel_callbacks: List[Callable[[], Any]] = []
+        self._lock = threading.Lock()
+        self.cancelled = threading.Event()
+        self.finished = threading.Event()
+        self.metrics: Dict[str, Any] = {
+            'time_to_first_token': None,
+            'total_time': None,
+            'chunks': 0,
+            'characters': 0,
+            'cancelled': False,
+            'error': None
+        }
+
+    def on_cancel(self, callback: Callable[[], Any]):
+        """Зарегистрировать действие при отмене (например, закрытие HTTP-ответа)"""
+        with self._lock:
+            if not self.cancelled.is_set():
+                self._cancel_callbacks.append(callback)
+                return
+        callback()
+
+    def add_done_callback(self, callback: Callable[[Dict[str, Any]], None]):
+        """Вызвать callback с метриками после завершения генерации"""
+        with self._lock:
+            if not self.finished.is_set():
+                self._finish_callbacks.append(callback)
+                return
+        callback(dict(self.metrics))
+
+    def cancel(self):
+        """Остановить генерацию"""
+        with self._lock:
+            if self.cancelled.is_set():
+                return
+            self.cancelled.set()
+            callbacks, self._cancel_callbacks = self._cancel_callbacks, []
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                logger.debug(f"Ошибка при отмене генерации: {e}")
+
+    async def aclose(self):
+        self.cancel()
+
+    async def __aenter__(self) -> 'TokenStream':
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.cancel()
+
+    def __aiter__(self) -> 'TokenStream':
+        return self
+
+    async def __anext__(self) -> str:
+        if self._exhausted:
+            raise StopAsyncIteration
+        if self._queue is None:
+            self._start(asyncio.get_running_loop())
+        try:
+            kind, value = await self._queue.get()
+        except asyncio.CancelledError:
+            self.cancel()
+            raise
+
+        if kind == 'chunk':
+            return value
+        self._exhausted = True
+        if kind == 'error':
+            raise value
+        raise StopAsyncIteration
+
+    async def collect(self) -> str:
+        """Дождаться полного ответа"""
+        return ''.join([chunk async for chunk in self])
+
+    def _start(self, loop: asyncio.AbstractEventLoop):
+        self._queue = asyncio.Queue()
+        self._thread = threading.Thread(target=self._run, args=(loop,), name="daur_ai_stream", daemon=True)
+        self._thread.start()
+
+    def _run(self, loop: asyncio.AbstractEventLoop):
+        start = time.perf_counter()
+        metrics = self.metrics
+        item = ('done', None)
+
+        def deliver(entry):
+            try:
+                loop.call_soon_threadsafe(self._queue.put_nowait, entry)
+            except RuntimeError:
+                # Цикл событий закрыт - получать фрагменты некому
+                self.cancel()
+
+        iterator = None
+        try:
+            iterator = self._produce(self)
+            for chunk in iterator:
+                if self.cancelled.is_set():
+                    break
+                if not chunk:
+                    continue
+                if metrics['time_to_first_token'] is None:
+                    metrics['time_to_first_token'] = time.perf_counter() - start
+                metrics['chunks'] += 1
+                metrics['characters'] += len(chunk)
+                deliver(('chunk', chunk))
+        except Exception as e:
+            # Ошибка закрытого при отмене соединения ошибкой не считается
+            if not self.cancelled.is_set():
+                metrics['error'] = str(e)
+                item = ('error', e)
+        finally:
+            close = getattr(iterator, 'close', None)
+            if close is not None:
+                try:
+                    close()
+                except Exception as e:
+                    logger.debug(f"Ошибка при закрытии потока генерации: {e}")
+
+            metrics['total_time'] = time.perf_counter() - start
+            metrics['cancelled'] = self.cancelled.is_set()
+            with self._lock:
+                self.finished.set()
+                callbacks, self._finish_callbacks = self._finish_callbacks, []
+            for callback in callbacks:
+                callback(dict(metrics))
+            deliver(item)
+
+
+class StreamStats:
+    """Сводные метрики потоковой генерации"""
+
+    def __init__(self, window: int = 1000):
+        """
+        Args:
+            window: Число последних потоков для перцентилей задержки
+        """
+        self.lock = threading.Lock()
+        self.first_token_times = deque(maxlen=window)
+        self.counts = {'streams': 0, 'completed': 0, 'cancelled': 0, 'failed': 0}
+        self.total_time = 0.0
+
+    def record(self, metrics: Dict[str, Any]):
+        with self.lock:
+            self.counts['streams'] += 1
+            if metrics['error']:
+                self.counts['failed'] += 1
+            elif metrics['cancelled']:
+                self.counts['cancelled'] += 1
+            else:
+                self.counts['completed'] += 1
+            self.total_time += metrics['total_time'] or 0.0
+            if metrics['time_to_first_token'] is not None:
+                self.first_token_times.append(metrics['time_to_first_token'])
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self.lock:
+            times = sorted(self.first_token_times)
+            streams = self.counts['streams']
+
+        def percentile(share):
+            return round(times[min(len(times) - 1, int(len(times) * share))], 4) if times else None
+
+        return {
+            **self.counts,
+            'avg_time_to_first_token': round(sum(times) / len(times), 4) if times else None,
+            'p50_time_to_first_token': percentile(0.5),
+            'p95_time_to_first_token': percentile(0.95),
+            'avg_total_time': round(self.total_time / streams, 4) if streams else None
+        }
+
+
+def iter_ollama_stream(stream: TokenStream, url: str, payload: Dict[str, Any],
+                       timeout: float) -> Iterator[str]:
+    """
+    Фрагменты ответа Ollama /api/generate в режиме stream
+
+    Args:
+        stream: Поток (закрытие соединения при отмене)
+        url: Адрес /api/generate
+        payload: Тело запроса (stream включается автоматически)
+        timeout: Таймаут соединения и ожидания фрагмента
+
+    Returns:
+        Iterator[str]: Фрагменты текста
+    """
+    with requests.post(url, json={**payload, 'stream': True}, stream=True, timeout=timeout) as response:
+        stream.on_cancel(response.close)
+        if response.status_code != 200:
+            raise RuntimeError(f"Ошибка генерации: HTTP {response.status_code}")
+
+        for line in response.iter_lines():
+            if not line:
+                continue
+            data = json.loads(line)
+            if 'error' in data:
+                raise RuntimeError(data['error'])
+            yield data.get('response', '')
+            if data.get('done'):
+                return
+
+
+def iter_openai_stream(stream: TokenStream, url: str, headers: Dict[str, str],
+                       payload: Dict[str, Any], timeout: float) -> Iterator[str]:
+    """
+    Фрагменты ответа OpenAI /chat/completions (server-sent events)
+
+    Args:
+        stream: Поток (закрытие соединения при отмене)
+        url: Адрес /chat/completions
+        headers: Заголовки с ключом API
+        payload: Тело запроса (stream включается автоматически)
+        timeout: Таймаут соединения и ожидания фрагмента
+
+    Returns:
+        Iterator[str]: Фрагменты текста
+    """
+    with requests.post(url, headers=headers, json={**payload, 'stream': True},
+                       stream=True, timeout=timeout) as response:
+        stream.on_cancel(response.close)
+        if response.status_code != 200:
+            error_msg = f"OpenAI API error: HTTP {response.status_code}"
+            try:
+                error_msg += f" - {response.json().get('error', {}).get('message', '')}"
+            except ValueError:
+                pass
+            raise RuntimeError(error_msg)
+
+        for line in response.iter_lines():
+            if not line.startswith(b'data:'):
+                continue
+            data = line[5:].strip().decode('utf-8')
+            if data == '[DONE]':
+                return
+            choices = json.loads(data).get('choices') or [{}]
+            yield choices[0].get('delta', {}).get('content') or ''
+
+
+def iter_transformers_stream(stream: TokenStream, model: Any, tokenizer: Any, prompt: str,
+                             device: Optional[str] = None, **generate_kwargs) -> Iterator[str]:
+    """
+    Фрагменты ответа transformers-модели через TextIteratorStreamer
+
+    generate выполняется в отдельном потоке и останавливается критерием
+    остановки после отмены потока или прекращения чтения фрагментов.
+
+    Args:
+        stream: Поток (проверка отмены)
+        model: Модель с методом generate
+        tokenizer: Токенизатор модели
+        prompt: Входной текст
+        device: Устройство для входных тензоров
+        **generate_kwargs: Параметры generate (max_new_tokens, temperature и т.д.)
+
+    Returns:
+        Iterator[str]: Фрагменты текста
+    """
+    from transformers import StoppingCriteria, StoppingCriteriaList, TextIteratorStreamer
+
+    stopped = threading.Event()
+
+    class _Stop(StoppingCriteria):
+        def __call__(self, input_ids, scores, **kwargs):
+            return stopped.is_set() or stream.cancelled.is_set()
+
+    inputs = tokenizer(prompt, return_tensors="pt")
+    if device is not None:
+        inputs = inputs.to(device)
+    streamer = TextIteratorStreamer(tokenizer, skip_prompt=True, skip_special_tokens=True)
+    error = []
+
+    def _generate():
+        try:
+            model.generate(**inputs, streamer=streamer,
+                           stopping_criteria=StoppingCriteriaList([_Stop()]), **generate_kwargs)
+        except Exception as e:
+            error.append(e)
+            streamer.end()
+
+    thread = threading.Thread(target=_generate, name="daur_ai_stream_generate", daemon=True)
+    thread.start()
+    try:
+        for text in streamer:
+            yield text
+        if error:
+            raise error[0]
+    finally:
+        stopped.set()
+        thread.join()
@@ -1,8 +1,30 @@
-from typing import List, Optional
+import bisect
+import heapq
+import json
+import math
+import os
+import time
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set
 import numpy as np
 import faiss
 from dataclasses import dataclass
 
+INDEX_FLAT = "flat"
+INDEX_IVF = "ivf"
+INDEX_HNSW = "hnsw"
+
+_INDEX_FILE = "index.faiss"
+_EMBEDDINGS_FILE = "embeddings.npy"
+_ENTRIES_FILE = "entries.json"
+
+_RANGE_OPERATORS = {
+    'gt': lambda value, bound: value > bound,
+    'gte': lambda value, bound: value >= bound,
+    'lt': lambda value, bound: value < bound,
+    'lte': lambda value, bound: value <= bound,
+}
+
+
 @dataclass
 class MemoryEntry:
     """Представляет собой запись в векторной базе данных."""
@@ -10,45 +32,483 @@ class MemoryEntry:
     embedding: np.ndarray
     timestamp: float
     metadata: dict
+    id: Optional[int] = None
+
 
 class VectorMemory:
-    """Управляет долговременной памятью агента через векторную базу данных."""
-    
-    def __init__(self, dimension: int = 1536):
+    """Управляет долговременной памятью агента через векторную базу данных.
+
+    Пока записей меньше ``train_threshold``, используется точный поиск
+    (``IndexFlatL2``). После достижения порога индекс перестраивается в
+    выбранный ANN-бэкенд (IVF или HNSW).
+    """
+
+    def __init__(self, dimension: int = 1536, index_type: str = INDEX_FLAT,
+                 train_threshold: int = 10000, nlist: Optional[int] = None,
+                 nprobe: int = 16, hnsw_m: int = 32, ef_search: int = 64,
+                 ttl: Optional[float] = None, compaction_ratio: float = 0.25,
+                 exact_search_limit: int = 4096, decay_oversample: int = 4):
         """Инициализация векторной базы данных.
-        
+
         Args:
             dimension: Размерность векторов эмбеддингов
+            index_type: Тип индекса: "flat", "ivf" или "hnsw"
+            train_threshold: Число записей, после которого строится ANN-индекс
+            nlist: Число кластеров IVF (по умолчанию 4 * sqrt(N))
+            nprobe: Число просматриваемых кластеров IVF при поиске
+            hnsw_m: Число связей на узел графа HNSW
+            ef_search: Ширина поиска HNSW
+            ttl: Время жизни записи в секундах (None - бессрочно)
+            compaction_ratio: Доля удалённых записей HNSW, после которой индекс перестраивается
+            exact_search_limit: Максимум кандидатов фильтра, считаемых точным перебором
+            decay_oversample: Во сколько раз больше кандидатов берётся для ранжирования по свежести
         """
+        if index_type not in (INDEX_FLAT, INDEX_IVF, INDEX_HNSW):
+            raise ValueError(f"Неизвестный тип индекса: {index_type}")
+
         self.dimension = dimension
-        self.index = faiss.IndexFlatL2(dimension)
-        self.entries: List[MemoryEntry] = []
-        
-    def add_memory(self, entry: MemoryEntry) -> None:
+        self.index_type = index_type
+        self.train_threshold = train_threshold
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.hnsw_m = hnsw_m
+        self.ef_search = ef_search
+        self.ttl = ttl
+        self.compaction_ratio = compaction_ratio
+        self.exact_search_limit = exact_search_limit
+        self.decay_oversample = decay_oversample
+
+        self.entries: Dict[int, MemoryEntry] = {}
+        self._next_id = 0
+        self._expiry_heap: List[tuple] = []
+        # HNSW не поддерживает remove_ids: удалённые id отфильтровываются при поиске
+        self._tombstones: set = set()
+        # Инвертированный индекс метаданных: ключ -> значение -> id записей
+        self._metadata_index: Dict[str, Dict[Any, Set[int]]] = {}
+        # Отсортированные пары (timestamp, id) для фильтра по времени
+        self._time_order: List[tuple] = []
+        self._read_only = False
+        self.active_index_type = INDEX_FLAT
+        self.index = self._build_index(INDEX_FLAT)
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def _build_index(self, index_type: str, training: Optional[np.ndarray] = None):
+        """Создаёт пустой (при необходимости обученный) индекс заданного типа."""
+        if index_type == INDEX_IVF:
+            nlist = self.nlist or max(1, int(4 * math.sqrt(len(training))))
+            nlist = min(nlist, len(training))
+            quantizer = faiss.IndexFlatL2(self.dimension)
+            index = faiss.IndexIVFFlat(quantizer, self.dimension, nlist)
+            index.train(training)
+            index.nprobe = self.nprobe
+            return index
+        if index_type == INDEX_HNSW:
+            hnsw = faiss.IndexHNSWFlat(self.dimension, self.hnsw_m)
+            hnsw.hnsw.efSearch = self.ef_search
+            return faiss.IndexIDMap2(hnsw)
+        return faiss.IndexIDMap2(faiss.IndexFlatL2(self.dimension))
+
+    def _rebuild_index(self, index_type: Optional[str] = None) -> None:
+        """Перестраивает индекс из сохранённых эмбеддингов записей."""
+        index_type = index_type or self.active_index_type
+        if index_type == INDEX_IVF and not self.entries:
+            # Обучить IVF не на чем: остаёмся на точном поиске до следующего порога
+            index_type = INDEX_FLAT
+        ids = np.fromiter(self.entries.keys(), dtype=np.int64, count=len(self.entries))
+        vectors = self._stack([e.embedding for e in self.entries.values()])
+        self.index = self._build_index(index_type, vectors)
+        if len(ids):
+            self.index.add_with_ids(vectors, ids)
+        self.active_index_type = index_type
+        self._tombstones.clear()
+        self._read_only = False
+
+    def _ensure_writable(self) -> None:
+        """Индекс, загруженный через mmap, доступен только для чтения."""
+        if self._read_only:
+            self._rebuild_index()
+
+    def _maybe_upgrade(self) -> None:
+        if (self.index_type != INDEX_FLAT and self.active_index_type == INDEX_FLAT
+                and len(self.entries) >= self.train_threshold):
+            self._rebuild_index(self.index_type)
+
+    def _stack(self, embeddings: Sequence[np.ndarray]) -> np.ndarray:
+        if not len(embeddings):
+            return np.empty((0, self.dimension), dtype=np.float32)
+        vectors = np.ascontiguousarray(np.vstack(embeddings), dtype=np.float32)
+        if vectors.shape[1] != self.dimension:
+            raise ValueError(
+                f"Ожидалась размерность {self.dimension}, получено {vectors.shape[1]}"
+            )
+        return vectors
+
+    def _index_entry(self, entry: MemoryEntry) -> None:
+        for key, value in entry.metadata.items():
+            try:
+                self._metadata_index.setdefault(key, {}).setdefault(value, set()).add(entry.id)
+            except TypeError:
+                continue  # нехешируемые значения не индексируются
+        bisect.insort(self._time_order, (entry.timestamp, entry.id))
+
+    def _unindex_entry(self, entry: MemoryEntry) -> None:
+        for key, value in entry.metadata.items():
+            try:
+                ids = self._metadata_index[key][value]
+            except (KeyError, TypeError):
+                continue
+            ids.discard(entry.id)
+            if not ids:
+                del self._metadata_index[key][value]
+        pos = bisect.bisect_left(self._time_order, (entry.timestamp, entry.id))
+        if pos < len(self._time_order) and self._time_order[pos][1] == entry.id:
+            del self._time_order[pos]
+
+    def _match_metadata(self, key: str, condition: Any) -> Set[int]:
+        """Возвращает id записей, у которых metadata[key] удовлетворяет условию."""
+        values = self._metadata_index.get(key, {})
+        if isinstance(condition, dict):
+            unknown = set(condition) - set(_RANGE_OPERATORS)
+            if unknown:
+                raise ValueError(f"Неизвестные операторы фильтра: {sorted(unknown)}")
+            matched = set()
+            for value, ids in values.items():
+                try:
+                    if all(_RANGE_OPERATORS[op](value, bound) for op, bound in condition.items()):
+                        matched |= ids
+                except TypeError:
+                    continue  # несравнимые типы не попадают в диапазон
+            return matched
+        if isinstance(condition, (list, tuple, set, frozenset)):
+            matched = set()
+            for value in condition:
+                matched |= values.get(value, set())
+            return matched
+        return set(values.get(condition, set()))
+
+    def _filter_ids(self, filters: Optional[Dict[str, Any]], since: Optional[float],
+                    until: Optional[float]) -> Optional[Set[int]]:
+        """Вычисляет множество кандидатов по фильтрам (None - без ограничений)."""
+        candidate_sets = []
+        for key, condition in (filters or {}).items():
+            candidate_sets.append(self._match_metadata(key, condition))
+        if since is not None or until is not None:
+            lo = 0 if since is None else bisect.bisect_left(self._time_order, (since, -1))
+            hi = (len(self._time_order) if until is None
+                  else bisect.bisect_right(self._time_order, (until, float('inf'))))
+            candidate_sets.append({entry_id for _, entry_id in self._time_order[lo:hi]})
+        if not candidate_sets:
+            return None
+
+        candidate_sets.sort(key=len)
+        candidates = candidate_sets[0]
+        for other in candidate_sets[1:]:
+            candidates = candidates & other
+            if not candidates:
+                break
+        return candidates
+
+    def _search_params(self, candidates: np.ndarray):
+        selector = faiss.IDSelectorBatch(candidates)
+        if self.active_index_type == INDEX_IVF:
+            return faiss.SearchParametersIVF(sel=selector, nprobe=self.nprobe)
+        if self.active_index_type == INDEX_HNSW:
+            return faiss.SearchParametersHNSW(sel=selector, efSearch=self.ef_search)
+        return faiss.SearchParameters(sel=selector)
+
+    def _search_candidates(self, query: np.ndarray, k: int,
+                           candidates: Set[int]) -> List[tuple]:
+        """Ищет k ближайших среди заданных id, возвращает пары (distance, id)."""
+        if not candidates:
+            return []
+        ids = np.fromiter(candidates, dtype=np.int64, count=len(candidates))
+        if len(ids) <= self.exact_search_limit:
+            # Малое множество дешевле досчитать напрямую, не трогая индекс
+            vectors = self._stack([self.entries[i].embedding for i in ids.tolist()])
+            distances = ((vectors - query) ** 2).sum(axis=1)
+            k = min(k, len(ids))
+            top = np.argpartition(distances, k - 1)[:k]
+            top = top[np.argsort(distances[top])]
+            return list(zip(distances[top].tolist(), ids[top].tolist()))
+
+        distances, indices = self.index.search(query, k, params=self._search_params(ids))
+        return [(d, i) for d, i in zip(distances[0].tolist(), indices[0].tolist()) if i >= 0]
+
+    def add_memory(self, entry: MemoryEntry) -> int:
         """Добавляет новую запись в память.
-        
+
         Args:
             entry: Запись для добавления
+
+        Returns:
+            Идентификатор записи
         """
-        self.index.add(np.array([entry.embedding]))
-        self.entries.append(entry)
-        
-    def search(self, query_embedding: np.ndarray, k: int = 5) -> List[MemoryEntry]:
+        return self.add_memories([entry])[0]
+
+    def add_memories(self, entries: Sequence[MemoryEntry]) -> List[int]:
+        """Добавляет пакет записей одним вызовом индекса.
+
+        Args:
+            entries: Записи для добавления
+
+        Returns:
+            Идентификаторы добавленных записей
+        """
+        if not entries:
+            return []
+        self._ensure_writable()
+
+        vectors = self._stack([e.embedding for e in entries])
+        ids = np.arange(self._next_id, self._next_id + len(entries), dtype=np.int64)
+        self._next_id += len(entries)
+
+        self.index.add_with_ids(vectors, ids)
+        for entry_id, entry in zip(ids.tolist(), entries):
+            entry.id = entry_id
+            self.entries[entry_id] = entry
+            self._index_entry(entry)
+            if self.ttl is not None:
+                heapq.heappush(self._expiry_heap, (entry.timestamp, entry_id))
+
+        self._maybe_upgrade()
+        return ids.tolist()
+
+    def search(self, query_embedding: np.ndarray, k: int = 5,
+               filters: Optional[Dict[str, Any]] = None,
+               since: Optional[float] = None, until: Optional[float] = None,
+               decay_half_life: Optional[float] = None,
+               now: Optional[float] = None) -> List[MemoryEntry]:
         """Ищет k ближайших записей к запросу.
-        
+
+        Фильтры применяются до поиска: кандидаты берутся из инвертированного
+        индекса метаданных, и ближайшие ищутся только среди них.
+
         Args:
             query_embedding: Вектор запроса
             k: Количество результатов
-            
+            filters: Условия на metadata: значение (равенство), список (любое
+                из значений) или словарь операторов gt/gte/lt/lte
+            since: Нижняя граница timestamp (включительно)
+            until: Верхняя граница timestamp (включительно)
+            decay_half_life: Период полураспада релевантности в секундах;
+                если задан, результаты переранжируются с учётом свежести
+            now: Текущее время для расчёта свежести (по умолчанию time.time())
+
         Returns:
             Список наиболее релевантных записей
         """
-        distances, indices = self.index.search(
-            np.array([query_embedding]), k
+        if filters is None and since is None and until is None and decay_half_life is None:
+            return self.search_batch([query_embedding], k)[0]
+
+        self.expire()
+        if not self.entries or k <= 0:
+            return []
+
+        query = self._stack([query_embedding])
+        fetch = k * self.decay_oversample if decay_half_life else k
+        candidates = self._filter_ids(filters, since, until)
+        if candidates is None:
+            fetch = min(fetch + len(self._tombstones), self.index.ntotal)
+            distances, indices = self.index.search(query, fetch)
+            scored = [(d, i) for d, i in zip(distances[0].tolist(), indices[0].tolist())
+                      if i >= 0 and i not in self._tombstones]
+        else:
+            scored = self._search_candidates(query, fetch, candidates)
+
+        if decay_half_life:
+            now = now if now is not None else time.time()
+            scored.sort(key=lambda item: self._decayed_score(
+                item[0], self.entries[item[1]].timestamp, now, decay_half_life), reverse=True)
+        return [self.entries[i] for _, i in scored[:k]]
+
+    @staticmethod
+    def _decayed_score(distance: float, timestamp: float, now: float,
+                       half_life: float) -> float:
+        age = max(0.0, now - timestamp)
+        return 0.5 ** (age / half_life) / (1.0 + distance)
+
+    def search_batch(self, query_embeddings: Sequence[np.ndarray],
+                     k: int = 5) -> List[List[MemoryEntry]]:
+        """Ищет k ближайших записей для каждого запроса одним вызовом индекса.
+
+        Args:
+            query_embeddings: Векторы запросов
+            k: Количество результатов на запрос
+
+        Returns:
+            Списки наиболее релевантных записей в порядке запросов
+        """
+        self.expire()
+        queries = self._stack(query_embeddings)
+        if not self.entries or k <= 0:
+            return [[] for _ in range(len(queries))]
+
+        fetch = min(k + len(self._tombstones), self.index.ntotal)
+        _, indices = self.index.search(queries, fetch)
+
+        results = []
+        for row in indices:
+            found = []
+            for entry_id in row:
+                if entry_id < 0 or entry_id in self._tombstones:
+                    continue
+                found.append(self.entries[int(entry_id)])
+                if len(found) == k:
+                    break
+            results.append(found)
+        return results
+
+    def remove(self, ids: Iterable[int]) -> int:
+        """Удаляет записи по идентификаторам.
+
+        Args:
+            ids: Идентификаторы записей
+
+        Returns:
+            Количество удалённых записей
+        """
+        ids = [i for i in ids if i in self.entries]
+        if not ids:
+            return 0
+        self._ensure_writable()
+
+        for entry_id in ids:
+            self._unindex_entry(self.entries.pop(entry_id))
+
+        if self.active_index_type == INDEX_HNSW:
+            self._tombstones.update(ids)
+            if len(self._tombstones) > self.compaction_ratio * max(self.index.ntotal, 1):
+                self._rebuild_index()
+        else:
+            self.index.remove_ids(np.asarray(ids, dtype=np.int64))
+        return len(ids)
+
+    def expire(self, now: Optional[float] = None) -> int:
+        """Удаляет записи старше ttl.
+
+        Args:
+            now: Текущее время (по умолчанию time.time())
+
+        Returns:
+            Количество удалённых записей
+        """
+        if self.ttl is None or not self._expiry_heap:
+            return 0
+        cutoff = (now if now is not None else time.time()) - self.ttl
+        expired = []
+        while self._expiry_heap and self._expiry_heap[0][0] < cutoff:
+            _, entry_id = heapq.heappop(self._expiry_heap)
+            expired.append(entry_id)
+        return self.remove(expired)
+
+    def save(self, path: str) -> None:
+        """Сохраняет индекс и записи в каталог.
+
+        Args:
+            path: Каталог для сохранения
+        """
+        os.makedirs(path, exist_ok=True)
+        if self._tombstones:
+            self._rebuild_index()
+
+        ids = list(self.entries.keys())
+        np.save(os.path.join(path, _EMBEDDINGS_FILE),
+                self._stack([self.entries[i].embedding for i in ids]))
+        faiss.write_index(self.index, os.path.join(path, _INDEX_FILE))
+
+        state = {
+            'dimension': self.dimension,
+            'index_type': self.index_type,
+            'active_index_type': self.active_index_type,
+            'train_threshold': self.train_threshold,
+            'nlist': self.nlist,
+            'nprobe': self.nprobe,
+            'hnsw_m': self.hnsw_m,
+            'ef_search': self.ef_search,
+            'ttl': self.ttl,
+            'compaction_ratio': self.compaction_ratio,
+            'exact_search_limit': self.exact_search_limit,
+            'decay_oversample': self.decay_oversample,
+            'next_id': self._next_id,
+            'entries': [
+                {
+                    'id': i,
+                    'text': self.entries[i].text,
+                    'timestamp': self.entries[i].timestamp,
+                    'metadata': self.entries[i].metadata,
+                }
+                for i in ids
+            ],
+        }
+        with open(os.path.join(path, _ENTRIES_FILE), 'w', encoding='utf-8') as f:
+            json.dump(state, f, ensure_ascii=False, default=str)
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True) -> 'VectorMemory':
+        """Загружает память, сохранённую через save().
+
+        При mmap=True индекс и эмбеддинги отображаются в память без чтения
+        в ОЗУ; первое изменение перестраивает индекс в памяти.
+
+        Args:
+            path: Каталог с сохранённой памятью
+            mmap: Отображать файлы в память вместо полного чтения
+
+        Returns:
+            Восстановленный экземпляр VectorMemory
+        """
+        with open(os.path.join(path, _ENTRIES_FILE), 'r', encoding='utf-8') as f:
+            state = json.load(f)
+
+        memory = cls(
+            dimension=state['dimension'],
+            index_type=state['index_type'],
+            train_threshold=state['train_threshold'],
+            nlist=state['nlist'],
+            nprobe=state['nprobe'],
+            hnsw_m=state['hnsw_m'],
+            ef_search=state['ef_search'],
+            ttl=state['ttl'],
+            compaction_ratio=state['compaction_ratio'],
+            exact_search_limit=state.get('exact_search_limit', 4096),
+            decay_oversample=state.get('decay_oversample', 4),
         )
-        return [self.entries[i] for i in indices[0]]
-    
+        embeddings = np.load(os.path.join(path, _EMBEDDINGS_FILE),
+                             mmap_mode='r' if mmap else None)
+        for row, item in zip(embeddings, state['entries']):
+            entry = MemoryEntry(
+                text=item['text'],
+                embedding=row,
+                timestamp=item['timestamp'],
+                metadata=item['metadata'],
+                id=item['id'],
+            )
+            memory.entries[entry.id] = entry
+            memory._index_entry(entry)
+            if memory.ttl is not None:
+                memory._expiry_heap.append((entry.timestamp, entry.id))
+        heapq.heapify(memory._expiry_heap)
+        memory._next_id = state['next_id']
+
+        flags = faiss.IO_FLAG_MMAP if mmap else 0
+        memory.index = faiss.read_index(os.path.join(path, _INDEX_FILE), flags)
+        memory.active_index_type = state['active_index_type']
+        memory._read_only = mmap
+        if memory.active_index_type == INDEX_IVF:
+            memory.index.nprobe = memory.nprobe
+        elif memory.active_index_type == INDEX_HNSW:
+            faiss.downcast_index(memory.index.index).hnsw.efSearch = memory.ef_search
+        return memory
+
     def clear(self) -> None:
         """Очищает всю память."""
-        self.index = faiss.IndexFlatL2(self.dimension)
-        self.entries.clear()
\ No newline at end of file
+        self.index = self._build_index(INDEX_FLAT)
+        self.active_index_type = INDEX_FLAT
+        self.entries.clear()
+        self._expiry_heap.clear()
+        self._tombstones.clear()
+        self._metadata_index.clear()
+        self._time_order.clear()
+        self._read_only = False
@@ -0,0 +1,272 @@
+"""Rate limiting backends for Daur-AI v2.0
+
+Both backends expose the same sliding-window-log and token-bucket
+operations. The Redis backend runs each check as a single Lua script, so
+every worker process sharing the Redis instance enforces one consistent
+limit; the memory backend gives the same semantics within one process.
+"""
+import heapq
+import itertools
+import logging
+import math
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from dataclasses import dataclass
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class RateLimitResult:
+    allowed: bool
+    remaining: int
+    retry_after: float  # seconds until the request would be allowed
+    limit: int
+
+    def __bool__(self) -> bool:
+        return self.allowed
+
+
+class RateLimitBackend:
+    """Interface shared by the rate limiting backends."""
+
+    def sliding_window(self, key: str, limit: int, window: float, cost: int = 1,
+                       now: Optional[float] = None) -> RateLimitResult:
+        """Allow at most `limit` requests within any `window` seconds."""
+        raise NotImplementedError
+
+    def token_bucket(self, key: str, capacity: int, refill_rate: float, cost: int = 1,
+                     now: Optional[float] = None) -> RateLimitResult:
+        """Allow bursts of `capacity` refilled at `refill_rate` tokens per second."""
+        raise NotImplementedError
+
+    def reset(self, key: str) -> None:
+        raise NotImplementedError
+
+
+class MemoryRateLimitBackend(RateLimitBackend):
+    """In-process backend.
+
+    Keys are dropped only once idle long enough that their state no longer
+    matters (window elapsed or bucket refilled), so eviction never relaxes
+    a limit. Sliding windows and token buckets of the same key expire
+    independently, like the separate sw:/tb: keys of the Redis backend. max_keys is an opt-in hard bound: beyond it the least recently
+    used keys are evicted even while their window is still live, which
+    resets their counters and lets a client that cycles through enough
+    distinct identifiers slip past its limit. Leave it unset unless memory
+    must stay flat regardless of correctness.
+    """
+
+    COMPACT_RATIO = 0.5
+
+    def __init__(self, max_keys: Optional[int] = None):
+        self.max_keys = max_keys
+        self._lock = threading.Lock()
+        self._windows: Dict[str, Deque[float]] = {}
+        self._buckets: Dict[str, Tuple[float, float]] = {}
+        # Heap of [idle_at, seq, slot] where slot is ('sw' | 'tb', key);
+        # a stale entry has slot set to None
+        self._expiry: List[list] = []
+        self._entries: Dict[Tuple[str, str], list] = {}
+        self._stale_entries = 0
+        self._seq = itertools.count()
+        # Access order, used only for the opt-in max_keys bound
+        self._recent: "OrderedDict[Tuple[str, str], None]" = OrderedDict()
+        self.evictions = 0
+
+    def _touch(self, slot: Tuple[str, str], idle_at: float, now: float):
+        entry = self._entries.get(slot)
+        if entry is None or entry[0] != idle_at:
+            if entry is not None:
+                entry[2] = None
+                self._stale_entries += 1
+            entry = self._entries[slot] = [idle_at, next(self._seq), slot]
+            heapq.heappush(self._expiry, entry)
+        self._recent[slot] = None
+        self._recent.move_to_end(slot)
+
+        while self._expiry and self._expiry[0][0] <= now:
+            idle_at, _, idle_slot = heapq.heappop(self._expiry)
+            if idle_slot is None:
+                self._stale_entries -= 1
+            else:
+                # The state equals a fresh one, dropping it changes nothing
+                del self._entries[idle_slot]
+                self._drop(idle_slot)
+
+        if self.max_keys is not None:
+            while len(self._recent) > self.max_keys:
+                oldest = next(iter(self._recent))
+                if oldest == slot:
+                    break
+                self._drop(oldest)
+                self.evictions += 1
+
+        if self._stale_entries > len(self._expiry) * self.COMPACT_RATIO:
+            self._expiry = [entry for entry in self._expiry if entry[2] is not None]
+            heapq.heapify(self._expiry)
+            self._stale_entries = 0
+
+    def _drop(self, slot: Tuple[str, str]):
+        entry = self._entries.pop(slot, None)
+        if entry is not None:
+            entry[2] = None
+            self._stale_entries += 1
+        self._recent.pop(slot, None)
+        kind, key = slot
+        (self._windows if kind == 'sw' else self._buckets).pop(key, None)
+
+    def sliding_window(self, key: str, limit: int, window: float, cost: int = 1,
+                       now: Optional[float] = None) -> RateLimitResult:
+        now = time.time() if now is None else now
+        with self._lock:
+            log = self._windows.get(key)
+            if log is None:
+                log = self._windows[key] = deque()
+            while log and log[0] < now - window:
+                log.popleft()
+
+            count = len(log)
+            if count + cost <= limit:
+                log.extend([now] * cost)
+                self._touch(('sw', key), now + window, now)
+                return RateLimitResult(True, limit - count - cost, 0.0, limit)
+
+            self._touch(('sw', key), (log[-1] if log else now) + window, now)
+            if cost > limit:
+                retry_after = float(window)
+            else:
+                retry_after = max(0.0, log[count + cost - limit - 1] + window - now)
+            return RateLimitResult(False, max(0, limit - count), retry_after, limit)
+
+    def token_bucket(self, key: str, capacity: int, refill_rate: float, cost: int = 1,
+                     now: Optional[float] = None) -> RateLimitResult:
+        if refill_rate <= 0:
+            raise ValueError("refill_rate must be positive")
+        now = time.time() if now is None else now
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (float(capacity), now))
+            if now > updated:
+                tokens = min(float(capacity), tokens + (now - updated) * refill_rate)
+                updated = now
+
+            if tokens >= cost:
+                tokens -= cost
+                allowed, retry_after = True, 0.0
+            else:
+                allowed, retry_after = False, (cost - tokens) / refill_rate
+            self._buckets[key] = (tokens, updated)
+            self._touch(('tb', key), updated + (capacity - tokens) / refill_rate, now)
+            return RateLimitResult(allowed, int(tokens), retry_after, capacity)
+
+    def reset(self, key: str) -> None:
+        with self._lock:
+            self._drop(('sw', key))
+            self._drop(('tb', key))
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._windows) + len(self._buckets)
+
+
+# KEYS[1] - sorted set of request timestamps
+# ARGV: now, window, limit, cost, unique member prefix
+SLIDING_WINDOW_SCRIPT = """
+local key = KEYS[1]
+local now = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local limit = tonumber(ARGV[3])
+local cost = tonumber(ARGV[4])
+
+redis.call('ZREMRANGEBYSCORE', key, '-inf', '(' .. (now - window))
+local count = redis.call('ZCARD', key)
+if count + cost <= limit then
+    for i = 1, cost do
+        redis.call('ZADD', key, now, ARGV[5] .. ':' .. i)
+    end
+    redis.call('PEXPIRE', key, math.ceil(window * 1000))
+    return {1, limit - count - cost, '0'}
+end
+
+local retry = window
+if cost <= limit then
+    local index = count + cost - limit - 1
+    local entry = redis.call('ZRANGE', key, index, index, 'WITHSCORES')
+    retry = math.max(0, tonumber(entry[2]) + window - now)
+end
+return {0, math.max(0, limit - count), tostring(retry)}
+"""
+
+# KEYS[1] - hash with fields tokens, ts
+# ARGV: now, capacity, refill_rate, cost
+TOKEN_BUCKET_SCRIPT = """
+local key = KEYS[1]
+local now = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local rate = tonumber(ARGV[3])
+local cost = tonumber(ARGV[4])
+
+local state = redis.call('HMGET', key, 'tokens', 'ts')
+local tokens = tonumber(state[1])
+local ts = tonumber(state[2])
+if tokens == nil or ts == nil then
+    tokens = capacity
+    ts = now
+end
+if now > ts then
+    tokens = math.min(capacity, tokens + (now - ts) * rate)
+    ts = now
+end
+
+local allowed = 0
+local retry = 0
+if tokens >= cost then
+    tokens = tokens - cost
+    allowed = 1
+else
+    retry = (cost - tokens) / rate
+end
+redis.call('HSET', key, 'tokens', tostring(tokens), 'ts', tostring(ts))
+redis.call('PEXPIRE', key, math.ceil(capacity / rate * 1000) + 1000)
+return {allowed, tostring(tokens), tostring(retry)}
+"""
+
+
+class RedisRateLimitBackend(RateLimitBackend):
+    """Atomic rate limiting shared across processes through Redis.
+
+    Timestamps come from the calling process, so workers are expected to
+    have reasonably synchronized clocks.
+    """
+
+    def __init__(self, client: Any, prefix: str = "ratelimit:"):
+        self.client = client
+        self.prefix = prefix
+        self._sliding_window = client.register_script(SLIDING_WINDOW_SCRIPT)
+        self._token_bucket = client.register_script(TOKEN_BUCKET_SCRIPT)
+
+    def sliding_window(self, key: str, limit: int, window: float, cost: int = 1,
+                       now: Optional[float] = None) -> RateLimitResult:
+        now = time.time() if now is None else now
+        allowed, remaining, retry = self._sliding_window(
+            keys=[f"{self.prefix}sw:{key}"],
+            args=[repr(now), window, limit, cost, uuid.uuid4().hex],
+        )
+        return RateLimitResult(bool(allowed), int(remaining), float(retry), limit)
+
+    def token_bucket(self, key: str, capacity: int, refill_rate: float, cost: int = 1,
+                     now: Optional[float] = None) -> RateLimitResult:
+        if refill_rate <= 0:
+            raise ValueError("refill_rate must be positive")
+        now = time.time() if now is None else now
+        allowed, tokens, retry = self._token_bucket(
+            keys=[f"{self.prefix}tb:{key}"],
+            args=[repr(now), capacity, repr(float(refill_rate)), cost],
+        )
+        return RateLimitResult(bool(allowed), int(math.floor(float(tokens))), float(retry), capacity)
+
+    def reset(self, key: str) -> None:
+        self.client.delete(f"{self.prefix}sw:{key}", f"{self.prefix}tb:{key}")
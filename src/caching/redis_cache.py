@@ -1,7 +1,14 @@
 """Redis Caching Layer for Daur-AI v2.0"""
 import logging
 import json
-from typing import Optional, Any, Dict
+import hashlib
+import threading
+from typing import Optional, Any, Callable, Dict, Iterable, List
+
+from src.caching.rate_limit_backend import (
+    MemoryRateLimitBackend, RateLimitBackend, RateLimitResult, RedisRateLimitBackend
+)
+from src.performance.optimization import SmartCache
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -27,14 +34,20 @@ class RedisCacheConfig:
 
 
 class RedisCache:
-    def __init__(self, config: Optional[RedisCacheConfig] = None):
+    def __init__(self, config: Optional[RedisCacheConfig] = None, client: Optional[Any] = None):
+        self.config = config or RedisCacheConfig()
+        if client is not None:
+            # Externally managed client, e.g. a shared pool or fakeredis in tests
+            self.redis_client = client
+            self.memory_cache = {}
+            return
+        
         if not REDIS_AVAILABLE:
             logger.warning("Redis not available. Using in-memory cache")
             self.redis_client = None
             self.memory_cache = {}
             return
         
-        self.config = config or RedisCacheConfig()
         try:
             self.pool = ConnectionPool(
                 host=self.config.host,
@@ -52,9 +65,22 @@ class RedisCache:
             self.redis_client = None
             self.memory_cache = {}
     
+    @staticmethod
+    def _serialize(value: Any) -> str:
+        return json.dumps(value) if isinstance(value, (dict, list)) else str(value)
+    
+    @staticmethod
+    def _deserialize(value: Optional[str]) -> Optional[Any]:
+        if value is None:
+            return None
+        try:
+            return json.loads(value)
+        except Exception:
+            return value
+    
     def set(self, key: str, value: Any, ttl: Optional[int] = None) -> bool:
         try:
-            serialized = json.dumps(value) if isinstance(value, (dict, list)) else str(value)
+            serialized = self._serialize(value)
             if self.redis_client:
                 if ttl:
                     self.redis_client.setex(key, ttl, serialized)
@@ -74,17 +100,48 @@ class RedisCache:
             else:
                 value = self.memory_cache.get(key)
             
-            if value is None:
-                return None
-            
-            try:
-                return json.loads(value)
-            except Exception as e:
-                return value
+            return self._deserialize(value)
         except Exception as e:
             logger.error(f"Error getting cache: {e}")
             return None
     
+    def get_many(self, keys: Iterable[str]) -> Dict[str, Any]:
+        """Fetch several keys in one MGET round trip; missing keys are omitted."""
+        keys = list(keys)
+        if not keys:
+            return {}
+        try:
+            if self.redis_client:
+                values = self.redis_client.mget(keys)
+            else:
+                values = [self.memory_cache.get(key) for key in keys]
+            return {key: self._deserialize(value)
+                    for key, value in zip(keys, values) if value is not None}
+        except Exception as e:
+            logger.error(f"Error getting cache keys: {e}")
+            return {}
+    
+    def set_many(self, mapping: Dict[str, Any], ttl: Optional[int] = None) -> bool:
+        """Store several keys through one non-transactional pipeline."""
+        if not mapping:
+            return True
+        try:
+            if self.redis_client:
+                pipe = self.redis_client.pipeline(transaction=False)
+                for key, value in mapping.items():
+                    if ttl:
+                        pipe.setex(key, ttl, self._serialize(value))
+                    else:
+                        pipe.set(key, self._serialize(value))
+                pipe.execute()
+            else:
+                for key, value in mapping.items():
+                    self.memory_cache[key] = self._serialize(value)
+            return True
+        except Exception as e:
+            logger.error(f"Error setting cache keys: {e}")
+            return False
+    
     def delete(self, key: str) -> bool:
         try:
             if self.redis_client:
@@ -119,6 +176,146 @@ class RedisCache:
             return False
 
 
+class _Flight:
+    """A loader call in progress that concurrent callers wait on."""
+    
+    def __init__(self):
+        self.done = threading.Event()
+        self.value: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class TieredCache:
+    """Read-through cache: in-process LRU (L1) in front of RedisCache (L2).
+    
+    Concurrent misses for the same key are coalesced so that only one
+    caller runs the loader while the others wait for its result. L1 entries
+    use a fixed (non-sliding) TTL, which bounds how stale a process can be
+    after another process updates L2. None values are never cached.
+    """
+    
+    def __init__(self, l2: RedisCache, l1_size: int = 1024, l1_ttl: int = 30):
+        self.l2 = l2
+        self.l1_ttl = l1_ttl
+        self.l1 = SmartCache(max_size=l1_size, ttl=l1_ttl, sliding_ttl=False)
+        self._flights: Dict[str, _Flight] = {}
+        self._flights_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.stats = {'l1_hits': 0, 'l2_hits': 0, 'misses': 0, 'loads': 0, 'coalesced': 0}
+    
+    def _count(self, name: str, amount: int = 1):
+        with self._stats_lock:
+            self.stats[name] += amount
+    
+    def _l1_ttl(self, ttl: Optional[int]) -> int:
+        return min(ttl, self.l1_ttl) if ttl else self.l1_ttl
+    
+    def get(self, key: str) -> Optional[Any]:
+        value = self.l1.get(key)
+        if value is not None:
+            self._count('l1_hits')
+            return value
+        
+        value = self.l2.get(key)
+        if value is None:
+            self._count('misses')
+            return None
+        self._count('l2_hits')
+        self.l1.set(key, value)
+        return value
+    
+    def get_many(self, keys: Iterable[str]) -> Dict[str, Any]:
+        """L1 lookups first, then one pipelined L2 fetch for the remaining keys."""
+        result = {}
+        missing = []
+        for key in keys:
+            value = self.l1.get(key)
+            if value is not None:
+                result[key] = value
+            else:
+                missing.append(key)
+        self._count('l1_hits', len(result))
+        
+        if missing:
+            fetched = self.l2.get_many(missing)
+            for key, value in fetched.items():
+                self.l1.set(key, value)
+            result.update(fetched)
+            self._count('l2_hits', len(fetched))
+            self._count('misses', len(missing) - len(fetched))
+        return result
+    
+    def get_or_load(self, key: str, loader: Callable[[], Any], ttl: Optional[int] = None) -> Any:
+        """Return the cached value or compute it once across concurrent callers."""
+        value = self.get(key)
+        if value is not None:
+            return value
+        
+        with self._flights_lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+        
+        if not leader:
+            self._count('coalesced')
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+        
+        try:
+            # Another process may have filled L2 while we were acquiring the flight
+            value = self.l2.get(key)
+            if value is None:
+                self._count('loads')
+                value = loader()
+                if value is not None:
+                    self.l2.set(key, value, ttl=ttl)
+            if value is not None:
+                self.l1.set(key, value, ttl=self._l1_ttl(ttl))
+            flight.value = value
+            return value
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._flights_lock:
+                self._flights.pop(key, None)
+            flight.done.set()
+    
+    def set(self, key: str, value: Any, ttl: Optional[int] = None) -> bool:
+        stored = self.l2.set(key, value, ttl=ttl)
+        if stored and value is not None:
+            self.l1.set(key, value, ttl=self._l1_ttl(ttl))
+        return stored
+    
+    def set_many(self, mapping: Dict[str, Any], ttl: Optional[int] = None) -> bool:
+        stored = self.l2.set_many(mapping, ttl=ttl)
+        if stored:
+            for key, value in mapping.items():
+                if value is not None:
+                    self.l1.set(key, value, ttl=self._l1_ttl(ttl))
+        return stored
+    
+    def delete(self, key: str) -> bool:
+        self.l1.delete(key)
+        return self.l2.delete(key)
+    
+    def exists(self, key: str) -> bool:
+        return self.l1.get(key) is not None or self.l2.exists(key)
+    
+    def clear(self) -> bool:
+        self.l1.clear()
+        return self.l2.clear()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            stats = dict(self.stats)
+        stats['l1'] = self.l1.get_stats()
+        return stats
+
+
 class SessionCache:
     def __init__(self, cache: RedisCache, prefix: str = "session:"):
         self.cache = cache
@@ -148,32 +345,48 @@ class QueryCache:
         self.cache = cache
         self.prefix = prefix
     
+    def _key(self, query: str) -> str:
+        # hash() is salted per process, so shared Redis keys need a stable digest
+        return f"{self.prefix}{hashlib.sha1(query.encode('utf-8')).hexdigest()}"
+    
     def cache_query(self, query: str, result: Any, ttl: int = 300) -> bool:
-        cache_key = f"{self.prefix}{hash(query)}"
-        return self.cache.set(cache_key, result, ttl=ttl)
+        return self.cache.set(self._key(query), result, ttl=ttl)
     
     def get_cached_query(self, query: str) -> Optional[Any]:
-        cache_key = f"{self.prefix}{hash(query)}"
-        return self.cache.get(cache_key)
+        return self.cache.get(self._key(query))
+    
+    def get_or_execute(self, query: str, execute: Callable[[], Any], ttl: int = 300) -> Any:
+        """Return the cached result or run the query; concurrent misses share one run
+        when the underlying cache is a TieredCache."""
+        cache_key = self._key(query)
+        if isinstance(self.cache, TieredCache):
+            return self.cache.get_or_load(cache_key, execute, ttl=ttl)
+        
+        result = self.cache.get(cache_key)
+        if result is None:
+            result = execute()
+            if result is not None:
+                self.cache.set(cache_key, result, ttl=ttl)
+        return result
 
 
 class RateLimitCache:
-    def __init__(self, cache: RedisCache, prefix: str = "ratelimit:"):
+    def __init__(self, cache: RedisCache, prefix: str = "ratelimit:",
+                 backend: Optional[RateLimitBackend] = None):
         self.cache = cache
         self.prefix = prefix
+        if backend is None:
+            l2 = cache.l2 if isinstance(cache, TieredCache) else cache
+            client = getattr(l2, 'redis_client', None)
+            backend = RedisRateLimitBackend(client, prefix) if client else MemoryRateLimitBackend()
+        self.backend = backend
     
     def check_rate_limit(self, identifier: str, max_requests: int, window: int) -> bool:
-        key = f"{self.prefix}{identifier}"
-        count = self.cache.get(key)
-        
-        if count is None:
-            self.cache.set(key, 1, ttl=window)
-            return True
-        
-        count = int(count) + 1
-        
-        if count > max_requests:
-            return False
-        
-        self.cache.set(key, count, ttl=window)
-        return True
+        return self.backend.sliding_window(identifier, max_requests, window).allowed
+    
+    def check_token_bucket(self, identifier: str, capacity: int, refill_rate: float,
+                           cost: int = 1) -> RateLimitResult:
+        return self.backend.token_bucket(identifier, capacity, refill_rate, cost=cost)
+    
+    def reset(self, identifier: str):
+        self.backend.reset(identifier)
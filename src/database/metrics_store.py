@@ -0,0 +1,384 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Metrics Store for Daur-AI v2.0
+Append-only columnar time-series storage with rollups and retention
+
+Each series keeps raw samples plus 1-minute and 1-hour rollups
+(count/sum/min/max). Samples accumulate in an in-memory head chunk that is
+sealed into a compressed SQLite blob once full: timestamps are stored as
+delta-of-delta integers and floats as XOR with the previous value, which
+leaves mostly zero bytes for zlib to squeeze. Aggregate queries combine
+the coarsest rollup buckets fully inside the range with finer data at the
+edges, so a month-long average reads a few hundred rows instead of
+millions of raw samples.
+"""
+
+import logging
+import math
+import sqlite3
+import struct
+import threading
+import time
+import zlib
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+RAW = 0
+MINUTE = 60
+HOUR = 3600
+RESOLUTIONS = (RAW, MINUTE, HOUR)
+
+DEFAULT_RETENTION = {
+    RAW: 24 * 3600,
+    MINUTE: 30 * 24 * 3600,
+    HOUR: 365 * 24 * 3600,
+}
+
+# Columns per resolution: raw chunks hold (ts, value), rollups (ts, count, sum, min, max)
+RAW_COLUMNS = 2
+ROLLUP_COLUMNS = 5
+
+_HEADER = struct.Struct('<IB')
+
+
+def encode_chunk(columns: Sequence[Sequence[float]]) -> bytes:
+    """Compress a chunk: first column is timestamps, the rest are floats"""
+    timestamps = np.round(np.asarray(columns[0], dtype=np.float64) * 1000).astype(np.int64)
+    # Delta-of-delta: regular sampling turns into runs of zeros
+    deltas = np.diff(timestamps, n=1, prepend=0)
+    parts = [np.diff(deltas, n=1, prepend=0).tobytes()]
+    for column in columns[1:]:
+        bits = np.asarray(column, dtype=np.float64).view(np.uint64)
+        # XOR with the previous value: slowly changing metrics share sign/exponent bits
+        previous = np.concatenate((np.zeros(1, dtype=np.uint64), bits[:-1]))
+        parts.append(np.bitwise_xor(bits, previous).tobytes())
+    return _HEADER.pack(len(timestamps), len(columns)) + zlib.compress(b''.join(parts), 6)
+
+
+def decode_chunk(data: bytes) -> List[np.ndarray]:
+    count, ncolumns = _HEADER.unpack_from(data)
+    payload = zlib.decompress(data[_HEADER.size:])
+    size = count * 8
+    dod = np.frombuffer(payload[:size], dtype=np.int64)
+    columns = [np.cumsum(np.cumsum(dod)) / 1000.0]
+    for index in range(1, ncolumns):
+        xored = np.frombuffer(payload[index * size:(index + 1) * size], dtype=np.uint64)
+        columns.append(np.bitwise_xor.accumulate(xored).view(np.float64))
+    return columns
+
+
+class _Aggregate:
+    """Running count/sum/min/max"""
+
+    __slots__ = ('count', 'sum', 'min', 'max')
+
+    def __init__(self):
+        self.count = 0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, count: float, total: float, low: float, high: float):
+        if count:
+            self.count += int(count)
+            self.sum += total
+            self.min = min(self.min, low)
+            self.max = max(self.max, high)
+
+    def to_dict(self) -> Dict:
+        if not self.count:
+            return {'count': 0, 'sum': 0.0, 'min': None, 'max': None, 'avg': None}
+        return {'count': self.count, 'sum': self.sum, 'min': self.min, 'max': self.max,
+                'avg': self.sum / self.count}
+
+
+class _Series:
+    def __init__(self):
+        # Head chunks per resolution, one Python list per column
+        self.heads: Dict[int, List[List[float]]] = {
+            RAW: [[] for _ in range(RAW_COLUMNS)],
+            MINUTE: [[] for _ in range(ROLLUP_COLUMNS)],
+            HOUR: [[] for _ in range(ROLLUP_COLUMNS)],
+        }
+        # Currently filling rollup bucket: [start, count, sum, min, max]
+        self.open: Dict[int, Optional[List[float]]] = {MINUTE: None, HOUR: None}
+
+
+class MetricsStore:
+    """Time-series store with automatic 1m/1h rollups"""
+
+    def __init__(self, db_path: str = ':memory:', chunk_size: int = 1024,
+                 retention: Optional[Dict[int, float]] = None,
+                 retention_interval: float = 300):
+        """
+        Args:
+            db_path: SQLite file for sealed chunks
+            chunk_size: Rows per head chunk before it is compressed and stored
+            retention: Seconds to keep data per resolution (RAW, MINUTE, HOUR)
+            retention_interval: How often retention is applied while appending
+        """
+        self.db_path = db_path
+        self.chunk_size = chunk_size
+        self.retention = dict(DEFAULT_RETENTION)
+        if retention:
+            self.retention.update(retention)
+        self.retention_interval = retention_interval
+
+        self.lock = threading.RLock()
+        self.series: Dict[str, _Series] = {}
+        self.late_samples = 0
+        self._last_retention = 0.0
+
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        if db_path != ':memory:':
+            self.conn.execute('PRAGMA journal_mode = WAL')
+        self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS metric_chunks (
+                series TEXT NOT NULL,
+                resolution INTEGER NOT NULL,
+                start_ts REAL NOT NULL,
+                end_ts REAL NOT NULL,
+                count INTEGER NOT NULL,
+                data BLOB NOT NULL
+            )
+        ''')
+        self.conn.execute('''
+            CREATE INDEX IF NOT EXISTS idx_metric_chunks
+            ON metric_chunks(series, resolution, end_ts)
+        ''')
+        self.conn.commit()
+
+    # ===== Writes =====
+
+    def add(self, series: str, value: float, timestamp: Optional[float] = None):
+        """Append a sample"""
+        timestamp = time.time() if timestamp is None else timestamp
+        value = float(value)
+        with self.lock:
+            state = self.series.get(series)
+            if state is None:
+                state = self.series[series] = _Series()
+
+            head = state.heads[RAW]
+            head[0].append(timestamp)
+            head[1].append(value)
+            if len(head[0]) >= self.chunk_size:
+                self._seal(series, state, RAW)
+
+            self._roll(series, state, MINUTE, timestamp, 1, value, value, value)
+
+            if timestamp - self._last_retention >= self.retention_interval:
+                self._last_retention = timestamp
+                self.apply_retention(timestamp)
+
+    def record(self, values: Dict[str, Optional[float]], timestamp: Optional[float] = None):
+        """Append one sample to several series; None values are skipped"""
+        timestamp = time.time() if timestamp is None else timestamp
+        with self.lock:
+            for series, value in values.items():
+                if value is not None:
+                    self.add(series, value, timestamp)
+
+    def _roll(self, series: str, state: _Series, level: int, timestamp: float,
+              count: float, total: float, low: float, high: float):
+        bucket_start = math.floor(timestamp / level) * level
+        bucket = state.open[level]
+        if bucket is not None and bucket[0] == bucket_start:
+            bucket[1] += count
+            bucket[2] += total
+            bucket[3] = min(bucket[3], low)
+            bucket[4] = max(bucket[4], high)
+            return
+        if bucket is not None and bucket_start < bucket[0]:
+            # Closed buckets are immutable; raw data still keeps the sample
+            self.late_samples += 1
+            return
+
+        if bucket is not None:
+            head = state.heads[level]
+            for column, item in zip(head, bucket):
+                column.append(item)
+            if len(head[0]) >= self.chunk_size:
+                self._seal(series, state, level)
+            if level == MINUTE:
+                self._roll(series, state, HOUR, bucket[0], *bucket[1:])
+        state.open[level] = [bucket_start, count, total, low, high]
+
+    def _seal(self, series: str, state: _Series, level: int):
+        head = state.heads[level]
+        if not head[0]:
+            return
+        self.conn.execute(
+            'INSERT INTO metric_chunks (series, resolution, start_ts, end_ts, count, data) '
+            'VALUES (?, ?, ?, ?, ?, ?)',
+            (series, level, min(head[0]), max(head[0]), len(head[0]), encode_chunk(head))
+        )
+        self.conn.commit()
+        for column in head:
+            column.clear()
+
+    def flush(self):
+        """Seal all head chunks into storage"""
+        with self.lock:
+            for series, state in self.series.items():
+                for level in RESOLUTIONS:
+                    self._seal(series, state, level)
+
+    def apply_retention(self, now: Optional[float] = None) -> int:
+        """Drop data older than the retention of its resolution
+
+        Returns:
+            Number of deleted chunks
+        """
+        now = time.time() if now is None else now
+        deleted = 0
+        with self.lock:
+            for level in RESOLUTIONS:
+                cutoff = now - self.retention[level]
+                cursor = self.conn.execute(
+                    'DELETE FROM metric_chunks WHERE resolution = ? AND end_ts < ?',
+                    (level, cutoff)
+                )
+                deleted += cursor.rowcount
+                for state in self.series.values():
+                    head = state.heads[level]
+                    if head[0] and head[0][0] < cutoff:
+                        keep = [i for i, ts in enumerate(head[0]) if ts >= cutoff]
+                        for index, column in enumerate(head):
+                            head[index] = [column[i] for i in keep]
+            self.conn.commit()
+        return deleted
+
+    # ===== Reads =====
+
+    def _open_buckets(self, state: _Series, level: int) -> List[List[float]]:
+        """Open buckets of a level including the finer open bucket it will absorb
+
+        The open minute may already belong to the next hour while the previous
+        hour is still open: both partial hours are returned then.
+        """
+        bucket = state.open[level]
+        buckets = [list(bucket)] if bucket is not None else []
+        if level == HOUR:
+            minute = state.open[MINUTE]
+            if minute is not None:
+                minute_hour = math.floor(minute[0] / HOUR) * HOUR
+                if bucket is not None and minute_hour == bucket[0]:
+                    buckets[0] = [bucket[0], bucket[1] + minute[1], bucket[2] + minute[2],
+                                  min(bucket[3], minute[3]), max(bucket[4], minute[4])]
+                else:
+                    buckets.append([minute_hour] + minute[1:])
+        return buckets
+
+    def _read(self, series: str, level: int, start: float, end: float) -> List[np.ndarray]:
+        """Columns of rows with start <= ts < end, ordered by time"""
+        ncolumns = RAW_COLUMNS if level == RAW else ROLLUP_COLUMNS
+        parts: List[List[np.ndarray]] = []
+        with self.lock:
+            state = self.series.get(series)
+            rows = self.conn.execute(
+                'SELECT data FROM metric_chunks WHERE series = ? AND resolution = ? '
+                'AND end_ts >= ? AND start_ts < ? ORDER BY start_ts',
+                (series, level, start, end)
+            ).fetchall()
+            if state is not None:
+                head = [np.asarray(column, dtype=np.float64) for column in state.heads[level]]
+                if level != RAW:
+                    for bucket in self._open_buckets(state, level):
+                        head = [np.append(column, item) for column, item in zip(head, bucket)]
+            else:
+                head = None
+
+        for (data,) in rows:
+            parts.append(decode_chunk(data))
+        if head is not None and len(head[0]):
+            parts.append(head)
+        if not parts:
+            return [np.empty(0) for _ in range(ncolumns)]
+
+        columns = [np.concatenate([part[i] for part in parts]) for i in range(ncolumns)]
+        mask = (columns[0] >= start) & (columns[0] < end)
+        order = np.argsort(columns[0][mask], kind='stable')
+        return [column[mask][order] for column in columns]
+
+    def query(self, series: str, start: float, end: float, resolution: Optional[int] = None,
+              max_points: int = 1000) -> List[Dict]:
+        """Read points of a series
+
+        Args:
+            series: Series name
+            start: Range start (inclusive, epoch seconds)
+            end: Range end (exclusive)
+            resolution: RAW, MINUTE or HOUR; by default the finest resolution
+                that returns at most max_points points (raw counted as 1s)
+            max_points: Point budget for automatic resolution
+
+        Returns:
+            Raw points {'timestamp', 'value'} or rollup buckets
+            {'timestamp', 'count', 'sum', 'min', 'max', 'avg'}
+        """
+        if resolution is None:
+            resolution = next((level for level in RESOLUTIONS
+                               if (end - start) / max(level, 1) <= max_points), HOUR)
+        columns = self._read(series, resolution, start, end)
+        if resolution == RAW:
+            return [{'timestamp': ts, 'value': value}
+                    for ts, value in zip(columns[0].tolist(), columns[1].tolist())]
+        return [{'timestamp': ts, 'count': int(count), 'sum': total, 'min': low, 'max': high,
+                 'avg': total / count if count else None}
+                for ts, count, total, low, high in zip(*(c.tolist() for c in columns))]
+
+    def aggregate(self, series: str, start: float, end: float) -> Dict:
+        """Count/sum/min/max/avg over [start, end) from the coarsest rollups that fit"""
+        result = _Aggregate()
+        segments = [(start, end)]
+        for level in (HOUR, MINUTE):
+            remaining = []
+            for low, high in segments:
+                inner_start = math.ceil(low / level) * level
+                inner_end = math.floor(high / level) * level
+                if inner_start >= inner_end:
+                    remaining.append((low, high))
+                    continue
+                _, counts, sums, mins, maxs = self._read(series, level, inner_start, inner_end)
+                if len(counts):
+                    result.add(counts.sum(), sums.sum(), mins.min(), maxs.max())
+                remaining += [(low, inner_start), (inner_end, high)]
+            segments = [(low, high) for low, high in remaining if low < high]
+
+        for low, high in segments:
+            _, values = self._read(series, RAW, low, high)
+            if len(values):
+                result.add(len(values), values.sum(), values.min(), values.max())
+        return result.to_dict()
+
+    def get_statistics(self) -> Dict:
+        with self.lock:
+            row = self.conn.execute(
+                'SELECT COUNT(*), COALESCE(SUM(count), 0), COALESCE(SUM(LENGTH(data)), 0) '
+                'FROM metric_chunks'
+            ).fetchone()
+            head_rows = sum(len(state.heads[level][0])
+                            for state in self.series.values() for level in RESOLUTIONS)
+        return {
+            'series': len(self.series),
+            'chunks': row[0],
+            'stored_rows': row[1],
+            'stored_bytes': row[2],
+            'head_rows': head_rows,
+            'late_samples': self.late_samples,
+        }
+
+    def close(self):
+        self.flush()
+        with self.lock:
+            self.conn.close()
+
+
+__all__ = ['MetricsStore', 'RAW', 'MINUTE', 'HOUR', 'encode_chunk', 'decode_chunk']
@@ -9,188 +9,280 @@ Production-grade SQLite database with full schema and CRUD operations
 import sqlite3
 import json
 import logging
+import queue
+import threading
+from itertools import groupby
 from datetime import datetime
-from typing import Dict, List, Optional
+from typing import Any, Dict, Iterable, List, Optional, Tuple
 from contextlib import contextmanager
 
+from src.database.metrics_store import MetricsStore
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
+# Statements shared by single and batched writes, so each pooled
+# connection compiles them once and reuses them from its statement cache
+INSERT_LOG_SQL = '''
+    INSERT INTO logs (timestamp, level, message, user_id, source)
+    VALUES (?, ?, ?, ?, ?)
+'''
+
+INSERT_HARDWARE_METRICS_SQL = '''
+    INSERT INTO hardware_metrics
+    (timestamp, cpu_percent, memory_percent, disk_percent, gpu_percent,
+     gpu_memory_percent, battery_percent, temperature)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+'''
+
+INSERT_ACTION_SQL = '''
+    INSERT INTO user_actions (timestamp, action_type, action_data, user_id, status)
+    VALUES (?, ?, ?, ?, ?)
+'''
+
+# Series names used for hardware_metrics columns in the metrics store
+HARDWARE_METRIC_SERIES = ('cpu_percent', 'memory_percent', 'disk_percent', 'gpu_percent',
+                          'gpu_memory_percent', 'battery_percent', 'temperature')
+
+PRAGMAS = (
+    'PRAGMA synchronous = NORMAL',
+    'PRAGMA temp_store = MEMORY',
+    'PRAGMA cache_size = -16000',
+    'PRAGMA busy_timeout = 5000',
+)
+
+
 class RealDatabase:
     """Production-grade database with full schema and operations"""
     
-    def __init__(self, db_path: str = 'daur_ai.db'):
+    def __init__(self, db_path: str = 'daur_ai.db', pool_size: int = 5,
+                 write_behind: bool = False, max_batch_size: int = 1000,
+                 max_queue_size: int = 100000, metrics_store: Optional[MetricsStore] = None):
+        """
+        Args:
+            db_path: Path to the SQLite file (':memory:' for an in-memory database)
+            pool_size: Maximum number of pooled connections
+            write_behind: Queue insert_log/insert_hardware_metrics/insert_action
+                rows for the background writer instead of committing each one
+            max_batch_size: Maximum rows written per background transaction
+            max_queue_size: Queued rows before enqueueing blocks (backpressure)
+            metrics_store: Time-series store that also receives hardware metrics
+                and serves get_hardware_metrics_average from its rollups
+        """
         self.db_path = db_path
+        self.pool_size = max(1, pool_size)
+        self.write_behind = write_behind
+        self.max_batch_size = max_batch_size
+        self.metrics_store = metrics_store
+        
+        self._pool: queue.LifoQueue = queue.LifoQueue()
+        self._pool_lock = threading.Lock()
+        self._connections: List[sqlite3.Connection] = []
+        self._local = threading.local()
+        self._closed = False
+        
+        self._write_queue: queue.Queue = queue.Queue(maxsize=max_queue_size)
+        self._writer: Optional[threading.Thread] = None
+        self._writer_lock = threading.Lock()
+        self._writer_stop = threading.Event()
+        self.write_stats = {'rows': 0, 'batches': 0, 'errors': 0, 'rejected': 0}
+        
         # For in-memory databases, keep a persistent connection
         self._persistent_conn = None
+        self._persistent_lock = threading.RLock()
         if db_path == ':memory:':
-            self._persistent_conn = sqlite3.connect(db_path, check_same_thread=False)
-            self._persistent_conn.row_factory = sqlite3.Row
+            self._persistent_conn = self._connect()
         self.init_database()
     
+    def _connect(self) -> sqlite3.Connection:
+        """Open a connection with tuned pragmas"""
+        conn = sqlite3.connect(self.db_path, check_same_thread=False, cached_statements=256)
+        conn.row_factory = sqlite3.Row
+        if self.db_path != ':memory:':
+            # WAL lets readers proceed while a writer commits
+            conn.execute('PRAGMA journal_mode = WAL')
+        for pragma in PRAGMAS:
+            conn.execute(pragma)
+        return conn
+    
+    def _acquire(self) -> sqlite3.Connection:
+        """Take a pooled connection, opening a new one while below pool_size"""
+        if self._closed:
+            raise sqlite3.ProgrammingError("Database is closed")
+        try:
+            return self._pool.get_nowait()
+        except queue.Empty:
+            pass
+        with self._pool_lock:
+            if len(self._connections) < self.pool_size:
+                conn = self._connect()
+                self._connections.append(conn)
+                return conn
+        return self._pool.get()
+    
+    def _release(self, conn: sqlite3.Connection):
+        if self._closed:
+            conn.close()
+        else:
+            self._pool.put(conn)
+    
     @contextmanager
     def get_connection(self):
         """Context manager for database connections"""
         # Use persistent connection for in-memory databases
         if self._persistent_conn:
-            try:
-                yield self._persistent_conn
-                self._persistent_conn.commit()
-            except Exception as e:
-                self._persistent_conn.rollback()
-                logger.error(f"Database error: {e}")
-                raise
-        else:
-            conn = sqlite3.connect(self.db_path)
-            conn.row_factory = sqlite3.Row
-            try:
-                yield conn
-                conn.commit()
-            except Exception as e:
-                conn.rollback()
-                logger.error(f"Database error: {e}")
-                raise
-            finally:
-                conn.close()
-    
-    def _get_direct_connection(self):
-        """Get a direct connection without context manager"""
-        if self._persistent_conn:
-            return self._persistent_conn
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
-        return conn
+            with self._persistent_lock:
+                try:
+                    yield self._persistent_conn
+                    self._persistent_conn.commit()
+                except Exception as e:
+                    self._persistent_conn.rollback()
+                    logger.error(f"Database error: {e}")
+                    raise
+            return
+        
+        held = getattr(self._local, 'conn', None)
+        if held is not None:
+            # Nested use in the same thread joins the outer transaction
+            yield held
+            return
+        
+        conn = self._acquire()
+        self._local.conn = conn
+        try:
+            yield conn
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            logger.error(f"Database error: {e}")
+            raise
+        finally:
+            self._local.conn = None
+            self._release(conn)
     
     def init_database(self):
         """Initialize database schema"""
         try:
-            conn = self._get_direct_connection()
-            cursor = conn.cursor()
-            
-            # Users table
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS users (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    username TEXT UNIQUE NOT NULL,
-                    email TEXT UNIQUE NOT NULL,
-                    password_hash TEXT NOT NULL,
-                    role TEXT DEFAULT 'user',
-                    api_key TEXT UNIQUE,
-                    created_at TEXT DEFAULT CURRENT_TIMESTAMP,
-                    last_login TEXT,
-                    is_active INTEGER DEFAULT 1
-                )
-            ''')
-            
-            # Logs table
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS logs (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    timestamp TEXT DEFAULT CURRENT_TIMESTAMP,
-                    level TEXT,
-                    message TEXT,
-                    user_id INTEGER,
-                    source TEXT,
-                    FOREIGN KEY (user_id) REFERENCES users(id)
-                )
-            ''')
-            
-            # Hardware metrics table
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS hardware_metrics (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    timestamp TEXT DEFAULT CURRENT_TIMESTAMP,
-                    cpu_percent REAL,
-                    memory_percent REAL,
-                    disk_percent REAL,
-                    gpu_percent REAL,
-                    gpu_memory_percent REAL,
-                    battery_percent REAL,
-                    temperature REAL
-                )
-            ''')
-            
-            # Vision analysis table
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS vision_analysis (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    timestamp TEXT DEFAULT CURRENT_TIMESTAMP,
-                    image_path TEXT,
-                    ocr_text TEXT,
-                    ocr_confidence REAL,
-                    faces_count INTEGER,
-                    faces_data TEXT,
-                    barcodes_count INTEGER,
-                    barcodes_data TEXT,
-                    user_id INTEGER,
-                    FOREIGN KEY (user_id) REFERENCES users(id)
-                )
-            ''')
-            
-            # User actions table
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS user_actions (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    timestamp TEXT DEFAULT CURRENT_TIMESTAMP,
-                    action_type TEXT,
-                    action_data TEXT,
-                    user_id INTEGER,
-                    status TEXT DEFAULT 'completed',
-                    FOREIGN KEY (user_id) REFERENCES users(id)
-                )
-            ''')
-            
-            # API sessions table
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS api_sessions (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    user_id INTEGER NOT NULL,
-                    token TEXT UNIQUE NOT NULL,
-                    created_at TEXT DEFAULT CURRENT_TIMESTAMP,
-                    expires_at TEXT,
-                    is_active INTEGER DEFAULT 1,
-                    FOREIGN KEY (user_id) REFERENCES users(id)
-                )
-            ''')
-            
-            # Audit log table
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS audit_log (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    timestamp TEXT DEFAULT CURRENT_TIMESTAMP,
-                    user_id INTEGER,
-                    action TEXT,
-                    resource TEXT,
-                    details TEXT,
-                    ip_address TEXT,
-                    FOREIGN KEY (user_id) REFERENCES users(id)
-                )
-            ''')
-            
-            # Create indexes for better performance
-            try:
-                cursor.execute('CREATE INDEX IF NOT EXISTS idx_users_username ON users(username)')
-                cursor.execute('CREATE INDEX IF NOT EXISTS idx_logs_timestamp ON logs(timestamp)')
-                cursor.execute('CREATE INDEX IF NOT EXISTS idx_hardware_timestamp ON hardware_metrics(timestamp)')
-                cursor.execute('CREATE INDEX IF NOT EXISTS idx_vision_timestamp ON vision_analysis(timestamp)')
-                cursor.execute('CREATE INDEX IF NOT EXISTS idx_actions_user ON user_actions(user_id)')
-            except Exception:
-                pass  # Indexes may already exist
-            
-            conn.commit()
-            # Don't close persistent connections
-            if not self._persistent_conn:
-                conn.close()
+            with self.get_connection() as conn:
+                self._create_schema(conn)
             logger.info("Database initialized successfully")
-        
         except Exception as e:
             logger.error(f"Error initializing database: {e}")
-            try:
-                if not self._persistent_conn:
-                    conn.close()
-            except Exception as e:
-                pass
+    
+    def _create_schema(self, conn: sqlite3.Connection):
+        """Create tables and indexes"""
+        cursor = conn.cursor()
+        
+        # Users table
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS users (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                username TEXT UNIQUE NOT NULL,
+                email TEXT UNIQUE NOT NULL,
+                password_hash TEXT NOT NULL,
+                role TEXT DEFAULT 'user',
+                api_key TEXT UNIQUE,
+                created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+                last_login TEXT,
+                is_active INTEGER DEFAULT 1
+            )
+        ''')
+        
+        # Logs table
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS logs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                timestamp TEXT DEFAULT CURRENT_TIMESTAMP,
+                level TEXT,
+                message TEXT,
+                user_id INTEGER,
+                source TEXT,
+                FOREIGN KEY (user_id) REFERENCES users(id)
+            )
+        ''')
+        
+        # Hardware metrics table
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS hardware_metrics (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                timestamp TEXT DEFAULT CURRENT_TIMESTAMP,
+                cpu_percent REAL,
+                memory_percent REAL,
+                disk_percent REAL,
+                gpu_percent REAL,
+                gpu_memory_percent REAL,
+                battery_percent REAL,
+                temperature REAL
+            )
+        ''')
+        
+        # Vision analysis table
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS vision_analysis (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                timestamp TEXT DEFAULT CURRENT_TIMESTAMP,
+                image_path TEXT,
+                ocr_text TEXT,
+                ocr_confidence REAL,
+                faces_count INTEGER,
+                faces_data TEXT,
+                barcodes_count INTEGER,
+                barcodes_data TEXT,
+                user_id INTEGER,
+                FOREIGN KEY (user_id) REFERENCES users(id)
+            )
+        ''')
+        
+        # User actions table
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS user_actions (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                timestamp TEXT DEFAULT CURRENT_TIMESTAMP,
+                action_type TEXT,
+                action_data TEXT,
+                user_id INTEGER,
+                status TEXT DEFAULT 'completed',
+                FOREIGN KEY (user_id) REFERENCES users(id)
+            )
+        ''')
+        
+        # API sessions table
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS api_sessions (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id INTEGER NOT NULL,
+                token TEXT UNIQUE NOT NULL,
+                created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+                expires_at TEXT,
+                is_active INTEGER DEFAULT 1,
+                FOREIGN KEY (user_id) REFERENCES users(id)
+            )
+        ''')
+        
+        # Audit log table
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS audit_log (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                timestamp TEXT DEFAULT CURRENT_TIMESTAMP,
+                user_id INTEGER,
+                action TEXT,
+                resource TEXT,
+                details TEXT,
+                ip_address TEXT,
+                FOREIGN KEY (user_id) REFERENCES users(id)
+            )
+        ''')
+        
+        # Create indexes for better performance
+        try:
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_users_username ON users(username)')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_logs_timestamp ON logs(timestamp)')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_hardware_timestamp ON hardware_metrics(timestamp)')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_vision_timestamp ON vision_analysis(timestamp)')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_actions_user ON user_actions(user_id)')
+        except Exception:
+            pass  # Indexes may already exist
     
     # ===== User Operations =====
     
@@ -273,22 +365,135 @@ class RealDatabase:
             logger.error(f"Error getting all users: {e}")
             return []
     
+    # ===== Batched Writes =====
+    
+    def _execute_many(self, sql: str, rows: List[Tuple], what: str) -> int:
+        if not rows:
+            return 0
+        try:
+            with self.get_connection() as conn:
+                conn.executemany(sql, rows)
+                return len(rows)
+        except Exception as e:
+            logger.error(f"Error inserting {what}: {e}")
+            return 0
+    
+    def enqueue_write(self, sql: str, params: Tuple) -> bool:
+        """Queue a row for the background writer
+        
+        Rows are committed in batches, at most one batch write after they are
+        queued; blocks when the queue is full.
+        """
+        if self._closed:
+            logger.error("Error queueing write: database is closed")
+            return False
+        self._ensure_writer()
+        self._write_queue.put((sql, params))
+        return True
+    
+    def _ensure_writer(self):
+        if self._writer is not None and self._writer.is_alive():
+            return
+        with self._writer_lock:
+            if self._writer is None or not self._writer.is_alive():
+                self._writer_stop.clear()
+                self._writer = threading.Thread(target=self._writer_loop,
+                                                name='daur_ai_db_writer', daemon=True)
+                self._writer.start()
+    
+    def _writer_loop(self):
+        while True:
+            try:
+                first = self._write_queue.get(timeout=0.1)
+            except queue.Empty:
+                if self._writer_stop.is_set():
+                    return
+                continue
+            
+            # Everything queued while the previous batch was written goes in one transaction
+            batch = [first]
+            while len(batch) < self.max_batch_size:
+                try:
+                    batch.append(self._write_queue.get_nowait())
+                except queue.Empty:
+                    break
+            
+            try:
+                with self.get_connection() as conn:
+                    for sql, group in groupby(batch, key=lambda item: item[0]):
+                        conn.executemany(sql, [params for _, params in group])
+                self.write_stats['rows'] += len(batch)
+                self.write_stats['batches'] += 1
+            except Exception as e:
+                self.write_stats['errors'] += 1
+                logger.error(f"Error writing batch of {len(batch)} rows, retrying row by row: {e}")
+                self._write_rows(batch)
+            finally:
+                for _ in batch:
+                    self._write_queue.task_done()
+    
+    def _write_rows(self, batch: List[Tuple[str, tuple]]):
+        """Write rows of a failed batch one per transaction, so one bad row does not drop the rest"""
+        for sql, params in batch:
+            try:
+                with self.get_connection() as conn:
+                    conn.execute(sql, params)
+                self.write_stats['rows'] += 1
+            except Exception as e:
+                self.write_stats['rejected'] += 1
+                logger.error(f"Rejected queued write {sql.split('(')[0].strip()} {params!r}: {e}")
+    
+    def flush(self):
+        """Wait until all queued writes are committed"""
+        if self._writer is not None:
+            self._write_queue.join()
+    
+    def close(self):
+        """Flush queued writes and close pooled connections"""
+        if self._closed:
+            return
+        self.flush()
+        self._writer_stop.set()
+        if self._writer is not None:
+            self._writer.join(timeout=1.0)
+        self._closed = True
+        with self._pool_lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections.clear()
+        if self._persistent_conn:
+            self._persistent_conn.close()
+    
     # ===== Logging Operations =====
     
     def insert_log(self, level: str, message: str, user_id: Optional[int] = None, source: str = '') -> bool:
         """Insert a log entry"""
+        params = (datetime.now().isoformat(), level, message, user_id, source)
+        if self.write_behind:
+            return self.enqueue_write(INSERT_LOG_SQL, params)
         try:
             with self.get_connection() as conn:
-                cursor = conn.cursor()
-                cursor.execute('''
-                    INSERT INTO logs (timestamp, level, message, user_id, source)
-                    VALUES (?, ?, ?, ?, ?)
-                ''', (datetime.now().isoformat(), level, message, user_id, source))
+                conn.execute(INSERT_LOG_SQL, params)
                 return True
         except Exception as e:
             logger.error(f"Error inserting log: {e}")
             return False
     
+    def insert_logs_many(self, entries: Iterable[Dict[str, Any]]) -> int:
+        """Insert log entries in a single transaction
+        
+        Args:
+            entries: Dicts with insert_log arguments (level, message, user_id, source)
+                and an optional timestamp
+        
+        Returns:
+            Number of inserted rows
+        """
+        now = datetime.now().isoformat()
+        rows = [(e.get('timestamp', now), e['level'], e['message'], e.get('user_id'),
+                 e.get('source', '')) for e in entries]
+        return self._execute_many(INSERT_LOG_SQL, rows, 'logs')
+    
     def get_logs(self, limit: int = 100, level: Optional[str] = None) -> List[Dict]:
         """Get logs"""
         try:
@@ -313,21 +518,45 @@ class RealDatabase:
                                gpu_memory_percent: float = 0.0, battery_percent: float = 0.0,
                                temperature: float = 0.0) -> bool:
         """Insert hardware metrics"""
+        now = datetime.now()
+        params = (now.isoformat(), cpu_percent, memory_percent, disk_percent,
+                  gpu_percent, gpu_memory_percent, battery_percent, temperature)
+        self._store_hardware_metrics(params, now.timestamp())
+        if self.write_behind:
+            return self.enqueue_write(INSERT_HARDWARE_METRICS_SQL, params)
         try:
             with self.get_connection() as conn:
-                cursor = conn.cursor()
-                cursor.execute('''
-                    INSERT INTO hardware_metrics 
-                    (timestamp, cpu_percent, memory_percent, disk_percent, gpu_percent, 
-                     gpu_memory_percent, battery_percent, temperature)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-                ''', (datetime.now().isoformat(), cpu_percent, memory_percent, disk_percent,
-                      gpu_percent, gpu_memory_percent, battery_percent, temperature))
+                conn.execute(INSERT_HARDWARE_METRICS_SQL, params)
                 return True
         except Exception as e:
             logger.error(f"Error inserting hardware metrics: {e}")
             return False
     
+    def insert_hardware_metrics_many(self, samples: Iterable[Dict[str, Any]]) -> int:
+        """Insert hardware metric samples in a single transaction
+        
+        Args:
+            samples: Dicts with insert_hardware_metrics arguments and an optional timestamp
+        
+        Returns:
+            Number of inserted rows
+        """
+        now = datetime.now().isoformat()
+        rows = [(s.get('timestamp', now), s['cpu_percent'], s['memory_percent'],
+                 s['disk_percent'], s.get('gpu_percent', 0.0), s.get('gpu_memory_percent', 0.0),
+                 s.get('battery_percent', 0.0), s.get('temperature', 0.0)) for s in samples]
+        for row in rows:
+            self._store_hardware_metrics(row, datetime.fromisoformat(row[0]).timestamp())
+        return self._execute_many(INSERT_HARDWARE_METRICS_SQL, rows, 'hardware metrics')
+    
+    def _store_hardware_metrics(self, row: Tuple, timestamp: float):
+        if self.metrics_store is None:
+            return
+        try:
+            self.metrics_store.record(dict(zip(HARDWARE_METRIC_SERIES, row[1:])), timestamp)
+        except Exception as e:
+            logger.error(f"Error storing hardware metrics series: {e}")
+    
     def get_hardware_metrics(self, limit: int = 100) -> List[Dict]:
         """Get hardware metrics"""
         try:
@@ -341,6 +570,18 @@ class RealDatabase:
     
     def get_hardware_metrics_average(self, hours: int = 1) -> Optional[Dict]:
         """Get average hardware metrics for the last N hours"""
+        if self.metrics_store is not None:
+            now = datetime.now().timestamp()
+            aggregates = {series: self.metrics_store.aggregate(series, now - hours * 3600, now + 1)
+                          for series in ('cpu_percent', 'memory_percent', 'disk_percent', 'gpu_percent')}
+            return {
+                'avg_cpu': aggregates['cpu_percent']['avg'],
+                'avg_memory': aggregates['memory_percent']['avg'],
+                'avg_disk': aggregates['disk_percent']['avg'],
+                'avg_gpu': aggregates['gpu_percent']['avg'],
+                'max_cpu': aggregates['cpu_percent']['max'],
+                'max_memory': aggregates['memory_percent']['max']
+            }
         try:
             with self.get_connection() as conn:
                 cursor = conn.cursor()
@@ -404,18 +645,31 @@ class RealDatabase:
     
     def insert_action(self, action_type: str, action_data: str, user_id: int, status: str = 'completed') -> bool:
         """Insert user action"""
+        params = (datetime.now().isoformat(), action_type, action_data, user_id, status)
+        if self.write_behind:
+            return self.enqueue_write(INSERT_ACTION_SQL, params)
         try:
             with self.get_connection() as conn:
-                cursor = conn.cursor()
-                cursor.execute('''
-                    INSERT INTO user_actions (timestamp, action_type, action_data, user_id, status)
-                    VALUES (?, ?, ?, ?, ?)
-                ''', (datetime.now().isoformat(), action_type, action_data, user_id, status))
+                conn.execute(INSERT_ACTION_SQL, params)
                 return True
         except Exception as e:
             logger.error(f"Error inserting action: {e}")
             return False
     
+    def insert_actions_many(self, actions: Iterable[Dict[str, Any]]) -> int:
+        """Insert user actions in a single transaction
+        
+        Args:
+            actions: Dicts with insert_action arguments and an optional timestamp
+        
+        Returns:
+            Number of inserted rows
+        """
+        now = datetime.now().isoformat()
+        rows = [(a.get('timestamp', now), a['action_type'], a['action_data'], a['user_id'],
+                 a.get('status', 'completed')) for a in actions]
+        return self._execute_many(INSERT_ACTION_SQL, rows, 'actions')
+    
     def get_user_actions(self, user_id: int, limit: int = 100) -> List[Dict]:
         """Get user actions"""
         try:
@@ -96,6 +96,17 @@ class V4L2Buffer(ctypes.Structure):
         ("reserved", ctypes.c_uint32),
     ]
 
+def yuyv_to_bgr(frame_data, width: int, height: int) -> np.ndarray:
+    """Конвертирует упакованный YUYV (Y0 U0 Y1 V0) в BGR одним вызовом OpenCV
+    
+    Цвета по BT.601 с ограниченным диапазоном (Y 16-235), как у камер V4L2.
+    """
+    import cv2
+    
+    yuyv = np.frombuffer(frame_data, dtype=np.uint8, count=width * height * 2)
+    return cv2.cvtColor(yuyv.reshape((height, width, 2)), cv2.COLOR_YUV2BGR_YUYV)
+
+
 class CameraDriver:
     """Низкоуровневый драйвер камеры"""
     
@@ -406,8 +417,8 @@ class CameraDriver:
                     buffer_info = self.frame_buffers[device_path][buf.index]
                     buffer_map = buffer_info['map']
                     
-                    buffer_map.seek(0)
-                    frame_data = buffer_map.read(buf.bytesused)
+                    # Представление поверх mmap: данные не копируются до конвертации
+                    frame_data = np.frombuffer(buffer_map, dtype=np.uint8, count=buf.bytesused)
                     
                     # Конвертируем в numpy array
                     frame = self._convert_frame(
@@ -417,6 +428,8 @@ class CameraDriver:
                         self.active_cameras[device_path]['pixelformat']
                     )
                     
+                    del frame_data
+                    
                     if frame is not None:
                         # Добавляем кадр в очередь
                         try:
@@ -473,34 +486,7 @@ class CameraDriver:
     def _convert_yuyv_to_bgr(self, frame_data: bytes, width: int, height: int) -> np.ndarray:
         """Конвертирует YUYV в BGR"""
         try:
-            # YUYV: Y0 U0 Y1 V0 (4 байта на 2 пикселя)
-            yuyv = np.frombuffer(frame_data, dtype=np.uint8)
-            yuyv = yuyv.reshape((height, width // 2, 4))
-            
-            # Извлекаем компоненты
-            y0 = yuyv[:, :, 0]
-            u = yuyv[:, :, 1]
-            y1 = yuyv[:, :, 2]
-            v = yuyv[:, :, 3]
-            
-            # Создаем YUV изображение
-            yuv = np.zeros((height, width, 3), dtype=np.uint8)
-            
-            # Заполняем Y канал
-            yuv[:, 0::2, 0] = y0  # Четные пиксели
-            yuv[:, 1::2, 0] = y1  # Нечетные пиксели
-            
-            # Заполняем U и V каналы (интерполяция)
-            yuv[:, 0::2, 1] = u
-            yuv[:, 1::2, 1] = u
-            yuv[:, 0::2, 2] = v
-            yuv[:, 1::2, 2] = v
-            
-            # Конвертируем YUV в BGR
-            import cv2
-            bgr = cv2.cvtColor(yuv, cv2.COLOR_YUV2BGR)
-            
-            return bgr
+            return yuyv_to_bgr(frame_data, width, height)
             
         except Exception as e:
             self.logger.debug(f"Ошибка конвертации YUYV: {e}")
@@ -37,6 +37,16 @@ class FramebufferInfo(Structure):
         ("grayscale", c_uint32),
     ]
 
+def rgb565_to_bgr(rgb565_frame: np.ndarray) -> np.ndarray:
+    """Конвертирует RGB565 (H, W) в BGR (H, W, 3) одним проходом OpenCV
+    
+    Раскладка бит совпадает с BGR565 OpenCV: синий в младших 5 битах.
+    """
+    height, width = rgb565_frame.shape
+    packed = rgb565_frame.view(np.uint8).reshape((height, width, 2))
+    return cv2.cvtColor(packed, cv2.COLOR_BGR5652BGR)
+
+
 class ScreenDriver:
     """Низкоуровневый драйвер для захвата экрана"""
     
@@ -50,6 +60,8 @@ class ScreenDriver:
         self.is_initialized = False
         self.framebuffer_fd = None
         self.framebuffer_map = None
+        # Представление numpy поверх mmap фреймбуфера (без копирования)
+        self.framebuffer_view = None
         self.screen_info = {}
         
         # Буфер для кадров
@@ -140,6 +152,9 @@ class ScreenDriver:
                             mmap.MAP_SHARED, 
                             mmap.PROT_READ
                         )
+                        self.framebuffer_view = self._wrap_framebuffer(
+                            self.framebuffer_map, fb_info.xres, fb_info.yres, fb_info.bits_per_pixel
+                        )
                         
                         self.logger.info(f"Фреймбуфер {device} открыт: {self.screen_info}")
                         return True
@@ -242,40 +257,48 @@ class ScreenDriver:
             self.logger.error(f"Ошибка захвата кадра: {e}")
             return None
     
+    @staticmethod
+    def _wrap_framebuffer(buffer, width: int, height: int, bpp: int) -> Optional[np.ndarray]:
+        """Оборачивает память фреймбуфера в массив numpy без копирования"""
+        if bpp == 32:
+            return np.frombuffer(buffer, dtype=np.uint8, count=width * height * 4).reshape((height, width, 4))
+        if bpp == 24:
+            return np.frombuffer(buffer, dtype=np.uint8, count=width * height * 3).reshape((height, width, 3))
+        if bpp == 16:
+            return np.frombuffer(buffer, dtype=np.uint16, count=width * height).reshape((height, width))
+        return None
+    
+    def get_framebuffer_view(self) -> Optional[np.ndarray]:
+        """
+        Возвращает живое представление фреймбуфера только для чтения
+        
+        Данные не копируются и меняются вместе с экраном; для устойчивого
+        кадра используйте capture_frame().
+        """
+        return self.framebuffer_view
+    
     def _capture_framebuffer(self) -> Optional[np.ndarray]:
         """Захват через фреймбуфер"""
         try:
             if not self.framebuffer_map:
                 return None
             
-            width = self.screen_info['width']
-            height = self.screen_info['height']
             bpp = self.screen_info['bpp']
+            raw = self.framebuffer_view
+            if raw is None:
+                self.logger.error(f"Неподдерживаемая глубина цвета: {bpp}")
+                return None
             
-            # Читаем данные из фреймбуфера
-            self.framebuffer_map.seek(0)
-            buffer_data = self.framebuffer_map.read(width * height * (bpp // 8))
-            
-            # Конвертируем в numpy array
+            # Конвертация читает прямо из mmap: единственная копия - выходной кадр
             if bpp == 32:
-                # RGBA или BGRA
-                frame = np.frombuffer(buffer_data, dtype=np.uint8)
-                frame = frame.reshape((height, width, 4))
-                # Конвертируем в BGR для OpenCV
-                frame = cv2.cvtColor(frame, cv2.COLOR_BGRA2BGR)
+                # RGBA или BGRA -> BGR для OpenCV
+                frame = cv2.cvtColor(raw, cv2.COLOR_BGRA2BGR)
             elif bpp == 24:
                 # RGB или BGR
-                frame = np.frombuffer(buffer_data, dtype=np.uint8)
-                frame = frame.reshape((height, width, 3))
-            elif bpp == 16:
-                # RGB565
-                frame = np.frombuffer(buffer_data, dtype=np.uint16)
-                frame = frame.reshape((height, width))
-                # Конвертируем RGB565 в BGR
-                frame = self._rgb565_to_bgr(frame)
+                frame = raw.copy()
             else:
-                self.logger.error(f"Неподдерживаемая глубина цвета: {bpp}")
-                return None
+                # RGB565 -> BGR
+                frame = self._rgb565_to_bgr(raw)
             
             return frame
             
@@ -352,20 +375,7 @@ class ScreenDriver:
     def _rgb565_to_bgr(self, rgb565_frame: np.ndarray) -> np.ndarray:
         """Конвертирует RGB565 в BGR"""
         try:
-            height, width = rgb565_frame.shape
-            bgr_frame = np.zeros((height, width, 3), dtype=np.uint8)
-            
-            # Извлекаем компоненты RGB565
-            r = ((rgb565_frame & 0xF800) >> 11) << 3
-            g = ((rgb565_frame & 0x07E0) >> 5) << 2
-            b = (rgb565_frame & 0x001F) << 3
-            
-            # Собираем BGR
-            bgr_frame[:, :, 0] = b  # Blue
-            bgr_frame[:, :, 1] = g  # Green
-            bgr_frame[:, :, 2] = r  # Red
-            
-            return bgr_frame
+            return rgb565_to_bgr(rgb565_frame)
             
         except Exception as e:
             self.logger.error(f"Ошибка конвертации RGB565: {e}")
@@ -476,6 +486,8 @@ class ScreenDriver:
         try:
             self.stop_continuous_capture()
             
+            # Представление нужно освободить до закрытия mmap
+            self.framebuffer_view = None
             if self.framebuffer_map:
                 self.framebuffer_map.close()
                 self.framebuffer_map = None
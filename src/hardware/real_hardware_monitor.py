@@ -16,12 +16,13 @@ Real Hardware Monitor for Daur-AI v2.0
 """
 
 import psutil
+import heapq
 import json
 import logging
 import threading
 import time
 from datetime import datetime
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, Iterable, List, Optional, Tuple
 from dataclasses import dataclass, asdict, field
 from enum import Enum
 from collections import deque
@@ -153,6 +154,8 @@ class NetworkMetrics:
     errout: int  # Ошибки исходящих
     dropin: int  # Потеряно входящих пакетов
     dropout: int  # Потеряно исходящих пакетов
+    bytes_sent_rate: float = 0  # Скорость отправки в байт/сек
+    bytes_recv_rate: float = 0  # Скорость получения в байт/сек
     
     def to_dict(self):
         return asdict(self)
@@ -176,17 +179,77 @@ class ProcessMetrics:
         return asdict(self)
 
 
+@dataclass(frozen=True)
+class HardwareSnapshot:
+    """Неизменяемый снимок состояния оборудования
+    
+    Создается фоновым опросом целиком и заменяется атомарно, поэтому
+    читатели получают согласованные данные без блокировок. Метрики внутри
+    снимка не должны изменяться вызывающим кодом.
+    """
+    timestamp: float
+    sequence: int
+    cpu: Optional[CPUMetrics]
+    memory: Optional[MemoryMetrics]
+    disks: Tuple[DiskMetrics, ...] = ()
+    gpus: Tuple[GPUMetrics, ...] = ()
+    battery: Optional[BatteryMetrics] = None
+    network: Tuple[NetworkMetrics, ...] = ()
+    processes_by_cpu: Tuple[ProcessMetrics, ...] = ()
+    processes_by_memory: Tuple[ProcessMetrics, ...] = ()
+    
+    def to_dict(self) -> Dict:
+        return {
+            "timestamp": datetime.fromtimestamp(self.timestamp).isoformat(),
+            "cpu": self.cpu.to_dict() if self.cpu else None,
+            "memory": self.memory.to_dict() if self.memory else None,
+            "disks": [m.to_dict() for m in self.disks],
+            "gpus": [m.to_dict() for m in self.gpus],
+            "battery": self.battery.to_dict() if self.battery else None,
+            "network": [m.to_dict() for m in self.network],
+            "top_processes_cpu": [m.to_dict() for m in self.processes_by_cpu],
+            "top_processes_memory": [m.to_dict() for m in self.processes_by_memory]
+        }
+
+
+def _cpu_busy_total(times) -> Tuple[float, float]:
+    """Занятое и общее время CPU (как в psutil: без guest и с учетом iowait)"""
+    total = sum(times)
+    total -= getattr(times, 'guest', 0) + getattr(times, 'guest_nice', 0)
+    idle = times.idle + getattr(times, 'iowait', 0)
+    return total - idle, total
+
+
 class RealHardwareMonitor:
-    """Полнофункциональный монитор оборудования"""
+    """Полнофункциональный монитор оборудования
+    
+    При запущенном мониторинге фоновый поток с фиксированной частотой
+    формирует HardwareSnapshot, и get_*_metrics возвращают данные последнего
+    снимка без обращения к системе. Загрузка CPU, скорости дисков и сети
+    считаются по разнице счетчиков между опросами, без ожидания. Дорогие
+    замеры (температуры, частота CPU, GPU, батарея, процессы) выполняются
+    реже и в разные тики, чтобы не создавать пиков длительности опроса.
+    """
+    
+    # Замеры, выполняемые раз в slow_interval; смещения разносят их по тикам
+    SLOW_PROBES = ('temperature', 'cpu_freq', 'gpu', 'battery', 'processes')
     
-    def __init__(self, history_size: int = 1000):
+    def __init__(self, history_size: int = 1000, metrics_store=None,
+                 slow_interval: float = 10.0, process_limit: int = 10):
         """
         Инициализация монитора
         
         Args:
             history_size: Размер истории для каждого типа метрик
+            metrics_store: Хранилище временных рядов (MetricsStore) для
+                долгосрочной истории с агрегацией по минутам и часам
+            slow_interval: Период дорогих замеров в фоновом опросе (секунды)
+            process_limit: Количество процессов в снимке для каждой сортировки
         """
         self.history_size = history_size
+        self.metrics_store = metrics_store
+        self.slow_interval = slow_interval
+        self.process_limit = process_limit
         self.cpu_history: deque = deque(maxlen=history_size)
         self.memory_history: deque = deque(maxlen=history_size)
         self.disk_history: deque = deque(maxlen=history_size)
@@ -197,7 +260,21 @@ class RealHardwareMonitor:
         
         self.monitoring = False
         self.monitor_thread = None
+        self.interval = 5.0
         self.lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._snapshot: Optional[HardwareSnapshot] = None
+        self._sequence = 0
+        self.sampler_stats = {'ticks': 0, 'overruns': 0, 'errors': 0, 'last_duration': 0.0}
+        
+        # Счетчики CPU предыдущего замера для расчёта загрузки без ожидания
+        self._probe_lock = threading.Lock()
+        self._last_cpu_times = None
+        self._last_cpu_time = 0.0
+        self._last_cpu_percent: Optional[Tuple[float, List[float]]] = None
+        self._cpu_counts = (psutil.cpu_count(logical=True), psutil.cpu_count(logical=False))
+        self._cpu_freq = None
+        self._cpu_temperature: Optional[float] = None
         
         # Для расчёта скорости диска
         self.last_disk_io = {}
@@ -209,60 +286,82 @@ class RealHardwareMonitor:
         
         logger.info("Real Hardware Monitor initialized")
     
-    def get_cpu_metrics(self) -> CPUMetrics:
-        """Получить метрики CPU"""
+    # ===== Замеры =====
+    
+    def _cpu_percent(self) -> Tuple[float, List[float]]:
+        """Загрузка CPU по разнице счетчиков с предыдущим замером"""
+        with self._probe_lock:
+            now = time.monotonic()
+            if self._last_cpu_percent is not None and now - self._last_cpu_time < 0.05:
+                # Слишком короткий интервал для осмысленной разницы
+                return self._last_cpu_percent
+            
+            previous = self._last_cpu_times
+            current = psutil.cpu_times(percpu=True)
+            if previous is None or len(previous) != len(current):
+                # Первый замер: одно короткое ожидание вместо двух
+                previous = current
+                time.sleep(0.1)
+                current = psutil.cpu_times(percpu=True)
+                now = time.monotonic()
+            
+            per_core = []
+            busy_sum = total_sum = 0.0
+            for before, after in zip(previous, current):
+                busy_before, total_before = _cpu_busy_total(before)
+                busy_after, total_after = _cpu_busy_total(after)
+                busy = max(0.0, busy_after - busy_before)
+                total = total_after - total_before
+                busy_sum += busy
+                total_sum += total
+                per_core.append(round(min(100.0, busy / total * 100), 1) if total > 0 else 0.0)
+            percent = round(min(100.0, busy_sum / total_sum * 100), 1) if total_sum > 0 else 0.0
+            
+            self._last_cpu_times = current
+            self._last_cpu_time = now
+            self._last_cpu_percent = (percent, per_core)
+            return self._last_cpu_percent
+    
+    def _probe_cpu_freq(self):
+        self._cpu_freq = psutil.cpu_freq()
+    
+    def _probe_temperature(self):
+        temperature = None
         try:
-            percent = psutil.cpu_percent(interval=0.1)
-            percent_per_core = psutil.cpu_percent(interval=0.1, percpu=True)
-            count_logical = psutil.cpu_count(logical=True)
-            count_physical = psutil.cpu_count(logical=False)
-            
-            freq = psutil.cpu_freq()
-            freq_current = freq.current if freq else 0
-            freq_min = freq.min if freq else 0
-            freq_max = freq.max if freq else 0
-            
-            # Попытка получить температуру
-            temperature = None
-            try:
-                temps = psutil.sensors_temperatures()
-                if temps:
-                    # Берём среднюю температуру
-                    all_temps = []
-                    for name, entries in temps.items():
-                        for entry in entries:
-                            all_temps.append(entry.current)
-                    if all_temps:
-                        temperature = sum(all_temps) / len(all_temps)
-            except Exception as e:
-                logger.debug(f"Could not get CPU temperature: {e}")
-            
+            temps = psutil.sensors_temperatures()
+            if temps:
+                # Берём среднюю температуру
+                all_temps = [entry.current for entries in temps.values() for entry in entries]
+                if all_temps:
+                    temperature = sum(all_temps) / len(all_temps)
+        except Exception as e:
+            logger.debug(f"Could not get CPU temperature: {e}")
+        self._cpu_temperature = temperature
+    
+    def _probe_cpu(self) -> Optional[CPUMetrics]:
+        try:
+            percent, percent_per_core = self._cpu_percent()
+            freq = self._cpu_freq
             metrics = CPUMetrics(
                 timestamp=datetime.now().isoformat(),
                 percent=percent,
                 percent_per_core=percent_per_core,
-                count_logical=count_logical,
-                count_physical=count_physical,
-                freq_current=freq_current,
-                freq_min=freq_min,
-                freq_max=freq_max,
-                temperature=temperature
+                count_logical=self._cpu_counts[0],
+                count_physical=self._cpu_counts[1],
+                freq_current=freq.current if freq else 0,
+                freq_min=freq.min if freq else 0,
+                freq_max=freq.max if freq else 0,
+                temperature=self._cpu_temperature
             )
-            
-            with self.lock:
-                self.cpu_history.append(metrics)
-            
-            logger.debug(f"CPU: {percent}% @ {freq_current:.0f}MHz")
+            logger.debug(f"CPU: {percent}% @ {metrics.freq_current:.0f}MHz")
             return metrics
         except Exception as e:
             logger.error(f"Error getting CPU metrics: {e}")
             return None
     
-    def get_memory_metrics(self) -> MemoryMetrics:
-        """Получить метрики памяти"""
+    def _probe_memory(self) -> Optional[MemoryMetrics]:
         try:
             mem = psutil.virtual_memory()
-            
             metrics = MemoryMetrics(
                 timestamp=datetime.now().isoformat(),
                 total=mem.total,
@@ -271,44 +370,40 @@ class RealHardwareMonitor:
                 free=mem.free,
                 percent=mem.percent
             )
-            
-            with self.lock:
-                self.memory_history.append(metrics)
-            
             logger.debug(f"Memory: {mem.percent}% ({mem.used / (1024**3):.1f}GB / {mem.total / (1024**3):.1f}GB)")
             return metrics
         except Exception as e:
             logger.error(f"Error getting memory metrics: {e}")
             return None
     
-    def get_disk_metrics(self) -> List[DiskMetrics]:
-        """Получить метрики дисков"""
+    def _probe_disks(self) -> List[DiskMetrics]:
         try:
             metrics_list = []
             current_time = time.time()
+            time_delta = current_time - self.last_disk_io_time
+            
+            try:
+                io_counters = psutil.disk_io_counters(perdisk=True) or {}
+            except Exception as e:
+                logger.debug(f"Could not get disk IO speed: {e}")
+                io_counters = {}
             
             for partition in psutil.disk_partitions():
                 try:
                     usage = psutil.disk_usage(partition.mountpoint)
                     
-                    # Расчёт скорости
+                    # Расчёт скорости по разнице счётчиков с прошлого замера
                     read_speed = 0
                     write_speed = 0
+                    disk_name = os.path.basename(partition.device)
+                    current_io = io_counters.get(disk_name)
+                    if current_io is not None:
+                        last_io = self.last_disk_io.get(disk_name)
+                        if last_io is not None and time_delta > 0:
+                            read_speed = (current_io.read_bytes - last_io.read_bytes) / time_delta
+                            write_speed = (current_io.write_bytes - last_io.write_bytes) / time_delta
                     
-                    try:
-                        io_counters = psutil.disk_io_counters(perdisk=True)
-                        if partition.device in io_counters:
-                            current_io = io_counters[partition.device]
-                            if partition.device in self.last_disk_io:
-                                time_delta = current_time - self.last_disk_io_time
-                                if time_delta > 0:
-                                    read_speed = (current_io.read_bytes - self.last_disk_io[partition.device].read_bytes) / time_delta
-                                    write_speed = (current_io.write_bytes - self.last_disk_io[partition.device].write_bytes) / time_delta
-                            self.last_disk_io[partition.device] = current_io
-                    except Exception as e:
-                        logger.debug(f"Could not get disk IO speed: {e}")
-                    
-                    metrics = DiskMetrics(
+                    metrics_list.append(DiskMetrics(
                         timestamp=datetime.now().isoformat(),
                         device=partition.device,
                         mount_point=partition.mountpoint,
@@ -318,26 +413,20 @@ class RealHardwareMonitor:
                         percent=usage.percent,
                         read_speed=read_speed,
                         write_speed=write_speed
-                    )
-                    
-                    metrics_list.append(metrics)
+                    ))
                 except Exception as e:
                     logger.debug(f"Error getting metrics for {partition.device}: {e}")
             
+            self.last_disk_io = io_counters
             self.last_disk_io_time = current_time
             
-            with self.lock:
-                for metrics in metrics_list:
-                    self.disk_history.append(metrics)
-            
             logger.debug(f"Disk: {len(metrics_list)} partitions")
             return metrics_list
         except Exception as e:
             logger.error(f"Error getting disk metrics: {e}")
             return []
     
-    def get_gpu_metrics(self) -> List[GPUMetrics]:
-        """Получить метрики GPU NVIDIA"""
+    def _probe_gpus(self) -> List[GPUMetrics]:
         try:
             metrics_list = []
             
@@ -372,59 +461,57 @@ class RealHardwareMonitor:
             except (FileNotFoundError, subprocess.TimeoutExpired):
                 logger.debug("nvidia-smi not found or timed out")
             
-            with self.lock:
-                for metrics in metrics_list:
-                    self.gpu_history.append(metrics)
-            
             if metrics_list:
                 logger.debug(f"GPU: {len(metrics_list)} GPUs found")
-            
             return metrics_list
         except Exception as e:
             logger.error(f"Error getting GPU metrics: {e}")
             return []
     
-    def get_battery_metrics(self) -> Optional[BatteryMetrics]:
-        """Получить метрики батареи"""
+    def _probe_battery(self) -> Optional[BatteryMetrics]:
         try:
             battery = psutil.sensors_battery()
             if battery is None:
                 return None
             
-            status_map = {
-                0: "charging",
-                1: "discharging",
-                2: "full",
-                3: "unknown"
-            }
+            plugged = bool(battery.power_plugged)
+            if plugged:
+                status = "full" if battery.percent >= 100 else "charging"
+            elif battery.power_plugged is None:
+                status = "unknown"
+            else:
+                status = "discharging"
             
+            unknown_time = (psutil.POWER_TIME_UNLIMITED, psutil.POWER_TIME_UNKNOWN)
             metrics = BatteryMetrics(
                 timestamp=datetime.now().isoformat(),
                 percent=battery.percent,
-                status=status_map.get(battery.power_plugged, "unknown"),
-                time_remaining=battery.secsleft if battery.secsleft != psutil.POWER_TIME_UNLIMITED else None,
-                power_plugged=battery.power_plugged
+                is_plugged=plugged,
+                status=status,
+                time_left=battery.secsleft if battery.secsleft not in unknown_time else None
             )
-            
-            with self.lock:
-                self.battery_history.append(metrics)
-            
             logger.debug(f"Battery: {battery.percent}% ({metrics.status})")
             return metrics
         except Exception as e:
             logger.debug(f"Error getting battery metrics: {e}")
             return None
     
-    def get_network_metrics(self) -> List[NetworkMetrics]:
-        """Получить метрики сети"""
+    def _probe_network(self) -> List[NetworkMetrics]:
         try:
             metrics_list = []
             current_time = time.time()
+            time_delta = current_time - self.last_net_io_time
             
             net_io = psutil.net_io_counters(pernic=True)
             
             for interface, stats in net_io.items():
-                metrics = NetworkMetrics(
+                last = self.last_net_io.get(interface)
+                sent_rate = recv_rate = 0.0
+                if last is not None and time_delta > 0:
+                    sent_rate = max(0.0, (stats.bytes_sent - last.bytes_sent) / time_delta)
+                    recv_rate = max(0.0, (stats.bytes_recv - last.bytes_recv) / time_delta)
+                
+                metrics_list.append(NetworkMetrics(
                     timestamp=datetime.now().isoformat(),
                     interface=interface,
                     bytes_sent=stats.bytes_sent,
@@ -434,63 +521,244 @@ class RealHardwareMonitor:
                     errin=stats.errin,
                     errout=stats.errout,
                     dropin=stats.dropin,
-                    dropout=stats.dropout
-                )
-                metrics_list.append(metrics)
+                    dropout=stats.dropout,
+                    bytes_sent_rate=sent_rate,
+                    bytes_recv_rate=recv_rate
+                ))
             
+            self.last_net_io = net_io
             self.last_net_io_time = current_time
             
-            with self.lock:
-                for metrics in metrics_list:
-                    self.network_history.append(metrics)
-            
             logger.debug(f"Network: {len(metrics_list)} interfaces")
             return metrics_list
         except Exception as e:
             logger.error(f"Error getting network metrics: {e}")
             return []
     
+    def _probe_processes(self) -> List[Dict]:
+        """Сведения о процессах; загрузка CPU считается psutil по разнице с прошлым обходом"""
+        processes = []
+        for proc in psutil.process_iter(['pid', 'name', 'cpu_percent', 'memory_percent', 'memory_info']):
+            pinfo = proc.info
+            if pinfo['cpu_percent'] is not None and pinfo['memory_percent'] is not None:
+                processes.append(pinfo)
+        return processes
+    
+    def _top_processes(self, processes: List[Dict], limit: int, sort_by: str) -> List[ProcessMetrics]:
+        key = 'memory_percent' if sort_by == "memory" else 'cpu_percent'
+        timestamp = datetime.now().isoformat()
+        return [
+            ProcessMetrics(
+                timestamp=timestamp,
+                pid=proc['pid'],
+                name=proc['name'],
+                cpu_percent=proc['cpu_percent'],
+                memory_percent=proc['memory_percent'],
+                memory_mb=proc['memory_info'].rss / (1024 * 1024) if proc['memory_info'] else 0.0
+            )
+            for proc in heapq.nlargest(limit, processes, key=lambda p: p[key])
+        ]
+    
+    # ===== Снимки =====
+    
+    def _due_slow_probes(self, tick: int, ticks_per_slow: int) -> List[str]:
+        """Дорогие замеры текущего тика, равномерно разнесённые по периоду"""
+        due = []
+        for index, name in enumerate(self.SLOW_PROBES):
+            offset = index * ticks_per_slow // len(self.SLOW_PROBES)
+            if tick % ticks_per_slow == offset % ticks_per_slow:
+                due.append(name)
+        return due
+    
+    def sample(self, slow_probes: Optional[List[str]] = None) -> HardwareSnapshot:
+        """Выполнить опрос и опубликовать новый снимок
+        
+        Args:
+            slow_probes: Какие дорогие замеры выполнить (None - все);
+                для остальных берутся значения предыдущего снимка
+        
+        Returns:
+            Новый снимок
+        """
+        slow = set(self.SLOW_PROBES if slow_probes is None else slow_probes)
+        previous = self._snapshot
+        
+        if 'cpu_freq' in slow:
+            try:
+                self._probe_cpu_freq()
+            except Exception as e:
+                logger.debug(f"Could not get CPU frequency: {e}")
+        if 'temperature' in slow:
+            self._probe_temperature()
+        
+        cpu = self._probe_cpu()
+        memory = self._probe_memory()
+        disks = tuple(self._probe_disks())
+        network = tuple(self._probe_network())
+        gpus = tuple(self._probe_gpus()) if 'gpu' in slow or previous is None else previous.gpus
+        battery = self._probe_battery() if 'battery' in slow or previous is None else previous.battery
+        
+        if 'processes' in slow or previous is None:
+            try:
+                processes = self._probe_processes()
+                by_cpu = tuple(self._top_processes(processes, self.process_limit, "cpu"))
+                by_memory = tuple(self._top_processes(processes, self.process_limit, "memory"))
+            except Exception as e:
+                logger.error(f"Error getting process metrics: {e}")
+                by_cpu = by_memory = ()
+        else:
+            by_cpu, by_memory = previous.processes_by_cpu, previous.processes_by_memory
+        
+        with self.lock:
+            self._sequence += 1
+            snapshot = HardwareSnapshot(
+                timestamp=time.time(),
+                sequence=self._sequence,
+                cpu=cpu,
+                memory=memory,
+                disks=disks,
+                gpus=gpus,
+                battery=battery,
+                network=network,
+                processes_by_cpu=by_cpu,
+                processes_by_memory=by_memory
+            )
+            self._snapshot = snapshot
+            
+            if cpu:
+                self.cpu_history.append(cpu)
+            if memory:
+                self.memory_history.append(memory)
+            self.disk_history.extend(disks)
+            self.network_history.extend(network)
+            if previous is None or gpus is not previous.gpus:
+                self.gpu_history.extend(gpus)
+            if battery and (previous is None or battery is not previous.battery):
+                self.battery_history.append(battery)
+            if previous is None or by_cpu is not previous.processes_by_cpu:
+                self.process_history.extend(by_cpu)
+        
+        values = {f'disk_percent:{m.mount_point}': m.percent for m in disks}
+        if cpu:
+            values['cpu_percent'] = cpu.percent
+            values['cpu_temperature'] = cpu.temperature
+        if memory:
+            values['memory_percent'] = memory.percent
+        if battery:
+            values['battery_percent'] = battery.percent
+        if previous is None or gpus is not previous.gpus:
+            values.update(self._gpu_values(gpus))
+        self._store_metrics(values)
+        return snapshot
+    
+    def get_snapshot(self) -> HardwareSnapshot:
+        """Последний снимок за O(1); без фонового опроса выполняет опрос"""
+        snapshot = self._fresh_snapshot()
+        return snapshot if snapshot is not None else self.sample()
+    
+    def _fresh_snapshot(self) -> Optional[HardwareSnapshot]:
+        """Снимок фонового опроса, если он запущен и снимок не устарел"""
+        snapshot = self._snapshot
+        if not self.monitoring or snapshot is None:
+            return None
+        if time.time() - snapshot.timestamp > 2 * self.interval + 1:
+            return None
+        return snapshot
+    
+    # ===== Метрики =====
+    
+    def get_cpu_metrics(self) -> CPUMetrics:
+        """Получить метрики CPU"""
+        snapshot = self._fresh_snapshot()
+        if snapshot is not None:
+            return snapshot.cpu
+        
+        if self._cpu_freq is None:
+            try:
+                self._probe_cpu_freq()
+            except Exception as e:
+                logger.debug(f"Could not get CPU frequency: {e}")
+        self._probe_temperature()
+        metrics = self._probe_cpu()
+        if metrics:
+            with self.lock:
+                self.cpu_history.append(metrics)
+            self._store_metrics({'cpu_percent': metrics.percent,
+                                 'cpu_temperature': metrics.temperature})
+        return metrics
+    
+    def get_memory_metrics(self) -> MemoryMetrics:
+        """Получить метрики памяти"""
+        snapshot = self._fresh_snapshot()
+        if snapshot is not None:
+            return snapshot.memory
+        
+        metrics = self._probe_memory()
+        if metrics:
+            with self.lock:
+                self.memory_history.append(metrics)
+            self._store_metrics({'memory_percent': metrics.percent})
+        return metrics
+    
+    def get_disk_metrics(self) -> List[DiskMetrics]:
+        """Получить метрики дисков"""
+        snapshot = self._fresh_snapshot()
+        if snapshot is not None:
+            return list(snapshot.disks)
+        
+        metrics_list = self._probe_disks()
+        with self.lock:
+            self.disk_history.extend(metrics_list)
+        self._store_metrics({f'disk_percent:{m.mount_point}': m.percent for m in metrics_list})
+        return metrics_list
+    
+    def get_gpu_metrics(self) -> List[GPUMetrics]:
+        """Получить метрики GPU NVIDIA"""
+        snapshot = self._fresh_snapshot()
+        if snapshot is not None:
+            return list(snapshot.gpus)
+        
+        metrics_list = self._probe_gpus()
+        with self.lock:
+            self.gpu_history.extend(metrics_list)
+        self._store_metrics(self._gpu_values(metrics_list))
+        return metrics_list
+    
+    def get_battery_metrics(self) -> Optional[BatteryMetrics]:
+        """Получить метрики батареи"""
+        snapshot = self._fresh_snapshot()
+        if snapshot is not None:
+            return snapshot.battery
+        
+        metrics = self._probe_battery()
+        if metrics:
+            with self.lock:
+                self.battery_history.append(metrics)
+            self._store_metrics({'battery_percent': metrics.percent})
+        return metrics
+    
+    def get_network_metrics(self) -> List[NetworkMetrics]:
+        """Получить метрики сети"""
+        snapshot = self._fresh_snapshot()
+        if snapshot is not None:
+            return list(snapshot.network)
+        
+        metrics_list = self._probe_network()
+        with self.lock:
+            self.network_history.extend(metrics_list)
+        return metrics_list
+    
     def get_top_processes(self, limit: int = 10, sort_by: str = "cpu") -> List[ProcessMetrics]:
         """Получить топ процессов"""
+        snapshot = self._fresh_snapshot()
+        if snapshot is not None and limit <= self.process_limit:
+            top = snapshot.processes_by_memory if sort_by == "memory" else snapshot.processes_by_cpu
+            return list(top[:limit])
+        
         try:
-            processes = []
-            
-            for proc in psutil.process_iter(['pid', 'name', 'cpu_percent', 'memory_percent']):
-                try:
-                    pinfo = proc.as_dict(attrs=['pid', 'name', 'cpu_percent', 'memory_percent'])
-                    if pinfo['cpu_percent'] is not None and pinfo['memory_percent'] is not None:
-                        processes.append(pinfo)
-                except (psutil.NoSuchProcess, psutil.AccessDenied):
-                    pass
-            
-            # Сортируем по CPU или памяти
-            if sort_by == "memory":
-                processes.sort(key=lambda x: x['memory_percent'], reverse=True)
-            else:
-                processes.sort(key=lambda x: x['cpu_percent'], reverse=True)
-            
-            metrics_list = []
-            for proc in processes[:limit]:
-                try:
-                    p = psutil.Process(proc['pid'])
-                    memory_mb = p.memory_info().rss / (1024 * 1024)
-                    
-                    metrics = ProcessMetrics(
-                        timestamp=datetime.now().isoformat(),
-                        pid=proc['pid'],
-                        name=proc['name'],
-                        cpu_percent=proc['cpu_percent'],
-                        memory_percent=proc['memory_percent'],
-                        memory_mb=memory_mb
-                    )
-                    metrics_list.append(metrics)
-                except (psutil.NoSuchProcess, psutil.AccessDenied):
-                    pass
-            
+            metrics_list = self._top_processes(self._probe_processes(), limit, sort_by)
             with self.lock:
-                for metrics in metrics_list:
-                    self.process_history.append(metrics)
-            
+                self.process_history.extend(metrics_list)
             logger.debug(f"Top {limit} processes by {sort_by}")
             return metrics_list
         except Exception as e:
@@ -499,52 +767,95 @@ class RealHardwareMonitor:
     
     def get_full_status(self) -> Dict:
         """Получить полный статус системы"""
-        return {
-            "timestamp": datetime.now().isoformat(),
-            "cpu": self.get_cpu_metrics().to_dict() if self.get_cpu_metrics() else None,
-            "memory": self.get_memory_metrics().to_dict() if self.get_memory_metrics() else None,
-            "disks": [m.to_dict() for m in self.get_disk_metrics()],
-            "gpus": [m.to_dict() for m in self.get_gpu_metrics()],
-            "battery": self.get_battery_metrics().to_dict() if self.get_battery_metrics() else None,
-            "network": [m.to_dict() for m in self.get_network_metrics()],
-            "top_processes_cpu": [m.to_dict() for m in self.get_top_processes(limit=5, sort_by="cpu")],
-            "top_processes_memory": [m.to_dict() for m in self.get_top_processes(limit=5, sort_by="memory")]
-        }
+        status = self.get_snapshot().to_dict()
+        status["top_processes_cpu"] = status["top_processes_cpu"][:5]
+        status["top_processes_memory"] = status["top_processes_memory"][:5]
+        return status
+    
+    # Представления для API: словари из последнего снимка
     
-    def start_monitoring(self, interval: int = 5):
-        """Начать непрерывный мониторинг"""
+    def get_status(self) -> Dict:
+        """Получить статус оборудования"""
+        return self.get_snapshot().to_dict()
+    
+    def get_cpu_info(self) -> Optional[Dict]:
+        """Получить информацию о CPU"""
+        cpu = self.get_snapshot().cpu
+        return cpu.to_dict() if cpu else None
+    
+    def get_memory_info(self) -> Optional[Dict]:
+        """Получить информацию о памяти"""
+        memory = self.get_snapshot().memory
+        return memory.to_dict() if memory else None
+    
+    def get_gpu_info(self) -> List[Dict]:
+        """Получить информацию о GPU"""
+        return [m.to_dict() for m in self.get_snapshot().gpus]
+    
+    def get_battery_info(self) -> Optional[Dict]:
+        """Получить информацию о батарее"""
+        battery = self.get_snapshot().battery
+        return battery.to_dict() if battery else None
+    
+    def get_network_info(self) -> List[Dict]:
+        """Получить информацию о сети"""
+        return [m.to_dict() for m in self.get_snapshot().network]
+    
+    # ===== Фоновый опрос =====
+    
+    def start_monitoring(self, interval: float = 5):
+        """Начать непрерывный мониторинг
+        
+        Args:
+            interval: Период формирования снимков в секундах
+        """
         if self.monitoring:
             logger.warning("Monitoring already started")
             return
         
+        self.interval = interval
+        self._stop_event.clear()
         self.monitoring = True
-        self.monitor_thread = threading.Thread(target=self._monitor_loop, args=(interval,), daemon=True)
+        self.monitor_thread = threading.Thread(target=self._monitor_loop, args=(interval,),
+                                               name="daur_ai_hardware_sampler", daemon=True)
         self.monitor_thread.start()
         logger.info(f"Monitoring started with interval {interval}s")
     
     def stop_monitoring(self):
         """Остановить мониторинг"""
         self.monitoring = False
+        self._stop_event.set()
         if self.monitor_thread:
             self.monitor_thread.join(timeout=5)
+            self.monitor_thread = None
         logger.info("Monitoring stopped")
     
-    def _monitor_loop(self, interval: int):
-        """Цикл мониторинга"""
-        while self.monitoring:
+    def _monitor_loop(self, interval: float):
+        """Цикл мониторинга с фиксированной частотой"""
+        ticks_per_slow = max(1, round(self.slow_interval / interval))
+        tick = 0
+        next_tick = time.monotonic()
+        while not self._stop_event.is_set():
+            started = time.monotonic()
             try:
-                self.get_cpu_metrics()
-                self.get_memory_metrics()
-                self.get_disk_metrics()
-                self.get_gpu_metrics()
-                self.get_battery_metrics()
-                self.get_network_metrics()
-                self.get_top_processes(limit=5)
-                
-                time.sleep(interval)
+                # Первый снимок полный, далее дорогие замеры по расписанию
+                slow = None if tick == 0 else self._due_slow_probes(tick, ticks_per_slow)
+                self.sample(slow)
+                self.sampler_stats['ticks'] += 1
             except Exception as e:
+                self.sampler_stats['errors'] += 1
                 logger.error(f"Error in monitoring loop: {e}")
-                time.sleep(interval)
+            self.sampler_stats['last_duration'] = time.monotonic() - started
+            tick += 1
+            
+            next_tick += interval
+            delay = next_tick - time.monotonic()
+            if delay < 0:
+                # Опрос не успевает за заданной частотой: пропускаем тики
+                self.sampler_stats['overruns'] += 1
+                next_tick = time.monotonic()
+                delay = 0
+            self._stop_event.wait(delay)
     
     def save_metrics(self, filepath: str):
         """Сохранить метрики в JSON"""
@@ -569,6 +880,34 @@ class RealHardwareMonitor:
             logger.error(f"Error saving metrics: {e}")
             return False
     
+    @staticmethod
+    def _gpu_values(metrics_list: Iterable[GPUMetrics]) -> Dict[str, Optional[float]]:
+        """Значения рядов gpu_* для хранилища временных рядов"""
+        values = {}
+        for metrics in metrics_list:
+            values[f'gpu_percent:{metrics.index}'] = metrics.utilization
+            values[f'gpu_memory_percent:{metrics.index}'] = (
+                metrics.memory_used / metrics.memory_total * 100 if metrics.memory_total else None
+            )
+            values[f'gpu_temperature:{metrics.index}'] = metrics.temperature
+        return values
+    
+    def _store_metrics(self, values: Dict[str, Optional[float]]):
+        """Записать значения в хранилище временных рядов"""
+        if self.metrics_store is None or not values:
+            return
+        try:
+            self.metrics_store.record(values)
+        except Exception as e:
+            logger.error(f"Error storing metrics: {e}")
+    
+    def get_metrics_aggregate(self, series: str, hours: float = 1) -> Optional[Dict]:
+        """Получить агрегаты ряда (count, sum, min, max, avg) за последние часы"""
+        if self.metrics_store is None:
+            return None
+        now = time.time()
+        return self.metrics_store.aggregate(series, now - hours * 3600, now + 1)
+    
     def get_history(self, metric_type: str, limit: int = 100) -> List:
         """Получить историю метрик"""
         history_map = {
@@ -593,6 +932,7 @@ class RealHardwareMonitor:
 # Экспорт основных классов
 __all__ = [
     'RealHardwareMonitor',
+    'HardwareSnapshot',
     'CPUMetrics',
     'MemoryMetrics',
     'DiskMetrics',
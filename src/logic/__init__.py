@@ -18,6 +18,8 @@ from .workflow_engine import (
     get_logic_engine,
     get_automation_engine
 )
+from .workflow_journal import WorkflowJournal
+from .rule_network import Condition, RuleNetwork, when
 
 __all__ = [
     'WorkflowState',
@@ -30,6 +32,10 @@ __all__ = [
     'AutomationEngine',
     'get_workflow_engine',
     'get_logic_engine',
-    'get_automation_engine'
+    'get_automation_engine',
+    'WorkflowJournal',
+    'Condition',
+    'RuleNetwork',
+    'when'
 ]
 
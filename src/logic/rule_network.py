@@ -0,0 +1,518 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Daur-AI: Сеть правил для инкрементальной оценки условий (в духе Rete)
+
+Декларативные условия (when('cpu', '>', 80) & when('mode', '==', 'auto'))
+компилируются в альфа-узлы - проверки одного ключа контекста. Одинаковые
+проверки разных правил объединяются в один узел и вычисляются один раз,
+а правило активно, когда истинны все его альфа-узлы (счетчик на правило).
+Произвольные функции-условия тоже поддерживаются: при вычислении
+запоминается, какие ключи контекста они прочитали, и функция повторно
+вызывается только при изменении этих ключей.
+
+Состояние сети (контекст, значения узлов, счетчики) хранится отдельно в
+RuleMemory, поэтому одна скомпилированная сеть обслуживает и разовую
+оценку контекста, и долгоживущий инкрементально обновляемый контекст.
+"""
+
+import itertools
+import logging
+import operator
+from collections import defaultdict
+from collections.abc import Mapping
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Отсутствующий ключ; в изменениях контекста означает удаление ключа
+MISSING = object()
+
+# Условие читает весь контекст (итерация, len, copy)
+WILDCARD = object()
+
+
+def _contains(container, item) -> bool:
+    return item in container
+
+
+def _not_contains(item, container) -> bool:
+    return item not in container
+
+
+OPERATORS: Dict[str, Callable[[Any, Any], bool]] = {
+    '==': operator.eq,
+    '!=': operator.ne,
+    '>': operator.gt,
+    '>=': operator.ge,
+    '<': operator.lt,
+    '<=': operator.le,
+    'in': lambda actual, expected: actual in expected,
+    'not in': _not_contains,
+    'contains': _contains,
+    'exists': lambda actual, expected: True,
+    'missing': lambda actual, expected: False,
+}
+
+# Операторы, истинные для отсутствующего ключа
+_TRUE_WHEN_MISSING = frozenset(('!=', 'not in', 'missing'))
+
+
+class Condition:
+    """Проверка одного ключа контекста: key <op> value"""
+
+    __slots__ = ('key', 'op', 'value', '_test')
+
+    def __init__(self, key: str, op: str = 'exists', value: Any = None):
+        """
+        Args:
+            key: Ключ контекста
+            op: Оператор (==, !=, >, >=, <, <=, in, not in, contains, exists, missing)
+            value: Значение для сравнения
+        """
+        if op not in OPERATORS:
+            raise ValueError(f"Неизвестный оператор условия: {op}")
+        self.key = key
+        self.op = op
+        self.value = value
+        self._test = OPERATORS[op]
+
+    @property
+    def signature(self) -> Tuple[str, str, str]:
+        return self.key, self.op, repr(self.value)
+
+    def test(self, actual: Any) -> bool:
+        if actual is MISSING:
+            return self.op in _TRUE_WHEN_MISSING
+        try:
+            return bool(self._test(actual, self.value))
+        except Exception:
+            return False
+
+    def __call__(self, context: Dict[str, Any]) -> bool:
+        return self.test(context.get(self.key, MISSING))
+
+    def __and__(self, other) -> 'AllOf':
+        return AllOf(self, other)
+
+    def __repr__(self) -> str:
+        return f"when({self.key!r}, {self.op!r}, {self.value!r})"
+
+
+class AllOf:
+    """Конъюнкция условий"""
+
+    __slots__ = ('conditions',)
+
+    def __init__(self, *conditions):
+        flat: List[Condition] = []
+        for condition in conditions:
+            if isinstance(condition, AllOf):
+                flat.extend(condition.conditions)
+            elif isinstance(condition, Condition):
+                flat.append(condition)
+            else:
+                raise TypeError("AllOf принимает только Condition и AllOf")
+        self.conditions = tuple(flat)
+
+    def __call__(self, context: Dict[str, Any]) -> bool:
+        return all(condition(context) for condition in self.conditions)
+
+    def __and__(self, other) -> 'AllOf':
+        return AllOf(self, other)
+
+    def __repr__(self) -> str:
+        return ' & '.join(repr(condition) for condition in self.conditions)
+
+
+def when(key: str, op: str = 'exists', value: Any = None) -> Condition:
+    """Создать декларативное условие для компиляции в сеть правил"""
+    return Condition(key, op, value)
+
+
+class _TrackingView(Mapping):
+    """Контекст только для чтения, запоминающий прочитанные ключи"""
+
+    __slots__ = ('_data', 'keys_read')
+
+    def __init__(self, data: Dict[str, Any]):
+        self._data = data
+        self.keys_read: Set[Any] = set()
+
+    def __getitem__(self, key):
+        self.keys_read.add(key)
+        return self._data[key]
+
+    def get(self, key, default=None):
+        self.keys_read.add(key)
+        return self._data.get(key, default)
+
+    def __contains__(self, key):
+        self.keys_read.add(key)
+        return key in self._data
+
+    def __iter__(self):
+        self.keys_read.add(WILDCARD)
+        return iter(self._data)
+
+    def __len__(self):
+        self.keys_read.add(WILDCARD)
+        return len(self._data)
+
+    def copy(self) -> Dict[str, Any]:
+        self.keys_read.add(WILDCARD)
+        return dict(self._data)
+
+
+class RecordingDict(dict):
+    """Контекст для действий правил, запоминающий измененные ключи
+
+    Действие может изменить контекст на месте и вернуть его же - тогда
+    изменения известны без сравнения всего контекста.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.changed: Set[str] = set()
+
+    def __setitem__(self, key, value):
+        self.changed.add(key)
+        super().__setitem__(key, value)
+
+    def __delitem__(self, key):
+        self.changed.add(key)
+        super().__delitem__(key)
+
+    def update(self, *args, **kwargs):
+        other = dict(*args, **kwargs)
+        self.changed.update(other)
+        super().update(other)
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self.changed.add(key)
+        return super().setdefault(key, default)
+
+    def pop(self, key, *default):
+        self.changed.add(key)
+        return super().pop(key, *default)
+
+    def popitem(self):
+        key, value = super().popitem()
+        self.changed.add(key)
+        return key, value
+
+    def clear(self):
+        self.changed.update(self)
+        super().clear()
+
+    def __ior__(self, other):
+        self.update(other)
+        return self
+
+    def take_changes(self) -> Dict[str, Any]:
+        """Изменения с прошлого вызова (удаленные ключи - MISSING)"""
+        changes = {key: self.get(key, MISSING) for key in self.changed}
+        self.changed = set()
+        return changes
+
+
+class _Alpha:
+    """Общий узел проверки одного ключа"""
+
+    __slots__ = ('condition', 'nodes', 'absent')
+
+    def __init__(self, condition: Condition):
+        self.condition = condition
+        self.nodes: Set['_Node'] = set()
+        self.absent = condition.test(MISSING)
+
+
+class _Node:
+    """Правило в сети: набор альфа-узлов или отслеживаемая функция"""
+
+    __slots__ = ('rule_id', 'priority', 'order', 'alphas', 'size', 'base', 'function', 'sort_key')
+
+    def __init__(self, rule_id: str, priority: int, order: int,
+                 alphas: Optional[Tuple[_Alpha, ...]], function: Optional[Callable]):
+        self.rule_id = rule_id
+        self.priority = priority
+        self.order = order
+        self.alphas = alphas
+        self.size = len(alphas) if alphas is not None else 0
+        self.function = function
+        # Количество альфа-узлов, истинных при пустом контексте
+        self.base = sum(1 for alpha in alphas if alpha.absent) if alphas is not None else 0
+        # Порядок срабатывания: больший приоритет раньше, затем порядок добавления
+        self.sort_key = (-priority, order)
+
+
+class RuleMemory:
+    """Рабочая память сети: контекст и текущие значения узлов"""
+
+    def __init__(self, context: Optional[Dict[str, Any]] = None):
+        self.context: Dict[str, Any] = dict(context or {})
+        self.alpha: Dict[_Alpha, bool] = {}
+        self.count: Dict[_Node, int] = {}
+        self.dynamic: Dict[_Node, bool] = {}
+        self.reads: Dict[_Node, Set[Any]] = {}
+        self.readers: Dict[Any, Set[_Node]] = defaultdict(set)
+
+
+class RuleNetwork:
+    """Скомпилированная сеть правил"""
+
+    def __init__(self):
+        self._alphas: Dict[Tuple[str, str, str], _Alpha] = {}
+        self._key_alphas: Dict[str, Set[_Alpha]] = defaultdict(set)
+        self._nodes: Dict[str, _Node] = {}
+        self._dynamic: Set[_Node] = set()
+        # Правила, активные без единого ключа в контексте (например, только !=)
+        self._always: Set[_Node] = set()
+        self._ordered_dynamic: Optional[List[_Node]] = None
+        self._order = itertools.count()
+        self.stats = {'alpha_tests': 0, 'condition_calls': 0}
+
+    def __len__(self) -> int:
+        return len(self._nodes)
+
+    @property
+    def alpha_count(self) -> int:
+        return len(self._alphas)
+
+    def node(self, rule_id: str) -> Optional[_Node]:
+        return self._nodes.get(rule_id)
+
+    def add(self, rule_id: str, condition: Callable, priority: int = 0) -> _Node:
+        """
+        Скомпилировать правило
+
+        Args:
+            rule_id: ID правила (повторное добавление заменяет правило)
+            condition: Condition, AllOf или произвольная функция от контекста
+            priority: Приоритет срабатывания
+
+        Returns:
+            Узел правила
+        """
+        previous = self._nodes.get(rule_id)
+        order = previous.order if previous else next(self._order)
+        if previous:
+            self.remove(rule_id)
+
+        if isinstance(condition, (Condition, AllOf)):
+            conditions = condition.conditions if isinstance(condition, AllOf) else (condition,)
+            alphas = []
+            for item in conditions:
+                alpha = self._alphas.get(item.signature)
+                if alpha is None:
+                    alpha = self._alphas[item.signature] = _Alpha(item)
+                    self._key_alphas[item.key].add(alpha)
+                if alpha not in alphas:
+                    alphas.append(alpha)
+            node = _Node(rule_id, priority, order, tuple(alphas), None)
+            for alpha in alphas:
+                alpha.nodes.add(node)
+            if node.base == len(alphas):
+                self._always.add(node)
+        else:
+            node = _Node(rule_id, priority, order, None, condition)
+            self._dynamic.add(node)
+            self._ordered_dynamic = None
+
+        self._nodes[rule_id] = node
+        return node
+
+    def remove(self, rule_id: str) -> Optional[_Node]:
+        node = self._nodes.pop(rule_id, None)
+        if node is None:
+            return None
+        if node in self._dynamic:
+            self._dynamic.discard(node)
+            self._ordered_dynamic = None
+        self._always.discard(node)
+        for alpha in node.alphas or ():
+            alpha.nodes.discard(node)
+            if not alpha.nodes:
+                del self._alphas[alpha.condition.signature]
+                self._key_alphas[alpha.condition.key].discard(alpha)
+                if not self._key_alphas[alpha.condition.key]:
+                    del self._key_alphas[alpha.condition.key]
+        return node
+
+    # ===== Рабочая память =====
+
+    def _test_alpha(self, memory: RuleMemory, alpha: _Alpha) -> bool:
+        self.stats['alpha_tests'] += 1
+        value = memory.context.get(alpha.condition.key, MISSING)
+        return alpha.condition.test(value)
+
+    def _call(self, memory: RuleMemory, node: _Node) -> bool:
+        """Вызвать функцию-условие и обновить индекс прочитанных ключей"""
+        self.stats['condition_calls'] += 1
+        view = _TrackingView(memory.context)
+        try:
+            result = bool(node.function(view))
+        except Exception as e:
+            logger.debug(f"Условие правила {node.rule_id} завершилось ошибкой: {e}")
+            result = False
+        for key in memory.reads.get(node, ()):
+            memory.readers[key].discard(node)
+        memory.reads[node] = view.keys_read
+        for key in view.keys_read:
+            memory.readers[key].add(node)
+        memory.dynamic[node] = result
+        return result
+
+    def _set_alpha(self, memory: RuleMemory, alpha: _Alpha, value: bool,
+                   affected: Set[_Node]):
+        previous = memory.alpha.get(alpha, alpha.absent)
+        if value == alpha.absent:
+            memory.alpha.pop(alpha, None)
+        else:
+            memory.alpha[alpha] = value
+        if previous != value:
+            delta = 1 if value else -1
+            for node in alpha.nodes:
+                memory.count[node] = memory.count.get(node, node.base) + delta
+        affected.update(alpha.nodes)
+
+    def dynamic_nodes(self) -> List[_Node]:
+        """Правила с функциями-условиями в порядке срабатывания"""
+        if self._ordered_dynamic is None:
+            self._ordered_dynamic = sorted_nodes(self._dynamic)
+        return self._ordered_dynamic
+
+    def memory(self, context: Dict[str, Any],
+               track_dynamic: bool = True) -> Tuple[RuleMemory, Set[_Node]]:
+        """
+        Создать рабочую память для контекста
+
+        Вычисляются только альфа-узлы ключей, присутствующих в контексте.
+
+        Args:
+            context: Контекст
+            track_dynamic: Вычислить функции-условия с записью прочитанных
+                ключей (нужно для последующих инкрементальных изменений)
+
+        Returns:
+            Память и активные правила
+        """
+        memory = RuleMemory(context)
+        candidates: Set[_Node] = set(self._always)
+        count = memory.count
+        for key in memory.context:
+            alphas = self._key_alphas.get(key)
+            if not alphas:
+                continue
+            for alpha in alphas:
+                value = self._test_alpha(memory, alpha)
+                if value == alpha.absent:
+                    continue
+                memory.alpha[alpha] = value
+                delta = 1 if value else -1
+                for node in alpha.nodes:
+                    current = count.get(node, node.base) + delta
+                    count[node] = current
+                    if current == node.size:
+                        candidates.add(node)
+        if track_dynamic:
+            for node in self._dynamic:
+                if self._call(memory, node):
+                    candidates.add(node)
+        return memory, {node for node in candidates if self.is_active(memory, node)}
+
+    def attach(self, memory: RuleMemory, node: _Node):
+        """Вычислить в существующей памяти правило, добавленное после ее создания"""
+        if node.alphas is None:
+            self._call(memory, node)
+            return
+        count = 0
+        for alpha in node.alphas:
+            if alpha.condition.key in memory.context and alpha not in memory.alpha:
+                value = self._test_alpha(memory, alpha)
+                if value != alpha.absent:
+                    memory.alpha[alpha] = value
+                    # Узел мог быть общим с правилами, добавленными раньше
+                    for other in alpha.nodes:
+                        if other is not node:
+                            memory.count[other] = memory.count.get(other, other.base) + \
+                                (1 if value else -1)
+            count += memory.alpha.get(alpha, alpha.absent)
+        memory.count[node] = count
+
+    def detach(self, memory: RuleMemory, node: _Node):
+        memory.count.pop(node, None)
+        memory.dynamic.pop(node, None)
+        for key in memory.reads.pop(node, ()):
+            memory.readers[key].discard(node)
+
+    def is_active(self, memory: RuleMemory, node: _Node) -> bool:
+        if node.alphas is None:
+            return memory.dynamic.get(node, False)
+        return memory.count.get(node, node.base) == node.size
+
+    def propagate(self, memory: RuleMemory, changes: Dict[str, Any]) -> Set[_Node]:
+        """
+        Применить изменения контекста
+
+        Args:
+            memory: Рабочая память
+            changes: Новые значения ключей (MISSING - удалить ключ)
+
+        Returns:
+            Правила, читающие измененные ключи (их условия пересчитаны)
+        """
+        changed = []
+        for key, value in changes.items():
+            old = memory.context.get(key, MISSING)
+            if value is MISSING:
+                if old is MISSING:
+                    continue
+                del memory.context[key]
+            else:
+                if old is not MISSING and _same(old, value):
+                    continue
+                memory.context[key] = value
+            changed.append(key)
+
+        affected: Set[_Node] = set()
+        if not changed:
+            return affected
+
+        for key in changed:
+            for alpha in self._key_alphas.get(key, ()):
+                self._set_alpha(memory, alpha, self._test_alpha(memory, alpha), affected)
+
+        readers: Set[_Node] = set(memory.readers.get(WILDCARD, ()))
+        for key in changed:
+            readers.update(memory.readers.get(key, ()))
+        for node in readers:
+            if node.rule_id in self._nodes:
+                self._call(memory, node)
+                affected.add(node)
+        return affected
+
+
+def _same(old: Any, new: Any) -> bool:
+    if old is new:
+        return True
+    try:
+        return bool(old == new) and type(old) is type(new)
+    except Exception:
+        return False
+
+
+def context_changes(before: Dict[str, Any], after: Dict[str, Any]) -> Dict[str, Any]:
+    """Изменения между двумя версиями контекста (удаленные ключи - MISSING)"""
+    changes = {key: value for key, value in after.items()
+               if key not in before or not _same(before[key], value)}
+    for key in before:
+        if key not in after:
+            changes[key] = MISSING
+    return changes
+
+
+def sorted_nodes(nodes: Iterable[_Node]) -> List[_Node]:
+    return sorted(nodes, key=lambda node: node.sort_key)
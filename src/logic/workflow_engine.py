@@ -11,15 +11,25 @@ Daur-AI: Модуль улучшения логики работы систем
 """
 
 import logging
+import heapq
 import json
 import time
-from typing import Dict, List, Any, Optional, Callable, Tuple
+from collections import defaultdict, deque
+import threading
+from concurrent.futures import FIRST_COMPLETED, Future, wait
+from typing import Dict, Iterable, List, Any, Optional, Callable, Tuple
 from pathlib import Path
 from enum import Enum
 from dataclasses import dataclass, field
 from datetime import datetime
 from abc import ABC, abstractmethod
 
+from ..reliability.error_handling import RetryConfig, RetryStrategy
+from .rule_network import (
+    MISSING, RecordingDict, RuleMemory, RuleNetwork, context_changes, sorted_nodes
+)
+from .workflow_journal import WorkflowJournal, input_hash
+
 
 class WorkflowState(Enum):
     """Состояния рабочего процесса"""
@@ -54,9 +64,15 @@ class WorkflowStep:
     retry_count: int = 0
     max_retries: int = 3
     timeout: int = 300
+    # None - шаг выполняется после предыдущего шага списка (как раньше),
+    # [] - шаг не зависит от других и может стартовать сразу
+    depends_on: Optional[List[str]] = None
+    retry_delay: float = 0.5
+    max_retry_delay: float = 30.0
     created_at: datetime = field(default_factory=datetime.now)
     started_at: Optional[datetime] = None
     completed_at: Optional[datetime] = None
+    duration: Optional[float] = None
 
 
 @dataclass
@@ -78,18 +94,38 @@ class LogicRule:
     """Правило логики"""
     rule_id: str
     name: str
-    condition: Callable[[Dict[str, Any]], bool]
+    condition: Callable[[Dict[str, Any]], bool]  # функция или when(...) & when(...)
     action: Callable[[Dict[str, Any]], Dict[str, Any]]
     priority: int = 5
     enabled: bool = True
 
 
 class WorkflowEngine:
-    """Движок рабочих процессов"""
+    """Движок рабочих процессов
     
-    def __init__(self):
-        """Инициализация"""
+    Шаги образуют граф зависимостей (depends_on), каждая попытка шага
+    выполняется в своем потоке: независимые шаги идут параллельно, не больше
+    max_concurrency одновременно. Повторы выполняются с экспоненциальной
+    задержкой, таймаут отсчитывается от начала действия и проверяется
+    планировщиком. Поток попытки, снятой по таймауту, прервать нельзя: он
+    не занимает место в max_concurrency, но повтор шага ждет его завершения.
+    
+    С журналом (WorkflowJournal) каждое изменение шага сохраняется, и после
+    перезапуска resume_workflow выполняет только незавершенные шаги.
+    """
+    
+    def __init__(self, max_concurrency: int = 4, journal: Optional[WorkflowJournal] = None):
+        """
+        Инициализация
+        
+        Args:
+            max_concurrency: Максимальное количество одновременно выполняемых шагов
+            journal: Журнал для сохранения состояния шагов (опционально)
+        """
         self.logger = logging.getLogger('daur_ai.workflow_engine')
+        self.max_concurrency = max_concurrency
+        self.journal = journal
+        self._restored_ids = set()
         self.workflows: Dict[str, Workflow] = {}
         self.running_workflows: Dict[str, Workflow] = {}
     
@@ -130,12 +166,13 @@ class WorkflowEngine:
         self.logger.info(f"Шаг добавлен: {step.step_id}")
         return True
     
-    def execute_workflow(self, workflow_id: str) -> bool:
+    def execute_workflow(self, workflow_id: str, max_concurrency: Optional[int] = None) -> bool:
         """
         Выполнить рабочий процесс
         
         Args:
             workflow_id: ID рабочего процесса
+            max_concurrency: Ограничение параллелизма (по умолчанию из движка)
             
         Returns:
             bool: Успешность выполнения
@@ -145,16 +182,43 @@ class WorkflowEngine:
             return False
         
         workflow = self.workflows[workflow_id]
+        
+        try:
+            dependencies = self._resolve_dependencies(workflow)
+        except ValueError as e:
+            workflow.state = WorkflowState.FAILED
+            self.logger.error(f"Некорректный граф шагов {workflow_id}: {e}")
+            return False
+        
+        # Приостановленный процесс продолжается с невыполненных шагов
+        resume = workflow.state == WorkflowState.PAUSED
+        if not resume:
+            for step in workflow.steps:
+                self._reset_step(step)
+        
         workflow.state = WorkflowState.RUNNING
-        workflow.started_at = datetime.now()
+        workflow.started_at = workflow.started_at if resume and workflow.started_at else datetime.now()
+        workflow.completed_at = None
         self.running_workflows[workflow_id] = workflow
+        return self._run_workflow(workflow, dependencies, max_concurrency, reset=not resume)
+    
+    def _run_workflow(self, workflow: Workflow, dependencies: Dict[str, List[str]],
+                      max_concurrency: Optional[int], reset: bool = False) -> bool:
+        """Выполнить подготовленный рабочий процесс и зафиксировать итоговое состояние"""
+        workflow_id = workflow.workflow_id
+        self._journal_workflow(workflow, reset)
         
         try:
-            for step in workflow.steps:
-                if not self._execute_step(workflow, step):
-                    workflow.state = WorkflowState.FAILED
-                    self.logger.error(f"Рабочий процесс завершился с ошибкой: {workflow_id}")
-                    return False
+            succeeded = self._run_graph(workflow, dependencies, max_concurrency or self.max_concurrency)
+            
+            if workflow.state in (WorkflowState.PAUSED, WorkflowState.CANCELLED):
+                self.logger.info(f"Рабочий процесс остановлен ({workflow.state.value}): {workflow_id}")
+                return False
+            
+            if not succeeded:
+                workflow.state = WorkflowState.FAILED
+                self.logger.error(f"Рабочий процесс завершился с ошибкой: {workflow_id}")
+                return False
             
             workflow.state = WorkflowState.COMPLETED
             workflow.completed_at = datetime.now()
@@ -167,44 +231,365 @@ class WorkflowEngine:
             return False
         
         finally:
+            self._journal_workflow(workflow)
             if workflow_id in self.running_workflows:
                 del self.running_workflows[workflow_id]
     
-    def _execute_step(self, workflow: Workflow, step: WorkflowStep) -> bool:
+    def resume_workflow(self, workflow_id: str, actions: Optional[Dict[str, Callable]] = None,
+                        max_concurrency: Optional[int] = None) -> bool:
         """
-        Выполнить шаг
+        Возобновить рабочий процесс по журналу
+        
+        Шаги, выполненные ранее с теми же входными данными, не запускаются:
+        их выход берется из журнала. Если процесс не зарегистрирован в этом
+        экземпляре движка (например, после перезапуска), он восстанавливается
+        из журнала, а действия всех невыполненных шагов нужно передать через
+        actions - функции в журнал не сохраняются.
         
         Args:
-            workflow: Рабочий процесс
-            step: Шаг
+            workflow_id: ID рабочего процесса
+            actions: Действия шагов по ID (дополняют или заменяют действия
+                зарегистрированного процесса)
+            max_concurrency: Ограничение параллелизма (по умолчанию из движка)
             
         Returns:
             bool: Успешность выполнения
         """
-        step.status = StepStatus.RUNNING
-        step.started_at = datetime.now()
+        if self.journal is None:
+            self.logger.error("Возобновление невозможно: журнал не настроен")
+            return False
+        
+        saved = self.journal.load_workflow(workflow_id)
+        workflow = self.workflows.get(workflow_id)
+        if workflow is None:
+            if saved is None:
+                self.logger.error(f"Рабочий процесс не найден: {workflow_id}")
+                return False
+            workflow = self._restore_workflow(saved)
+            self.workflows[workflow_id] = workflow
+        
+        actions = actions or {}
+        saved_steps = {step['step_id']: step for step in (saved['steps'] if saved else [])}
+        reused = 0
+        for step in workflow.steps:
+            if step.step_id in actions:
+                step.action = actions[step.step_id]
+            record = saved_steps.get(step.step_id)
+            if (record and record['status'] == StepStatus.COMPLETED.value and record['memoized']
+                    and record['input_hash'] == input_hash(step.input_data)):
+                step.status = StepStatus.COMPLETED
+                step.output_data = record['output_data']
+                step.started_at = record['started_at']
+                step.completed_at = record['completed_at']
+                step.duration = record['duration']
+                step.retry_count = record['retry_count']
+                step.error = None
+                reused += 1
+            else:
+                self._reset_step(step)
         
         try:
-            if step.action:
-                result = step.action(step.input_data)
-                step.output_data = result or {}
+            dependencies = self._resolve_dependencies(workflow)
+        except ValueError as e:
+            workflow.state = WorkflowState.FAILED
+            self.logger.error(f"Некорректный граф шагов {workflow_id}: {e}")
+            return False
+        
+        # У восстановленного из журнала процесса действия есть только у переданных шагов
+        missing = [step.step_id for step in workflow.steps
+                   if self._restored(workflow) and step.status != StepStatus.COMPLETED
+                   and step.action is None]
+        if missing:
+            workflow.state = WorkflowState.FAILED
+            self.logger.error(f"Нет действий для шагов {missing} процесса {workflow_id}")
+            return False
+        
+        self.logger.info(f"Возобновление {workflow_id}: {reused}/{len(workflow.steps)} шагов из журнала")
+        workflow.state = WorkflowState.RUNNING
+        workflow.started_at = (saved or {}).get('started_at') or workflow.started_at or datetime.now()
+        workflow.completed_at = None
+        self.running_workflows[workflow_id] = workflow
+        return self._run_workflow(workflow, dependencies, max_concurrency)
+    
+    def _restored(self, workflow: Workflow) -> bool:
+        return workflow.workflow_id in self._restored_ids
+    
+    def _restore_workflow(self, saved: Dict[str, Any]) -> Workflow:
+        """Восстановить процесс из журнала (без действий шагов)"""
+        workflow = Workflow(saved['workflow_id'], saved['name'], saved['description'])
+        workflow.metadata = dict(saved['metadata'])
+        self._restored_ids.add(workflow.workflow_id)
+        workflow.started_at = saved['started_at']
+        for record in saved['steps']:
+            step = WorkflowStep(record['step_id'], record['name'], record['description'],
+                                input_data=record['input_data'], depends_on=record['depends_on'],
+                                max_retries=record['max_retries'])
+            if record['timeout'] is not None:
+                step.timeout = record['timeout']
+            workflow.steps.append(step)
+        return workflow
+    
+    def _journal_workflow(self, workflow: Workflow, reset: bool = False):
+        if self.journal is None:
+            return
+        try:
+            self.journal.record_workflow(workflow, reset=reset)
+        except Exception as e:
+            self.logger.error(f"Ошибка записи журнала {workflow.workflow_id}: {e}")
+    
+    def _journal_step(self, workflow: Workflow, step: WorkflowStep, event: str):
+        if self.journal is None:
+            return
+        try:
+            self.journal.record_step(workflow.workflow_id, step, event)
+        except Exception as e:
+            self.logger.error(f"Ошибка записи журнала шага {step.step_id}: {e}")
+    
+    @staticmethod
+    def _reset_step(step: WorkflowStep):
+        step.status = StepStatus.PENDING
+        step.error = None
+        step.retry_count = 0
+        step.started_at = None
+        step.completed_at = None
+        step.duration = None
+    
+    def _resolve_dependencies(self, workflow: Workflow) -> Dict[str, List[str]]:
+        """
+        Построить зависимости шагов и проверить граф
+        
+        Args:
+            workflow: Рабочий процесс
+            
+        Returns:
+            Dict: ID шага -> ID шагов, от которых он зависит
+            
+        Raises:
+            ValueError: Повторяющиеся ID, неизвестные зависимости или цикл
+        """
+        dependencies: Dict[str, List[str]] = {}
+        previous = None
+        for step in workflow.steps:
+            if step.step_id in dependencies:
+                raise ValueError(f"повторяющийся шаг {step.step_id}")
+            if step.depends_on is None:
+                dependencies[step.step_id] = [previous] if previous else []
+            else:
+                dependencies[step.step_id] = list(step.depends_on)
+            previous = step.step_id
+        
+        for step_id, deps in dependencies.items():
+            for dep in deps:
+                if dep not in dependencies:
+                    raise ValueError(f"шаг {step_id} зависит от неизвестного шага {dep}")
+        
+        if len(self._topological_order(dependencies)) != len(dependencies):
+            raise ValueError("циклическая зависимость шагов")
+        return dependencies
+    
+    @staticmethod
+    def _topological_order(dependencies: Dict[str, List[str]]) -> List[str]:
+        """Порядок Кана; при цикле возвращает неполный список"""
+        remaining = {step_id: len(set(deps)) for step_id, deps in dependencies.items()}
+        dependents = defaultdict(list)
+        for step_id, deps in dependencies.items():
+            for dep in set(deps):
+                dependents[dep].append(step_id)
+        queue = deque(step_id for step_id, count in remaining.items() if count == 0)
+        order = []
+        while queue:
+            step_id = queue.popleft()
+            order.append(step_id)
+            for dependent in dependents[step_id]:
+                remaining[dependent] -= 1
+                if remaining[dependent] == 0:
+                    queue.append(dependent)
+        return order
+    
+    def _run_graph(self, workflow: Workflow, dependencies: Dict[str, List[str]],
+                   max_concurrency: int) -> bool:
+        """
+        Выполнить шаги в порядке зависимостей с ограничением параллелизма
+        
+        Args:
+            workflow: Рабочий процесс
+            dependencies: Зависимости шагов
+            max_concurrency: Максимальное количество одновременно выполняемых шагов
             
+        Returns:
+            bool: Все шаги выполнены успешно
+        """
+        steps = {step.step_id: step for step in workflow.steps}
+        dependents = defaultdict(list)
+        waiting = {}
+        for step_id, deps in dependencies.items():
+            unique = set(deps)
+            for dep in unique:
+                dependents[dep].append(step_id)
+            waiting[step_id] = sum(1 for dep in unique if steps[dep].status != StepStatus.COMPLETED)
+        
+        ready = deque(step.step_id for step in workflow.steps
+                      if waiting[step.step_id] == 0 and step.status != StepStatus.COMPLETED)
+        delayed: List[Tuple[float, int, str]] = []
+        running: Dict[Any, Tuple[str, Optional[float], float]] = {}
+        attempts = 0
+        failed = False
+        
+        def complete(step_id: str, result: Any, attempt_started: float):
+            step = steps[step_id]
+            step.output_data = result or {}
             step.status = StepStatus.COMPLETED
             step.completed_at = datetime.now()
-            self.logger.info(f"Шаг выполнен: {step.step_id}")
-            return True
+            step.duration = (step.duration or 0.0) + time.monotonic() - attempt_started
+            self._journal_step(workflow, step, 'completed')
+            self.logger.info(f"Шаг выполнен: {step_id}")
+            for dependent in dependents[step_id]:
+                waiting[dependent] -= 1
+                if waiting[dependent] == 0:
+                    ready.append(dependent)
         
-        except Exception as e:
-            step.error = str(e)
-            
+        def attempt_failed(step_id: str, error: Exception, attempt_started: float) -> bool:
+            step = steps[step_id]
+            step.error = str(error)
+            step.duration = (step.duration or 0.0) + time.monotonic() - attempt_started
             if step.retry_count < step.max_retries:
                 step.retry_count += 1
-                self.logger.warning(f"Повтор шага {step.step_id} ({step.retry_count}/{step.max_retries})")
-                return self._execute_step(workflow, step)
-            
+                delay = RetryConfig(initial_delay=step.retry_delay, max_delay=step.max_retry_delay,
+                                    strategy=RetryStrategy.EXPONENTIAL).get_delay(step.retry_count - 1)
+                self.logger.warning(f"Повтор шага {step_id} ({step.retry_count}/{step.max_retries}) "
+                                    f"через {delay:.2f} с")
+                heapq.heappush(delayed, (time.monotonic() + delay, attempts, step_id))
+                self._journal_step(workflow, step, 'retry')
+                return False
             step.status = StepStatus.FAILED
-            self.logger.error(f"Ошибка выполнения шага: {step.step_id} - {e}")
-            return False
+            self._journal_step(workflow, step, 'failed')
+            self.logger.error(f"Ошибка выполнения шага: {step_id} - {error}")
+            return True
+        
+        # Попытки, снятые по таймауту, но еще выполняющиеся в своих потоках
+        abandoned: Dict[Future, str] = {}
+        # Повторы, ожидающие завершения такой попытки, и срок ожидания
+        held: Dict[str, float] = {}
+        
+        while ready or delayed or running or held:
+            if failed or workflow.state != WorkflowState.RUNNING:
+                # Новые шаги не запускаются, дожидаемся выполняющихся
+                ready.clear()
+                delayed.clear()
+                held.clear()
+                if not running:
+                    break
+            
+            now = time.monotonic()
+            while delayed and delayed[0][0] <= now:
+                step_id = heapq.heappop(delayed)[2]
+                if step_id in abandoned.values():
+                    # Повтор не должен выполняться одновременно с прежней попыткой
+                    held[step_id] = now + steps[step_id].timeout
+                else:
+                    ready.append(step_id)
+            
+            while ready and len(running) < max_concurrency:
+                step_id = ready.popleft()
+                step = steps[step_id]
+                step.status = StepStatus.RUNNING
+                if step.started_at is None:
+                    step.started_at = datetime.now()
+                    self._journal_step(workflow, step, 'started')
+                attempts += 1
+                if step.action is None:
+                    complete(step_id, step.output_data, time.monotonic())
+                    continue
+                future, started = self._start_attempt(workflow, step)
+                deadline = started + step.timeout if step.timeout else None
+                running[future] = (step_id, deadline, started)
+            
+            for step_id, give_up in list(held.items()):
+                if time.monotonic() >= give_up:
+                    del held[step_id]
+                    error = TimeoutError(f"таймаут шага {steps[step_id].timeout} с: "
+                                         f"предыдущая попытка не завершилась")
+                    failed = attempt_failed(step_id, error, time.monotonic()) or failed
+            
+            if not running and not held:
+                if delayed:
+                    time.sleep(max(0.0, delayed[0][0] - time.monotonic()))
+                continue
+            
+            # Ждем завершения попытки, ближайшего таймаута или повтора
+            wake_times = [deadline for _, deadline, _ in running.values() if deadline is not None]
+            wake_times += held.values()
+            if delayed and len(running) < max_concurrency:
+                wake_times.append(delayed[0][0])
+            timeout = max(0.0, min(wake_times) - time.monotonic()) if wake_times else None
+            done, _ = wait(list(running) + list(abandoned), timeout=timeout, return_when=FIRST_COMPLETED)
+            
+            for future in done:
+                if future in abandoned:
+                    step_id = abandoned.pop(future)
+                    if step_id in held:
+                        del held[step_id]
+                        ready.append(step_id)
+                    continue
+                step_id, _, started = running.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    failed = attempt_failed(step_id, e, started) or failed
+                else:
+                    complete(step_id, result, started)
+            
+            now = time.monotonic()
+            for future, (step_id, deadline, started) in list(running.items()):
+                if deadline is not None and now >= deadline:
+                    # Поток нельзя прервать: результат попытки будет отброшен
+                    del running[future]
+                    abandoned[future] = step_id
+                    error = TimeoutError(f"таймаут шага {steps[step_id].timeout} с")
+                    failed = attempt_failed(step_id, error, started) or failed
+        
+        if failed or workflow.state == WorkflowState.CANCELLED:
+            for step in workflow.steps:
+                if step.status in (StepStatus.PENDING, StepStatus.RUNNING):
+                    step.status = StepStatus.SKIPPED
+                    self._journal_step(workflow, step, 'skipped')
+        elif workflow.state == WorkflowState.PAUSED:
+            for step in workflow.steps:
+                if step.status == StepStatus.RUNNING:
+                    step.status = StepStatus.PENDING
+        
+        return not failed and all(step.status == StepStatus.COMPLETED for step in workflow.steps)
+    
+    @staticmethod
+    def _start_attempt(workflow: Workflow, step: WorkflowStep) -> Tuple[Future, float]:
+        """
+        Запустить попытку шага в отдельном потоке
+        
+        Args:
+            workflow: Рабочий процесс
+            step: Шаг
+            
+        Returns:
+            Tuple[Future, float]: Результат попытки и момент начала действия
+        """
+        future = Future()
+        begun = threading.Event()
+        clock = []
+        
+        def run():
+            clock.append(time.monotonic())
+            begun.set()
+            try:
+                result = step.action(step.input_data)
+            except BaseException as e:
+                future.set_exception(e)
+            else:
+                future.set_result(result)
+        
+        threading.Thread(target=run, name=f"workflow-{workflow.workflow_id}-{step.step_id}",
+                         daemon=True).start()
+        begun.wait()
+        return future, clock[0]
     
     def pause_workflow(self, workflow_id: str) -> bool:
         """
@@ -255,6 +640,11 @@ class WorkflowEngine:
             return None
         
         workflow = self.workflows[workflow_id]
+        critical_path, critical_duration = self._critical_path(workflow)
+        
+        duration = None
+        if workflow.started_at:
+            duration = ((workflow.completed_at or datetime.now()) - workflow.started_at).total_seconds()
         
         return {
             'workflow_id': workflow.workflow_id,
@@ -262,29 +652,80 @@ class WorkflowEngine:
             'state': workflow.state.value,
             'steps': len(workflow.steps),
             'completed_steps': sum(1 for s in workflow.steps if s.status == StepStatus.COMPLETED),
-            'failed_steps': sum(1 for s in workflow.steps if s.status == StepStatus.FAILED)
+            'failed_steps': sum(1 for s in workflow.steps if s.status == StepStatus.FAILED),
+            'duration': duration,
+            'total_step_time': sum(s.duration or 0.0 for s in workflow.steps),
+            'critical_path': critical_path,
+            'critical_path_duration': critical_duration
         }
+    
+    def _critical_path(self, workflow: Workflow) -> Tuple[List[str], float]:
+        """
+        Самая длинная по времени цепочка зависимых шагов
+        
+        Args:
+            workflow: Рабочий процесс
+            
+        Returns:
+            Tuple: ID шагов цепочки и ее суммарная длительность в секундах
+        """
+        try:
+            dependencies = self._resolve_dependencies(workflow)
+        except ValueError:
+            return [], 0.0
+        
+        steps = {step.step_id: step for step in workflow.steps}
+        finish: Dict[str, float] = {}
+        parent: Dict[str, Optional[str]] = {}
+        for step_id in self._topological_order(dependencies):
+            best = max(dependencies[step_id], key=lambda dep: finish[dep], default=None)
+            parent[step_id] = best
+            finish[step_id] = (finish[best] if best else 0.0) + (steps[step_id].duration or 0.0)
+        
+        if not finish:
+            return [], 0.0
+        
+        end = max(finish, key=finish.get)
+        path = []
+        node: Optional[str] = end
+        while node is not None:
+            path.append(node)
+            node = parent[node]
+        return list(reversed(path)), finish[end]
 
 
 class LogicEngine:
-    """Движок логики"""
+    """Движок логики
+    
+    Правила компилируются в RuleNetwork: одинаковые проверки ключей общие
+    для всех правил, а при изменении контекста пересчитываются только
+    условия, читающие измененные ключи.
+    """
     
     def __init__(self):
         """Инициализация"""
         self.logger = logging.getLogger('daur_ai.logic_engine')
         self.rules: Dict[str, LogicRule] = {}
+        self.network = RuleNetwork()
+        self._memory = RuleMemory()
+        self.last_fired: List[str] = []
     
     def add_rule(self, rule: LogicRule) -> bool:
         """
         Добавить правило
         
         Args:
-            rule: Правило
+            rule: Правило (условие - функция от контекста или when(...) & when(...))
             
         Returns:
             bool: Успешность операции
         """
+        previous = self.network.node(rule.rule_id)
+        if previous:
+            self.network.detach(self._memory, previous)
         self.rules[rule.rule_id] = rule
+        node = self.network.add(rule.rule_id, rule.condition, rule.priority)
+        self.network.attach(self._memory, node)
         self.logger.info(f"Правило добавлено: {rule.rule_id}")
         return True
     
@@ -300,11 +741,90 @@ class LogicEngine:
         """
         if rule_id in self.rules:
             del self.rules[rule_id]
+            node = self.network.remove(rule_id)
+            if node:
+                self.network.detach(self._memory, node)
             self.logger.info(f"Правило удалено: {rule_id}")
             return True
         
         return False
     
+    def _fire(self, memory: RuleMemory, candidates, result: Dict[str, Any],
+              ordered: bool, lazy: Optional[List[Any]] = None) -> Dict[str, Any]:
+        """
+        Выполнить действия активных правил в порядке приоритета
+        
+        Изменения контекста, сделанные действием, распространяются по сети,
+        и затронутые правила попадают в очередь. Каждое правило срабатывает
+        не больше одного раза; при ordered=True правило с более высоким
+        приоритетом, ставшее активным позже, не срабатывает (как при
+        последовательном проходе по отсортированным правилам).
+        
+        Args:
+            memory: Рабочая память сети
+            candidates: Активные правила
+            result: Контекст, передаваемый действиям
+            ordered: Однократный проход в порядке приоритета
+            lazy: Правила с функциями-условиями (в порядке срабатывания),
+                условие которых проверяется в момент их очереди
+        """
+        result = RecordingDict(result)
+        is_active = self.network.is_active
+        agenda = [(node.sort_key, node) for node in candidates if is_active(memory, node)]
+        heapq.heapify(agenda)
+        rules = self.rules
+        pending = iter(lazy or ())
+        waiting = next(pending, None)
+        fired = set()
+        cursor = None
+        self.last_fired = []
+        
+        while agenda or waiting is not None:
+            if waiting is not None and (not agenda or waiting.sort_key < agenda[0][0]):
+                node = waiting
+                waiting = next(pending, None)
+                key = node.sort_key
+                rule = rules.get(node.rule_id)
+                if rule is None or not rule.enabled:
+                    continue
+                try:
+                    if not node.function(result):
+                        continue
+                except Exception as e:
+                    self.logger.error(f"Ошибка применения правила {rule.rule_id}: {e}")
+                    continue
+            else:
+                key, node = heapq.heappop(agenda)
+                if node in fired or (ordered and cursor is not None and key <= cursor):
+                    continue
+                if not is_active(memory, node):
+                    continue
+                rule = rules.get(node.rule_id)
+                if rule is None or not rule.enabled:
+                    continue
+            
+            fired.add(node)
+            cursor = key
+            try:
+                updated = rule.action(result)
+                self.last_fired.append(rule.rule_id)
+                self.logger.info(f"Правило применено: {rule.rule_id}")
+            except Exception as e:
+                self.logger.error(f"Ошибка применения правила {rule.rule_id}: {e}")
+                updated = result
+            
+            if updated is result or updated is None:
+                changes = result.take_changes()
+            else:
+                # Действие вернуло новый словарь: сравниваем с текущим контекстом
+                changes = context_changes(memory.context, updated)
+                result = RecordingDict(updated)
+            for affected in self.network.propagate(memory, changes):
+                if affected not in fired:
+                    heapq.heappush(agenda, (affected.sort_key, affected))
+        
+        return dict(result)
+    
     def evaluate(self, context: Dict[str, Any]) -> Dict[str, Any]:
         """
         Оценить контекст с применением правил
@@ -315,36 +835,55 @@ class LogicEngine:
         Returns:
             Dict: Результат оценки
         """
-        result = context.copy()
+        # Функции-условия проверяются в свою очередь, как при полном проходе
+        memory, candidates = self.network.memory(context, track_dynamic=False)
+        return self._fire(memory, candidates, dict(context), ordered=True,
+                          lazy=self.network.dynamic_nodes())
+    
+    def update_context(self, delta: Dict[str, Any], removed: Iterable[str] = ()) -> Dict[str, Any]:
+        """
+        Инкрементально изменить рабочий контекст и применить затронутые правила
         
-        # Сортируем правила по приоритету
-        sorted_rules = sorted(
-            [r for r in self.rules.values() if r.enabled],
-            key=lambda r: r.priority,
-            reverse=True
-        )
+        Срабатывают только активные правила, условия которых читают
+        измененные ключи (в том числе ключи, измененные действиями правил).
         
-        for rule in sorted_rules:
-            try:
-                if rule.condition(result):
-                    result = rule.action(result)
-                    self.logger.info(f"Правило применено: {rule.rule_id}")
+        Args:
+            delta: Новые значения ключей
+            removed: Удаляемые ключи
             
-            except Exception as e:
-                self.logger.error(f"Ошибка применения правила {rule.rule_id}: {e}")
-        
-        return result
+        Returns:
+            Dict: Рабочий контекст после применения правил
+        """
+        changes = dict(delta)
+        for key in removed:
+            changes[key] = MISSING
+        affected = self.network.propagate(self._memory, changes)
+        return self._fire(self._memory, affected, dict(self._memory.context), ordered=False)
+    
+    def reset_context(self, context: Optional[Dict[str, Any]] = None):
+        """Заменить рабочий контекст без применения правил"""
+        self._memory, _ = self.network.memory(context or {})
+    
+    @property
+    def context(self) -> Dict[str, Any]:
+        """Копия рабочего контекста"""
+        return dict(self._memory.context)
     
     def get_status(self) -> Dict[str, Any]:
         """Получить статус движка"""
         return {
             'rules': len(self.rules),
-            'enabled_rules': sum(1 for r in self.rules.values() if r.enabled)
+            'enabled_rules': sum(1 for r in self.rules.values() if r.enabled),
+            'shared_conditions': self.network.alpha_count
         }
 
 
 class AutomationEngine:
-    """Движок автоматизации"""
+    """Движок автоматизации
+    
+    Триггеры автоматизаций компилируются в RuleNetwork так же, как
+    условия LogicEngine.
+    """
     
     def __init__(self):
         """Инициализация"""
@@ -352,6 +891,8 @@ class AutomationEngine:
         self.workflow_engine = WorkflowEngine()
         self.logic_engine = LogicEngine()
         self.automations: Dict[str, Dict[str, Any]] = {}
+        self.network = RuleNetwork()
+        self._memory = RuleMemory()
     
     def create_automation(self, automation_id: str, name: str,
                         trigger: Callable, action: Callable) -> bool:
@@ -361,7 +902,7 @@ class AutomationEngine:
         Args:
             automation_id: ID автоматизации
             name: Имя
-            trigger: Функция триггера
+            trigger: Функция триггера или when(...) & when(...)
             action: Функция действия
             
         Returns:
@@ -374,37 +915,83 @@ class AutomationEngine:
             'enabled': True,
             'created_at': datetime.now()
         }
+        previous = self.network.node(automation_id)
+        if previous:
+            self.network.detach(self._memory, previous)
+        node = self.network.add(automation_id, trigger)
+        self.network.attach(self._memory, node)
         
         self.logger.info(f"Автоматизация создана: {automation_id}")
         return True
     
-    def check_automations(self, context: Dict[str, Any]) -> List[Tuple[str, Any]]:
+    def remove_automation(self, automation_id: str) -> bool:
         """
-        Проверить автоматизации
+        Удалить автоматизацию
         
         Args:
-            context: Контекст
+            automation_id: ID автоматизации
             
         Returns:
-            List: Список активированных автоматизаций и результатов
+            bool: Успешность операции
         """
+        if automation_id not in self.automations:
+            return False
+        del self.automations[automation_id]
+        node = self.network.remove(automation_id)
+        if node:
+            self.network.detach(self._memory, node)
+        return True
+    
+    def _run_actions(self, memory: RuleMemory, nodes) -> List[Tuple[str, Any]]:
         results = []
-        
-        for automation_id, automation in self.automations.items():
-            if not automation['enabled']:
+        for node in sorted_nodes(nodes):
+            automation = self.automations.get(node.rule_id)
+            if automation is None or not automation['enabled']:
+                continue
+            if not self.network.is_active(memory, node):
                 continue
             
             try:
-                if automation['trigger'](context):
-                    result = automation['action'](context)
-                    results.append((automation_id, result))
-                    self.logger.info(f"Автоматизация активирована: {automation_id}")
+                result = automation['action'](dict(memory.context))
+                results.append((node.rule_id, result))
+                self.logger.info(f"Автоматизация активирована: {node.rule_id}")
             
             except Exception as e:
-                self.logger.error(f"Ошибка автоматизации {automation_id}: {e}")
+                self.logger.error(f"Ошибка автоматизации {node.rule_id}: {e}")
         
         return results
     
+    def check_automations(self, context: Dict[str, Any]) -> List[Tuple[str, Any]]:
+        """
+        Проверить автоматизации
+        
+        Args:
+            context: Контекст
+            
+        Returns:
+            List: Список активированных автоматизаций и результатов
+        """
+        memory, candidates = self.network.memory(context)
+        return self._run_actions(memory, candidates)
+    
+    def update_context(self, delta: Dict[str, Any],
+                       removed: Iterable[str] = ()) -> List[Tuple[str, Any]]:
+        """
+        Инкрементально изменить контекст и запустить затронутые автоматизации
+        
+        Args:
+            delta: Новые значения ключей
+            removed: Удаляемые ключи
+            
+        Returns:
+            List: Активированные автоматизации и их результаты
+        """
+        changes = dict(delta)
+        for key in removed:
+            changes[key] = MISSING
+        affected = self.network.propagate(self._memory, changes)
+        return self._run_actions(self._memory, affected)
+    
     def get_status(self) -> Dict[str, Any]:
         """Получить статус движка"""
         return {
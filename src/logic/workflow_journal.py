@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Daur-AI: Журнал выполнения рабочих процессов
+Устойчивое к сбоям хранение состояния шагов в SQLite
+
+Каждое изменение шага записывается в append-only таблицу событий и в
+таблицу текущего состояния шагов. Выход выполненного шага сохраняется
+вместе с хешем его входа, поэтому после перезапуска WorkflowEngine
+resume_workflow пропускает выполненные шаги и подставляет их результаты.
+"""
+
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+SCHEMA = (
+    '''CREATE TABLE IF NOT EXISTS workflows (
+        workflow_id TEXT PRIMARY KEY,
+        name TEXT NOT NULL,
+        description TEXT,
+        state TEXT NOT NULL,
+        metadata TEXT,
+        started_at TEXT,
+        completed_at TEXT,
+        updated_at TEXT NOT NULL
+    )''',
+    '''CREATE TABLE IF NOT EXISTS workflow_steps (
+        workflow_id TEXT NOT NULL,
+        step_id TEXT NOT NULL,
+        position INTEGER NOT NULL,
+        name TEXT NOT NULL,
+        description TEXT,
+        depends_on TEXT,
+        input_data TEXT,
+        input_hash TEXT,
+        status TEXT NOT NULL,
+        output_data TEXT,
+        memoized INTEGER NOT NULL DEFAULT 0,
+        error TEXT,
+        retry_count INTEGER NOT NULL DEFAULT 0,
+        max_retries INTEGER NOT NULL DEFAULT 3,
+        timeout REAL,
+        started_at TEXT,
+        completed_at TEXT,
+        duration REAL,
+        PRIMARY KEY (workflow_id, step_id)
+    )''',
+    '''CREATE TABLE IF NOT EXISTS workflow_events (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        workflow_id TEXT NOT NULL,
+        step_id TEXT,
+        event TEXT NOT NULL,
+        payload TEXT,
+        created_at TEXT NOT NULL
+    )''',
+    'CREATE INDEX IF NOT EXISTS idx_workflow_events ON workflow_events (workflow_id, id)',
+)
+
+
+def _isoformat(value: Optional[datetime]) -> Optional[str]:
+    return value.isoformat() if value else None
+
+
+def _parse_datetime(value: Optional[str]) -> Optional[datetime]:
+    return datetime.fromisoformat(value) if value else None
+
+
+def input_hash(data: Any) -> str:
+    """Хеш входных данных шага для проверки актуальности сохраненного выхода"""
+    encoded = json.dumps(data, sort_keys=True, default=repr, ensure_ascii=False)
+    return hashlib.sha256(encoded.encode('utf-8')).hexdigest()
+
+
+class WorkflowJournal:
+    """Журнал шагов рабочих процессов в SQLite"""
+
+    def __init__(self, db_path: str = 'workflows.db'):
+        """
+        Args:
+            db_path: Путь к файлу базы данных (':memory:' - без сохранения на диск)
+        """
+        self.db_path = db_path
+        self.logger = logging.getLogger('daur_ai.workflow_journal')
+        self.lock = threading.RLock()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        if db_path != ':memory:':
+            self.conn.execute('PRAGMA journal_mode = WAL')
+        self.conn.execute('PRAGMA synchronous = NORMAL')
+        with self.conn:
+            for statement in SCHEMA:
+                self.conn.execute(statement)
+
+    def _event(self, workflow_id: str, step_id: Optional[str], event: str,
+               payload: Optional[Dict[str, Any]] = None):
+        self.conn.execute(
+            'INSERT INTO workflow_events (workflow_id, step_id, event, payload, created_at) '
+            'VALUES (?, ?, ?, ?, ?)',
+            (workflow_id, step_id, event,
+             json.dumps(payload, default=repr, ensure_ascii=False) if payload else None,
+             datetime.now().isoformat())
+        )
+
+    def record_workflow(self, workflow, event: Optional[str] = None, reset: bool = False):
+        """
+        Сохранить рабочий процесс и определения его шагов
+
+        Args:
+            workflow: Рабочий процесс
+            event: Имя события для журнала (по умолчанию состояние процесса)
+            reset: Сбросить сохраненные результаты шагов (новый запуск процесса)
+        """
+        with self.lock, self.conn:
+            self.conn.execute(
+                '''INSERT INTO workflows (workflow_id, name, description, state, metadata,
+                                          started_at, completed_at, updated_at)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                   ON CONFLICT(workflow_id) DO UPDATE SET
+                       name = excluded.name, description = excluded.description,
+                       state = excluded.state, metadata = excluded.metadata,
+                       started_at = excluded.started_at, completed_at = excluded.completed_at,
+                       updated_at = excluded.updated_at''',
+                (workflow.workflow_id, workflow.name, workflow.description, workflow.state.value,
+                 json.dumps(workflow.metadata, default=repr, ensure_ascii=False),
+                 _isoformat(workflow.started_at), _isoformat(workflow.completed_at),
+                 datetime.now().isoformat())
+            )
+            for position, step in enumerate(workflow.steps):
+                # Определение шага обновляется, сохраненный результат не трогаем
+                self.conn.execute(
+                    '''INSERT INTO workflow_steps (workflow_id, step_id, position, name, description,
+                                                   depends_on, input_data, input_hash, status,
+                                                   max_retries, timeout)
+                       VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                       ON CONFLICT(workflow_id, step_id) DO UPDATE SET
+                           position = excluded.position, name = excluded.name,
+                           description = excluded.description, depends_on = excluded.depends_on,
+                           max_retries = excluded.max_retries, timeout = excluded.timeout''',
+                    (workflow.workflow_id, step.step_id, position, step.name, step.description,
+                     json.dumps(step.depends_on), json.dumps(step.input_data, default=repr, ensure_ascii=False),
+                     input_hash(step.input_data), step.status.value, step.max_retries, step.timeout)
+                )
+            if reset:
+                self.conn.execute(
+                    '''UPDATE workflow_steps SET status = 'pending', output_data = NULL, memoized = 0,
+                           error = NULL, retry_count = 0, started_at = NULL, completed_at = NULL,
+                           duration = NULL
+                       WHERE workflow_id = ?''', (workflow.workflow_id,)
+                )
+            self._event(workflow.workflow_id, None, event or workflow.state.value)
+
+    def record_step(self, workflow_id: str, step, event: str):
+        """
+        Записать изменение состояния шага
+
+        Args:
+            workflow_id: ID рабочего процесса
+            step: Шаг
+            event: Событие (started, completed, retry, failed, skipped)
+        """
+        output, memoized = None, 0
+        if event == 'completed':
+            try:
+                output = json.dumps(step.output_data, ensure_ascii=False)
+                memoized = 1
+            except (TypeError, ValueError):
+                # Несериализуемый результат не кешируется: шаг повторится при возобновлении
+                self.logger.warning(f"Результат шага {step.step_id} не сериализуется в JSON")
+
+        with self.lock, self.conn:
+            self.conn.execute(
+                '''UPDATE workflow_steps SET status = ?, input_data = ?, input_hash = ?,
+                       output_data = ?, memoized = ?, error = ?, retry_count = ?,
+                       started_at = ?, completed_at = ?, duration = ?
+                   WHERE workflow_id = ? AND step_id = ?''',
+                (step.status.value, json.dumps(step.input_data, default=repr, ensure_ascii=False),
+                 input_hash(step.input_data), output, memoized, step.error, step.retry_count,
+                 _isoformat(step.started_at), _isoformat(step.completed_at), step.duration,
+                 workflow_id, step.step_id)
+            )
+            self._event(workflow_id, step.step_id, event,
+                        {'error': step.error, 'retry_count': step.retry_count} if step.error else None)
+
+    def load_workflow(self, workflow_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Прочитать сохраненный рабочий процесс
+
+        Args:
+            workflow_id: ID рабочего процесса
+
+        Returns:
+            Optional[Dict]: Поля процесса и список шагов в исходном порядке
+        """
+        with self.lock:
+            row = self.conn.execute('SELECT * FROM workflows WHERE workflow_id = ?',
+                                    (workflow_id,)).fetchone()
+            if row is None:
+                return None
+            steps = self.conn.execute(
+                'SELECT * FROM workflow_steps WHERE workflow_id = ? ORDER BY position',
+                (workflow_id,)
+            ).fetchall()
+
+        return {
+            'workflow_id': row['workflow_id'],
+            'name': row['name'],
+            'description': row['description'] or "",
+            'state': row['state'],
+            'metadata': json.loads(row['metadata']) if row['metadata'] else {},
+            'started_at': _parse_datetime(row['started_at']),
+            'completed_at': _parse_datetime(row['completed_at']),
+            'steps': [self._step_row(step) for step in steps]
+        }
+
+    @staticmethod
+    def _step_row(row: sqlite3.Row) -> Dict[str, Any]:
+        return {
+            'step_id': row['step_id'],
+            'name': row['name'],
+            'description': row['description'] or "",
+            'depends_on': json.loads(row['depends_on']) if row['depends_on'] else None,
+            'input_data': json.loads(row['input_data']) if row['input_data'] else {},
+            'input_hash': row['input_hash'],
+            'status': row['status'],
+            'output_data': json.loads(row['output_data']) if row['output_data'] else {},
+            'memoized': bool(row['memoized']),
+            'error': row['error'],
+            'retry_count': row['retry_count'],
+            'max_retries': row['max_retries'],
+            'timeout': row['timeout'],
+            'started_at': _parse_datetime(row['started_at']),
+            'completed_at': _parse_datetime(row['completed_at']),
+            'duration': row['duration']
+        }
+
+    def get_events(self, workflow_id: str) -> List[Dict[str, Any]]:
+        """Журнал событий рабочего процесса в порядке записи"""
+        with self.lock:
+            rows = self.conn.execute(
+                'SELECT step_id, event, payload, created_at FROM workflow_events '
+                'WHERE workflow_id = ? ORDER BY id', (workflow_id,)
+            ).fetchall()
+        return [
+            {
+                'step_id': row['step_id'],
+                'event': row['event'],
+                'payload': json.loads(row['payload']) if row['payload'] else None,
+                'created_at': row['created_at']
+            }
+            for row in rows
+        ]
+
+    def list_workflows(self, state: Optional[str] = None) -> List[str]:
+        """ID сохраненных рабочих процессов (например, незавершенных: state='running')"""
+        with self.lock:
+            if state is None:
+                rows = self.conn.execute('SELECT workflow_id FROM workflows ORDER BY updated_at')
+            else:
+                rows = self.conn.execute('SELECT workflow_id FROM workflows WHERE state = ? '
+                                         'ORDER BY updated_at', (state,))
+            return [row['workflow_id'] for row in rows.fetchall()]
+
+    def delete_workflow(self, workflow_id: str):
+        with self.lock, self.conn:
+            for table in ('workflows', 'workflow_steps', 'workflow_events'):
+                self.conn.execute(f'DELETE FROM {table} WHERE workflow_id = ?', (workflow_id,))
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
@@ -22,17 +22,29 @@ from collections import deque, defaultdict
 import psutil
 from pathlib import Path
 
+from src.monitoring.streaming_stats import (
+    DEFAULT_QUANTILES, StreamingStats, WindowedStats, quantile_label
+)
+
 
 class MetricsCollector:
     """Сборщик метрик производительности"""
     
-    def __init__(self, max_samples: int = 1000):
+    def __init__(self, max_samples: int = 1000, window: float = 300.0,
+                 quantiles: Tuple[float, ...] = DEFAULT_QUANTILES):
         """
         Args:
             max_samples: Максимальное количество сохраняемых образцов
+            window: Размер скользящего окна статистики в секундах
+            quantiles: Квантили, включаемые в статистику
         """
         self.max_samples = max_samples
+        self.window = window
+        self.quantiles = quantiles
         self.metrics = defaultdict(lambda: deque(maxlen=max_samples))
+        # Агрегаты за все время и за окно: память не зависит от числа образцов
+        self.stats: Dict[str, StreamingStats] = defaultdict(StreamingStats)
+        self.windows: Dict[str, WindowedStats] = defaultdict(lambda: WindowedStats(window))
         self.lock = threading.RLock()
     
     def record(self, metric_name: str, value: float, timestamp: Optional[float] = None):
@@ -52,6 +64,8 @@ class MetricsCollector:
                 'value': value,
                 'timestamp': timestamp
             })
+            self.stats[metric_name].add(value, timestamp)
+            self.windows[metric_name].add(value, timestamp)
     
     def get_stats(self, metric_name: str) -> Dict[str, Any]:
         """
@@ -61,10 +75,11 @@ class MetricsCollector:
             metric_name: Имя метрики
             
         Returns:
-            Dict: Статистика (min, max, avg, count)
+            Dict: Статистика (min, max, avg, count, квантили p50/p95/p99,
+            частоты rate_1m/5m/15m и те же показатели за окно в 'window')
         """
         with self.lock:
-            if metric_name not in self.metrics or len(self.metrics[metric_name]) == 0:
+            if metric_name not in self.stats or self.stats[metric_name].count == 0:
                 return {
                     'count': 0,
                     'min': None,
@@ -72,27 +87,62 @@ class MetricsCollector:
                     'avg': None
                 }
             
-            values = [m['value'] for m in self.metrics[metric_name]]
+            result = self.stats[metric_name].summary(self.quantiles)
+            result['window'] = self.windows[metric_name].summary(self.quantiles)
+            return result
+    
+    def get_quantile(self, metric_name: str, q: float) -> Optional[float]:
+        """
+        Получить квантиль метрики за все время
+        
+        Args:
+            metric_name: Имя метрики
+            q: Квантиль от 0 до 1
             
+        Returns:
+            Optional[float]: Оценка квантиля или None, если данных нет
+        """
+        with self.lock:
+            if metric_name not in self.stats:
+                return None
+            return self.stats[metric_name].sketch.quantile(q)
+    
+    def export_state(self) -> Dict[str, Any]:
+        """
+        Сериализовать агрегаты для объединения в другом процессе
+        
+        Returns:
+            Dict: JSON-совместимое состояние всех метрик
+        """
+        with self.lock:
             return {
-                'count': len(values),
-                'min': min(values),
-                'max': max(values),
-                'avg': sum(values) / len(values),
-                'latest': values[-1]
+                name: {'stats': stats.to_dict(), 'window': self.windows[name].to_dict()}
+                for name, stats in self.stats.items()
             }
     
+    def merge_state(self, state: Dict[str, Any]):
+        """
+        Объединить агрегаты другого процесса (результат export_state)
+        
+        Args:
+            state: Состояние метрик другого сборщика
+        """
+        with self.lock:
+            for name, data in state.items():
+                self.stats[name].merge(StreamingStats.from_dict(data['stats']))
+                self.windows[name].merge(WindowedStats.from_dict(data['window']))
+    
     def get_all_metrics(self) -> Dict[str, Dict[str, Any]]:
         """Получить все метрики"""
-        result = {}
-        for metric_name in self.metrics.keys():
-            result[metric_name] = self.get_stats(metric_name)
-        return result
+        with self.lock:
+            return {metric_name: self.get_stats(metric_name) for metric_name in list(self.stats)}
     
     def clear(self):
         """Очистить все метрики"""
         with self.lock:
             self.metrics.clear()
+            self.stats.clear()
+            self.windows.clear()
 
 
 class SystemMonitor:
@@ -363,11 +413,24 @@ class ErrorTracker:
 
 
 class PerformanceProfiler:
-    """Профилировщик производительности"""
+    """Профилировщик производительности
     
-    def __init__(self):
-        """Инициализация профилировщика"""
-        self.measurements = defaultdict(list)
+    Измерения не хранятся: по каждой операции ведутся потоковые агрегаты
+    (квантили, частоты) за все время и за скользящее окно.
+    """
+    
+    def __init__(self, window: float = 300.0, quantiles: Tuple[float, ...] = DEFAULT_QUANTILES):
+        """
+        Инициализация профилировщика
+        
+        Args:
+            window: Размер скользящего окна статистики в секундах
+            quantiles: Квантили длительности, включаемые в статистику
+        """
+        self.window = window
+        self.quantiles = quantiles
+        self.measurements: Dict[str, StreamingStats] = defaultdict(StreamingStats)
+        self.windows: Dict[str, WindowedStats] = defaultdict(lambda: WindowedStats(window))
         self.lock = threading.RLock()
         self.logger = logging.getLogger('daur_ai.profiler')
     
@@ -379,11 +442,10 @@ class PerformanceProfiler:
             operation_name: Имя операции
             duration: Длительность в секундах
         """
+        now = time.time()
         with self.lock:
-            self.measurements[operation_name].append({
-                'duration': duration,
-                'timestamp': time.time()
-            })
+            self.measurements[operation_name].add(duration, now)
+            self.windows[operation_name].add(duration, now)
     
     def get_performance_stats(self, operation_name: str) -> Dict[str, Any]:
         """
@@ -393,10 +455,11 @@ class PerformanceProfiler:
             operation_name: Имя операции
             
         Returns:
-            Dict: Статистика производительности
+            Dict: Статистика производительности (в том числе p50/p95/p99,
+            частота вызовов и те же показатели за окно в 'window')
         """
         with self.lock:
-            if operation_name not in self.measurements or len(self.measurements[operation_name]) == 0:
+            if operation_name not in self.measurements or self.measurements[operation_name].count == 0:
                 return {
                     'count': 0,
                     'min': None,
@@ -404,27 +467,51 @@ class PerformanceProfiler:
                     'avg': None
                 }
             
-            durations = [m['duration'] for m in self.measurements[operation_name]]
-            
-            return {
-                'count': len(durations),
-                'min': round(min(durations), 4),
-                'max': round(max(durations), 4),
-                'avg': round(sum(durations) / len(durations), 4),
-                'total': round(sum(durations), 4)
+            summary = self.measurements[operation_name].summary(self.quantiles)
+            result = {
+                'count': summary['count'],
+                'min': round(summary['min'], 4),
+                'max': round(summary['max'], 4),
+                'avg': round(summary['avg'], 4),
+                'total': round(summary['sum'], 4)
             }
+            for q in self.quantiles:
+                label = quantile_label(q)
+                result[label] = round(summary[label], 4)
+            result['rate_1m'] = round(summary['rate_1m'], 4)
+            result['window'] = self.windows[operation_name].summary(self.quantiles)
+            return result
     
     def get_all_performance_stats(self) -> Dict[str, Dict[str, Any]]:
         """Получить статистику всех операций"""
-        result = {}
-        for operation_name in self.measurements.keys():
-            result[operation_name] = self.get_performance_stats(operation_name)
-        return result
+        with self.lock:
+            return {name: self.get_performance_stats(name) for name in list(self.measurements)}
+    
+    def export_state(self) -> Dict[str, Any]:
+        """Сериализовать агрегаты для объединения в другом процессе"""
+        with self.lock:
+            return {
+                name: {'stats': stats.to_dict(), 'window': self.windows[name].to_dict()}
+                for name, stats in self.measurements.items()
+            }
+    
+    def merge_state(self, state: Dict[str, Any]):
+        """
+        Объединить агрегаты другого процесса (результат export_state)
+        
+        Args:
+            state: Состояние профилировщика другого процесса
+        """
+        with self.lock:
+            for name, data in state.items():
+                self.measurements[name].merge(StreamingStats.from_dict(data['stats']))
+                self.windows[name].merge(WindowedStats.from_dict(data['window']))
     
     def clear(self):
         """Очистить все измерения"""
         with self.lock:
             self.measurements.clear()
+            self.windows.clear()
 
 
 class MonitoringDashboard:
@@ -0,0 +1,388 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Daur-AI: Реестр метрик в формате Prometheus
+Счетчики, датчики и гистограммы с наборами меток
+
+Текст каждой серии кодируется заранее и перестраивается только при
+изменении значения, поэтому сбор метрик не собирает экспозицию заново.
+Поддерживаются текстовый формат Prometheus 0.0.4 и OpenMetrics 1.0.0,
+а также сжатие gzip по заголовкам Accept и Accept-Encoding.
+"""
+
+import bisect
+import gzip
+import logging
+import math
+import threading
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+OPENMETRICS_CONTENT_TYPE = 'application/openmetrics-text; version=1.0.0; charset=utf-8'
+
+# Границы корзин по умолчанию для задержек в секундах
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def format_value(value: float) -> str:
+    """Значение сэмпла в формате экспозиции"""
+    if isinstance(value, bool):
+        return '1' if value else '0'
+    if isinstance(value, int):
+        return str(value)
+    if math.isnan(value):
+        return 'NaN'
+    if math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    return repr(float(value))
+
+
+def _escape_label(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _escape_help(text: str) -> str:
+    return text.replace('\\', '\\\\').replace('\n', '\\n')
+
+
+def _label_block(names: Sequence[str], values: Sequence[str], extra: str = '') -> str:
+    pairs = [f'{name}="{_escape_label(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class _Series:
+    """Серия с заранее закодированным префиксом и кешем строки"""
+
+    __slots__ = ('prefix', 'value', '_line')
+
+    def __init__(self, prefix: str, value: float = 0):
+        self.prefix = prefix
+        self.value = value
+        self._line: Optional[str] = None
+
+    def line(self) -> str:
+        if self._line is None:
+            self._line = self.prefix + format_value(self.value) + '\n'
+        return self._line
+
+
+class _HistogramSeries:
+    """Серия гистограммы: счетчики по корзинам, сумма и количество"""
+
+    __slots__ = ('prefixes', 'counts', 'sum', 'count', '_lines')
+
+    def __init__(self, prefixes: List[str], buckets: int):
+        self.prefixes = prefixes
+        self.counts = [0] * buckets
+        self.sum = 0.0
+        self.count = 0
+        self._lines: Optional[str] = None
+
+    def line(self) -> str:
+        if self._lines is None:
+            parts = []
+            cumulative = 0
+            for prefix, count in zip(self.prefixes, self.counts):
+                cumulative += count
+                parts.append(prefix + str(cumulative) + '\n')
+            parts.append(self.prefixes[-2] + format_value(self.sum) + '\n')
+            parts.append(self.prefixes[-1] + str(self.count) + '\n')
+            self._lines = ''.join(parts)
+        return self._lines
+
+
+class MetricFamily:
+    """Базовый класс семейства метрик с общим именем, описанием и метками"""
+
+    metric_type = 'untyped'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        """
+        Args:
+            name: Имя метрики
+            documentation: Описание для строки HELP
+            labelnames: Имена меток серий
+        """
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.lock = threading.Lock()
+        self._series: Dict[Tuple[str, ...], object] = {}
+        self._dirty = True
+        self._block: Dict[bool, str] = {}
+
+    # Имя серии и имя в заголовке могут отличаться (например, _total у счетчиков)
+    def _header_name(self, openmetrics: bool) -> str:
+        return self.name
+
+    def _sample_name(self) -> str:
+        return self.name
+
+    def _label_values(self, labels: Tuple, kwargs: Dict) -> Tuple[str, ...]:
+        if kwargs:
+            labels = tuple(kwargs[name] for name in self.labelnames)
+        if len(labels) != len(self.labelnames):
+            raise ValueError(f"{self.name}: expected labels {self.labelnames}, got {labels}")
+        return tuple(str(value) for value in labels)
+
+    def _new_series(self, values: Tuple[str, ...]):
+        prefix = self._sample_name() + _label_block(self.labelnames, values) + ' '
+        return _Series(prefix)
+
+    def _get(self, labels: Tuple, kwargs: Dict):
+        values = self._label_values(labels, kwargs)
+        series = self._series.get(values)
+        if series is None:
+            series = self._series[values] = self._new_series(values)
+            self._dirty = True
+        return series
+
+    def remove(self, *labels, **kwargs) -> None:
+        """Удалить серию с указанными метками"""
+        values = self._label_values(labels, kwargs)
+        with self.lock:
+            if self._series.pop(values, None) is not None:
+                self._dirty = True
+
+    def clear(self) -> None:
+        with self.lock:
+            self._series.clear()
+            self._dirty = True
+
+    def label_sets(self) -> List[Tuple[str, ...]]:
+        with self.lock:
+            return list(self._series)
+
+    def render(self, openmetrics: bool = False) -> str:
+        """Текст семейства; пересобирается только после изменений"""
+        with self.lock:
+            if self._dirty:
+                self._block.clear()
+                self._dirty = False
+            block = self._block.get(openmetrics)
+            if block is None:
+                name = self._header_name(openmetrics)
+                parts = [f'# HELP {name} {_escape_help(self.documentation)}\n',
+                         f'# TYPE {name} {self.metric_type}\n']
+                parts.extend(series.line() for series in self._series.values())
+                block = self._block[openmetrics] = ''.join(parts)
+            return block
+
+
+class Counter(MetricFamily):
+    """Монотонно возрастающий счетчик; сэмплы экспортируются с суффиксом _total"""
+
+    metric_type = 'counter'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        if name.endswith('_total'):
+            name = name[:-len('_total')]
+        super().__init__(name, documentation, labelnames)
+
+    def _header_name(self, openmetrics: bool) -> str:
+        return self.name if openmetrics else self.name + '_total'
+
+    def _sample_name(self) -> str:
+        return self.name + '_total'
+
+    def inc(self, amount: float = 1, *labels, **kwargs) -> None:
+        if amount < 0:
+            raise ValueError("Counter can only increase")
+        with self.lock:
+            series = self._get(labels, kwargs)
+            series.value += amount
+            series._line = None
+            self._dirty = True
+
+    def get(self, *labels, **kwargs) -> float:
+        with self.lock:
+            series = self._series.get(self._label_values(labels, kwargs))
+            return series.value if series else 0
+
+
+class Gauge(MetricFamily):
+    """Произвольное значение"""
+
+    metric_type = 'gauge'
+
+    def set(self, value: float, *labels, **kwargs) -> None:
+        with self.lock:
+            series = self._get(labels, kwargs)
+            if series.value == value and series._line is not None:
+                # Значение не изменилось: строка и блок остаются в кеше
+                return
+            series.value = value
+            series._line = None
+            self._dirty = True
+
+    def inc(self, amount: float = 1, *labels, **kwargs) -> None:
+        with self.lock:
+            series = self._get(labels, kwargs)
+            series.value += amount
+            series._line = None
+            self._dirty = True
+
+    def get(self, *labels, **kwargs) -> float:
+        with self.lock:
+            series = self._series.get(self._label_values(labels, kwargs))
+            return series.value if series else 0
+
+
+class Histogram(MetricFamily):
+    """Распределение наблюдений по корзинам с суммой и количеством"""
+
+    metric_type = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        """
+        Args:
+            name: Имя метрики
+            documentation: Описание для строки HELP
+            labelnames: Имена меток серий
+            buckets: Верхние границы корзин (+Inf добавляется автоматически)
+        """
+        super().__init__(name, documentation, labelnames)
+        bounds = sorted(float(bound) for bound in buckets)
+        if not bounds or bounds[-1] != math.inf:
+            bounds.append(math.inf)
+        self.buckets = tuple(bounds)
+
+    def _new_series(self, values: Tuple[str, ...]):
+        prefixes = [
+            self.name + '_bucket' + _label_block(self.labelnames, values,
+                                                 f'le="{format_value(bound)}"') + ' '
+            for bound in self.buckets
+        ]
+        labels = _label_block(self.labelnames, values)
+        prefixes.append(f'{self.name}_sum{labels} ')
+        prefixes.append(f'{self.name}_count{labels} ')
+        return _HistogramSeries(prefixes, len(self.buckets))
+
+    def observe(self, value: float, *labels, **kwargs) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            series = self._get(labels, kwargs)
+            series.counts[index] += 1
+            series.sum += value
+            series.count += 1
+            series._lines = None
+            self._dirty = True
+
+    def get(self, *labels, **kwargs) -> Dict:
+        """Кумулятивные счетчики корзин, сумма и количество серии"""
+        with self.lock:
+            series = self._series.get(self._label_values(labels, kwargs))
+            if series is None:
+                return {'buckets': {}, 'sum': 0.0, 'count': 0}
+            cumulative, buckets = 0, {}
+            for bound, count in zip(self.buckets, series.counts):
+                cumulative += count
+                buckets[bound] = cumulative
+            return {'buckets': buckets, 'sum': series.sum, 'count': series.count}
+
+
+class MetricsRegistry:
+    """Набор семейств метрик и сборщиков, обновляющих их перед выгрузкой"""
+
+    def __init__(self):
+        self._families: Dict[str, MetricFamily] = {}
+        self._collectors: List[Callable[[], None]] = []
+        self.lock = threading.Lock()
+
+    def register(self, family: MetricFamily) -> MetricFamily:
+        with self.lock:
+            if family.name in self._families:
+                raise ValueError(f"Metric {family.name} already registered")
+            self._families[family.name] = family
+        return family
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def get(self, name: str) -> Optional[MetricFamily]:
+        return self._families.get(name)
+
+    def add_collector(self, collector: Callable[[], None]) -> None:
+        """Добавить функцию, обновляющую метрики перед каждой выгрузкой"""
+        self._collectors.append(collector)
+
+    def collect(self) -> None:
+        for collector in self._collectors:
+            try:
+                collector()
+            except Exception as e:
+                logger.error(f"Error in metrics collector: {e}")
+
+    def render(self, openmetrics: bool = False, names: Optional[Sequence[str]] = None,
+               collect: bool = True) -> str:
+        """
+        Экспозиция метрик
+
+        Args:
+            openmetrics: Формат OpenMetrics вместо текстового формата Prometheus
+            names: Имена семейств (по умолчанию все)
+            collect: Запустить сборщики перед выгрузкой
+
+        Returns:
+            Текст экспозиции
+        """
+        if collect:
+            self.collect()
+        with self.lock:
+            families = list(self._families.values()) if names is None else \
+                [self._families[name] for name in names if name in self._families]
+        text = ''.join(family.render(openmetrics) for family in families)
+        if openmetrics:
+            text += '# EOF\n'
+        return text
+
+    def encode(self, accept: Optional[str] = None,
+               accept_encoding: Optional[str] = None) -> Tuple[bytes, Dict[str, str]]:
+        """
+        Экспозиция с учетом заголовков запроса
+
+        Args:
+            accept: Значение заголовка Accept
+            accept_encoding: Значение заголовка Accept-Encoding
+
+        Returns:
+            Тело ответа и заголовки Content-Type / Content-Encoding
+        """
+        openmetrics = _accepts(accept, 'application/openmetrics-text')
+        body = self.render(openmetrics=openmetrics).encode('utf-8')
+        headers = {'Content-Type': OPENMETRICS_CONTENT_TYPE if openmetrics else PROMETHEUS_CONTENT_TYPE}
+        if _accepts(accept_encoding, 'gzip'):
+            body = gzip.compress(body, compresslevel=6)
+            headers['Content-Encoding'] = 'gzip'
+        return body, headers
+
+
+def _accepts(header: Optional[str], token: str) -> bool:
+    """Есть ли token в заголовке с ненулевым q"""
+    if not header:
+        return False
+    for part in header.split(','):
+        fields = [field.strip() for field in part.split(';')]
+        if fields[0].lower() != token:
+            continue
+        for field in fields[1:]:
+            if field.startswith('q='):
+                try:
+                    return float(field[2:]) > 0
+                except ValueError:
+                    return False
+        return True
+    return False
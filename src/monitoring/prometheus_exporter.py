@@ -4,7 +4,8 @@ Prometheus Metrics Exporter for Daur-AI v2.0
 
 Поддерживает:
 - Экспорт метрик CPU, памяти, диска
-- Экспорт метрик API
+- Экспорт метрик API (счетчики и гистограмма задержек)
+- Форматы Prometheus text и OpenMetrics, сжатие gzip
 - Экспорт метрик базы данных
 - Интеграция с Prometheus
 - Grafana-совместимые метрики
@@ -12,9 +13,10 @@ Prometheus Metrics Exporter for Daur-AI v2.0
 
 import logging
 import time
-from typing import Dict, List
+from typing import Dict, Optional, Sequence, Tuple
 from datetime import datetime
 from src.hardware.real_hardware_monitor import RealHardwareMonitor
+from src.monitoring.metrics_registry import DEFAULT_BUCKETS, MetricsRegistry, format_value
 
 # Настройка логирования
 logging.basicConfig(level=logging.INFO)
@@ -22,23 +24,76 @@ logger = logging.getLogger(__name__)
 
 
 class PrometheusMetrics:
-    """Генератор Prometheus метрик"""
+    """Генератор Prometheus метрик
     
-    def __init__(self):
-        """Инициализация"""
-        self.monitor = RealHardwareMonitor()
+    Метрики хранятся в MetricsRegistry: значения оборудования обновляются
+    сборщиком перед выгрузкой, и перекодируются только изменившиеся серии.
+    """
+    
+    def __init__(self, monitor: Optional[RealHardwareMonitor] = None,
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        """
+        Инициализация
+        
+        Args:
+            monitor: Общий монитор оборудования; при запущенном фоновом
+                опросе метрики берутся из его последнего снимка
+            buckets: Границы корзин гистограммы задержек API в секундах
+        """
+        self.monitor = monitor or RealHardwareMonitor()
         self.api_requests_total = 0
         self.api_request_duration_sum = 0.0
         self.api_request_count = 0
         self.start_time = time.time()
         
+        registry = self.registry = MetricsRegistry()
+        self.cpu_usage = registry.gauge("daur_cpu_usage_percent", "CPU usage percentage")
+        self.cpu_cores_logical = registry.gauge("daur_cpu_cores_logical", "Number of logical CPU cores")
+        self.cpu_cores_physical = registry.gauge("daur_cpu_cores_physical", "Number of physical CPU cores")
+        self.cpu_frequency = registry.gauge("daur_cpu_frequency_mhz", "Current CPU frequency in MHz")
+        self.cpu_core_usage = registry.gauge("daur_cpu_core_usage_percent",
+                                             "CPU usage percentage per core", ["core"])
+        self.memory_usage = registry.gauge("daur_memory_usage_percent", "Memory usage percentage")
+        self.memory_used = registry.gauge("daur_memory_used_bytes", "Memory used in bytes")
+        self.memory_available = registry.gauge("daur_memory_available_bytes", "Memory available in bytes")
+        self.memory_total = registry.gauge("daur_memory_total_bytes", "Total memory in bytes")
+        disk_labels = ["device", "mount_point"]
+        self.disk_usage = registry.gauge("daur_disk_usage_percent", "Disk usage percentage", disk_labels)
+        self.disk_used = registry.gauge("daur_disk_used_bytes", "Disk used in bytes", disk_labels)
+        self.disk_total = registry.gauge("daur_disk_total_bytes", "Total disk space in bytes", disk_labels)
+        self.api_requests = registry.counter("daur_api_requests_total", "Total API requests",
+                                             ["method", "endpoint", "status"])
+        self.api_latency = registry.histogram("daur_api_request_duration_seconds",
+                                              "API request duration in seconds",
+                                              ["method", "endpoint"], buckets)
+        self.uptime = registry.gauge("daur_uptime_seconds", "System uptime in seconds")
+        self.start_time_gauge = registry.gauge("daur_start_time_seconds",
+                                               "Start time since unix epoch in seconds")
+        self.start_time_gauge.set(self.start_time)
+        
+        registry.add_collector(self._collect_cpu)
+        registry.add_collector(self._collect_memory)
+        registry.add_collector(self._collect_disks)
+        registry.add_collector(self._collect_uptime)
+        
         logger.info("Prometheus Metrics initialized")
     
-    def record_api_request(self, duration: float):
-        """Записать API запрос"""
+    def record_api_request(self, duration: float, method: str = "", endpoint: str = "",
+                           status: int = 200):
+        """
+        Записать API запрос
+        
+        Args:
+            duration: Длительность запроса в секундах
+            method: HTTP метод
+            endpoint: Маршрут (шаблон, а не фактический путь, чтобы не плодить серии)
+            status: Код ответа
+        """
         self.api_requests_total += 1
         self.api_request_duration_sum += duration
         self.api_request_count += 1
+        self.api_requests.inc(1, method=method, endpoint=endpoint, status=str(status))
+        self.api_latency.observe(duration, method=method, endpoint=endpoint)
     
     def _format_metric(self, name: str, value: float, labels: Dict = None, 
                       help_text: str = None, metric_type: str = "gauge") -> str:
@@ -52,189 +107,119 @@ class PrometheusMetrics:
         
         if labels:
             label_str = ",".join([f'{k}="{v}"' for k, v in labels.items()])
-            lines.append(f"{name}{{{label_str}}} {value}")
+            lines.append(f"{name}{{{label_str}}} {format_value(value)}")
         else:
-            lines.append(f"{name} {value}")
+            lines.append(f"{name} {format_value(value)}")
         
         return "\n".join(lines)
     
-    def get_cpu_metrics(self) -> str:
-        """Получить CPU метрики"""
+    # ===== Сборщики =====
+    
+    def _collect_cpu(self):
         cpu = self.monitor.get_cpu_metrics()
-        
-        lines = []
-        lines.append(self._format_metric(
-            "daur_cpu_usage_percent",
-            cpu.percent,
-            help_text="CPU usage percentage",
-            metric_type="gauge"
-        ))
-        
-        lines.append(self._format_metric(
-            "daur_cpu_cores_logical",
-            cpu.count_logical,
-            help_text="Number of logical CPU cores",
-            metric_type="gauge"
-        ))
-        
-        lines.append(self._format_metric(
-            "daur_cpu_cores_physical",
-            cpu.count_physical,
-            help_text="Number of physical CPU cores",
-            metric_type="gauge"
-        ))
-        
-        lines.append(self._format_metric(
-            "daur_cpu_frequency_mhz",
-            cpu.freq_current,
-            help_text="Current CPU frequency in MHz",
-            metric_type="gauge"
-        ))
-        
-        # Per-core metrics
+        if cpu is None:
+            return
+        self.cpu_usage.set(cpu.percent)
+        self.cpu_cores_logical.set(cpu.count_logical)
+        self.cpu_cores_physical.set(cpu.count_physical)
+        self.cpu_frequency.set(cpu.freq_current)
         for i, percent in enumerate(cpu.percent_per_core):
-            lines.append(self._format_metric(
-                "daur_cpu_core_usage_percent",
-                percent,
-                labels={"core": str(i)},
-                help_text="CPU usage percentage per core",
-                metric_type="gauge"
-            ))
+            self.cpu_core_usage.set(percent, str(i))
+    
+    def _collect_memory(self):
+        memory = self.monitor.get_memory_metrics()
+        if memory is None:
+            return
+        self.memory_usage.set(memory.percent)
+        self.memory_used.set(memory.used)
+        self.memory_available.set(memory.available)
+        self.memory_total.set(memory.total)
+    
+    def _collect_disks(self):
+        disk_list = self.monitor.get_disk_metrics()
+        current = set()
+        for disk in disk_list:
+            labels = (disk.device, disk.mount_point)
+            current.add(labels)
+            self.disk_usage.set(disk.percent, *labels)
+            self.disk_used.set(disk.used, *labels)
+            self.disk_total.set(disk.total, *labels)
         
-        return "\n".join(lines)
+        # Серии отключенных разделов больше не экспортируются
+        for family in (self.disk_usage, self.disk_used, self.disk_total):
+            for labels in family.label_sets():
+                if labels not in current:
+                    family.remove(*labels)
+    
+    def _collect_uptime(self):
+        self.uptime.set(time.time() - self.start_time)
+    
+    # ===== Выгрузка =====
+    
+    def _render_section(self, collector, families) -> str:
+        collector()
+        return self.registry.render(names=[family.name for family in families], collect=False)
+    
+    def get_cpu_metrics(self) -> str:
+        """Получить CPU метрики"""
+        return self._render_section(self._collect_cpu, [
+            self.cpu_usage, self.cpu_cores_logical, self.cpu_cores_physical,
+            self.cpu_frequency, self.cpu_core_usage
+        ])
     
     def get_memory_metrics(self) -> str:
         """Получить метрики памяти"""
-        memory = self.monitor.get_memory_metrics()
-        
-        lines = []
-        lines.append(self._format_metric(
-            "daur_memory_usage_percent",
-            memory.percent,
-            help_text="Memory usage percentage",
-            metric_type="gauge"
-        ))
-        
-        lines.append(self._format_metric(
-            "daur_memory_used_bytes",
-            memory.used,
-            help_text="Memory used in bytes",
-            metric_type="gauge"
-        ))
-        
-        lines.append(self._format_metric(
-            "daur_memory_available_bytes",
-            memory.available,
-            help_text="Memory available in bytes",
-            metric_type="gauge"
-        ))
-        
-        lines.append(self._format_metric(
-            "daur_memory_total_bytes",
-            memory.total,
-            help_text="Total memory in bytes",
-            metric_type="gauge"
-        ))
-        
-        return "\n".join(lines)
+        return self._render_section(self._collect_memory, [
+            self.memory_usage, self.memory_used, self.memory_available, self.memory_total
+        ])
     
     def get_disk_metrics(self) -> str:
         """Получить метрики диска"""
-        disk_list = self.monitor.get_disk_metrics()
-        
-        lines = []
-        for disk in disk_list:
-            labels = {"device": disk.device, "mount_point": disk.mount_point}
-            
-            lines.append(self._format_metric(
-                "daur_disk_usage_percent",
-                disk.percent,
-                labels=labels,
-                help_text="Disk usage percentage",
-                metric_type="gauge"
-            ))
-            
-            lines.append(self._format_metric(
-                "daur_disk_used_bytes",
-                disk.used,
-                labels=labels,
-                help_text="Disk used in bytes",
-                metric_type="gauge"
-            ))
-            
-            lines.append(self._format_metric(
-                "daur_disk_total_bytes",
-                disk.total,
-                labels=labels,
-                help_text="Total disk space in bytes",
-                metric_type="gauge"
-            ))
-        
-        return "\n".join(lines)
+        return self._render_section(self._collect_disks, [
+            self.disk_usage, self.disk_used, self.disk_total
+        ])
     
     def get_api_metrics(self) -> str:
         """Получить метрики API"""
-        lines = []
-        
-        lines.append(self._format_metric(
-            "daur_api_requests_total",
-            self.api_requests_total,
-            help_text="Total API requests",
-            metric_type="counter"
-        ))
-        
-        if self.api_request_count > 0:
-            avg_duration = self.api_request_duration_sum / self.api_request_count
-            lines.append(self._format_metric(
-                "daur_api_request_duration_seconds",
-                avg_duration,
-                help_text="Average API request duration in seconds",
-                metric_type="gauge"
-            ))
-        
-        uptime = time.time() - self.start_time
-        lines.append(self._format_metric(
-            "daur_uptime_seconds",
-            uptime,
-            help_text="System uptime in seconds",
-            metric_type="counter"
-        ))
-        
-        return "\n".join(lines)
+        return self._render_section(self._collect_uptime, [
+            self.api_requests, self.api_latency, self.uptime, self.start_time_gauge
+        ])
     
     def get_all_metrics(self) -> str:
         """Получить все метрики"""
-        sections = [
+        return "\n".join([
             "# DAUR-AI PROMETHEUS METRICS",
             f"# Generated: {datetime.now().isoformat()}",
-            "",
-            "# CPU Metrics",
-            self.get_cpu_metrics(),
-            "",
-            "# Memory Metrics",
-            self.get_memory_metrics(),
-            "",
-            "# Disk Metrics",
-            self.get_disk_metrics(),
-            "",
-            "# API Metrics",
-            self.get_api_metrics(),
-        ]
+            self.registry.render()
+        ])
+    
+    def encode(self, accept: Optional[str] = None,
+               accept_encoding: Optional[str] = None) -> Tuple[bytes, Dict[str, str]]:
+        """
+        Ответ для Prometheus с учетом заголовков запроса
+        
+        Args:
+            accept: Заголовок Accept (OpenMetrics или текстовый формат)
+            accept_encoding: Заголовок Accept-Encoding (gzip)
         
-        return "\n".join(sections)
+        Returns:
+            Тело ответа и заголовки
+        """
+        return self.registry.encode(accept, accept_encoding)
 
 
 class PrometheusExporter:
     """Экспортер метрик для Prometheus"""
     
-    def __init__(self, app=None):
+    def __init__(self, app=None, monitor: Optional[RealHardwareMonitor] = None):
         """
         Инициализация экспортера
         
         Args:
             app: Flask приложение (опционально)
+            monitor: Общий монитор оборудования (опционально)
         """
-        self.metrics = PrometheusMetrics()
+        self.metrics = PrometheusMetrics(monitor)
         self.app = app
         
         if app:
@@ -244,12 +229,31 @@ class PrometheusExporter:
     
     def _register_routes(self, app):
         """Зарегистрировать маршруты в Flask"""
+        from flask import g, request
+        
+        @app.before_request
+        def start_timer():
+            """Запомнить время начала запроса"""
+            g.prometheus_started = time.perf_counter()
+        
+        @app.after_request
+        def record_request(response):
+            """Записать длительность и статус запроса в метрики API"""
+            started = g.pop('prometheus_started', None)
+            if started is not None:
+                # Шаблон маршрута, а не путь, чтобы не плодить серии на каждый ID
+                endpoint = request.url_rule.rule if request.url_rule else '<unmatched>'
+                self.metrics.record_api_request(time.perf_counter() - started, request.method,
+                                                endpoint, response.status_code)
+            return response
+        
         @app.route('/metrics', methods=['GET'])
         def metrics():
             """Endpoint для Prometheus"""
-            return self.metrics.get_all_metrics(), 200, {
-                'Content-Type': 'text/plain; charset=utf-8'
-            }
+            body, headers = self.metrics.encode(request.headers.get('Accept'),
+                                                request.headers.get('Accept-Encoding'))
+            headers['Vary'] = 'Accept, Accept-Encoding'
+            return body, 200, headers
         
         logger.info("Prometheus metrics endpoint registered at /metrics")
     
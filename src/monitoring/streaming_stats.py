@@ -0,0 +1,423 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Daur-AI: Потоковые агрегаторы метрик с постоянным расходом памяти
+
+- QuantileSketch: квантили с относительной погрешностью (логарифмические
+  корзины в духе HDR-гистограммы / DDSketch), точное слияние
+- EWMARate: экспоненциально сглаженная частота событий
+- StreamingStats: count/sum/min/max, квантили и частоты одной серии
+- WindowedStats: те же показатели за скользящее окно из сегментов
+
+Все агрегаторы сериализуются в dict (to_dict/from_dict) и сливаются через
+merge, поэтому статистику воркеров можно объединять в одном процессе.
+"""
+
+import math
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Sequence, Tuple
+
+DEFAULT_QUANTILES = (0.5, 0.95, 0.99)
+
+# Горизонты сглаживания частоты, как у load average
+RATE_HORIZONS = (('1m', 60.0), ('5m', 300.0), ('15m', 900.0))
+
+
+class QuantileSketch:
+    """Квантили по логарифмическим корзинам
+
+    Значение x попадает в корзину ceil(log_gamma(|x|)), gamma = (1+a)/(1-a),
+    поэтому любой квантиль оценивается с относительной погрешностью не
+    больше a. Число корзин ограничено: для длительностей от микросекунды
+    до часа при a=1% это около тысячи счетчиков независимо от числа
+    наблюдений. При превышении max_bins объединяются младшие корзины.
+    """
+
+    def __init__(self, relative_accuracy: float = 0.01, max_bins: int = 2048,
+                 min_value: float = 1e-9):
+        """
+        Args:
+            relative_accuracy: Допустимая относительная погрешность квантилей
+            max_bins: Максимальное количество корзин для каждого знака
+            min_value: Модули меньше этого значения считаются нулем
+        """
+        if not 0 < relative_accuracy < 1:
+            raise ValueError("relative_accuracy must be in (0, 1)")
+        self.relative_accuracy = relative_accuracy
+        self.max_bins = max_bins
+        self.min_value = min_value
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.positive: Dict[int, int] = {}
+        self.negative: Dict[int, int] = {}
+        self.zero_count = 0
+        self.count = 0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+        self._sorted: Dict[bool, Optional[List[int]]] = {True: None, False: None}
+
+    def _index(self, value: float) -> int:
+        return math.ceil(math.log(value) / self._log_gamma)
+
+    def _value(self, index: int) -> float:
+        return 2 * self.gamma ** index / (self.gamma + 1)
+
+    def _bins(self, positive: bool) -> Dict[int, int]:
+        return self.positive if positive else self.negative
+
+    def _add_to_bin(self, positive: bool, index: int, count: int) -> None:
+        bins = self._bins(positive)
+        if index in bins:
+            bins[index] += count
+            return
+        bins[index] = count
+        self._sorted[positive] = None
+        if len(bins) > self.max_bins:
+            self._collapse(bins)
+
+    def _collapse(self, bins: Dict[int, int]) -> None:
+        keys = sorted(bins)
+        excess = len(keys) - self.max_bins
+        target = keys[excess]
+        for key in keys[:excess]:
+            bins[target] += bins.pop(key)
+
+    def add(self, value: float, count: int = 1) -> None:
+        """Добавить наблюдение"""
+        self.count += count
+        self.sum += value * count
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+        if value > self.min_value:
+            self._add_to_bin(True, self._index(value), count)
+        elif value < -self.min_value:
+            self._add_to_bin(False, self._index(-value), count)
+        else:
+            self.zero_count += count
+
+    def merge(self, other: 'QuantileSketch') -> 'QuantileSketch':
+        """Добавить наблюдения другого скетча с той же точностью"""
+        if other.gamma != self.gamma:
+            raise ValueError("Cannot merge sketches with different relative accuracy")
+        if other.count == 0:
+            return self
+        for positive in (True, False):
+            for index, count in other._bins(positive).items():
+                self._add_to_bin(positive, index, count)
+        self.zero_count += other.zero_count
+        self.count += other.count
+        self.sum += other.sum
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    def _sorted_keys(self, positive: bool) -> List[int]:
+        keys = self._sorted[positive]
+        if keys is None:
+            keys = self._sorted[positive] = sorted(self._bins(positive))
+        return keys
+
+    def quantiles(self, qs: Sequence[float]) -> List[Optional[float]]:
+        """Несколько квантилей за один проход по корзинам"""
+        if self.count == 0:
+            return [None] * len(qs)
+        order = sorted(range(len(qs)), key=lambda i: qs[i])
+        result: List[Optional[float]] = [None] * len(qs)
+        ranks = [(i, max(0.0, min(1.0, qs[i])) * (self.count - 1)) for i in order]
+
+        # От самых отрицательных значений к самым положительным
+        buckets: List[Tuple[float, int]] = []
+        buckets.extend((-self._value(k), self.negative[k]) for k in reversed(self._sorted_keys(False)))
+        if self.zero_count:
+            buckets.append((0.0, self.zero_count))
+        buckets.extend((self._value(k), self.positive[k]) for k in self._sorted_keys(True))
+
+        position = 0
+        seen = 0
+        for value, count in buckets:
+            seen += count
+            while position < len(ranks) and ranks[position][1] < seen:
+                result[ranks[position][0]] = min(self.max, max(self.min, value))
+                position += 1
+            if position == len(ranks):
+                break
+        for i, _ in ranks[position:]:
+            result[i] = self.max
+        return result
+
+    def quantile(self, q: float) -> Optional[float]:
+        return self.quantiles((q,))[0]
+
+    @property
+    def avg(self) -> Optional[float]:
+        return self.sum / self.count if self.count else None
+
+    @property
+    def bin_count(self) -> int:
+        return len(self.positive) + len(self.negative)
+
+    def clear(self) -> None:
+        self.positive.clear()
+        self.negative.clear()
+        self.zero_count = 0
+        self.count = 0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+        self._sorted = {True: None, False: None}
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'relative_accuracy': self.relative_accuracy,
+            'max_bins': self.max_bins,
+            'min_value': self.min_value,
+            'positive': [[k, v] for k, v in self.positive.items()],
+            'negative': [[k, v] for k, v in self.negative.items()],
+            'zero_count': self.zero_count,
+            'count': self.count,
+            'sum': self.sum,
+            'min': self.min if self.count else None,
+            'max': self.max if self.count else None
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'QuantileSketch':
+        sketch = cls(data['relative_accuracy'], data['max_bins'], data['min_value'])
+        sketch.positive = {int(k): int(v) for k, v in data['positive']}
+        sketch.negative = {int(k): int(v) for k, v in data['negative']}
+        sketch.zero_count = data['zero_count']
+        sketch.count = data['count']
+        sketch.sum = data['sum']
+        if sketch.count:
+            sketch.min = data['min']
+            sketch.max = data['max']
+        return sketch
+
+
+class EWMARate:
+    """Экспоненциально сглаженная частота событий в секунду
+
+    r(t) = r(t0) * exp(-(t - t0) / tau) + n / tau; при постоянном потоке
+    с частотой lambda оценка сходится к lambda.
+    """
+
+    def __init__(self, horizon: float = 60.0):
+        """
+        Args:
+            horizon: Постоянная времени сглаживания в секундах
+        """
+        self.horizon = horizon
+        self.value = 0.0
+        self.updated_at: Optional[float] = None
+
+    def _decayed(self, now: float) -> float:
+        if self.updated_at is None:
+            return 0.0
+        return self.value * math.exp(-max(0.0, now - self.updated_at) / self.horizon)
+
+    def update(self, count: float = 1, now: Optional[float] = None) -> None:
+        if now is None:
+            now = time.time()
+        self.value = self._decayed(now) + count / self.horizon
+        self.updated_at = now
+
+    def rate(self, now: Optional[float] = None) -> float:
+        return self._decayed(time.time() if now is None else now)
+
+    def merge(self, other: 'EWMARate') -> 'EWMARate':
+        """Частоты независимых потоков складываются"""
+        if other.updated_at is None:
+            return self
+        now = max(other.updated_at, self.updated_at or other.updated_at)
+        self.value = self._decayed(now) + other._decayed(now)
+        self.updated_at = now
+        return self
+
+
+class StreamingStats:
+    """Агрегаты одной серии: count/sum/min/max/latest, квантили и частоты"""
+
+    def __init__(self, relative_accuracy: float = 0.01, max_bins: int = 2048):
+        self.sketch = QuantileSketch(relative_accuracy, max_bins)
+        self.rates = {name: EWMARate(horizon) for name, horizon in RATE_HORIZONS}
+        self.latest: Optional[float] = None
+        self.latest_at: Optional[float] = None
+
+    def add(self, value: float, now: Optional[float] = None) -> None:
+        if now is None:
+            now = time.time()
+        self.sketch.add(value)
+        for rate in self.rates.values():
+            rate.update(1, now)
+        if self.latest_at is None or now >= self.latest_at:
+            self.latest = value
+            self.latest_at = now
+
+    @property
+    def count(self) -> int:
+        return self.sketch.count
+
+    def merge(self, other: 'StreamingStats') -> 'StreamingStats':
+        self.sketch.merge(other.sketch)
+        for name, rate in self.rates.items():
+            rate.merge(other.rates[name])
+        if other.latest_at is not None and (self.latest_at is None or other.latest_at > self.latest_at):
+            self.latest = other.latest
+            self.latest_at = other.latest_at
+        return self
+
+    def summary(self, quantiles: Sequence[float] = DEFAULT_QUANTILES,
+                now: Optional[float] = None) -> Dict[str, Any]:
+        """Сводка: count, min, max, avg, sum, latest, pNN и rate_*"""
+        sketch = self.sketch
+        if sketch.count == 0:
+            return {'count': 0, 'min': None, 'max': None, 'avg': None}
+        result = {
+            'count': sketch.count,
+            'min': sketch.min,
+            'max': sketch.max,
+            'avg': sketch.avg,
+            'sum': sketch.sum,
+            'latest': self.latest
+        }
+        for q, value in zip(quantiles, sketch.quantiles(quantiles)):
+            result[quantile_label(q)] = value
+        for name, rate in self.rates.items():
+            result[f'rate_{name}'] = rate.rate(now)
+        return result
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'sketch': self.sketch.to_dict(),
+            'rates': {name: [rate.value, rate.updated_at] for name, rate in self.rates.items()},
+            'latest': [self.latest, self.latest_at]
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'StreamingStats':
+        stats = cls()
+        stats.sketch = QuantileSketch.from_dict(data['sketch'])
+        for name, (value, updated_at) in data['rates'].items():
+            if name in stats.rates:
+                stats.rates[name].value = value
+                stats.rates[name].updated_at = updated_at
+        stats.latest, stats.latest_at = data['latest']
+        return stats
+
+
+class WindowedStats:
+    """Квантили и агрегаты за скользящее окно
+
+    Окно делится на сегменты со своими скетчами; устаревший сегмент
+    очищается и переиспользуется, запрос сливает живые сегменты.
+    """
+
+    def __init__(self, window: float = 60.0, slices: int = 6,
+                 relative_accuracy: float = 0.01, max_bins: int = 2048):
+        """
+        Args:
+            window: Размер окна в секундах
+            slices: Количество сегментов окна
+            relative_accuracy: Относительная погрешность квантилей
+            max_bins: Максимальное количество корзин скетча сегмента
+        """
+        self.window = window
+        self.slices = slices
+        self.slice_size = window / slices
+        self.relative_accuracy = relative_accuracy
+        self.max_bins = max_bins
+        self._slices: Deque[Tuple[int, QuantileSketch]] = deque()
+        self._free: List[QuantileSketch] = []
+
+    def _advance(self, now: float) -> int:
+        current = int(now // self.slice_size)
+        while self._slices and self._slices[0][0] <= current - self.slices:
+            _, sketch = self._slices.popleft()
+            sketch.clear()
+            self._free.append(sketch)
+        return current
+
+    def _slice(self, index: int) -> QuantileSketch:
+        if self._slices and self._slices[-1][0] == index:
+            return self._slices[-1][1]
+        for slice_index, sketch in self._slices:
+            if slice_index == index:
+                return sketch
+        sketch = self._free.pop() if self._free else \
+            QuantileSketch(self.relative_accuracy, self.max_bins)
+        self._slices.append((index, sketch))
+        if len(self._slices) > 1 and self._slices[-2][0] > index:
+            # Запоздавшее наблюдение: сохраняем порядок сегментов
+            self._slices = deque(sorted(self._slices, key=lambda item: item[0]))
+        return sketch
+
+    def add(self, value: float, now: Optional[float] = None) -> None:
+        if now is None:
+            now = time.time()
+        current = self._advance(now)
+        index = int(now // self.slice_size)
+        if index <= current - self.slices:
+            return
+        self._slice(index).add(value)
+
+    def sketch(self, now: Optional[float] = None) -> QuantileSketch:
+        """Скетч, объединяющий все сегменты окна"""
+        self._advance(time.time() if now is None else now)
+        merged = QuantileSketch(self.relative_accuracy, self.max_bins)
+        for _, sketch in self._slices:
+            merged.merge(sketch)
+        return merged
+
+    def merge(self, other: 'WindowedStats') -> 'WindowedStats':
+        for index, sketch in other._slices:
+            self._slice(index).merge(sketch)
+        return self
+
+    def summary(self, quantiles: Sequence[float] = DEFAULT_QUANTILES,
+                now: Optional[float] = None) -> Dict[str, Any]:
+        if now is None:
+            now = time.time()
+        sketch = self.sketch(now)
+        if sketch.count == 0:
+            return {'window': self.window, 'count': 0, 'min': None, 'max': None, 'avg': None}
+        result = {
+            'window': self.window,
+            'count': sketch.count,
+            'min': sketch.min,
+            'max': sketch.max,
+            'avg': sketch.avg,
+            'rate': sketch.count / self.window
+        }
+        for q, value in zip(quantiles, sketch.quantiles(quantiles)):
+            result[quantile_label(q)] = value
+        return result
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'window': self.window,
+            'slices': self.slices,
+            'segments': [[index, sketch.to_dict()] for index, sketch in self._slices]
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'WindowedStats':
+        segments = [(int(index), QuantileSketch.from_dict(sketch)) for index, sketch in data['segments']]
+        if segments:
+            stats = cls(data['window'], data['slices'], segments[0][1].relative_accuracy,
+                        segments[0][1].max_bins)
+        else:
+            stats = cls(data['window'], data['slices'])
+        stats._slices = deque(segments)
+        return stats
+
+
+def quantile_label(q: float) -> str:
+    """Имя квантиля в сводке: 0.5 -> p50, 0.999 -> p99.9"""
+    percent = q * 100
+    return f"p{percent:g}"
+
@@ -21,6 +21,11 @@ from collections import OrderedDict, defaultdict
 import time
 from datetime import datetime
 
+from .semantic_cache import SemanticParseCache
+
+
+_WHITESPACE = re.compile(r'\s+')
+
 
 class CommandType(Enum):
     """Типы команд"""
@@ -89,13 +94,16 @@ class OptimizedCommandParser:
     Оптимизированный парсер команд с расширенными возможностями
     """
     
-    def __init__(self, ai_manager=None, cache_size: int = 500):
+    def __init__(self, ai_manager=None, cache_size: int = 500,
+                 semantic_cache_size: int = 1000, semantic_threshold: float = 0.6):
         """
         Инициализация парсера
         
         Args:
             ai_manager: Менеджер AI моделей (опционально)
             cache_size: Размер кэша распознанных команд
+            semantic_cache_size: Размер семантического кэша AI-разборов (0 - отключен)
+            semantic_threshold: Минимальное сходство шаблонов команд для попадания
         """
         self.logger = logging.getLogger('daur_ai.optimized_parser')
         self.ai_manager = ai_manager
@@ -105,12 +113,18 @@ class OptimizedCommandParser:
         self.command_cache = OrderedDict()
         self.cache_lock = threading.RLock()
         
+        # Второй уровень: шаблоны команд, разобранных AI, с нечетким поиском
+        self.semantic_cache = (SemanticParseCache(semantic_cache_size, semantic_threshold)
+                               if semantic_cache_size > 0 else None)
+        
         # Статистика парсинга
         self.parse_stats = {
             'total_parses': 0,
             'successful_parses': 0,
             'failed_parses': 0,
             'cache_hits': 0,
+            'semantic_hits': 0,
+            'ai_parses': 0,
             'total_parse_time': 0
         }
         
@@ -120,9 +134,11 @@ class OptimizedCommandParser:
         
         # Шаблоны для быстрого распознавания (оптимизированные регулярные выражения)
         self.quick_patterns = self._compile_patterns()
+        self._quick_matcher, self._quick_alternatives = self._combine_patterns(self.quick_patterns)
         
         # Словарь синонимов для улучшенного распознавания
         self.synonyms = self._build_synonyms()
+        self._synonym_pattern, self._synonym_map = self._compile_synonyms(self.synonyms)
         
         self.logger.info("Оптимизированный парсер команд инициализирован")
     
@@ -219,6 +235,73 @@ class OptimizedCommandParser:
             'помощь': ['справка', 'помоги', 'подскажи', 'инструкция'],
         }
     
+    @staticmethod
+    def _combine_patterns(quick_patterns: Dict[CommandType, List[Tuple[re.Pattern, ActionType]]]
+                          ) -> Tuple[re.Pattern, Dict[int, Tuple[CommandType, ActionType, int]]]:
+        """
+        Объединение шаблонов в одно регулярное выражение
+        
+        Каждый шаблон становится именованной альтернативой; по номеру
+        сработавшей альтернативы (match.lastindex) определяются тип команды
+        и действие, а ее вложенные группы идут сразу за ней.
+        
+        Args:
+            quick_patterns: Шаблоны по типам команд
+            
+        Returns:
+            Tuple: Общее выражение и альтернативы по номеру группы
+        """
+        parts = []
+        alternatives = {}
+        group_index = 1
+        for command_type, patterns in quick_patterns.items():
+            for pattern, action_type in patterns:
+                flags = 'i' if pattern.flags & re.IGNORECASE else '-i'
+                parts.append(f"(?P<q{group_index}>(?{flags}:{pattern.pattern}))")
+                alternatives[group_index] = (command_type, action_type, pattern.groups)
+                group_index += pattern.groups + 1
+        
+        return re.compile('|'.join(parts)), alternatives
+    
+    @staticmethod
+    def _compile_synonyms(synonyms: Dict[str, List[str]]) -> Tuple[re.Pattern, Dict[str, str]]:
+        """
+        Компиляция словаря синонимов в одно выражение для замены за один проход
+        
+        Замена для каждого слова вычисляется заранее так же, как при
+        последовательной замене по словарю (с учетом цепочек синонимов).
+        
+        Args:
+            synonyms: Словарь синонимов
+            
+        Returns:
+            Tuple: Выражение для поиска синонимов и словарь замен
+        """
+        replacements = {}
+        for words in synonyms.values():
+            for word in words:
+                replacement = word
+                for key, key_synonyms in synonyms.items():
+                    if replacement in key_synonyms:
+                        replacement = key
+                if replacement != word:
+                    replacements[word] = replacement
+        
+        # Длинные слова первыми, чтобы альтернатива не останавливалась на префиксе
+        alternation = '|'.join(re.escape(word) for word in sorted(replacements, key=len, reverse=True))
+        return re.compile(r'\b(?:' + (alternation or r'(?!)') + r')\b'), replacements
+    
+    def update_synonyms(self, synonyms: Dict[str, List[str]]):
+        """
+        Заменить словарь синонимов
+        
+        Args:
+            synonyms: Словарь {основное слово: [синонимы]}
+        """
+        self.synonyms = synonyms
+        self._synonym_pattern, self._synonym_map = self._compile_synonyms(synonyms)
+        self.clear_cache()
+    
     def _generate_cache_key(self, text: str) -> str:
         """
         Генерация ключа кэша
@@ -279,14 +362,11 @@ class OptimizedCommandParser:
         text = text.lower().strip()
         
         # Удаление лишних пробелов
-        text = re.sub(r'\s+', ' ', text)
+        text = _WHITESPACE.sub(' ', text)
         
-        # Замена синонимов
-        for key, synonyms in self.synonyms.items():
-            for synonym in synonyms:
-                text = re.sub(r'\b' + synonym + r'\b', key, text)
-        
-        return text
+        # Замена синонимов за один проход
+        synonym_map = self._synonym_map
+        return self._synonym_pattern.sub(lambda match: synonym_map[match.group(0)], text)
     
     def _quick_parse(self, text: str) -> Optional[ParsedCommand]:
         """
@@ -300,30 +380,31 @@ class OptimizedCommandParser:
         """
         normalized_text = self._normalize_text(text)
         
-        # Проверяем все шаблоны
-        for command_type, patterns in self.quick_patterns.items():
-            for pattern, action_type in patterns:
-                match = pattern.search(normalized_text)
-                if match:
-                    # Извлекаем параметры из групп
-                    parameters = {}
-                    if match.groups():
-                        if len(match.groups()) == 1:
-                            parameters['target'] = match.group(1)
-                        else:
-                            for i, group in enumerate(match.groups()):
-                                parameters[f'param_{i}'] = group
-                    
-                    command = ParsedCommand(
-                        command_type=command_type,
-                        action=action_type,
-                        parameters=parameters,
-                        confidence=0.95  # Высокая уверенность для шаблонных команд
-                    )
-                    command.raw_text = text
-                    return command
+        # Все шаблоны проверяются за один проход: побеждает самое раннее
+        # совпадение в тексте, а на одной позиции - шаблон, объявленный раньше
+        match = self._quick_matcher.search(normalized_text)
+        if match is None:
+            return None
         
-        return None
+        index = match.lastindex
+        command_type, action_type, group_count = self._quick_alternatives[index]
+        
+        # Извлекаем параметры из групп
+        parameters = {}
+        if group_count == 1:
+            parameters['target'] = match.group(index + 1)
+        else:
+            for i in range(group_count):
+                parameters[f'param_{i}'] = match.group(index + 1 + i)
+        
+        command = ParsedCommand(
+            command_type=command_type,
+            action=action_type,
+            parameters=parameters,
+            confidence=0.95  # Высокая уверенность для шаблонных команд
+        )
+        command.raw_text = text
+        return command
     
     def parse(self, text: str, use_cache: bool = True, use_ai: bool = True) -> ParsedCommand:
         """
@@ -353,10 +434,26 @@ class OptimizedCommandParser:
         
         # Если быстрый парсинг не сработал и есть AI, используем AI
         if command is None and use_ai and self.ai_manager:
-            try:
-                command = self._ai_parse(text)
-            except Exception as e:
-                self.logger.warning(f"Ошибка AI парсинга: {e}")
+            normalized_text = self._normalize_text(text)
+            
+            # Вариант уже разобранной AI команды не требует нового запроса
+            if use_cache and self.semantic_cache is not None:
+                hit = self.semantic_cache.lookup(normalized_text)
+                if hit is not None:
+                    command, similarity = hit
+                    command.confidence = command.confidence * similarity
+                    command.timestamp = datetime.now()
+                    self.parse_stats['semantic_hits'] += 1
+            
+            if command is None:
+                try:
+                    command = self._ai_parse(text)
+                    self.parse_stats['ai_parses'] += 1
+                except Exception as e:
+                    self.logger.warning(f"Ошибка AI парсинга: {e}")
+                
+                if command is not None and use_cache and self.semantic_cache is not None:
+                    self.semantic_cache.store(normalized_text, command)
         
         # Если ничего не сработало, возвращаем неизвестную команду
         if command is None:
@@ -466,9 +563,12 @@ class OptimizedCommandParser:
             'successful_parses': self.parse_stats['successful_parses'],
             'failed_parses': self.parse_stats['failed_parses'],
             'cache_hits': self.parse_stats['cache_hits'],
+            'semantic_hits': self.parse_stats['semantic_hits'],
+            'ai_parses': self.parse_stats['ai_parses'],
             'average_parse_time': round(avg_parse_time, 4),
             'success_rate': round(success_rate, 2),
             'cache_size': len(self.command_cache),
+            'semantic_cache_size': len(self.semantic_cache) if self.semantic_cache is not None else 0,
             'history_size': len(self.command_history)
         }
     
@@ -476,6 +576,8 @@ class OptimizedCommandParser:
         """Очистить кэш команд"""
         with self.cache_lock:
             self.command_cache.clear()
+            if self.semantic_cache is not None:
+                self.semantic_cache.clear()
             self.logger.info("Кэш парсера очищен")
     
     def get_history(self, limit: int = 10) -> List[Dict[str, Any]]:
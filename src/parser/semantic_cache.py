@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Daur-AI: Семантический кэш распознанных команд
+Второй уровень кэша парсера для вариантов одной и той же команды
+
+Команда сводится к шаблону: пути, URL, числа, текст в кавычках и
+названия приложений заменяются слотами, слова-паразиты отбрасываются.
+Похожие шаблоны находятся через MinHash с LSH-бакетами; шаблоны могут
+различаться только нейтральными словами вроде "browser". Значения слотов
+новой команды подставляются в параметры найденной. Поэтому
+"open chrome" и "please open firefox browser" разбираются AI один раз.
+"""
+
+import copy
+import re
+import threading
+import zlib
+from collections import OrderedDict, defaultdict
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+# Простое число Мерсенна для универсального хеширования MinHash
+_PRIME = (1 << 61) - 1
+
+SLOT_PATTERNS: List[Tuple[str, re.Pattern]] = [
+    ('text', re.compile(r'"[^"]+"|«[^»]+»|\'[^\']+\'')),
+    ('url', re.compile(r'\bhttps?://\S+')),
+    ('number', re.compile(r'\b\d+(?:[.,]\d+)?(?![.\w/])')),
+    ('path', re.compile(r'(?:[~.]?/|[a-z]:\\)\S*|\b[\w-]+\.[a-z0-9]{1,5}\b', re.IGNORECASE)),
+]
+
+DEFAULT_APP_NAMES = (
+    'chrome', 'google chrome', 'firefox', 'safari', 'opera', 'yandex',
+    'telegram', 'slack', 'discord', 'skype', 'spotify', 'outlook', 'thunderbird',
+    'vscode', 'vs code', 'visual studio code', 'pycharm', 'excel', 'powerpoint',
+    'notepad', 'terminal', 'calculator', 'photoshop',
+    'браузер', 'терминал', 'блокнот', 'калькулятор', 'проводник', 'телеграм', 'хром',
+)
+
+FILLER_WORDS = frozenset((
+    'please', 'pls', 'can', 'could', 'would', 'you', 'me', 'for', 'the', 'a', 'an', 'just', 'now',
+    'пожалуйста', 'можешь', 'мне', 'ли', 'ну', 'давай', 'быстро', 'сейчас',
+))
+
+
+# Слова, уточняющие цель команды без изменения смысла ("open firefox browser").
+# Шаблоны, различающиеся другими словами (например, "do not send ..."),
+# нечетким попаданием не считаются
+NEUTRAL_WORDS = FILLER_WORDS | frozenset((
+    'browser', 'app', 'application', 'program', 'window',
+    'приложение', 'программу', 'программа', 'окно',
+))
+
+
+def _shingles(tokens: List[str]) -> FrozenSet[str]:
+    """Слова и пары соседних слов шаблона"""
+    return frozenset(tokens) | frozenset(f"{a} {b}" for a, b in zip(tokens, tokens[1:]))
+
+
+def _jaccard(first: FrozenSet[str], second: FrozenSet[str]) -> float:
+    if not first and not second:
+        return 1.0
+    return len(first & second) / len(first | second)
+
+
+def _rebind(value: Any, bindings: List[Tuple[str, str]]) -> Any:
+    """Подставить новые значения слотов в параметры команды"""
+    mapping: Dict[str, str] = {}
+    for old, new in bindings:
+        mapping.setdefault(old.lower(), new)
+    if all(old == new for old, new in mapping.items()):
+        return value
+    # Один проход по целым значениям: подставленное значение не заменяется
+    # повторно, а "1" не совпадает с частью "report10.txt"
+    names = sorted(mapping, key=len, reverse=True)
+    pattern = re.compile(r'(?<!\w)(?:' + '|'.join(map(re.escape, names)) + r')(?!\w)', re.IGNORECASE)
+    return _substitute(value, pattern, mapping)
+
+
+def _substitute(value: Any, pattern: re.Pattern, mapping: Dict[str, str]) -> Any:
+    if isinstance(value, str):
+        return pattern.sub(lambda match: mapping[match.group(0).lower()], value)
+    if isinstance(value, dict):
+        return {key: _substitute(item, pattern, mapping) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_substitute(item, pattern, mapping) for item in value]
+    return value
+
+
+class _Entry:
+    """Запись кэша: шаблон, значения слотов и распознанная команда"""
+
+    __slots__ = ('key', 'signature', 'slot_values', 'shingles', 'bands', 'command')
+
+    def __init__(self, key, signature, slot_values, shingles, bands, command):
+        self.key = key
+        self.signature = signature
+        self.slot_values = slot_values
+        self.shingles = shingles
+        self.bands = bands
+        self.command = command
+
+
+class SemanticParseCache:
+    """Кэш команд с нечетким поиском по шаблону"""
+
+    def __init__(self, max_entries: int = 1000, threshold: float = 0.6,
+                 num_perm: int = 64, bands: int = 16,
+                 app_names: Iterable[str] = DEFAULT_APP_NAMES):
+        """
+        Args:
+            max_entries: Максимальное число шаблонов (LRU)
+            threshold: Минимальное сходство Жаккара шаблонов для попадания
+            num_perm: Число хеш-функций MinHash
+            bands: Число LSH-бакетов (num_perm должно делиться на bands)
+            app_names: Названия приложений, заменяемые слотом <app>
+        """
+        if num_perm % bands:
+            raise ValueError("num_perm must be divisible by bands")
+
+        self.max_entries = max_entries
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.lock = threading.RLock()
+
+        names = sorted((name.lower() for name in app_names), key=len, reverse=True)
+        self.app_pattern = re.compile(r'\b(?:' + '|'.join(map(re.escape, names)) + r')\b') if names else None
+
+        # Фиксированные коэффициенты: одинаковые подписи между запусками
+        self._coefficients = [
+            (zlib.crc32(f"a{i}".encode()) | 1, zlib.crc32(f"b{i}".encode()))
+            for i in range(num_perm)
+        ]
+
+        self._entries: 'OrderedDict[str, _Entry]' = OrderedDict()
+        self._buckets: Dict[Tuple[int, Tuple[int, ...]], set] = defaultdict(set)
+        self.stats = {'lookups': 0, 'exact_hits': 0, 'fuzzy_hits': 0, 'misses': 0, 'evictions': 0}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def templatize(self, text: str) -> Tuple[str, Tuple[str, ...], List[str]]:
+        """
+        Свести команду к шаблону
+
+        Args:
+            text: Нормализованный текст команды
+
+        Returns:
+            Tuple: Шаблон, типы слотов по порядку и значения слотов
+        """
+        found: List[Tuple[int, int, str, str]] = []
+        taken = [False] * len(text)
+        patterns = list(SLOT_PATTERNS)
+        if self.app_pattern is not None:
+            patterns.append(('app', self.app_pattern))
+
+        for slot, pattern in patterns:
+            for match in pattern.finditer(text):
+                start, end = match.span()
+                if any(taken[start:end]):
+                    continue
+                taken[start:end] = [True] * (end - start)
+                found.append((start, end, slot, match.group(0)))
+
+        found.sort()
+        parts, slots, values = [], [], []
+        position = 0
+        for start, end, slot, value in found:
+            parts.append(text[position:start])
+            parts.append(f"<{slot}>")
+            slots.append(slot)
+            values.append(value.strip('"«»\''))
+            position = end
+        parts.append(text[position:])
+
+        tokens = [token for token in re.findall(r'<\w+>|\w+', ''.join(parts).lower())
+                  if token not in FILLER_WORDS]
+        return ' '.join(tokens), tuple(slots), values
+
+    def _minhash(self, shingles: FrozenSet[str]) -> List[int]:
+        hashes = [zlib.crc32(shingle.encode()) for shingle in shingles] or [0]
+        return [min((a * h + b) % _PRIME for h in hashes) for a, b in self._coefficients]
+
+    def _bands(self, signature: List[int]) -> List[Tuple[int, Tuple[int, ...]]]:
+        return [(band, tuple(signature[band * self.rows:(band + 1) * self.rows]))
+                for band in range(self.bands)]
+
+    def lookup(self, text: str) -> Optional[Tuple[Any, float]]:
+        """
+        Найти команду с похожим шаблоном
+
+        Args:
+            text: Нормализованный текст команды
+
+        Returns:
+            Optional[Tuple]: Копия команды с подставленными значениями слотов
+                             и сходство шаблонов (1.0 - совпадение шаблона)
+        """
+        template, slots, values = self.templatize(text)
+        with self.lock:
+            self.stats['lookups'] += 1
+            entry = self._entries.get(template)
+            similarity = 1.0
+
+            if entry is None:
+                shingles = _shingles(template.split())
+                tokens = set(template.split())
+                candidates = set()
+                for band in self._bands(self._minhash(shingles)):
+                    candidates.update(self._buckets.get(band, ()))
+
+                similarity = 0.0
+                for key in candidates:
+                    candidate = self._entries[key]
+                    # Значения слотов можно перенести только при тех же типах слотов
+                    if candidate.signature != slots:
+                        continue
+                    if not (tokens ^ set(key.split())) <= NEUTRAL_WORDS:
+                        continue
+                    score = _jaccard(shingles, candidate.shingles)
+                    if score >= self.threshold and score > similarity:
+                        entry, similarity = candidate, score
+
+            if entry is None:
+                self.stats['misses'] += 1
+                return None
+
+            self.stats['exact_hits' if similarity == 1.0 else 'fuzzy_hits'] += 1
+            self._entries.move_to_end(entry.key)
+            command = copy.copy(entry.command)
+
+        command.parameters = _rebind(command.parameters, list(zip(entry.slot_values, values)))
+        return command, similarity
+
+    def store(self, text: str, command: Any):
+        """
+        Сохранить распознанную команду
+
+        Args:
+            text: Нормализованный текст команды
+            command: Команда (объект с атрибутом parameters)
+        """
+        template, slots, values = self.templatize(text)
+        shingles = _shingles(template.split())
+        bands = self._bands(self._minhash(shingles))
+        with self.lock:
+            self._discard(template)
+            self._entries[template] = _Entry(template, slots, values, shingles, bands, copy.copy(command))
+            for band in bands:
+                self._buckets[band].add(template)
+            while len(self._entries) > self.max_entries:
+                self._discard(next(iter(self._entries)))
+                self.stats['evictions'] += 1
+
+    def _discard(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for band in entry.bands:
+            bucket = self._buckets.get(band)
+            if bucket is not None:
+                bucket.discard(key)
+                if not bucket:
+                    del self._buckets[band]
+
+    def clear(self):
+        with self.lock:
+            self._entries.clear()
+            self._buckets.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self.lock:
+            return {'entries': len(self._entries), **self.stats}
@@ -16,6 +16,9 @@ import queue
 import time
 import gc
 import sys
+import heapq
+import itertools
+import weakref
 from typing import Callable, Any, Dict, List, Optional
 from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 from functools import wraps, lru_cache
@@ -148,65 +151,237 @@ class MemoryOptimizer:
         self.logger.info("Мониторинг памяти запущен")
 
 
+class _CacheItem:
+    """Запись SmartCache"""
+    
+    __slots__ = ('value', 'ttl', 'expires_at', 'weight', 'seq')
+    
+    def __init__(self, value: Any, ttl: float, expires_at: float, weight: int, seq: int):
+        self.value = value
+        self.ttl = ttl
+        self.expires_at = expires_at
+        self.weight = weight
+        self.seq = seq
+
+
+class _CacheShard:
+    """Сегмент SmartCache со своей блокировкой, LRU-порядком и кучей сроков истечения"""
+    
+    def __init__(self, max_items: int, max_bytes: Optional[int]):
+        self.lock = threading.Lock()
+        self.data: 'OrderedDict[str, _CacheItem]' = OrderedDict()
+        self.expiry_heap: List[tuple] = []
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+    
+    def remove(self, key: str) -> _CacheItem:
+        item = self.data.pop(key)
+        self.bytes -= item.weight
+        return item
+
+
 class SmartCache:
-    """Интеллектуальный кэш с автоматической очисткой"""
+    """Интеллектуальный кэш с автоматической очисткой
+    
+    Ключи распределяются по сегментам (lock striping), поэтому потоки,
+    обращающиеся к разным ключам, не конкурируют за одну блокировку.
+    Просроченные записи удаляются фоновым потоком по куче сроков истечения.
+    """
     
-    def __init__(self, max_size: int = 1000, ttl: int = 3600):
+    # Минимальная емкость сегмента: маленькие кэши не дробятся, чтобы LRU оставался точным
+    MIN_SHARD_SIZE = 64
+    
+    def __init__(self, max_size: int = 1000, ttl: int = 3600, num_shards: int = 16,
+                 max_bytes: Optional[int] = None, weigher: Optional[Callable[[Any], int]] = None,
+                 expiry_interval: float = 1.0, sliding_ttl: bool = True):
         """
         Args:
             max_size: Максимальный размер кэша
             ttl: Время жизни записей в секундах
+            num_shards: Количество сегментов
+            max_bytes: Ограничение суммарного веса записей (None - без ограничения)
+            weigher: Функция веса значения в байтах (по умолчанию sys.getsizeof)
+            expiry_interval: Период фоновой очистки просроченных записей в секундах
+            sliding_ttl: Продлевать срок жизни записи при каждом обращении
         """
         self.max_size = max_size
         self.ttl = ttl
-        self.cache = OrderedDict()
-        self.access_times = {}
-        self.lock = threading.RLock()
+        self.sliding_ttl = sliding_ttl
+        self.max_bytes = max_bytes
+        self.weigher = weigher or (sys.getsizeof if max_bytes is not None else None)
+        self.num_shards = max(1, min(num_shards, max_size // self.MIN_SHARD_SIZE))
+        
+        shard_items = -(-max_size // self.num_shards)
+        shard_bytes = -(-max_bytes // self.num_shards) if max_bytes is not None else None
+        self._shards = [_CacheShard(shard_items, shard_bytes) for _ in range(self.num_shards)]
+        self._seq = itertools.count()
         self.logger = logging.getLogger('daur_ai.smart_cache')
+        
+        self.expiry_interval = expiry_interval
+        self._stop_event = threading.Event()
+        self._expiry_thread = threading.Thread(
+            target=SmartCache._expiry_loop,
+            args=(weakref.ref(self), self._stop_event, expiry_interval),
+            name="daur_ai_cache_expiry",
+            daemon=True
+        )
+        self._expiry_thread.start()
+    
+    def _shard(self, key: str) -> _CacheShard:
+        return self._shards[hash(key) % self.num_shards]
     
     def get(self, key: str) -> Optional[Any]:
         """Получить значение из кэша"""
-        with self.lock:
-            if key in self.cache:
-                # Проверяем TTL
-                if time.time() - self.access_times[key] > self.ttl:
-                    del self.cache[key]
-                    del self.access_times[key]
-                    return None
-                
-                # Обновляем время доступа и перемещаем в конец (LRU)
-                self.access_times[key] = time.time()
-                self.cache.move_to_end(key)
-                return self.cache[key]
+        shard = self._shard(key)
+        now = time.time()
+        with shard.lock:
+            item = shard.data.get(key)
+            if item is None:
+                shard.misses += 1
+                return None
             
-            return None
+            # Проверяем TTL
+            if item.expires_at <= now:
+                shard.remove(key)
+                shard.expirations += 1
+                shard.misses += 1
+                return None
+            
+            # Продлеваем срок жизни и перемещаем в конец (LRU)
+            if self.sliding_ttl:
+                item.expires_at = now + item.ttl
+            shard.data.move_to_end(key)
+            shard.hits += 1
+            return item.value
     
-    def set(self, key: str, value: Any):
-        """Сохранить значение в кэш"""
-        with self.lock:
-            # Если кэш переполнен, удаляем самый старый элемент
-            if len(self.cache) >= self.max_size:
-                oldest_key = next(iter(self.cache))
-                del self.cache[oldest_key]
-                del self.access_times[oldest_key]
+    def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        """
+        Сохранить значение в кэш
+        
+        Args:
+            key: Ключ
+            value: Значение
+            ttl: Время жизни записи (по умолчанию self.ttl)
+        """
+        ttl = self.ttl if ttl is None else ttl
+        weight = self.weigher(value) if self.weigher else 0
+        shard = self._shard(key)
+        
+        if shard.max_bytes is not None and weight > shard.max_bytes:
+            self.logger.debug(f"Значение для ключа {key} превышает лимит сегмента ({weight} байт)")
+            self.delete(key)
+            return
+        
+        seq = next(self._seq)
+        expires_at = time.time() + ttl
+        with shard.lock:
+            if key in shard.data:
+                shard.remove(key)
+            shard.data[key] = _CacheItem(value, ttl, expires_at, weight, seq)
+            shard.bytes += weight
+            heapq.heappush(shard.expiry_heap, (expires_at, seq, key))
             
-            self.cache[key] = value
-            self.access_times[key] = time.time()
+            # Вытесняем самые старые записи, пока не уложимся в лимиты
+            while len(shard.data) > shard.max_items or (
+                    shard.max_bytes is not None and shard.bytes > shard.max_bytes):
+                oldest_key = next(iter(shard.data))
+                shard.remove(oldest_key)
+                shard.evictions += 1
+    
+    def delete(self, key: str) -> bool:
+        """Удалить значение из кэша"""
+        shard = self._shard(key)
+        with shard.lock:
+            if key not in shard.data:
+                return False
+            shard.remove(key)
+            return True
+    
+    def expire(self, now: Optional[float] = None) -> int:
+        """
+        Удалить просроченные записи
+        
+        Returns:
+            int: Количество удаленных записей
+        """
+        now = time.time() if now is None else now
+        removed = 0
+        for shard in self._shards:
+            with shard.lock:
+                heap = shard.expiry_heap
+                while heap and heap[0][0] <= now:
+                    _, seq, key = heapq.heappop(heap)
+                    item = shard.data.get(key)
+                    if item is None or item.seq != seq:
+                        continue  # запись удалена или перезаписана
+                    if item.expires_at > now:
+                        # Срок продлен обращением - возвращаем в кучу с новым сроком
+                        heapq.heappush(heap, (item.expires_at, seq, key))
+                        continue
+                    shard.remove(key)
+                    shard.expirations += 1
+                    removed += 1
+                
+                # Куча копит записи удаленных и перезаписанных ключей: перестраиваем при разрастании
+                if len(heap) > 2 * len(shard.data) + self.MIN_SHARD_SIZE:
+                    shard.expiry_heap = [(item.expires_at, item.seq, k) for k, item in shard.data.items()]
+                    heapq.heapify(shard.expiry_heap)
+        return removed
+    
+    @staticmethod
+    def _expiry_loop(cache_ref, stop_event: threading.Event, interval: float):
+        """Фоновая очистка; поток завершается вместе с кэшем"""
+        while not stop_event.wait(interval):
+            cache = cache_ref()
+            if cache is None:
+                return
+            try:
+                cache.expire()
+            except Exception as e:
+                cache.logger.error(f"Ошибка очистки кэша: {e}")
+            del cache
+    
+    def close(self):
+        """Остановить фоновую очистку"""
+        self._stop_event.set()
     
     def clear(self):
         """Очистить кэш"""
-        with self.lock:
-            self.cache.clear()
-            self.access_times.clear()
+        for shard in self._shards:
+            with shard.lock:
+                shard.data.clear()
+                shard.expiry_heap.clear()
+                shard.bytes = 0
+    
+    def __len__(self) -> int:
+        return sum(len(shard.data) for shard in self._shards)
     
     def get_stats(self) -> Dict[str, Any]:
         """Получить статистику кэша"""
-        with self.lock:
-            return {
-                'size': len(self.cache),
-                'max_size': self.max_size,
-                'ttl': self.ttl
-            }
+        stats = {'size': 0, 'bytes': 0, 'hits': 0, 'misses': 0, 'evictions': 0, 'expirations': 0}
+        for shard in self._shards:
+            with shard.lock:
+                stats['size'] += len(shard.data)
+                stats['bytes'] += shard.bytes
+                stats['hits'] += shard.hits
+                stats['misses'] += shard.misses
+                stats['evictions'] += shard.evictions
+                stats['expirations'] += shard.expirations
+        
+        lookups = stats['hits'] + stats['misses']
+        stats.update({
+            'max_size': self.max_size,
+            'max_bytes': self.max_bytes,
+            'ttl': self.ttl,
+            'shards': self.num_shards,
+            'hit_rate': stats['hits'] / lookups if lookups else 0.0
+        })
+        return stats
 
 
 class LoadBalancer:
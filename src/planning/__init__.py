@@ -9,6 +9,7 @@ from .task_scheduler import (
     TaskPriority,
     TaskStatus,
     RecurrenceType,
+    MisfirePolicy,
     Task,
     RecurringTask,
     Schedule,
@@ -19,17 +20,20 @@ from .task_scheduler import (
     get_schedule_manager,
     get_planning_manager
 )
+from .recurring_scheduler import RecurringScheduler
 
 __all__ = [
     'TaskPriority',
     'TaskStatus',
     'RecurrenceType',
+    'MisfirePolicy',
     'Task',
     'RecurringTask',
     'Schedule',
     'TaskManager',
     'ScheduleManager',
     'PlanningManager',
+    'RecurringScheduler',
     'get_task_manager',
     'get_schedule_manager',
     'get_planning_manager'
@@ -0,0 +1,458 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Daur-AI: Планировщик повторяющихся задач
+Запуск RecurringTask по расписанию одним фоновым потоком
+
+Сроки всех повторяющихся задач хранятся в одной куче. Поток спит до
+ближайшего срока (или до изменения расписания), затем за один проход
+забирает все наступившие сроки, создает для них задачи в TaskManager и
+отдает их действия пулу потоков. Поэтому тысячи повторяющихся задач не
+требуют отдельных потоков и периодического опроса.
+"""
+
+import calendar
+import heapq
+import itertools
+import logging
+import random
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Any, Callable, Deque, Dict, Iterable, List, Optional, Tuple
+
+from .task_scheduler import (
+    MisfirePolicy,
+    RecurrenceType,
+    RecurringTask,
+    Task,
+    TaskManager,
+    TaskStatus
+)
+
+
+def _add_months(moment: datetime, months: int, day: int) -> datetime:
+    """Сдвинуть дату на N месяцев, сохраняя день (с поправкой на длину месяца)"""
+    total = moment.month - 1 + months
+    year = moment.year + total // 12
+    month = total % 12 + 1
+    return moment.replace(year=year, month=month, day=min(day, calendar.monthrange(year, month)[1]))
+
+
+def _fixed_period(recurring_task: RecurringTask) -> Optional[timedelta]:
+    """Период повторения постоянной длины (None для месяцев и лет)"""
+    interval = max(recurring_task.interval, 1)
+    if recurring_task.recurrence_type == RecurrenceType.DAILY:
+        return timedelta(days=interval)
+    if recurring_task.recurrence_type == RecurrenceType.WEEKLY:
+        return timedelta(weeks=interval)
+    if recurring_task.recurrence_type == RecurrenceType.CUSTOM:
+        return timedelta(seconds=interval)
+    return None
+
+
+def first_occurrence(recurring_task: RecurringTask) -> datetime:
+    """
+    Первый срок запуска повторяющейся задачи
+
+    Args:
+        recurring_task: Повторяющаяся задача
+
+    Returns:
+        datetime: Ближайшее время time_of_day не раньше start_date
+                  (для CUSTOM - сама start_date)
+    """
+    start = recurring_task.start_date
+    if recurring_task.recurrence_type == RecurrenceType.CUSTOM:
+        return start
+
+    hour, minute = (int(part) for part in recurring_task.time_of_day.split(':'))
+    first = start.replace(hour=hour, minute=minute, second=0, microsecond=0)
+    if first < start:
+        first += timedelta(days=1)
+    return first
+
+
+def next_occurrence(recurring_task: RecurringTask, moment: datetime) -> Optional[datetime]:
+    """
+    Срок запуска, следующий за moment
+
+    Args:
+        recurring_task: Повторяющаяся задача
+        moment: Текущий срок
+
+    Returns:
+        Optional[datetime]: Следующий срок или None (однократная задача)
+    """
+    recurrence_type = recurring_task.recurrence_type
+    if recurrence_type == RecurrenceType.ONCE:
+        return None
+
+    period = _fixed_period(recurring_task)
+    if period is not None:
+        return moment + period
+
+    months = max(recurring_task.interval, 1)
+    if recurrence_type == RecurrenceType.YEARLY:
+        months *= 12
+    # День месяца берется из первого срока: при start_date позже time_of_day
+    # он уже на следующий день после start_date
+    return _add_months(moment, months, first_occurrence(recurring_task).day)
+
+
+def next_occurrence_after(recurring_task: RecurringTask, moment: datetime,
+                          now: datetime) -> Optional[datetime]:
+    """Первый срок после now в последовательности, начинающейся с moment"""
+    period = _fixed_period(recurring_task)
+    if period is not None:
+        if moment > now:
+            return moment
+        return moment + period * ((now - moment) // period + 1)
+
+    while moment is not None and moment <= now:
+        moment = next_occurrence(recurring_task, moment)
+    return moment
+
+
+class RecurringScheduler:
+    """Планировщик повторяющихся задач TaskManager
+
+    Для каждого наступившего срока создается задача TaskManager с ID
+    '<task_id>@<срок>'. Если у повторяющейся задачи есть action, задача
+    выполняется в пуле потоков, иначе остается в очереди готовых задач.
+
+    Запуск, опоздавший больше чем на misfire_grace_time (например, после
+    сна компьютера), считается пропущенным и обрабатывается по
+    misfire_policy. jitter сдвигает фактический запуск на случайное время,
+    не меняя плановые сроки, чтобы задачи с одинаковым расписанием не
+    запускались одновременно.
+
+    Завершенные задачи запусков (completed, failed, cancelled) удаляются из
+    TaskManager: остаются keep_runs последних на каждую повторяющуюся
+    задачу, и не старше keep_for по плановому сроку. Незавершенные задачи
+    не удаляются.
+    """
+
+    # Статусы задач запусков, которые можно удалить
+    FINISHED_STATUSES = (TaskStatus.COMPLETED, TaskStatus.FAILED, TaskStatus.CANCELLED)
+
+    # Максимальный сон потока: защита от перевода системных часов
+    MAX_SLEEP = 60.0
+
+    # Доля устаревших записей кучи, при которой она перестраивается
+    COMPACT_RATIO = 0.5
+
+    def __init__(self, task_manager: TaskManager, max_workers: int = 4,
+                 max_catchup: int = 100, clock: Callable[[], datetime] = datetime.now,
+                 keep_runs: Optional[int] = 100, keep_for: Optional[timedelta] = None):
+        """
+        Args:
+            task_manager: Менеджер задач (его повторяющиеся задачи ставятся в расписание)
+            max_workers: Размер пула для действий задач
+            max_catchup: Максимум догоняющих запусков за раз для MisfirePolicy.FIRE_ALL
+            clock: Источник текущего времени
+            keep_runs: Сколько последних завершенных запусков хранить (None - все)
+            keep_for: Сколько хранить завершенные запуски (None - без ограничения)
+        """
+        self.task_manager = task_manager
+        self.max_workers = max_workers
+        self.max_catchup = max_catchup
+        self.clock = clock
+        self.keep_runs = keep_runs
+        self.keep_for = keep_for
+        # ID задач запусков каждой повторяющейся задачи, от старых к новым
+        self._runs: Dict[str, Deque[str]] = {}
+        self.logger = logging.getLogger('daur_ai.recurring_scheduler')
+        self.condition = threading.Condition()
+        self.running = False
+        self.scheduler_thread: Optional[threading.Thread] = None
+        self.executor: Optional[ThreadPoolExecutor] = None
+        self._heap: List[List[Any]] = []  # [срок с jitter, порядок, task_id, плановый срок]
+        self._entries: Dict[str, List[Any]] = {}
+        self._stale_entries = 0
+        self._sequence = itertools.count()
+        self._random = random.Random()
+        self.stats = {
+            'fired': 0,
+            'missed': 0,
+            'coalesced': 0,
+            'failed': 0,
+            'wakeups': 0,
+            'pruned': 0,
+            'max_lag': 0.0
+        }
+
+        task_manager.recurring_scheduler = self
+        with task_manager.lock:
+            recurring_tasks = list(task_manager.recurring_tasks.values())
+        for recurring_task in recurring_tasks:
+            self.schedule(recurring_task)
+
+    def schedule(self, recurring_task: RecurringTask):
+        """
+        Поставить повторяющуюся задачу в расписание (или обновить ее срок)
+
+        Args:
+            recurring_task: Повторяющаяся задача
+        """
+        if recurring_task.run_count == 0 and recurring_task.last_run is None:
+            recurring_task.next_occurrence = first_occurrence(recurring_task)
+        with self.condition:
+            self._push(recurring_task, recurring_task.next_occurrence)
+
+    def unschedule(self, task_id: str) -> bool:
+        """
+        Убрать повторяющуюся задачу из расписания
+
+        Args:
+            task_id: ID повторяющейся задачи
+
+        Returns:
+            bool: Была ли задача в расписании
+        """
+        with self.condition:
+            self._runs.pop(task_id, None)
+            return self._discard(task_id)
+
+    def _push(self, recurring_task: RecurringTask, nominal: Optional[datetime]):
+        self._discard(recurring_task.task_id)
+        if nominal is None or (recurring_task.end_date and nominal > recurring_task.end_date):
+            self.logger.info(f"Повторения задачи завершены: {recurring_task.task_id}")
+            return
+
+        recurring_task.next_occurrence = nominal
+        due = nominal
+        if recurring_task.jitter > 0:
+            due += timedelta(seconds=self._random.uniform(0, recurring_task.jitter))
+        entry = [due, next(self._sequence), recurring_task.task_id, nominal]
+        self._entries[recurring_task.task_id] = entry
+        heapq.heappush(self._heap, entry)
+        self.condition.notify()
+
+    def _discard(self, task_id: str) -> bool:
+        """Пометить запись кучи устаревшей (удаляется лениво)"""
+        entry = self._entries.pop(task_id, None)
+        if entry is None:
+            return False
+        entry[2] = None
+        self._stale_entries += 1
+        if self._stale_entries > len(self._heap) * self.COMPACT_RATIO:
+            self._heap = [entry for entry in self._heap if entry[2] is not None]
+            heapq.heapify(self._heap)
+            self._stale_entries = 0
+        return True
+
+    def _peek(self) -> Optional[List[Any]]:
+        while self._heap and self._heap[0][2] is None:
+            heapq.heappop(self._heap)
+            self._stale_entries -= 1
+        return self._heap[0] if self._heap else None
+
+    def _occurrences(self, recurring_task: RecurringTask, nominal: datetime,
+                     now: datetime, lag: float) -> List[datetime]:
+        """Плановые сроки, которые нужно запустить для наступившей записи"""
+        if not recurring_task.enabled:
+            return []
+        if lag <= recurring_task.misfire_grace_time:
+            self.stats['max_lag'] = max(self.stats['max_lag'], lag)
+            return [nominal]
+
+        policy = recurring_task.misfire_policy
+        self.logger.warning(f"Пропущен запуск {recurring_task.task_id} ({nominal.isoformat()}), "
+                            f"политика {policy.value}")
+        if policy == MisfirePolicy.SKIP:
+            self.stats['missed'] += 1
+            return []
+        if policy == MisfirePolicy.FIRE_ONCE:
+            self.stats['coalesced'] += 1
+            return [nominal]
+
+        occurrences = []
+        moment = nominal
+        while (moment is not None and moment <= now and len(occurrences) < self.max_catchup
+               and not (recurring_task.end_date and moment > recurring_task.end_date)):
+            occurrences.append(moment)
+            moment = next_occurrence(recurring_task, moment)
+        return occurrences
+
+    def run_pending(self, now: Optional[datetime] = None) -> int:
+        """
+        Запустить все наступившие сроки
+
+        Вызывается фоновым потоком; можно вызывать и напрямую (без start),
+        тогда действия выполняются в вызывающем потоке.
+
+        Args:
+            now: Текущее время (по умолчанию clock())
+
+        Returns:
+            int: Число созданных задач
+        """
+        now = now or self.clock()
+        batch: List[Tuple[RecurringTask, datetime]] = []
+
+        with self.condition:
+            while True:
+                entry = self._peek()
+                if entry is None or entry[0] > now:
+                    break
+
+                due, _, task_id, nominal = heapq.heappop(self._heap)
+                del self._entries[task_id]
+                recurring_task = self.task_manager.recurring_tasks.get(task_id)
+                if recurring_task is None:
+                    continue
+
+                lag = (now - due).total_seconds()
+                occurrences = self._occurrences(recurring_task, nominal, now, lag)
+                batch.extend((recurring_task, moment) for moment in occurrences)
+
+                if lag <= recurring_task.misfire_grace_time:
+                    following = next_occurrence(recurring_task, nominal)
+                else:
+                    following = next_occurrence_after(recurring_task, nominal, now)
+                self._push(recurring_task, following)
+
+        if batch:
+            self._materialize(batch, now)
+        return len(batch)
+
+    def _materialize(self, batch: List[Tuple[RecurringTask, datetime]], now: datetime):
+        """Создать задачи для пачки сроков и запустить их действия"""
+        created: List[Tuple[RecurringTask, Task]] = []
+        with self.task_manager.lock:
+            for recurring_task, nominal in batch:
+                task = self.task_manager.create_task(
+                    f"{recurring_task.task_id}@{nominal.isoformat(timespec='seconds')}",
+                    recurring_task.title, recurring_task.description,
+                    recurring_task.priority, due_date=nominal
+                )
+                recurring_task.last_run = now
+                recurring_task.run_count += 1
+                created.append((recurring_task, task))
+
+        with self.condition:
+            self.stats['fired'] += len(created)
+            for recurring_task, task in created:
+                self._runs.setdefault(recurring_task.task_id, deque()).append(task.task_id)
+
+        for recurring_task, task in created:
+            if recurring_task.action is None:
+                continue
+            if self.executor is not None:
+                self.executor.submit(self._run_action, recurring_task, task)
+            else:
+                self._run_action(recurring_task, task)
+
+        # Действия из пула завершатся позже - их задачи удалятся при следующих запусках
+        self.prune({recurring_task.task_id for recurring_task, _ in created}, now)
+
+    def prune(self, task_ids: Optional[Iterable[str]] = None, now: Optional[datetime] = None) -> int:
+        """
+        Удалить из TaskManager завершенные запуски сверх keep_runs и старше keep_for
+
+        Args:
+            task_ids: ID повторяющихся задач (по умолчанию все)
+            now: Текущее время (по умолчанию clock())
+
+        Returns:
+            int: Число удаленных задач
+        """
+        if self.keep_runs is None and self.keep_for is None:
+            return 0
+        now = now or self.clock()
+        cutoff = now - self.keep_for if self.keep_for is not None else None
+        removed = []
+
+        with self.task_manager.lock, self.condition:
+            for task_id in list(self._runs) if task_ids is None else task_ids:
+                runs = self._runs.get(task_id)
+                if not runs:
+                    continue
+                tasks = self.task_manager.tasks
+                finished = [run_id for run_id in runs
+                            if run_id in tasks and tasks[run_id].status in self.FINISHED_STATUSES]
+                excess = len(finished) - self.keep_runs if self.keep_runs is not None else 0
+                expired = set(finished[:max(0, excess)])
+                if cutoff is not None:
+                    expired.update(run_id for run_id in finished
+                                   if tasks[run_id].due_date and tasks[run_id].due_date < cutoff)
+                kept = deque(run_id for run_id in runs if run_id in tasks and run_id not in expired)
+                self._runs[task_id] = kept
+                removed.extend(expired)
+            self.stats['pruned'] += len(removed)
+
+            for run_id in removed:
+                self.task_manager.remove_task(run_id)
+        return len(removed)
+
+    def _run_action(self, recurring_task: RecurringTask, task: Task):
+        self.task_manager.update_task_status(task.task_id, TaskStatus.RUNNING)
+        try:
+            recurring_task.action(task)
+            self.task_manager.update_task_status(task.task_id, TaskStatus.COMPLETED, progress=100)
+
+        except Exception as e:
+            self.logger.error(f"Ошибка повторяющейся задачи {task.task_id}: {e}")
+            self.task_manager.update_task_status(task.task_id, TaskStatus.FAILED, error=str(e))
+            with self.condition:
+                self.stats['failed'] += 1
+
+    def start(self):
+        """Запустить фоновый поток планировщика"""
+        with self.condition:
+            if self.running:
+                return
+            self.running = True
+
+        self.executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                           thread_name_prefix='daur-recurring')
+        self.scheduler_thread = threading.Thread(target=self._scheduler_loop, daemon=True)
+        self.scheduler_thread.start()
+        self.logger.info("Планировщик повторяющихся задач запущен")
+
+    def stop(self):
+        """Остановить планировщик и дождаться выполняемых действий"""
+        with self.condition:
+            self.running = False
+            self.condition.notify_all()
+
+        if self.scheduler_thread:
+            self.scheduler_thread.join(timeout=5)
+            self.scheduler_thread = None
+        if self.executor:
+            self.executor.shutdown(wait=True)
+            self.executor = None
+        self.logger.info("Планировщик повторяющихся задач остановлен")
+
+    def _scheduler_loop(self):
+        """Основной цикл: сон до ближайшего срока, затем обработка всех наступивших"""
+        while True:
+            with self.condition:
+                if not self.running:
+                    break
+                entry = self._peek()
+                delay = self.MAX_SLEEP if entry is None else (entry[0] - self.clock()).total_seconds()
+                if delay > 0:
+                    # Пробуждение раньше срока - при изменении расписания или остановке
+                    self.condition.wait(timeout=min(delay, self.MAX_SLEEP))
+                    continue
+                self.stats['wakeups'] += 1
+
+            try:
+                self.run_pending()
+            except Exception as e:
+                self.logger.error(f"Ошибка планировщика повторяющихся задач: {e}")
+
+    def get_status(self) -> Dict[str, Any]:
+        """Получить статус планировщика"""
+        with self.condition:
+            entry = self._peek()
+            return {
+                'running': self.running,
+                'scheduled': len(self._entries),
+                'next_due': entry[0].isoformat() if entry else None,
+                **self.stats
+            }
@@ -10,10 +10,14 @@ Daur-AI: Модуль планирования и управления зада
 Автор: Manus AI
 """
 
+import bisect
+import itertools
 import logging
 import json
+import threading
 import time
-from typing import Dict, List, Any, Optional, Callable
+from collections import defaultdict
+from typing import Dict, List, Any, Optional, Callable, Set, Tuple
 from pathlib import Path
 from enum import Enum
 from dataclasses import dataclass, field
@@ -51,6 +55,13 @@ class RecurrenceType(Enum):
     CUSTOM = "custom"
 
 
+class MisfirePolicy(Enum):
+    """Поведение при пропущенных запусках повторяющейся задачи"""
+    FIRE_ONCE = "fire_once"  # один запуск вместо всех пропущенных
+    FIRE_ALL = "fire_all"  # запустить каждый пропущенный
+    SKIP = "skip"  # пропустить и ждать следующего срока
+
+
 @dataclass
 class Task:
     """Задача"""
@@ -85,11 +96,17 @@ class RecurringTask:
     recurrence_type: RecurrenceType = RecurrenceType.DAILY
     start_date: datetime = field(default_factory=datetime.now)
     end_date: Optional[datetime] = None
-    interval: int = 1  # каждый N дней/недель/месяцев
+    interval: int = 1  # каждый N дней/недель/месяцев (для CUSTOM - секунд)
     time_of_day: str = "09:00"  # HH:MM
     created_at: datetime = field(default_factory=datetime.now)
     enabled: bool = True
     next_occurrence: datetime = field(default_factory=datetime.now)
+    misfire_policy: MisfirePolicy = MisfirePolicy.FIRE_ONCE
+    misfire_grace_time: float = 60.0  # опоздание в секундах, не считающееся пропуском
+    jitter: float = 0.0  # случайная задержка запуска до N секунд
+    action: Optional[Callable[[Task], Any]] = None
+    last_run: Optional[datetime] = None
+    run_count: int = 0
 
 
 @dataclass
@@ -104,7 +121,21 @@ class Schedule:
 
 
 class TaskManager:
-    """Менеджер задач"""
+    """Менеджер задач
+    
+    Задачи проиндексированы по статусу, приоритету и сроку выполнения.
+    Очередь task_queue содержит только готовые задачи - в статусе PENDING,
+    все зависимости которых выполнены. Счетчики невыполненных зависимостей
+    обновляются в update_task_status, поэтому задача попадает в очередь в
+    момент завершения последней зависимости. Устаревшие записи очереди
+    удаляются лениво, а при их накоплении куча перестраивается.
+    
+    Статус, приоритет и срок задачи следует менять через методы менеджера,
+    иначе индексы разойдутся с задачами.
+    """
+    
+    # Доля устаревших записей очереди, при которой куча перестраивается
+    COMPACT_RATIO = 0.5
     
     def __init__(self):
         """Инициализация"""
@@ -112,84 +143,260 @@ class TaskManager:
         self.tasks: Dict[str, Task] = {}
         self.recurring_tasks: Dict[str, RecurringTask] = {}
         self.schedules: Dict[str, Schedule] = {}
-        self.task_queue: List[Tuple[int, str]] = []  # Приоритетная очередь
+        self.task_queue: List[List[Any]] = []  # Готовые задачи: [приоритет, порядок, task_id]
+        self._queued: Dict[str, List[Any]] = {}
+        self._stale_entries = 0
+        self._sequence = itertools.count()
+        self._by_status: Dict[TaskStatus, Dict[str, Task]] = {status: {} for status in TaskStatus}
+        self._by_priority: Dict[TaskPriority, Dict[str, Task]] = {priority: {} for priority in TaskPriority}
+        self._due_index: List[Tuple[datetime, str]] = []  # Незавершенные задачи со сроком
+        self._blockers: Dict[str, int] = {}  # Число невыполненных зависимостей
+        self._dependents: Dict[str, Set[str]] = defaultdict(set)
+        self.lock = threading.RLock()
+        self.recurring_scheduler = None  # RecurringScheduler, если подключен
     
     def create_task(self, task_id: str, title: str, description: str = "",
                    priority: TaskPriority = TaskPriority.NORMAL,
-                   due_date: Optional[datetime] = None) -> Task:
+                   due_date: Optional[datetime] = None,
+                   dependencies: Optional[List[str]] = None) -> Task:
         """
         Создать задачу
         
+        Задача с существующим ID заменяется: зависимые от нее задачи
+        сохраняют зависимость и ждут выполнения новой задачи.
+        
         Args:
             task_id: ID задачи
             title: Название
             description: Описание
             priority: Приоритет
             due_date: Срок выполнения
+            dependencies: ID задач, которые должны быть выполнены раньше
             
         Returns:
             Task: Объект задачи
         """
-        task = Task(task_id, title, description, priority, due_date=due_date)
-        self.tasks[task_id] = task
+        with self.lock:
+            dependents: Set[str] = set()
+            if task_id in self.tasks:
+                # Отсоединяем зависимые задачи, чтобы remove_task их не разблокировал
+                dependents = self._dependents.pop(task_id, set())
+                replaced_completed = self.tasks[task_id].status == TaskStatus.COMPLETED
+                self.remove_task(task_id)
+                if replaced_completed:
+                    for dependent_id in dependents:
+                        self._block(self.tasks[dependent_id])
+            
+            task = Task(task_id, title, description, priority, due_date=due_date)
+            self.tasks[task_id] = task
+            self._by_status[task.status][task_id] = task
+            self._by_priority[priority][task_id] = task
+            if due_date:
+                bisect.insort(self._due_index, (due_date, task_id))
+            self._blockers[task_id] = 0
+            if dependents:
+                self._dependents[task_id] = dependents
+            
+            for dependency_id in dependencies or []:
+                self.add_dependency(task_id, dependency_id)
+            
+            # Добавляем в приоритетную очередь, если задача готова
+            self._enqueue(task)
+            
+            self.logger.info(f"Задача создана: {task_id}")
+            return task
+    
+    def remove_task(self, task_id: str) -> bool:
+        """
+        Удалить задачу
         
-        # Добавляем в приоритетную очередь
-        heapq.heappush(self.task_queue, (priority.value, task_id))
+        Зависимые задачи перестают ждать удаленную задачу.
         
-        self.logger.info(f"Задача создана: {task_id}")
-        return task
+        Args:
+            task_id: ID задачи
+            
+        Returns:
+            bool: Успешность операции
+        """
+        with self.lock:
+            task = self.tasks.pop(task_id, None)
+            if task is None:
+                return False
+            
+            self._dequeue(task_id)
+            del self._by_status[task.status][task_id]
+            del self._by_priority[task.priority][task_id]
+            self._unindex_due(task)
+            
+            for dependency_id in task.dependencies:
+                self._dependents[dependency_id].discard(task_id)
+            for dependent_id in self._dependents.pop(task_id, set()):
+                dependent = self.tasks[dependent_id]
+                dependent.dependencies = [d for d in dependent.dependencies if d != task_id]
+                if task.status != TaskStatus.COMPLETED:
+                    self._unblock(dependent)
+            del self._blockers[task_id]
+            
+            self.logger.info(f"Задача удалена: {task_id}")
+            return True
     
     def create_recurring_task(self, task_id: str, title: str,
                              recurrence_type: RecurrenceType = RecurrenceType.DAILY,
-                             description: str = "") -> RecurringTask:
+                             description: str = "",
+                             priority: TaskPriority = TaskPriority.NORMAL,
+                             interval: int = 1, time_of_day: str = "09:00",
+                             start_date: Optional[datetime] = None,
+                             end_date: Optional[datetime] = None,
+                             action: Optional[Callable[[Task], Any]] = None,
+                             misfire_policy: MisfirePolicy = MisfirePolicy.FIRE_ONCE,
+                             misfire_grace_time: float = 60.0,
+                             jitter: float = 0.0) -> RecurringTask:
         """
         Создать повторяющуюся задачу
         
+        Если к менеджеру подключен RecurringScheduler, задача сразу
+        ставится в его расписание.
+        
         Args:
             task_id: ID задачи
             title: Название
             recurrence_type: Тип повторения
             description: Описание
+            priority: Приоритет создаваемых задач
+            interval: Каждый N дней/недель/месяцев/лет (для CUSTOM - секунд)
+            time_of_day: Время запуска HH:MM (кроме CUSTOM)
+            start_date: Начало повторений (по умолчанию сейчас)
+            end_date: Конец повторений
+            action: Функция, выполняемая для каждого запуска
+            misfire_policy: Поведение при пропущенных запусках
+            misfire_grace_time: Допустимое опоздание запуска в секундах
+            jitter: Случайная задержка запуска до N секунд
             
         Returns:
             RecurringTask: Объект повторяющейся задачи
         """
-        recurring_task = RecurringTask(task_id, title, description, recurrence_type=recurrence_type)
-        self.recurring_tasks[task_id] = recurring_task
+        recurring_task = RecurringTask(
+            task_id, title, description, priority=priority, recurrence_type=recurrence_type,
+            start_date=start_date or datetime.now(), end_date=end_date, interval=interval,
+            time_of_day=time_of_day, action=action, misfire_policy=misfire_policy,
+            misfire_grace_time=misfire_grace_time, jitter=jitter
+        )
+        with self.lock:
+            self.recurring_tasks[task_id] = recurring_task
+        if self.recurring_scheduler is not None:
+            self.recurring_scheduler.schedule(recurring_task)
         self.logger.info(f"Повторяющаяся задача создана: {task_id}")
         return recurring_task
     
+    def remove_recurring_task(self, task_id: str) -> bool:
+        """
+        Удалить повторяющуюся задачу (уже созданные задачи остаются)
+        
+        Args:
+            task_id: ID повторяющейся задачи
+            
+        Returns:
+            bool: Успешность операции
+        """
+        with self.lock:
+            recurring_task = self.recurring_tasks.pop(task_id, None)
+        if recurring_task is None:
+            return False
+        if self.recurring_scheduler is not None:
+            self.recurring_scheduler.unschedule(task_id)
+        return True
+    
     def update_task_status(self, task_id: str, status: TaskStatus,
                           progress: int = 0, error: Optional[str] = None):
         """
         Обновить статус задачи
         
+        Завершение задачи уменьшает счетчики зависимостей ожидающих ее
+        задач и ставит готовые из них в очередь.
+        
         Args:
             task_id: ID задачи
             status: Новый статус
             progress: Прогресс (0-100)
             error: Ошибка
         """
-        if task_id not in self.tasks:
-            self.logger.error(f"Задача не найдена: {task_id}")
-            return
-        
-        task = self.tasks[task_id]
-        task.status = status
-        task.progress = progress
-        
-        if status == TaskStatus.RUNNING and not task.started_at:
-            task.started_at = datetime.now()
-        
-        if status == TaskStatus.COMPLETED:
-            task.completed_at = datetime.now()
-            if task.started_at:
-                task.actual_duration = int((task.completed_at - task.started_at).total_seconds() / 60)
-        
-        if error:
-            task.error = error
+        with self.lock:
+            if task_id not in self.tasks:
+                self.logger.error(f"Задача не найдена: {task_id}")
+                return
+            
+            task = self.tasks[task_id]
+            previous = task.status
+            task.status = status
+            task.progress = progress
+            
+            if status == TaskStatus.RUNNING and not task.started_at:
+                task.started_at = datetime.now()
+            
+            if status == TaskStatus.COMPLETED:
+                task.completed_at = datetime.now()
+                if task.started_at:
+                    task.actual_duration = int((task.completed_at - task.started_at).total_seconds() / 60)
+            
+            if error:
+                task.error = error
+            
+            if status != previous:
+                del self._by_status[previous][task_id]
+                self._by_status[status][task_id] = task
+                
+                if status == TaskStatus.PENDING:
+                    self._enqueue(task)
+                else:
+                    self._dequeue(task_id)
+                
+                if status == TaskStatus.COMPLETED:
+                    self._unindex_due(task)
+                    for dependent_id in self._dependents.get(task_id, ()):
+                        self._unblock(self.tasks[dependent_id])
+                elif previous == TaskStatus.COMPLETED:
+                    # Задача возвращена в работу: зависимые снова ее ждут
+                    if task.due_date:
+                        bisect.insort(self._due_index, (task.due_date, task_id))
+                    for dependent_id in self._dependents.get(task_id, ()):
+                        self._block(self.tasks[dependent_id])
+            
+            self.logger.info(f"Статус задачи обновлен: {task_id} -> {status.value}")
+    
+    def update_task(self, task_id: str, priority: Optional[TaskPriority] = None,
+                    due_date: Optional[datetime] = None) -> bool:
+        """
+        Изменить приоритет или срок задачи
         
-        self.logger.info(f"Статус задачи обновлен: {task_id} -> {status.value}")
+        Args:
+            task_id: ID задачи
+            priority: Новый приоритет
+            due_date: Новый срок выполнения
+            
+        Returns:
+            bool: Успешность операции
+        """
+        with self.lock:
+            if task_id not in self.tasks:
+                self.logger.error(f"Задача не найдена: {task_id}")
+                return False
+            
+            task = self.tasks[task_id]
+            if priority is not None and priority != task.priority:
+                del self._by_priority[task.priority][task_id]
+                task.priority = priority
+                self._by_priority[priority][task_id] = task
+                if task_id in self._queued:
+                    self._dequeue(task_id)
+                    self._enqueue(task)
+            
+            if due_date is not None and due_date != task.due_date:
+                self._unindex_due(task)
+                task.due_date = due_date
+                if task.status != TaskStatus.COMPLETED:
+                    bisect.insort(self._due_index, (due_date, task_id))
+            
+            return True
     
     def add_subtask(self, parent_task_id: str, subtask_id: str) -> bool:
         """
@@ -223,36 +430,121 @@ class TaskManager:
             dependency_id: ID зависимой задачи
             
         Returns:
-            bool: Успешность операции
+            bool: Успешность операции (False и для зависимости, образующей цикл)
         """
-        if task_id not in self.tasks:
-            self.logger.error(f"Задача не найдена: {task_id}")
-            return False
-        
-        if dependency_id not in self.tasks:
-            self.logger.error(f"Зависимая задача не найдена: {dependency_id}")
-            return False
-        
-        self.tasks[task_id].dependencies.append(dependency_id)
-        self.logger.info(f"Зависимость добавлена: {task_id} зависит от {dependency_id}")
-        return True
+        with self.lock:
+            if task_id not in self.tasks:
+                self.logger.error(f"Задача не найдена: {task_id}")
+                return False
+            
+            if dependency_id not in self.tasks:
+                self.logger.error(f"Зависимая задача не найдена: {dependency_id}")
+                return False
+            
+            task = self.tasks[task_id]
+            if dependency_id in task.dependencies:
+                return True
+            
+            if self._depends_on(dependency_id, task_id):
+                self.logger.error(f"Циклическая зависимость: {dependency_id} уже зависит от {task_id}")
+                return False
+            
+            task.dependencies.append(dependency_id)
+            self._dependents[dependency_id].add(task_id)
+            if self.tasks[dependency_id].status != TaskStatus.COMPLETED:
+                self._block(task)
+            self.logger.info(f"Зависимость добавлена: {task_id} зависит от {dependency_id}")
+            return True
+    
+    def _depends_on(self, task_id: str, dependency_id: str) -> bool:
+        """Зависит ли задача (транзитивно) от dependency_id"""
+        stack = [task_id]
+        seen = set()
+        while stack:
+            current = stack.pop()
+            if current == dependency_id:
+                return True
+            if current in seen:
+                continue
+            seen.add(current)
+            stack.extend(self.tasks[current].dependencies)
+        return False
+    
+    def _block(self, task: Task):
+        self._blockers[task.task_id] += 1
+        self._dequeue(task.task_id)
+    
+    def _unblock(self, task: Task):
+        self._blockers[task.task_id] -= 1
+        self._enqueue(task)
+    
+    def _enqueue(self, task: Task):
+        """Поставить задачу в очередь, если она ожидает и ее зависимости выполнены"""
+        if (task.status != TaskStatus.PENDING or self._blockers[task.task_id]
+                or task.task_id in self._queued):
+            return
+        entry = [task.priority.value, next(self._sequence), task.task_id]
+        self._queued[task.task_id] = entry
+        heapq.heappush(self.task_queue, entry)
+    
+    def _dequeue(self, task_id: str):
+        """Пометить запись очереди устаревшей (удаляется из кучи лениво)"""
+        entry = self._queued.pop(task_id, None)
+        if entry is None:
+            return
+        entry[-1] = None
+        self._stale_entries += 1
+        if self._stale_entries > len(self.task_queue) * self.COMPACT_RATIO:
+            self._compact_queue()
+    
+    def _compact_queue(self):
+        """Перестроить кучу без устаревших записей"""
+        self.task_queue = [entry for entry in self.task_queue if entry[-1] is not None]
+        heapq.heapify(self.task_queue)
+        self._stale_entries = 0
+    
+    def _unindex_due(self, task: Task):
+        if not task.due_date:
+            return
+        key = (task.due_date, task.task_id)
+        index = bisect.bisect_left(self._due_index, key)
+        if index < len(self._due_index) and self._due_index[index] == key:
+            del self._due_index[index]
     
     def get_next_task(self) -> Optional[Task]:
         """
         Получить следующую задачу из очереди
         
+        Возвращается готовая задача с наивысшим приоритетом (при равном
+        приоритете - поставленная в очередь раньше); задача извлекается из
+        очереди и вернется в нее только после повторного перехода в PENDING.
+        
         Returns:
             Optional[Task]: Следующая задача или None
         """
-        while self.task_queue:
-            _, task_id = heapq.heappop(self.task_queue)
+        with self.lock:
+            while self.task_queue:
+                entry = heapq.heappop(self.task_queue)
+                task_id = entry[-1]
+                if task_id is None:
+                    self._stale_entries -= 1
+                    continue
+                
+                del self._queued[task_id]
+                return self.tasks[task_id]
             
-            if task_id in self.tasks:
-                task = self.tasks[task_id]
-                if task.status == TaskStatus.PENDING:
-                    return task
+            return None
+    
+    def get_ready_tasks(self) -> List[Task]:
+        """
+        Получить готовые к выполнению задачи в порядке очереди
         
-        return None
+        Returns:
+            List[Task]: Список задач
+        """
+        with self.lock:
+            entries = sorted(entry for entry in self.task_queue if entry[-1] is not None)
+            return [self.tasks[entry[-1]] for entry in entries]
     
     def get_tasks_by_priority(self, priority: TaskPriority) -> List[Task]:
         """
@@ -264,20 +556,18 @@ class TaskManager:
         Returns:
             List[Task]: Список задач
         """
-        return [task for task in self.tasks.values() if task.priority == priority]
+        return list(self._by_priority[priority].values())
     
     def get_overdue_tasks(self) -> List[Task]:
         """
         Получить просроченные задачи
         
         Returns:
-            List[Task]: Список просроченных задач
+            List[Task]: Список просроченных задач (по возрастанию срока)
         """
-        now = datetime.now()
-        return [
-            task for task in self.tasks.values()
-            if task.due_date and task.due_date < now and task.status != TaskStatus.COMPLETED
-        ]
+        with self.lock:
+            end = bisect.bisect_left(self._due_index, (datetime.now(),))
+            return [self.tasks[task_id] for _, task_id in self._due_index[:end]]
     
     def get_tasks_by_status(self, status: TaskStatus) -> List[Task]:
         """
@@ -289,7 +579,7 @@ class TaskManager:
         Returns:
             List[Task]: Список задач
         """
-        return [task for task in self.tasks.values() if task.status == status]
+        return list(self._by_status[status].values())
     
     def get_task_progress(self, task_id: str) -> Dict[str, Any]:
         """
@@ -326,11 +616,12 @@ class TaskManager:
         """Получить статус менеджера"""
         return {
             'total_tasks': len(self.tasks),
-            'pending_tasks': len(self.get_tasks_by_status(TaskStatus.PENDING)),
-            'running_tasks': len(self.get_tasks_by_status(TaskStatus.RUNNING)),
-            'completed_tasks': len(self.get_tasks_by_status(TaskStatus.COMPLETED)),
-            'failed_tasks': len(self.get_tasks_by_status(TaskStatus.FAILED)),
-            'overdue_tasks': len(self.get_overdue_tasks()),
+            'pending_tasks': len(self._by_status[TaskStatus.PENDING]),
+            'ready_tasks': len(self._queued),
+            'running_tasks': len(self._by_status[TaskStatus.RUNNING]),
+            'completed_tasks': len(self._by_status[TaskStatus.COMPLETED]),
+            'failed_tasks': len(self._by_status[TaskStatus.FAILED]),
+            'overdue_tasks': bisect.bisect_left(self._due_index, (datetime.now(),)),
             'recurring_tasks': len(self.recurring_tasks)
         }
 
@@ -421,14 +712,17 @@ class PlanningManager:
     def __init__(self):
         """Инициализация"""
         self.task_manager = TaskManager()
+        from .recurring_scheduler import RecurringScheduler
         self.schedule_manager = ScheduleManager(self.task_manager)
+        self.recurring_scheduler = RecurringScheduler(self.task_manager)
         self.logger = logging.getLogger('daur_ai.planning_manager')
     
     def get_status(self) -> Dict[str, Any]:
         """Получить статус менеджера"""
         return {
             'tasks': self.task_manager.get_status(),
-            'schedules': len(self.schedule_manager.schedules)
+            'schedules': len(self.schedule_manager.schedules),
+            'recurring_scheduler': self.recurring_scheduler.get_status()
         }
 
 
@@ -15,11 +15,14 @@ import time
 import logging
 import threading
 from typing import Dict, List, Tuple, Optional
-from collections import defaultdict, deque
+from collections import OrderedDict, defaultdict, deque
 from dataclasses import dataclass
 from datetime import datetime, timedelta
 from enum import Enum
 
+from src.caching.rate_limit_backend import MemoryRateLimitBackend, RateLimitBackend
+from src.security.traffic_sketch import WindowedHeavyHitters
+
 # Настройка логирования
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -39,6 +42,7 @@ class RateLimitRule:
     max_requests: int
     time_window: int  # в секундах
     action: str = "block"  # block, delay, challenge
+    algorithm: str = "sliding_window"  # sliding_window, token_bucket
 
 
 @dataclass
@@ -56,16 +60,26 @@ class IPInfo:
 class AdvancedRateLimiter:
     """Продвинутое ограничение частоты запросов"""
     
-    def __init__(self, max_history: int = 10000):
+    def __init__(self, max_history: int = 10000, backend: Optional[RateLimitBackend] = None,
+                 idle_timeout: Optional[float] = None):
         """
         Инициализация ограничителя
         
         Args:
-            max_history: Максимальный размер истории
+            max_history: Максимальное количество идентификаторов в трекерах
+                статистики (счетчики лимитов удаляются только после окна
+                неактивности, иначе лимит можно обойти сменой идентификаторов)
+            backend: Хранилище счетчиков (RedisRateLimitBackend - общий лимит
+                для нескольких процессов, по умолчанию - в памяти процесса)
+            idle_timeout: Время неактивности, после которого идентификатор
+                удаляется из трекеров (по умолчанию - наибольшее окно правил)
         """
         self.rules: Dict[str, RateLimitRule] = {}
-        self.ip_tracker: Dict[str, IPInfo] = {}
-        self.user_tracker: Dict[str, deque] = defaultdict(lambda: deque(maxlen=1000))
+        self.backend = backend or MemoryRateLimitBackend()
+        self.idle_timeout = idle_timeout
+        # Время последнего запроса по идентификатору в порядке обращения
+        self.ip_tracker: "OrderedDict[str, float]" = OrderedDict()
+        self.user_tracker: "OrderedDict[str, float]" = OrderedDict()
         self.blocked_ips: set = set()
         self.whitelist_ips: set = set()
         self.lock = threading.Lock()
@@ -146,40 +160,46 @@ class AdvancedRateLimiter:
             
             rule = self.rules[rule_name]
             
-            # Получаем трекер
-            if rule_name.startswith("ip_"):
-                tracker = self.ip_tracker.get(identifier, deque(maxlen=rule.max_requests * 2))
-            else:
-                tracker = self.user_tracker[identifier]
-            
-            # Текущее время
-            now = time.time()
-            
-            # Удаляем старые запросы
-            while tracker and tracker[0] < now - rule.time_window:
-                tracker.popleft()
-            
-            # Проверяем лимит
-            if len(tracker) >= rule.max_requests:
-                logger.warning(f"Rate limit exceeded for {identifier} on rule {rule_name}")
-                
-                # Блокируем IP если нужно
-                if ip_address:
-                    self.blocked_ips.add(ip_address)
-                    logger.warning(f"IP blocked: {ip_address}")
-                
-                return False, f"Rate limit exceeded for {rule_name}"
-            
-            # Добавляем текущий запрос
-            tracker.append(now)
-            
             # Обновляем трекер
-            if rule_name.startswith("ip_"):
-                self.ip_tracker[identifier] = tracker
-            else:
-                self.user_tracker[identifier] = tracker
-            
+            now = time.time()
+            tracker = self.ip_tracker if rule_name.startswith("ip_") else self.user_tracker
+            tracker[identifier] = now
+            tracker.move_to_end(identifier)
+            self._evict_idle(tracker, now)
+        
+        # Проверка атомарна на стороне хранилища, блокировка не нужна
+        key = f"{rule_name}:{identifier}"
+        if rule.algorithm == "token_bucket":
+            result = self.backend.token_bucket(
+                key, rule.max_requests, rule.max_requests / rule.time_window, now=now
+            )
+        else:
+            result = self.backend.sliding_window(key, rule.max_requests, rule.time_window, now=now)
+        
+        if result.allowed:
             return True, None
+        
+        logger.warning(f"Rate limit exceeded for {identifier} on rule {rule_name}")
+        
+        # Блокируем IP если нужно
+        if ip_address:
+            with self.lock:
+                self.blocked_ips.add(ip_address)
+            logger.warning(f"IP blocked: {ip_address}")
+        
+        return False, f"Rate limit exceeded for {rule_name}"
+    
+    def _evict_idle(self, tracker: "OrderedDict[str, float]", now: float):
+        """Удалить неактивные и лишние идентификаторы из начала трекера"""
+        idle_timeout = self.idle_timeout
+        if idle_timeout is None:
+            idle_timeout = max((rule.time_window for rule in self.rules.values()), default=0)
+        
+        while tracker:
+            identifier, last_request = next(iter(tracker.items()))
+            if last_request >= now - idle_timeout and len(tracker) <= self.max_history:
+                break
+            del tracker[identifier]
     
     def is_ip_blocked(self, ip_address: str) -> bool:
         """Проверить, заблокирован ли IP"""
@@ -229,44 +249,74 @@ class AdvancedRateLimiter:
 class DDoSDetector:
     """Обнаружение DDoS атак"""
     
-    def __init__(self, window_size: int = 60, threshold: int = 1000):
+    def __init__(self, window_size: int = 60, threshold: int = 1000,
+                 memory_bounded: bool = False, sketch_width: int = 2048,
+                 sketch_depth: int = 4, top_k: int = 100):
         """
         Инициализация детектора
         
         Args:
             window_size: Размер временного окна в секундах
             threshold: Порог для обнаружения атаки
+            memory_bounded: Считать запросы по IP приближенно (Count-Min Sketch
+                и Space-Saving) с памятью, не зависящей от числа уникальных IP
+            sketch_width: Ширина Count-Min Sketch
+            sketch_depth: Глубина Count-Min Sketch
+            top_k: Количество отслеживаемых кандидатов в самые активные IP
         """
         self.window_size = window_size
         self.threshold = threshold
+        self.memory_bounded = memory_bounded
         self.request_history: deque = deque(maxlen=threshold * 2)
         self.ip_request_count: Dict[str, int] = defaultdict(int)
-        self.lock = threading.Lock()
+        self.heavy_hitters: Optional[WindowedHeavyHitters] = (
+            WindowedHeavyHitters(window_size, width=sketch_width, depth=sketch_depth,
+                                 capacity=top_k)
+            if memory_bounded else None
+        )
+        # get_statistics вызывает другие методы под той же блокировкой
+        self.lock = threading.RLock()
         self.under_attack = False
         self.attack_start_time: Optional[float] = None
         
         logger.info(f"DDoS Detector initialized (threshold: {threshold})")
     
-    def record_request(self, ip_address: str) -> bool:
+    def record_request(self, ip_address: str, now: Optional[float] = None) -> bool:
         """Записать запрос"""
         with self.lock:
-            now = time.time()
+            now = time.time() if now is None else now
+            if self.heavy_hitters is not None:
+                # История не хранится: окно целиком описывают скетчи
+                self.heavy_hitters.add(ip_address, now)
+                return True
+            
+            if len(self.request_history) == self.request_history.maxlen:
+                # Вытесняемая из истории запись больше не учитывается в окне
+                self._forget(self.request_history[0][0])
             self.request_history.append((ip_address, now))
             self.ip_request_count[ip_address] += 1
             
             # Удаляем старые записи
             while self.request_history and self.request_history[0][1] < now - self.window_size:
                 old_ip, _ = self.request_history.popleft()
-                self.ip_request_count[old_ip] -= 1
-                if self.ip_request_count[old_ip] <= 0:
-                    del self.ip_request_count[old_ip]
+                self._forget(old_ip)
             
             return True
     
+    def _forget(self, ip_address: str):
+        self.ip_request_count[ip_address] -= 1
+        if self.ip_request_count[ip_address] <= 0:
+            del self.ip_request_count[ip_address]
+    
+    def _request_count(self) -> int:
+        if self.heavy_hitters is not None:
+            return self.heavy_hitters.total(time.time())
+        return len(self.request_history)
+    
     def detect_attack(self) -> bool:
         """Обнаружить атаку"""
         with self.lock:
-            request_count = len(self.request_history)
+            request_count = self._request_count()
             
             # Проверяем общее количество запросов
             if request_count > self.threshold:
@@ -285,6 +335,8 @@ class DDoSDetector:
     def get_suspicious_ips(self, top_n: int = 10) -> List[Tuple[str, int]]:
         """Получить подозрительные IP"""
         with self.lock:
+            if self.heavy_hitters is not None:
+                return self.heavy_hitters.top(top_n, time.time())
             sorted_ips = sorted(
                 self.ip_request_count.items(),
                 key=lambda x: x[1],
@@ -295,7 +347,7 @@ class DDoSDetector:
     def get_threat_level(self) -> ThreatLevel:
         """Получить уровень угрозы"""
         with self.lock:
-            request_count = len(self.request_history)
+            request_count = self._request_count()
             
             if request_count > self.threshold * 1.5:
                 return ThreatLevel.CRITICAL
@@ -308,8 +360,10 @@ class DDoSDetector:
         """Получить статистику"""
         with self.lock:
             return {
-                'total_requests': len(self.request_history),
-                'unique_ips': len(self.ip_request_count),
+                'total_requests': self._request_count(),
+                # В ограниченном режиме - число отслеживаемых кандидатов
+                'unique_ips': (self.heavy_hitters.candidate_count()
+                               if self.heavy_hitters is not None else len(self.ip_request_count)),
                 'under_attack': self.under_attack,
                 'threat_level': self.get_threat_level().value,
                 'top_ips': self.get_suspicious_ips(5)
@@ -319,10 +373,15 @@ class DDoSDetector:
 class SecurityMonitor:
     """Комплексный монитор безопасности"""
     
-    def __init__(self):
-        """Инициализация"""
+    def __init__(self, memory_bounded: bool = False):
+        """
+        Инициализация
+        
+        Args:
+            memory_bounded: Использовать приближенный подсчет запросов по IP
+        """
         self.rate_limiter = AdvancedRateLimiter()
-        self.ddos_detector = DDoSDetector()
+        self.ddos_detector = DDoSDetector(memory_bounded=memory_bounded)
         self.lock = threading.Lock()
         
         logger.info("Security Monitor initialized")
@@ -0,0 +1,191 @@
+"""
+Вероятностные структуры для анализа трафика с ограниченной памятью
+
+- CountMinSketch: оценка частоты ключа сверху с ошибкой ~ e/width * N
+- SpaceSaving: кандидаты в самые частые ключи (heavy hitters)
+- WindowedHeavyHitters: скользящее окно из сегментов с собственными
+  скетчами, память не зависит от числа уникальных ключей
+"""
+
+import hashlib
+import heapq
+import itertools
+import struct
+from array import array
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple
+
+
+class CountMinSketch:
+    """Count-Min Sketch фиксированного размера"""
+
+    def __init__(self, width: int = 2048, depth: int = 4):
+        """
+        Args:
+            width: Количество счетчиков в строке
+            depth: Количество независимых хеш-функций
+        """
+        self.width = width
+        self.depth = depth
+        self.table = [array('I', bytes(4 * width)) for _ in range(depth)]
+        self.total = 0
+        self._unpack = struct.Struct(f'<{depth}I').unpack
+
+    def _columns(self, key: str) -> Tuple[int, ...]:
+        digest = hashlib.blake2b(key.encode('utf-8'), digest_size=4 * self.depth).digest()
+        return self._unpack(digest)
+
+    def add(self, key: str, count: int = 1) -> int:
+        """Увеличивает счетчик ключа и возвращает новую оценку"""
+        estimate = None
+        width = self.width
+        for row, column in zip(self.table, self._columns(key)):
+            column %= width
+            value = row[column] + count
+            row[column] = value
+            if estimate is None or value < estimate:
+                estimate = value
+        self.total += count
+        return estimate
+
+    def estimate(self, key: str) -> int:
+        width = self.width
+        return min(row[column % width] for row, column in zip(self.table, self._columns(key)))
+
+    def clear(self) -> None:
+        zeros = bytes(4 * self.width)
+        self.table = [array('I', zeros) for _ in range(self.depth)]
+        self.total = 0
+
+    @property
+    def nbytes(self) -> int:
+        return sum(row.itemsize * len(row) for row in self.table)
+
+
+class SpaceSaving:
+    """Алгоритм Space-Saving: не более capacity отслеживаемых ключей.
+
+    Любой ключ с частотой выше N/capacity гарантированно присутствует
+    в сводке. Минимум ищется по куче с ленивым обновлением.
+    """
+
+    def __init__(self, capacity: int = 100):
+        self.capacity = capacity
+        self.counts: Dict[str, int] = {}
+        self.errors: Dict[str, int] = {}
+        self._heap: List[Tuple[int, int, str]] = []
+        self._seq = itertools.count()
+
+    def add(self, key: str, count: int = 1) -> None:
+        if key in self.counts:
+            # Запись в куче устаревает и будет обновлена при вытеснении
+            self.counts[key] += count
+            return
+
+        if len(self.counts) < self.capacity:
+            self.counts[key] = count
+            self.errors[key] = 0
+            heapq.heappush(self._heap, (count, next(self._seq), key))
+            return
+
+        while True:
+            stored, _, victim = heapq.heappop(self._heap)
+            current = self.counts[victim]
+            if current == stored:
+                break
+            heapq.heappush(self._heap, (current, next(self._seq), victim))
+
+        del self.counts[victim]
+        del self.errors[victim]
+        self.counts[key] = stored + count
+        self.errors[key] = stored
+        heapq.heappush(self._heap, (stored + count, next(self._seq), key))
+
+    def top(self, n: int) -> List[Tuple[str, int]]:
+        return heapq.nlargest(n, self.counts.items(), key=lambda item: item[1])
+
+    def clear(self) -> None:
+        self.counts.clear()
+        self.errors.clear()
+        self._heap.clear()
+
+
+class WindowedHeavyHitters:
+    """Частоты ключей в скользящем окне с фиксированным расходом памяти.
+
+    Окно делится на сегменты; каждый сегмент хранит свой CountMinSketch и
+    SpaceSaving. Устаревший сегмент очищается и переиспользуется.
+    """
+
+    def __init__(self, window_size: float = 60, slices: int = 6, width: int = 2048,
+                 depth: int = 4, capacity: int = 100):
+        """
+        Args:
+            window_size: Размер окна в секундах
+            slices: Количество сегментов окна
+            width: Ширина Count-Min Sketch сегмента
+            depth: Глубина Count-Min Sketch сегмента
+            capacity: Количество кандидатов Space-Saving в сегменте
+        """
+        self.slice_size = window_size / slices
+        self._slices: Deque[Tuple[int, CountMinSketch, SpaceSaving]] = deque()
+        self._free: List[Tuple[CountMinSketch, SpaceSaving]] = [
+            (CountMinSketch(width, depth), SpaceSaving(capacity)) for _ in range(slices)
+        ]
+        self.slices = slices
+
+    def _advance(self, now: float) -> None:
+        current = int(now // self.slice_size)
+        while self._slices and self._slices[0][0] <= current - self.slices:
+            _, sketch, summary = self._slices.popleft()
+            sketch.clear()
+            summary.clear()
+            self._free.append((sketch, summary))
+        if not self._slices or self._slices[-1][0] < current:
+            sketch, summary = self._free.pop()
+            self._slices.append((current, sketch, summary))
+
+    def add(self, key: str, now: float) -> None:
+        self._advance(now)
+        _, sketch, summary = self._slices[-1]
+        sketch.add(key)
+        summary.add(key)
+
+    def estimate(self, key: str, now: Optional[float] = None) -> int:
+        if now is not None:
+            self._advance(now)
+        return sum(sketch.estimate(key) for _, sketch, _ in self._slices)
+
+    def total(self, now: Optional[float] = None) -> int:
+        if now is not None:
+            self._advance(now)
+        return sum(sketch.total for _, sketch, _ in self._slices)
+
+    def top(self, n: int, now: Optional[float] = None) -> List[Tuple[str, int]]:
+        """Самые частые ключи окна с оценками Count-Min Sketch"""
+        if now is not None:
+            self._advance(now)
+        candidates = set()
+        for _, _, summary in self._slices:
+            candidates.update(summary.counts)
+        estimates = [(key, self.estimate(key)) for key in candidates]
+        return heapq.nlargest(n, estimates, key=lambda item: item[1])
+
+    def candidate_count(self) -> int:
+        candidates = set()
+        for _, _, summary in self._slices:
+            candidates.update(summary.counts)
+        return len(candidates)
+
+    def clear(self) -> None:
+        while self._slices:
+            _, sketch, summary = self._slices.popleft()
+            sketch.clear()
+            summary.clear()
+            self._free.append((sketch, summary))
+
+    @property
+    def nbytes(self) -> int:
+        """Объем памяти счетчиков Count-Min Sketch"""
+        return sum(sketch.nbytes for _, sketch, _ in self._slices) + \
+            sum(sketch.nbytes for sketch, _ in self._free)
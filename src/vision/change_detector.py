@@ -0,0 +1,251 @@
+"""
+Детектор изменений экрана по тайлам
+Определяет изменившиеся прямоугольники между кадрами, чтобы анализ
+(поиск шаблонов, OCR, детекция UI) перезапускался только для них
+"""
+
+import logging
+from threading import Lock
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+Rect = Tuple[int, int, int, int]
+
+
+class TileChangeDetector:
+    """Сравнивает кадры по тайлам и возвращает изменившиеся области."""
+
+    def __init__(self, tile_size: int = 64, threshold: int = 0):
+        """
+        Args:
+            tile_size: Размер квадратного тайла в пикселях
+            threshold: Минимальная разница яркости пикселя, считающаяся изменением
+        """
+        if tile_size < 1:
+            raise ValueError("tile_size должен быть >= 1")
+        self.tile_size = tile_size
+        self.threshold = threshold
+        self._previous: Optional[np.ndarray] = None
+
+    def reset(self) -> None:
+        """Забывает предыдущий кадр: следующий кадр считается изменённым целиком."""
+        self._previous = None
+
+    def grid_shape(self, frame_shape: Tuple[int, ...]) -> Tuple[int, int]:
+        rows = -(-frame_shape[0] // self.tile_size)
+        cols = -(-frame_shape[1] // self.tile_size)
+        return rows, cols
+
+    def update(self, frame: np.ndarray) -> np.ndarray:
+        """Сравнивает кадр с предыдущим и запоминает его.
+
+        Args:
+            frame: Кадр (H, W) или (H, W, C)
+
+        Returns:
+            Булева маска изменившихся тайлов формы (rows, cols)
+        """
+        rows, cols = self.grid_shape(frame.shape)
+        if self._previous is None or self._previous.shape != frame.shape:
+            self._previous = np.array(frame, copy=True)
+            return np.ones((rows, cols), dtype=bool)
+
+        if self.threshold:
+            diff = np.abs(frame.astype(np.int16) - self._previous) > self.threshold
+        else:
+            diff = frame != self._previous
+        if diff.ndim == 3:
+            diff = diff.any(axis=2)
+        np.copyto(self._previous, frame)
+
+        height, width = diff.shape
+        padded = np.zeros((rows * self.tile_size, cols * self.tile_size), dtype=bool)
+        padded[:height, :width] = diff
+        return padded.reshape(rows, self.tile_size, cols, self.tile_size).any(axis=(1, 3))
+
+    def mask_to_rects(self, mask: np.ndarray, frame_shape: Tuple[int, ...]) -> List[Rect]:
+        """Склеивает изменившиеся тайлы в прямоугольники (x, y, width, height).
+
+        Соседние тайлы строки объединяются в отрезки, одинаковые отрезки
+        соседних строк - в один прямоугольник.
+        """
+        height, width = frame_shape[:2]
+        open_runs: Dict[Tuple[int, int], List[int]] = {}
+        rects: List[Rect] = []
+
+        for row in range(mask.shape[0] + 1):
+            runs = set()
+            if row < mask.shape[0]:
+                line = mask[row]
+                col = 0
+                while col < len(line):
+                    if line[col]:
+                        start = col
+                        while col < len(line) and line[col]:
+                            col += 1
+                        runs.add((start, col))
+                    else:
+                        col += 1
+
+            for run in list(open_runs):
+                if run not in runs:
+                    start_row, end_row = open_runs.pop(run)
+                    rects.append(self._rect(run, start_row, end_row, width, height))
+            for run in runs:
+                if run in open_runs:
+                    open_runs[run][1] = row + 1
+                else:
+                    open_runs[run] = [row, row + 1]
+
+        return rects
+
+    def _rect(self, run: Tuple[int, int], start_row: int, end_row: int,
+              width: int, height: int) -> Rect:
+        tile = self.tile_size
+        x, y = run[0] * tile, start_row * tile
+        return (x, y, min(run[1] * tile, width) - x, min(end_row * tile, height) - y)
+
+    def detect(self, frame: np.ndarray) -> List[Rect]:
+        """Возвращает изменившиеся прямоугольники относительно предыдущего кадра."""
+        return self.mask_to_rects(self.update(frame), frame.shape)
+
+
+def rects_overlap(a: Rect, b: Rect) -> bool:
+    """Проверяет пересечение двух прямоугольников (x, y, width, height)."""
+    return (a[0] < b[0] + b[2] and b[0] < a[0] + a[2]
+            and a[1] < b[1] + b[3] and b[1] < a[1] + a[3])
+
+
+def _result_rect(result: Dict[str, Any]) -> Rect:
+    return (result.get('x', 0), result.get('y', 0),
+            result.get('width', 0), result.get('height', 0))
+
+
+class DirtyRegionCache:
+    """Кэш результатов анализа, пересчитываемых только в изменившихся областях.
+
+    Каждый потребитель (ключ) накапливает маску изменений с момента своего
+    последнего запуска, поэтому разные анализаторы могут вызываться с разной
+    частотой над одним потоком кадров.
+    """
+
+    def __init__(self, tile_size: int = 64, threshold: int = 0):
+        """
+        Args:
+            tile_size: Размер тайла детектора изменений
+            threshold: Порог изменения пикселя
+        """
+        self.detector = TileChangeDetector(tile_size, threshold)
+        self._lock = Lock()
+        self._frame: Optional[np.ndarray] = None
+        self._generation = 0
+        self._pending: Dict[Hashable, np.ndarray] = {}
+        self._results: Dict[Hashable, List[Dict[str, Any]]] = {}
+        self.last_dirty_rects: List[Rect] = []
+        self.stats = {'full_runs': 0, 'partial_runs': 0, 'reused': 0}
+
+    def update(self, frame: np.ndarray) -> List[Rect]:
+        """Передаёт новый кадр детектору.
+
+        Кадр сохраняется по ссылке и не должен изменяться, пока по нему
+        выполняется run().
+
+        Returns:
+            Прямоугольники, изменившиеся относительно предыдущего кадра
+        """
+        with self._lock:
+            shape_changed = self._frame is None or self._frame.shape != frame.shape
+            mask = self.detector.update(frame)
+            self._frame = frame
+            self._generation += 1
+            if shape_changed:
+                self._pending.clear()
+                self._results.clear()
+            else:
+                for pending in self._pending.values():
+                    pending |= mask
+            self.last_dirty_rects = self.detector.mask_to_rects(mask, frame.shape)
+            return self.last_dirty_rects
+
+    def invalidate(self, key: Optional[Hashable] = None) -> None:
+        """Сбрасывает кэш одного ключа или всех ключей."""
+        with self._lock:
+            if key is None:
+                self._pending.clear()
+                self._results.clear()
+            else:
+                self._pending.pop(key, None)
+                self._results.pop(key, None)
+
+    def run(self, key: Hashable,
+            analyze: Callable[[np.ndarray], List[Dict[str, Any]]],
+            margin: Tuple[int, int] = (0, 0)) -> List[Dict[str, Any]]:
+        """Выполняет анализ последнего кадра, переиспользуя результаты чистых областей.
+
+        Args:
+            key: Ключ потребителя (например, путь к шаблону и порог)
+            analyze: Функция анализа изображения; возвращает словари с
+                координатами x, y, width, height относительно переданного изображения
+            margin: Расширение изменившейся области (ширина, высота), чтобы
+                найти объекты, пересекающие её границу (для шаблона - его размер)
+
+        Returns:
+            Результаты анализа в координатах кадра
+        """
+        with self._lock:
+            frame = self._frame
+            generation = self._generation
+            if frame is None:
+                return []
+            pending = self._pending.get(key)
+            cached = self._results.get(key)
+            self._pending[key] = np.zeros(self.detector.grid_shape(frame.shape), dtype=bool)
+
+        if pending is None or cached is None:
+            results = analyze(frame)
+            self.stats['full_runs'] += 1
+        else:
+            dirty = self.detector.mask_to_rects(pending, frame.shape)
+            if not dirty:
+                self.stats['reused'] += 1
+                return list(cached)
+            results = [r for r in cached
+                       if not any(rects_overlap(_result_rect(r), d) for d in dirty)]
+            seen = {(r.get('x'), r.get('y')) for r in results}
+            for rect in dirty:
+                for found in self._analyze_rect(frame, rect, analyze, margin):
+                    position = (found.get('x'), found.get('y'))
+                    if position not in seen and rects_overlap(_result_rect(found), rect):
+                        seen.add(position)
+                        results.append(found)
+            self.stats['partial_runs'] += 1
+
+        with self._lock:
+            if self._generation == generation:
+                self._results[key] = results
+            else:
+                # Кадр сменился во время анализа - результат нельзя переиспользовать
+                self._results.pop(key, None)
+        return list(results)
+
+    @staticmethod
+    def _analyze_rect(frame: np.ndarray, rect: Rect,
+                      analyze: Callable[[np.ndarray], List[Dict[str, Any]]],
+                      margin: Tuple[int, int]) -> List[Dict[str, Any]]:
+        x, y, w, h = rect
+        left = max(0, x - margin[0])
+        top = max(0, y - margin[1])
+        right = min(frame.shape[1], x + w + margin[0])
+        bottom = min(frame.shape[0], y + h + margin[1])
+
+        shifted = []
+        for result in analyze(frame[top:bottom, left:right]):
+            result = dict(result)
+            for field, offset in (('x', left), ('center_x', left), ('y', top), ('center_y', top)):
+                if field in result:
+                    result[field] += offset
+            shifted.append(result)
+        return shifted
@@ -1,67 +1,219 @@
+import logging
+import time
 import numpy as np
-from typing import Optional, Tuple
+from typing import Dict, Optional, Tuple
 import mss
-from threading import Lock
-from .cv2_utils import cv
+from threading import Event, Lock, Thread, local
+
+from .change_detector import DirtyRegionCache
+
+logger = logging.getLogger(__name__)
+
 
 class OptimizedScreenCapture:
-    """Оптимизированный захват экрана с буферизацией и кэшированием."""
-    
-    def __init__(self):
-        self._sct = mss.mss()
+    """Оптимизированный захват экрана с кольцевым буфером кадров.
+
+    Кадры пишутся в заранее выделенный буфер (buffer_size, h, w, 3) без
+    промежуточных копий, среднее по буферу обновляется инкрементально.
+    Захват может выполняться фоновым потоком с заданной частотой.
+    """
+
+    def __init__(self, buffer_size: int = 5, fps: float = 30.0,
+                 change_tile_size: Optional[int] = None):
+        """
+        Args:
+            buffer_size: Количество кадров в кольцевом буфере
+            fps: Частота фонового захвата (кадров в секунду)
+            change_tile_size: Размер тайла детектора изменений (None - отключен)
+        """
+        if buffer_size < 1:
+            raise ValueError("buffer_size должен быть >= 1")
+
+        # Экземпляры mss нельзя разделять между потоками
+        self._local = local()
         self._buffer_lock = Lock()
-        self._last_frame: Optional[np.ndarray] = None
+        self._max_buffer_size = buffer_size
+        self.fps = fps
+
+        self._ring: Optional[np.ndarray] = None
+        self._accumulator: Optional[np.ndarray] = None
+        self._write_index = 0
+        self._count = 0
+        self._frame_number = 0
         self._last_frame_region: Optional[Tuple[int, int, int, int]] = None
-        self._frame_buffer = []
-        self._max_buffer_size = 5
-        
+
+        self._thread: Optional[Thread] = None
+        self._stop_event = Event()
+        self._thread_region: Optional[Tuple[int, int, int, int]] = None
+        self.stats = {'frames': 0, 'overruns': 0, 'errors': 0}
+
+        # Анализаторы могут пересчитывать результаты только для изменившихся тайлов
+        self.change_cache: Optional[DirtyRegionCache] = (
+            DirtyRegionCache(change_tile_size) if change_tile_size else None
+        )
+
+    @property
+    def _sct(self):
+        sct = getattr(self._local, 'sct', None)
+        if sct is None:
+            sct = self._local.sct = mss.mss()
+        return sct
+
+    @property
+    def frame_number(self) -> int:
+        """Порядковый номер последнего захваченного кадра."""
+        return self._frame_number
+
+    def _monitor(self, region: Optional[Tuple[int, int, int, int]]) -> Dict[str, int]:
+        if region is None:
+            return self._sct.monitors[0]
+        left, top, width, height = region
+        return {'left': left, 'top': top, 'width': width, 'height': height}
+
+    def _grab(self, region: Optional[Tuple[int, int, int, int]]) -> np.ndarray:
+        """Захватывает кадр и возвращает BGRA-представление буфера mss без копирования."""
+        screenshot = self._sct.grab(self._monitor(region))
+        return np.frombuffer(screenshot.raw, dtype=np.uint8).reshape(
+            screenshot.height, screenshot.width, 4
+        )
+
+    def _ensure_ring(self, height: int, width: int,
+                     region: Optional[Tuple[int, int, int, int]]) -> None:
+        """Выделяет буфер заново только при смене размера или области."""
+        if (self._ring is not None and self._ring.shape[1:3] == (height, width)
+                and region == self._last_frame_region):
+            return
+        self._ring = np.empty((self._max_buffer_size, height, width, 3), dtype=np.uint8)
+        self._accumulator = np.zeros((height, width, 3), dtype=np.uint32)
+        self._write_index = 0
+        self._count = 0
+        self._last_frame_region = region
+
+    def _store(self, bgra: np.ndarray, region: Optional[Tuple[int, int, int, int]]) -> np.ndarray:
+        """Записывает кадр в кольцевой буфер и обновляет накопитель среднего."""
+        with self._buffer_lock:
+            self._ensure_ring(bgra.shape[0], bgra.shape[1], region)
+            slot = self._ring[self._write_index]
+            if self._count == self._max_buffer_size:
+                # Вытесняемый кадр вычитается из суммы до перезаписи слота
+                np.subtract(self._accumulator, slot, out=self._accumulator, casting='unsafe')
+            else:
+                self._count += 1
+
+            # BGRA -> BGR: копирование каналов прямо в слот буфера
+            np.copyto(slot, bgra[..., :3])
+            np.add(self._accumulator, slot, out=self._accumulator, casting='unsafe')
+
+            self._write_index = (self._write_index + 1) % self._max_buffer_size
+            self._frame_number += 1
+            frame = self._readonly(slot)
+            if self.change_cache is not None:
+                # Слот будет перезаписан через max_buffer_size кадров, а кэш
+                # хранит кадр до следующего update - ему нужна своя копия
+                self.change_cache.update(self._readonly(slot.copy()))
+            return frame
+
+    @staticmethod
+    def _readonly(frame: np.ndarray) -> np.ndarray:
+        view = frame.view()
+        view.flags.writeable = False
+        return view
+
     def capture(self, region: Optional[Tuple[int, int, int, int]] = None) -> np.ndarray:
         """Захватывает область экрана с оптимизацией.
-        
+
+        Если для этой области работает фоновый захват, возвращается его
+        последний кадр без обращения к экрану.
+
         Args:
             region: Кортеж (left, top, width, height) области захвата
-            
+
         Returns:
-            Захваченное изображение как numpy массив
+            Захваченное изображение как numpy массив (только для чтения;
+            слот перезаписывается через buffer_size кадров)
         """
-        # Если регион тот же, возвращаем кэшированный кадр
-        if (region == self._last_frame_region and 
-            self._last_frame is not None):
-            return self._last_frame
-            
+        if self.is_running:
+            if region == self._thread_region:
+                frame = self.get_latest_frame()
+                if frame is not None:
+                    return frame
+            else:
+                # Чужая область не должна сбрасывать буфер фонового захвата
+                return np.ascontiguousarray(self._grab(region)[..., :3])
+
+        return self._store(self._grab(region), region)
+
+    def get_latest_frame(self) -> Optional[np.ndarray]:
+        """Возвращает последний кадр буфера как представление только для чтения."""
         with self._buffer_lock:
-            # Захват нового кадра
-            monitor = region if region else self._sct.monitors[0]
-            screenshot = self._sct.grab(monitor)
-            
-            # Конвертация в numpy массив
-            frame = np.array(screenshot)
-            
-            # Конвертация из BGRA в BGR
-            frame = cv.cvtColor(frame, cv.COLOR_BGRA2BGR)
-            
-            # Обновление буфера
-            self._frame_buffer.append(frame)
-            if len(self._frame_buffer) > self._max_buffer_size:
-                self._frame_buffer.pop(0)
-            
-            # Обновление кэша
-            self._last_frame = frame
-            self._last_frame_region = region
-            
-            return frame
-    
+            if not self._count:
+                return None
+            latest = (self._write_index - 1) % self._max_buffer_size
+            return self._readonly(self._ring[latest])
+
     def get_buffer_average(self) -> Optional[np.ndarray]:
         """Возвращает усредненный кадр из буфера для уменьшения шума."""
         with self._buffer_lock:
-            if not self._frame_buffer:
+            if not self._count:
                 return None
-            
-            return np.mean(self._frame_buffer, axis=0).astype(np.uint8)
-    
+
+            return (self._accumulator // self._count).astype(np.uint8)
+
+    def start(self, region: Optional[Tuple[int, int, int, int]] = None,
+              fps: Optional[float] = None) -> None:
+        """Запускает фоновый захват кадров.
+
+        Args:
+            region: Область захвата (None - весь экран)
+            fps: Частота захвата (по умолчанию self.fps)
+        """
+        if self.is_running:
+            self.stop()
+        if fps is not None:
+            self.fps = fps
+        self._thread_region = region
+        self._stop_event.clear()
+        self._thread = Thread(target=self._capture_loop, name="daur_ai_screen_capture",
+                              daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 1.0) -> None:
+        """Останавливает фоновый захват."""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self._thread = None
+        self._thread_region = None
+
+    @property
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def _capture_loop(self) -> None:
+        interval = 1.0 / self.fps if self.fps > 0 else 0.0
+        next_tick = time.monotonic()
+        while not self._stop_event.is_set():
+            try:
+                self._store(self._grab(self._thread_region), self._thread_region)
+                self.stats['frames'] += 1
+            except Exception as e:
+                self.stats['errors'] += 1
+                logger.error(f"Ошибка фонового захвата экрана: {e}")
+
+            next_tick += interval
+            delay = next_tick - time.monotonic()
+            if delay < 0:
+                # Захват не успевает за заданной частотой: пропускаем тики
+                self.stats['overruns'] += 1
+                next_tick = time.monotonic()
+                delay = 0
+            self._stop_event.wait(delay)
+
     def clear_buffer(self) -> None:
         """Очищает буфер кадров."""
         with self._buffer_lock:
-            self._frame_buffer.clear()
-            self._last_frame = None
-            self._last_frame_region = None
\ No newline at end of file
+            self._count = 0
+            self._write_index = 0
+            if self._accumulator is not None:
+                self._accumulator.fill(0)
+            self._last_frame_region = None
@@ -7,10 +7,12 @@ import cv2
 import numpy as np
 from PIL import Image, ImageDraw
 import logging
-from typing import List, Dict, Tuple, Optional
+from typing import Any, Callable, List, Dict, Tuple, Optional
 import time
 import os
 
+from .change_detector import DirtyRegionCache
+
 # Настройка headless режима для sandbox
 os.environ.setdefault('DISPLAY', ':99')
 
@@ -40,7 +42,7 @@ except Exception as e:
 class ScreenAnalyzer:
     """Анализатор экрана с возможностями компьютерного зрения"""
     
-    def __init__(self):
+    def __init__(self, change_tile_size: int = 64):
         self.logger = logging.getLogger(__name__)
         
         # Настройки pyautogui
@@ -51,6 +53,10 @@ class ScreenAnalyzer:
         self.screenshot_cache = {}
         self.cache_timeout = 1.0  # секунды
         
+        # Детекторы изменений по областям захвата: анализ повторяется только для изменившихся тайлов
+        self.change_tile_size = change_tile_size
+        self.region_caches: Dict[Optional[Tuple[int, int, int, int]], DirtyRegionCache] = {}
+        
         # Создаем директорию для сохранения скриншотов
         self.screenshots_dir = "/home/ubuntu/Daur-AI-v1/screenshots"
         os.makedirs(self.screenshots_dir, exist_ok=True)
@@ -113,6 +119,72 @@ class ScreenAnalyzer:
             self.logger.error(f"Ошибка сохранения скриншота: {e}")
             return ""
     
+    def track_changes(self, screen: np.ndarray,
+                      region: Optional[Tuple[int, int, int, int]] = None) -> List[Tuple[int, int, int, int]]:
+        """
+        Передает новый кадр детектору изменений области
+        
+        Args:
+            screen: Захваченный кадр
+            region: Область, которой соответствует кадр
+            
+        Returns:
+            Изменившиеся прямоугольники (x, y, width, height)
+        """
+        cache = self.region_caches.get(region)
+        if cache is None:
+            cache = self.region_caches[region] = DirtyRegionCache(self.change_tile_size)
+        return cache.update(screen)
+    
+    def analyze_changes(self, key, analyze: Callable[[np.ndarray], List[Dict[str, Any]]],
+                        region: Optional[Tuple[int, int, int, int]] = None,
+                        margin: Tuple[int, int] = (0, 0)) -> List[Dict[str, Any]]:
+        """
+        Выполняет анализ последнего кадра области только в изменившихся тайлах
+        
+        Точка подключения для поиска шаблонов, OCR и детекции UI элементов:
+        результаты для неизменившихся областей берутся из кэша.
+        
+        Args:
+            key: Ключ анализа (например, ('ocr', language))
+            analyze: Функция анализа изображения, возвращающая элементы с x, y, width, height
+            region: Область, ранее переданная в track_changes
+            margin: Расширение изменившихся областей (ширина, высота)
+            
+        Returns:
+            Результаты анализа в координатах кадра
+        """
+        cache = self.region_caches.get(region)
+        if cache is None:
+            return []
+        return cache.run(key, analyze, margin)
+    
+    @staticmethod
+    def _match_template(image: np.ndarray, template: np.ndarray, threshold: float) -> List[Dict]:
+        """Поиск шаблона в готовом изображении"""
+        h, w = template.shape[:2]
+        if image.shape[0] < h or image.shape[1] < w:
+            return []
+        
+        result = cv2.matchTemplate(image, template, cv2.TM_CCOEFF_NORMED)
+        
+        # Находим все совпадения выше порога
+        locations = np.where(result >= threshold)
+        matches = []
+        
+        for pt in zip(*locations[::-1]):
+            confidence = result[pt[1], pt[0]]
+            matches.append({
+                'x': int(pt[0]),
+                'y': int(pt[1]),
+                'width': w,
+                'height': h,
+                'confidence': float(confidence),
+                'center_x': int(pt[0] + w/2),
+                'center_y': int(pt[1] + h/2)
+            })
+        return matches
+    
     def find_template(self, template_path: str, threshold: float = 0.8, region: Optional[Tuple[int, int, int, int]] = None) -> List[Dict]:
         """
         Поиск шаблона на экране
@@ -137,26 +209,15 @@ class ScreenAnalyzer:
                 self.logger.error(f"Не удалось загрузить шаблон: {template_path}")
                 return []
             
-            # Выполняем поиск шаблона
-            result = cv2.matchTemplate(screen, template, cv2.TM_CCOEFF_NORMED)
-            
-            # Находим все совпадения выше порога
-            locations = np.where(result >= threshold)
-            matches = []
-            
+            # Выполняем поиск шаблона только в изменившихся с прошлого поиска областях
             h, w = template.shape[:2]
-            
-            for pt in zip(*locations[::-1]):
-                confidence = result[pt[1], pt[0]]
-                matches.append({
-                    'x': int(pt[0]),
-                    'y': int(pt[1]),
-                    'width': w,
-                    'height': h,
-                    'confidence': float(confidence),
-                    'center_x': int(pt[0] + w/2),
-                    'center_y': int(pt[1] + h/2)
-                })
+            self.track_changes(screen, region)
+            matches = self.analyze_changes(
+                ('template', template_path, threshold),
+                lambda image: self._match_template(image, template, threshold),
+                region=region,
+                margin=(w - 1, h - 1)
+            )
             
             # Сортируем по уверенности
             matches.sort(key=lambda x: x['confidence'], reverse=True)
@@ -12,6 +12,7 @@ Endpoints:
 
 import logging
 import json
+import threading
 from datetime import datetime
 from functools import wraps
 from typing import Dict, Tuple, Optional
@@ -46,6 +47,34 @@ vision_system = RealVisionSystem()
 active_sessions: Dict[str, Dict] = {}
 
 
+# ===== Background services =====
+
+_background_lock = threading.Lock()
+_background_started = False
+
+
+def start_background_services():
+    """Запустить фоновый опрос оборудования (однократно)
+    
+    Вызывается при старте сервера и перед первым запросом, а не при
+    импорте модуля: импорт (тесты, WSGI-загрузчик, мастер-процесс перед
+    fork) не должен запускать потоки опроса.
+    """
+    global _background_started
+    with _background_lock:
+        if _background_started:
+            return
+        _background_started = True
+    # Эндпоинты оборудования читают готовый снимок фонового опроса
+    hardware_monitor.start_monitoring(interval=1)
+
+
+@app.before_request
+def ensure_background_services():
+    if not _background_started:
+        start_background_services()
+
+
 # ===== Decorators =====
 
 def require_auth(f):
@@ -604,5 +633,6 @@ def internal_error(error):
 
 if __name__ == '__main__':
     logger.info("Starting Real API Server v2.0")
+    start_background_services()
     app.run(host='0.0.0.0', port=5000, debug=False)
 
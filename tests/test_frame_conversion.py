@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Daur-AI: Тесты конвертации кадров драйверов экрана и камеры
+"""
+
+import unittest
+
+import numpy as np
+
+from src.drivers.camera_driver import yuyv_to_bgr
+from src.drivers.screen_driver import rgb565_to_bgr
+
+
+def legacy_rgb565_to_bgr(frame):
+    """Прежняя поканальная сборка BGR из RGB565"""
+    bgr = np.zeros(frame.shape + (3,), dtype=np.uint8)
+    bgr[:, :, 0] = (frame & 0x001F) << 3
+    bgr[:, :, 1] = ((frame & 0x07E0) >> 5) << 2
+    bgr[:, :, 2] = ((frame & 0xF800) >> 11) << 3
+    return bgr
+
+
+def legacy_yuv444(raw):
+    """Прежняя распаковка YUYV в YUV 4:4:4: U и V общие для пары пикселей"""
+    height, pairs, _ = raw.shape
+    yuv = np.zeros((height, pairs * 2, 3), dtype=np.float64)
+    yuv[:, 0::2, 0] = raw[:, :, 0]
+    yuv[:, 1::2, 0] = raw[:, :, 2]
+    yuv[:, 0::2, 1] = yuv[:, 1::2, 1] = raw[:, :, 1]
+    yuv[:, 0::2, 2] = yuv[:, 1::2, 2] = raw[:, :, 3]
+    return yuv
+
+
+class TestFrameConversion(unittest.TestCase):
+    """Тесты rgb565_to_bgr и yuyv_to_bgr"""
+
+    def setUp(self):
+        """Подготовка к тестам"""
+        self.random = np.random.default_rng(5)
+
+    def test_rgb565_matches_legacy(self):
+        """Тест совпадения RGB565 с прежней поканальной конвертацией"""
+        frame = self.random.integers(0, 1 << 16, (37, 64), dtype=np.uint16)
+        frame[0, :4] = [0x0000, 0xF800, 0x07E0, 0x001F]
+        np.testing.assert_array_equal(rgb565_to_bgr(frame), legacy_rgb565_to_bgr(frame))
+        self.assertEqual(rgb565_to_bgr(frame)[0, 1].tolist(), [0, 0, 248])
+
+    def test_yuyv_pixel_layout(self):
+        """Тест раскладки YUYV: пиксели и цветность совпадают с прежней распаковкой
+
+        Цвета считаются по BT.601 с ограниченным диапазоном (Y 16-235),
+        как у COLOR_YUV2BGR_YUYV.
+        """
+        height, width = 6, 10
+        raw = self.random.integers(0, 256, (height, width // 2, 4), dtype=np.uint8)
+        yuv = legacy_yuv444(raw)
+        luma = 1.164 * np.maximum(yuv[..., 0] - 16, 0)
+        u, v = yuv[..., 1] - 128, yuv[..., 2] - 128
+        expected = np.stack([luma + 2.018 * u, luma - 0.813 * v - 0.391 * u, luma + 1.596 * v], axis=-1)
+        expected = np.clip(np.round(expected), 0, 255)
+
+        result = yuyv_to_bgr(raw.tobytes(), width, height)
+        self.assertEqual(result.shape, (height, width, 3))
+        np.testing.assert_allclose(result, expected, atol=2)
+
+    def test_yuyv_limited_range(self):
+        """Тест отличия от прежней конвертации COLOR_YUV2BGR: Y 16-235 растягивается до 0-255"""
+        for luma, bgr in ((16, 0), (235, 255)):
+            raw = np.array([luma, 128, luma, 128] * 4, dtype=np.uint8)
+            # Прежний результат - [luma, luma, luma]
+            self.assertEqual(yuyv_to_bgr(raw.tobytes(), 4, 2)[1, 3].tolist(), [bgr] * 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
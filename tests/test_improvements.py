@@ -195,6 +195,54 @@ class TestPerformance(unittest.TestCase):
         stats = cache.get_stats()
         self.assertEqual(stats['max_size'], 3)
     
+    def test_smart_cache_stats_and_sharding(self):
+        """Тест счетчиков и сегментирования кэша"""
+        cache = SmartCache(max_size=1000, ttl=10, num_shards=8)
+        self.assertEqual(cache.num_shards, 8)
+        
+        for i in range(1200):
+            cache.set(f'key{i}', i)
+        cache.get('key1199')
+        cache.get('missing')
+        
+        stats = cache.get_stats()
+        self.assertLessEqual(stats['size'], 1000 + cache.num_shards)
+        self.assertGreaterEqual(stats['evictions'], 200 - cache.num_shards)
+        self.assertEqual(stats['hits'], 1)
+        self.assertEqual(stats['misses'], 1)
+        self.assertAlmostEqual(stats['hit_rate'], 0.5)
+        cache.close()
+    
+    def test_smart_cache_expiry(self):
+        """Тест фоновой очистки просроченных записей"""
+        cache = SmartCache(max_size=100, ttl=0.05, expiry_interval=0.02)
+        cache.set('short', 1)
+        cache.set('long', 2, ttl=60)
+        
+        deadline = time.time() + 2
+        while len(cache) > 1 and time.time() < deadline:
+            time.sleep(0.02)
+        
+        self.assertEqual(len(cache), 1)
+        self.assertEqual(cache.get('long'), 2)
+        self.assertEqual(cache.get_stats()['expirations'], 1)
+        cache.close()
+    
+    def test_smart_cache_max_bytes(self):
+        """Тест ограничения кэша по весу записей"""
+        cache = SmartCache(max_size=100, max_bytes=10, weigher=len)
+        cache.set('a', 'xxxx')
+        cache.set('b', 'yyyy')
+        cache.set('c', 'zzzz')
+        
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(cache.get('c'), 'zzzz')
+        self.assertEqual(cache.get_stats()['bytes'], 8)
+        
+        cache.set('huge', 'x' * 50)
+        self.assertIsNone(cache.get('huge'))
+        cache.close()
+    
     def test_load_balancer(self):
         """Тест балансировщика нагрузки"""
         balancer = LoadBalancer(num_workers=3)
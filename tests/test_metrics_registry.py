@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Daur-AI: Тесты реестра метрик Prometheus
+"""
+
+import gzip
+import importlib.util
+import unittest
+
+from src.monitoring.metrics_registry import (
+    OPENMETRICS_CONTENT_TYPE, PROMETHEUS_CONTENT_TYPE, MetricsRegistry, format_value
+)
+from src.monitoring.prometheus_exporter import PrometheusExporter, PrometheusMetrics
+
+
+class TestMetricsRegistry(unittest.TestCase):
+    """Тесты MetricsRegistry"""
+
+    def setUp(self):
+        """Подготовка к тестам"""
+        self.registry = MetricsRegistry()
+        self.requests = self.registry.counter("app_requests_total", "Requests", ["method"])
+        self.temperature = self.registry.gauge("app_temperature", "Temperature", ["sensor"])
+        self.latency = self.registry.histogram("app_latency_seconds", "Latency",
+                                               buckets=[0.1, 0.5, 1])
+
+    def test_text_format(self):
+        """Тест текстового формата Prometheus"""
+        self.requests.inc(method="GET")
+        self.requests.inc(2, "GET")
+        self.temperature.set(21.5, 'a"b\n')
+        text = self.registry.render()
+        self.assertEqual(text.count("# TYPE app_requests_total counter"), 1)
+        self.assertIn('app_requests_total{method="GET"} 3\n', text)
+        self.assertIn('app_temperature{sensor="a\\"b\\n"} 21.5\n', text)
+        self.assertNotIn("# EOF", text)
+
+    def test_openmetrics_format(self):
+        """Тест формата OpenMetrics"""
+        self.requests.inc(method="POST")
+        text = self.registry.render(openmetrics=True)
+        self.assertIn("# TYPE app_requests counter\n", text)
+        self.assertIn('app_requests_total{method="POST"} 1\n', text)
+        self.assertTrue(text.endswith("# EOF\n"))
+
+    def test_histogram(self):
+        """Тест гистограммы"""
+        for value in (0.05, 0.2, 0.3, 2.0):
+            self.latency.observe(value)
+        data = self.latency.get()
+        self.assertEqual(data['count'], 4)
+        self.assertAlmostEqual(data['sum'], 2.55)
+        self.assertEqual(list(data['buckets'].values()), [1, 3, 3, 4])
+        text = self.registry.render()
+        self.assertIn('app_latency_seconds_bucket{le="0.5"} 3\n', text)
+        self.assertIn('app_latency_seconds_bucket{le="+Inf"} 4\n', text)
+        self.assertIn('app_latency_seconds_count 4\n', text)
+
+    def test_unchanged_families_are_cached(self):
+        """Тест повторного использования текста неизменившихся семейств"""
+        self.temperature.set(1.0, "x")
+        self.requests.inc(method="GET")
+        self.registry.render()
+        block = self.temperature.render()
+        self.temperature.set(1.0, "x")
+        self.requests.inc(method="GET")
+        self.registry.render()
+        self.assertIs(self.temperature.render(), block)
+        self.temperature.set(2.0, "x")
+        self.assertIn("app_temperature{sensor=\"x\"} 2.0", self.temperature.render())
+
+    def test_remove_series(self):
+        """Тест удаления серии"""
+        self.temperature.set(1, "x")
+        self.temperature.set(2, "y")
+        self.temperature.remove("x")
+        text = self.registry.render()
+        self.assertNotIn('sensor="x"', text)
+        self.assertIn('sensor="y"', text)
+
+    def test_label_validation(self):
+        """Тест проверки меток"""
+        with self.assertRaises(ValueError):
+            self.requests.inc(1)
+        with self.assertRaises(ValueError):
+            self.requests.inc(-1, "GET")
+        with self.assertRaises(ValueError):
+            self.registry.gauge("app_temperature", "Duplicate")
+
+    def test_content_negotiation(self):
+        """Тест выбора формата и сжатия"""
+        self.requests.inc(method="GET")
+        body, headers = self.registry.encode("text/plain", None)
+        self.assertEqual(headers['Content-Type'], PROMETHEUS_CONTENT_TYPE)
+        self.assertNotIn('Content-Encoding', headers)
+        self.assertIn(b"app_requests_total", body)
+
+        body, headers = self.registry.encode(
+            "application/openmetrics-text;version=1.0.0;q=0.9,text/plain;q=0.5", "gzip, deflate")
+        self.assertEqual(headers['Content-Type'], OPENMETRICS_CONTENT_TYPE)
+        self.assertEqual(headers['Content-Encoding'], 'gzip')
+        self.assertTrue(gzip.decompress(body).endswith(b"# EOF\n"))
+
+        _, headers = self.registry.encode("*/*", "gzip;q=0")
+        self.assertNotIn('Content-Encoding', headers)
+
+    def test_format_value(self):
+        """Тест форматирования значений"""
+        self.assertEqual(format_value(3), "3")
+        self.assertEqual(format_value(0.25), "0.25")
+        self.assertEqual(format_value(float('inf')), "+Inf")
+        self.assertEqual(format_value(float('nan')), "NaN")
+
+
+class TestPrometheusMetricsRegistry(unittest.TestCase):
+    """Тесты метрик API и оборудования в реестре"""
+
+    def setUp(self):
+        """Подготовка к тестам"""
+        self.metrics = PrometheusMetrics()
+
+    def tearDown(self):
+        """Очистка после тестов"""
+        self.metrics.monitor.cleanup()
+
+    def test_api_latency_histogram(self):
+        """Тест гистограммы задержек API"""
+        self.metrics.record_api_request(0.02, "GET", "/api/v1/status")
+        self.metrics.record_api_request(0.7, "GET", "/api/v1/status", 500)
+        text = self.metrics.get_api_metrics()
+        self.assertIn('daur_api_requests_total{method="GET",endpoint="/api/v1/status",status="500"} 1',
+                      text)
+        self.assertIn('daur_api_request_duration_seconds_bucket{method="GET",'
+                      'endpoint="/api/v1/status",le="0.025"} 1', text)
+        self.assertIn('daur_api_request_duration_seconds_count{method="GET",'
+                      'endpoint="/api/v1/status"} 2', text)
+
+    def test_hardware_collectors(self):
+        """Тест сборщиков оборудования"""
+        text = self.metrics.registry.render()
+        self.assertEqual(text.count("# TYPE daur_cpu_core_usage_percent gauge"), 1)
+        self.assertIn('daur_cpu_core_usage_percent{core="0"}', text)
+        self.assertIn("daur_memory_total_bytes", text)
+
+    @unittest.skipUnless(importlib.util.find_spec('flask'), "flask не установлен")
+    def test_exporter_records_requests(self):
+        """Тест записи запросов Flask в гистограмму по шаблону маршрута"""
+        from flask import Flask
+
+        app = Flask(__name__)
+
+        @app.route('/ping/<name>')
+        def ping(name):
+            return name, 201
+
+        exporter = PrometheusExporter(app, monitor=self.metrics.monitor)
+        client = app.test_client()
+        client.get('/ping/first')
+        client.get('/ping/second')
+        client.get('/missing')
+        text = exporter.metrics.get_api_metrics()
+        self.assertIn('daur_api_request_duration_seconds_count{method="GET",'
+                      'endpoint="/ping/<name>"} 2', text)
+        self.assertIn('daur_api_requests_total{method="GET",endpoint="/ping/<name>",status="201"} 2',
+                      text)
+        self.assertIn('daur_api_requests_total{method="GET",endpoint="<unmatched>",status="404"} 1',
+                      text)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Daur-AI: Тесты хранилища временных рядов
+"""
+
+import math
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from src.database.metrics_store import HOUR, MINUTE, RAW, MetricsStore, decode_chunk, encode_chunk
+from src.database.real_database import RealDatabase
+
+T0 = 1_700_000_000.0
+
+
+class TestMetricsStore(unittest.TestCase):
+    """Тесты MetricsStore"""
+
+    def setUp(self):
+        """Подготовка к тестам"""
+        self.store = MetricsStore(chunk_size=256, retention={RAW: 10 ** 9})
+        self.samples = []
+        for i in range(2 * 86400 // 10):
+            value = round(40 + 20 * math.sin(i / 50.0), 1)
+            self.store.add('cpu', value, T0 + i * 10)
+            self.samples.append((T0 + i * 10, value))
+
+    def tearDown(self):
+        self.store.close()
+
+    def test_chunk_roundtrip(self):
+        """Тест сжатия и распаковки блока"""
+        timestamps = [T0 + i * 5 for i in range(1000)]
+        values = [50.0 + (i % 7) * 0.5 for i in range(1000)]
+        data = encode_chunk([timestamps, values])
+        decoded = decode_chunk(data)
+        np.testing.assert_allclose(decoded[0], timestamps)
+        np.testing.assert_array_equal(decoded[1], values)
+        self.assertLess(len(data), 16000 / 4)
+
+    def test_aggregate_matches_raw(self):
+        """Тест совпадения агрегатов по сверткам с расчетом по исходным данным"""
+        for start, end in ((T0 + 1234.5, T0 + 86400 + 777), (T0, T0 + 10 ** 6), (T0 + 3, T0 + 65)):
+            expected = [v for t, v in self.samples if start <= t < end]
+            result = self.store.aggregate('cpu', start, end)
+            self.assertEqual(result['count'], len(expected))
+            self.assertAlmostEqual(result['sum'], sum(expected), places=6)
+            self.assertEqual(result['min'], min(expected))
+            self.assertEqual(result['max'], max(expected))
+
+    def test_query_resolution(self):
+        """Тест выбора разрешения запроса"""
+        raw = self.store.query('cpu', T0, T0 + 600)
+        self.assertEqual(len(raw), 60)
+        self.assertEqual(raw[1], {'timestamp': T0 + 10, 'value': self.samples[1][1]})
+
+        minutes = self.store.query('cpu', T0, T0 + 6 * 3600)
+        self.assertEqual(len(minutes), 360)
+        self.assertEqual(minutes[0]['count'], 6)
+
+        # Бакет попадает в результат по времени своего начала
+        hours = self.store.query('cpu', T0 - HOUR, T0 + 2 * 86400, resolution=HOUR)
+        self.assertEqual(sum(h['count'] for h in hours), len(self.samples))
+
+    def test_open_hour_with_minute_of_next_hour(self):
+        """Тест незакрытого часа, когда открытая минута уже в следующем часе"""
+        store = MetricsStore(chunk_size=256)
+        for i in range(360):
+            store.add('gpu', 1.0, 36000 + i * 10)
+        store.add('gpu', 2.0, 39605)
+
+        hours = store.query('gpu', 36000, 43200, resolution=HOUR)
+        self.assertEqual([(h['timestamp'], h['count']) for h in hours], [(36000, 360), (39600, 1)])
+        self.assertEqual(store.aggregate('gpu', 36000, 43200)['count'], 361)
+        self.assertEqual(store.aggregate('gpu', 36000, 43200)['sum'], 362.0)
+        store.close()
+
+    def test_retention(self):
+        """Тест удаления устаревших данных"""
+        self.store.retention[RAW] = 3600
+        self.store.flush()
+        self.assertGreater(self.store.apply_retention(T0 + 2 * 86400), 0)
+        self.assertEqual(self.store.query('cpu', T0, T0 + 600, resolution=RAW), [])
+        self.assertEqual(len(self.store.query('cpu', T0, T0 + 600, resolution=MINUTE)), 10)
+
+
+class TestRealDatabaseMetricsStore(unittest.TestCase):
+    """Тесты RealDatabase с хранилищем временных рядов"""
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def test_hardware_metrics_average(self):
+        """Тест средних значений из хранилища временных рядов"""
+        store = MetricsStore(os.path.join(self.tmpdir, 'metrics.db'))
+        db = RealDatabase(os.path.join(self.tmpdir, 'test.db'), metrics_store=store)
+        db.insert_hardware_metrics(10.0, 40.0, 70.0)
+        db.insert_hardware_metrics_many([{'cpu_percent': 30.0, 'memory_percent': 60.0,
+                                          'disk_percent': 70.0}])
+        average = db.get_hardware_metrics_average(hours=1)
+        self.assertEqual(average['avg_cpu'], 20.0)
+        self.assertEqual(average['max_memory'], 60.0)
+        db.close()
+        store.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
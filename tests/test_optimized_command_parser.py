@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Daur-AI: Тесты оптимизированного парсера команд
+"""
+
+import json
+import unittest
+from unittest.mock import MagicMock
+
+from src.parser.optimized_command_parser import ActionType, CommandType, OptimizedCommandParser
+from src.parser.semantic_cache import SemanticParseCache
+
+
+class TestOptimizedCommandParser(unittest.TestCase):
+    """Тесты OptimizedCommandParser"""
+
+    def setUp(self):
+        """Подготовка к тестам"""
+        self.parser = OptimizedCommandParser()
+
+    def test_normalize_synonyms(self):
+        """Тест замены синонимов за один проход"""
+        self.assertEqual(self.parser._normalize_text('  Запусти   Браузер '), 'открой браузер')
+        self.assertEqual(self.parser._normalize_text('напишите и сотри'), 'напиши и удали')
+        # Синоним внутри слова не заменяется
+        self.assertEqual(self.parser._normalize_text('поискать'), 'поискать')
+
+    def test_synonym_chains(self):
+        """Тест цепочек синонимов как при последовательной замене"""
+        self.parser.update_synonyms({'старт': ['пуск'], 'запуск': ['старт']})
+        self.assertEqual(self.parser._normalize_text('пуск старт'), 'запуск запуск')
+
+    def test_quick_parse(self):
+        """Тест распознавания команд единым выражением"""
+        cases = {
+            'Создай файл test.txt': (CommandType.FILE_OPERATION, ActionType.CREATE, {'target': 'test.txt'}),
+            'сохрани привет в файл a.txt': (CommandType.FILE_OPERATION, ActionType.CREATE,
+                                            {'param_0': 'привет', 'param_1': 'a.txt'}),
+            'открой файл a.txt': (CommandType.FILE_OPERATION, ActionType.OPEN, {'target': 'a.txt'}),
+            'запусти терминал': (CommandType.APPLICATION, ActionType.OPEN, {'target': 'терминал'}),
+            'сделай скриншот': (CommandType.SCREENSHOT, ActionType.TAKE, {}),
+            'поищи погоду в браузер': (CommandType.SEARCH, ActionType.SEARCH, {'target': 'погоду в браузер'}),
+            'справка': (CommandType.HELP, ActionType.HELP, {}),
+        }
+        for text, (command_type, action, parameters) in cases.items():
+            command = self.parser.parse(text, use_cache=False)
+            self.assertEqual((command.command_type, command.action, command.parameters),
+                             (command_type, action, parameters), text)
+
+    def test_unknown_command(self):
+        """Тест нераспознанной команды"""
+        command = self.parser.parse('расскажи анекдот')
+        self.assertEqual(command.command_type, CommandType.UNKNOWN)
+        self.assertEqual(self.parser.get_parse_stats()['failed_parses'], 1)
+
+
+class TestSemanticParseCache(unittest.TestCase):
+    """Тесты семантического кэша AI-разборов"""
+
+    def setUp(self):
+        """Подготовка к тестам"""
+        self.ai_manager = MagicMock()
+        self.ai_manager.generate_response.side_effect = self.ai_response
+        self.parser = OptimizedCommandParser(self.ai_manager)
+
+    @staticmethod
+    def ai_response(prompt):
+        command = prompt.split('Команда: "')[1].split('"')[0].lower()
+        action = 'close' if 'close' in command else 'open'
+        app = command.split()[-2] if command.endswith('browser') else command.split()[-1]
+        return {'success': True, 'response': json.dumps({
+            'command_type': 'application', 'action': action,
+            'parameters': {'app': app.capitalize()}, 'confidence': 0.9})}
+
+    def test_templatize(self):
+        """Тест сведения команды к шаблону"""
+        cache = SemanticParseCache()
+        self.assertEqual(cache.templatize('please delete the file ~/notes.md'),
+                         ('delete file <path>', ('path',), ['~/notes.md']))
+        self.assertEqual(cache.templatize('set volume to 30'), ('set volume to <number>', ('number',), ['30']))
+
+    def test_fuzzy_hit_rebinds_slots(self):
+        """Тест попадания для варианта команды с подстановкой слотов"""
+        first = self.parser.parse('open chrome')
+        self.assertEqual(first.parameters, {'app': 'Chrome'})
+
+        variant = self.parser.parse('please open firefox browser')
+        self.assertEqual(variant.action, ActionType.OPEN)
+        self.assertEqual(variant.parameters, {'app': 'firefox'})
+        self.assertLess(variant.confidence, 0.9)
+        self.assertEqual(self.ai_manager.generate_response.call_count, 1)
+
+        # Другое действие - другой шаблон, нужен AI
+        closing = self.parser.parse('close chrome')
+        self.assertEqual(closing.action, ActionType.CLOSE)
+        self.assertEqual(self.ai_manager.generate_response.call_count, 2)
+
+        stats = self.parser.get_parse_stats()
+        self.assertEqual(stats['semantic_hits'], 1)
+        self.assertEqual(stats['ai_parses'], 2)
+        # Кэшированная команда не изменилась при подстановке
+        self.assertEqual(self.parser.parse('open safari').parameters, {'app': 'safari'})
+        self.assertEqual(self.parser.parse('open chrome', use_cache=False).parameters, {'app': 'Chrome'})
+
+    def test_rebind_single_pass_whole_values(self):
+        """Тест подстановки слотов за один проход и только целых значений"""
+        cache = SemanticParseCache()
+        cache.store('copy rows from 1 to 2', MagicMock(parameters={'from': '1', 'to': '2'}))
+        command, _ = cache.lookup('copy rows from 2 to 3')
+        self.assertEqual(command.parameters, {'from': '2', 'to': '3'})
+
+        cache.store('print report10.txt 1 times', MagicMock(parameters={'file': 'report10.txt', 'copies': 1,
+                                                                         'note': '1 copy of report10.txt'}))
+        command, _ = cache.lookup('print report10.txt 5 times')
+        self.assertEqual(command.parameters, {'file': 'report10.txt', 'copies': 1,
+                                              'note': '5 copy of report10.txt'})
+
+    def test_fuzzy_hit_requires_neutral_difference(self):
+        """Тест отказа в нечетком попадании при различии значимых слов"""
+        cache = SemanticParseCache()
+        cache.store('send weekly sales report to "Anna"', MagicMock(parameters={'to': 'Anna'}))
+        self.assertIsNone(cache.lookup('do not send weekly sales report to "Anna"'))
+        self.assertIsNotNone(cache.lookup('please send weekly sales report to "Bob" now'))
+        self.assertEqual(cache.get_stats()['misses'], 1)
+
+    def test_lru_eviction(self):
+        """Тест вытеснения старых шаблонов"""
+        cache = SemanticParseCache(max_entries=2)
+        for text in ('open chrome', 'close chrome', 'minimize chrome'):
+            command = MagicMock(parameters={'app': 'chrome'})
+            cache.store(text, command)
+        self.assertEqual(len(cache), 2)
+        self.assertIsNone(cache.lookup('open firefox'))
+        self.assertIsNotNone(cache.lookup('close firefox'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Daur-AI: Тесты пакетной обработки запросов OptimizedModelManager
+"""
+
+import asyncio
+import threading
+import time
+import unittest
+
+from src.ai.optimized_model_manager import ModelType, OptimizedModelManager
+from src.ai.request_batcher import RequestBatcher
+
+
+class FakeModel:
+    """Модель с фиксированной задержкой, считающая одновременные вызовы"""
+
+    def __init__(self, delay=0.02, fail=False):
+        self.delay = delay
+        self.fail = fail
+        self.lock = threading.Lock()
+        self.active = 0
+        self.max_active = 0
+        self.calls = []
+
+    def _call(self, prompts):
+        with self.lock:
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+            self.calls.append(list(prompts))
+        try:
+            time.sleep(self.delay)
+            if self.fail:
+                raise ConnectionError("backend down")
+            return [f"out:{prompt}" for prompt in prompts]
+        finally:
+            with self.lock:
+                self.active -= 1
+
+    def generate_text(self, prompt, max_tokens=256):
+        return self._call([prompt])[0]
+
+
+class FakeBatchModel(FakeModel):
+    """Модель с пакетной генерацией"""
+
+    def generate_batch(self, prompts, max_tokens=256):
+        return self._call(prompts)
+
+
+class FakeManager(OptimizedModelManager):
+    def __init__(self, models, **batching):
+        self.fake_models = models
+        super().__init__({'ai_models': {'batching': batching}})
+
+    def _initialize_models(self):
+        self.models.update(self.fake_models)
+        for model_type in self.model_priority:
+            if model_type in self.models:
+                self.active_model = self.models[model_type]
+                self.active_model_type = model_type
+                break
+
+
+class TestRequestBatching(unittest.TestCase):
+    """Тесты пакетной генерации"""
+
+    def test_batch_generate_groups_and_dedupes(self):
+        """Тест объединения запросов в пакеты и дедупликации"""
+        model = FakeBatchModel()
+        manager = FakeManager({ModelType.LOCAL: model}, window=0.05, max_batch_size=8)
+        prompts = [f"p{i % 12}" for i in range(16)]
+        try:
+            results = manager.batch_generate(prompts)
+        finally:
+            manager.shutdown()
+
+        self.assertEqual([r['response'] for r in results], [f"out:{p}" for p in prompts])
+        self.assertTrue(all(r['success'] and r['model'] == 'local' for r in results))
+        self.assertEqual(sorted(p for call in model.calls for p in call), sorted(set(prompts)))
+        self.assertLessEqual(len(model.calls), 3)
+
+        stats = manager.get_model_stats()['batching']['local']
+        self.assertEqual(stats['deduplicated'], 4)
+        self.assertEqual(stats['batched_prompts'], 12)
+        self.assertEqual(manager.get_model_stats()['successful_requests'], 16)
+
+    def test_concurrency_limit(self):
+        """Тест ограничения параллельных вызовов модели без пакетного API"""
+        model = FakeModel()
+        manager = FakeManager({ModelType.OLLAMA: model}, concurrency={'ollama': 2})
+        try:
+            start = time.perf_counter()
+            results = manager.batch_generate([f"p{i}" for i in range(8)])
+            elapsed = time.perf_counter() - start
+        finally:
+            manager.shutdown()
+
+        self.assertTrue(all(r['success'] for r in results))
+        self.assertEqual(model.max_active, 2)
+        self.assertTrue(all(len(call) == 1 for call in model.calls))
+        # Последовательно заняло бы 8 * 0.02 с
+        self.assertLess(elapsed, 8 * model.delay)
+
+    def test_fallback_to_next_model(self):
+        """Тест переключения на резервную модель при ошибке"""
+        manager = FakeManager({ModelType.OLLAMA: FakeModel(fail=True), ModelType.SIMPLE: FakeModel()})
+        try:
+            results = manager.batch_generate(["a", "b", "c"])
+        finally:
+            manager.shutdown()
+
+        self.assertEqual([r['response'] for r in results], ["out:a", "out:b", "out:c"])
+        self.assertTrue(all(r['model'] == 'simple' for r in results))
+        self.assertEqual(manager.get_model_stats()['model_switch_count'], 1)
+
+    def test_all_models_fail(self):
+        """Тест результата при отказе всех моделей"""
+        manager = FakeManager({ModelType.OLLAMA: FakeModel(fail=True)})
+        try:
+            self.assertFalse(manager.batch_generate(["a"])[0]['success'])
+            self.assertFalse(manager.generate_response("b")['success'])
+        finally:
+            manager.shutdown()
+
+    def test_generate_response_uses_cache(self):
+        """Тест синхронной генерации через generate_text и кэш"""
+        model = FakeModel(delay=0)
+        manager = FakeManager({ModelType.SIMPLE: model})
+        try:
+            first = manager.generate_response("hello")
+            second = manager.batch_generate(["hello"])[0]
+        finally:
+            manager.shutdown()
+
+        self.assertEqual(first['response'], "out:hello")
+        self.assertFalse(first['from_cache'])
+        self.assertTrue(second['from_cache'])
+        self.assertEqual(len(model.calls), 1)
+
+    def test_async_requests_are_batched(self):
+        """Тест объединения асинхронных запросов в пакет"""
+        model = FakeBatchModel()
+        manager = FakeManager({ModelType.LOCAL: model}, window=0.05)
+
+        async def run():
+            return await asyncio.gather(*(manager.generate_response_async(f"q{i}") for i in range(4)))
+
+        try:
+            results = asyncio.run(run())
+        finally:
+            manager.shutdown()
+
+        self.assertEqual([r['response'] for r in results], [f"out:q{i}" for i in range(4)])
+        self.assertEqual(len(model.calls), 1)
+
+    def test_batcher_splits_by_max_tokens(self):
+        """Тест раздельных вызовов для разных max_tokens"""
+        model = FakeBatchModel(delay=0)
+        batcher = RequestBatcher(model, batch_window=0.05)
+        try:
+            futures = [batcher.submit("a", 10), batcher.submit("b", 10), batcher.submit("a", 20)]
+            self.assertEqual([f.result(timeout=5) for f in futures], ["out:a", "out:b", "out:a"])
+        finally:
+            batcher.shutdown()
+        self.assertEqual(sorted(model.calls), [["a"], ["a", "b"]])
+        with self.assertRaises(RuntimeError):
+            batcher.submit("c", 10)
+
+
+    def test_cancelled_caller_does_not_affect_others(self):
+        """Тест отмены Future одного из вызывающих"""
+        model = FakeBatchModel(delay=0.05)
+        batcher = RequestBatcher(model, batch_window=0.05)
+        try:
+            first, duplicate, other = batcher.submit("a", 10), batcher.submit("a", 10), batcher.submit("b", 10)
+            self.assertTrue(first.cancel())
+            self.assertEqual(duplicate.result(timeout=5), "out:a")
+            self.assertEqual(other.result(timeout=5), "out:b")
+            self.assertEqual(batcher.submit("c", 10).result(timeout=5), "out:c")
+        finally:
+            batcher.shutdown()
+        self.assertTrue(first.cancelled())
+        self.assertEqual(batcher.get_stats()['deduplicated'], 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,153 @@
+"""
+Tests for the ring-buffered OptimizedScreenCapture.
+"""
+
+import time
+
+import numpy as np
+import pytest
+from unittest.mock import patch
+
+try:
+    from src.vision.optimized_screen_capture import OptimizedScreenCapture
+    HAS_CAPTURE = True
+except ImportError:
+    HAS_CAPTURE = False
+
+pytestmark = pytest.mark.skipif(not HAS_CAPTURE, reason="mss not available")
+
+
+def _bgra(value, height=4, width=6):
+    frame = np.full((height, width, 4), value, dtype=np.uint8)
+    frame[..., 3] = 255
+    return frame
+
+
+class TestRingBuffer:
+    """Ring buffer and running average."""
+
+    def test_capture_returns_readonly_bgr(self):
+        capture = OptimizedScreenCapture(buffer_size=3)
+        with patch.object(capture, '_grab', return_value=_bgra(10)):
+            frame = capture.capture((0, 0, 6, 4))
+        assert frame.shape == (4, 6, 3)
+        assert not frame.flags.writeable
+        with pytest.raises(ValueError):
+            frame[0, 0, 0] = 1
+
+    def test_buffer_is_preallocated(self):
+        capture = OptimizedScreenCapture(buffer_size=3)
+        with patch.object(capture, '_grab', side_effect=[_bgra(v) for v in range(5)]):
+            ring = None
+            for _ in range(5):
+                capture.capture()
+                ring = ring if ring is not None else capture._ring
+                assert capture._ring is ring
+
+    def test_running_average(self):
+        capture = OptimizedScreenCapture(buffer_size=3)
+        assert capture.get_buffer_average() is None
+        values = [10, 20, 30, 40, 50]
+        with patch.object(capture, '_grab', side_effect=[_bgra(v) for v in values]):
+            for _ in values:
+                capture.capture()
+        # В буфере остались последние три кадра: 30, 40, 50
+        assert np.all(capture.get_buffer_average() == 40)
+        assert np.all(capture.get_latest_frame() == 50)
+        assert capture.frame_number == 5
+
+    def test_clear_buffer(self):
+        capture = OptimizedScreenCapture(buffer_size=2)
+        with patch.object(capture, '_grab', return_value=_bgra(7)):
+            capture.capture()
+        capture.clear_buffer()
+        assert capture.get_latest_frame() is None
+        assert capture.get_buffer_average() is None
+
+
+class TestBackgroundCapture:
+    """Background capture thread."""
+
+    def test_start_stop(self):
+        capture = OptimizedScreenCapture(buffer_size=4)
+        with patch.object(capture, '_grab', return_value=_bgra(99)):
+            capture.start(fps=200)
+            deadline = time.time() + 2
+            while capture.get_latest_frame() is None and time.time() < deadline:
+                time.sleep(0.01)
+            frame = capture.capture()
+            capture.stop()
+
+        assert not capture.is_running
+        assert capture.stats['frames'] >= 1
+        assert np.all(frame == 99)
+
+
+class TestChangeDetection:
+    """Tile change detection and dirty-region result reuse."""
+
+    def test_detects_changed_tiles(self):
+        from src.vision.change_detector import TileChangeDetector
+
+        detector = TileChangeDetector(tile_size=8)
+        frame = np.zeros((20, 30, 3), dtype=np.uint8)
+        assert detector.detect(frame) == [(0, 0, 30, 20)]
+        assert detector.detect(frame) == []
+
+        changed = frame.copy()
+        changed[9, 17] = 255
+        assert detector.detect(changed) == [(16, 8, 8, 8)]
+
+        changed[0:2, 0:20] = 1
+        rects = detector.detect(changed)
+        assert rects == [(0, 0, 24, 8)]
+
+    def test_dirty_region_cache_reuses_clean_results(self):
+        from src.vision.change_detector import DirtyRegionCache
+
+        def find_bright(image):
+            ys, xs = np.nonzero(image[..., 0] == 255)
+            return [{'x': int(x), 'y': int(y), 'width': 1, 'height': 1}
+                    for x, y in zip(xs, ys)]
+
+        calls = []
+
+        def analyze(image):
+            calls.append(image.shape)
+            return find_bright(image)
+
+        cache = DirtyRegionCache(tile_size=8)
+        frame = np.zeros((32, 32, 3), dtype=np.uint8)
+        frame[2, 3] = 255
+        cache.update(frame)
+        assert cache.run('bright', analyze) == [{'x': 3, 'y': 2, 'width': 1, 'height': 1}]
+
+        cache.update(frame.copy())
+        assert len(cache.run('bright', analyze)) == 1
+        assert len(calls) == 1  # кадр не изменился - анализ не запускался
+
+        moved = frame.copy()
+        moved[20, 25] = 255
+        cache.update(moved)
+        results = cache.run('bright', analyze)
+        assert sorted((r['x'], r['y']) for r in results) == [(3, 2), (25, 20)]
+        assert calls[-1] == (8, 8, 3)  # анализировался только изменившийся тайл
+        assert cache.stats['partial_runs'] == 1
+
+    def test_capture_feeds_change_cache(self):
+        capture = OptimizedScreenCapture(buffer_size=2, change_tile_size=2)
+        with patch.object(capture, '_grab', side_effect=[_bgra(1), _bgra(1), _bgra(2)]):
+            capture.capture()
+            capture.capture()
+            assert capture.change_cache.last_dirty_rects == []
+            capture.capture()
+            assert capture.change_cache.last_dirty_rects == [(0, 0, 6, 4)]
+
+    def test_change_cache_frame_survives_ring_wrap(self):
+        capture = OptimizedScreenCapture(buffer_size=1, change_tile_size=2)
+        with patch.object(capture, '_grab', side_effect=[_bgra(1), _bgra(2)]):
+            capture.capture()
+            cached = capture.change_cache._frame
+            capture.capture()
+        assert (cached == 1).all()
+        assert (capture.change_cache._frame == 2).all()
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Daur-AI: Тесты параллельного выполнения планов RealAIPlanner
+"""
+
+import threading
+import time
+import unittest
+
+from src.ai.real_ai_planner import (
+    PlanCycleError,
+    PlanningStrategy,
+    RealAIPlanner,
+    TaskPriority,
+    TaskStatus
+)
+
+
+class TestRealAIPlannerParallel(unittest.TestCase):
+    """Тесты уровней зависимостей и execute_plan_parallel"""
+
+    def setUp(self):
+        """Подготовка к тестам"""
+        self.planner = RealAIPlanner()
+
+    def make_plan(self, spec, priorities=None):
+        priorities = priorities or {}
+        for task_id, dependencies in spec.items():
+            self.planner.create_task(task_id, task_id, task_id,
+                                     priority=priorities.get(task_id, TaskPriority.MEDIUM),
+                                     estimated_duration=10, dependencies=dependencies)
+        return self.planner.create_plan('goal', list(spec), PlanningStrategy.DEPTH_FIRST)
+
+    def test_levels(self):
+        """Тест разбиения на уровни"""
+        plan = self.make_plan({'a': [], 'b': [], 'c': ['a'], 'd': ['b', 'c'], 'e': []},
+                              priorities={'e': TaskPriority.CRITICAL})
+        self.assertEqual(self.planner.parallelize_plan(plan.plan_id), [['e', 'a', 'b'], ['c'], ['d']])
+
+    def test_cycle_detected(self):
+        """Тест обнаружения цикла"""
+        plan = self.make_plan({'a': ['c'], 'b': ['a'], 'c': ['b'], 'd': ['c'], 'e': []})
+        with self.assertRaises(PlanCycleError) as context:
+            self.planner._dependency_levels(plan.tasks)
+        self.assertEqual(set(context.exception.cycle), {'a', 'b', 'c'})
+        self.assertEqual(context.exception.cycle[0], context.exception.cycle[-1])
+        self.assertIsNone(self.planner.parallelize_plan(plan.plan_id))
+        self.assertIsNone(self.planner.execute_plan_parallel(plan.plan_id))
+
+    def test_parallel_speedup(self):
+        """Тест ускорения при независимых задачах"""
+        plan = self.make_plan({'a': [], 'b': [], 'c': [], 'd': [], 'e': ['a', 'b', 'c', 'd']})
+        order = []
+
+        def runner(task):
+            time.sleep(0.1)
+            order.append(task.task_id)
+            return task.task_id.upper()
+
+        report = self.planner.execute_plan_parallel(plan.plan_id, max_workers=4, runner=runner)
+        self.assertEqual(report['completed'], 5)
+        self.assertEqual(order[-1], 'e')
+        self.assertGreater(report['speedup'], 1.8)
+        self.assertLess(report['wall_time'], 0.45)
+        self.assertGreaterEqual(report['tasks']['e']['start'], max(
+            report['tasks'][task_id]['end'] for task_id in 'abcd'))
+        self.assertEqual(self.planner.get_task('e').result, 'E')
+        self.assertEqual(plan.success_rate, 1.0)
+
+    def test_resource_limits(self):
+        """Тест ограничения одновременного использования ресурса"""
+        plan = self.make_plan({'a': [], 'b': [], 'c': []})
+        for task in plan.tasks:
+            task.metadata['resources'] = {'gpu': 1}
+        active = []
+        peak = []
+        lock = threading.Lock()
+
+        def runner(task):
+            with lock:
+                active.append(task.task_id)
+                peak.append(len(active))
+            time.sleep(0.05)
+            with lock:
+                active.remove(task.task_id)
+
+        report = self.planner.execute_plan_parallel(plan.plan_id, max_workers=3,
+                                                    resource_limits={'gpu': 1}, runner=runner)
+        self.assertEqual(report['completed'], 3)
+        self.assertEqual(max(peak), 1)
+
+    def test_failure_blocks_dependents(self):
+        """Тест блокировки задач, зависящих от упавшей"""
+        plan = self.make_plan({'a': [], 'b': ['a'], 'c': ['b'], 'd': []})
+
+        def runner(task):
+            if task.task_id == 'a':
+                raise RuntimeError('boom')
+
+        report = self.planner.execute_plan_parallel(plan.plan_id, runner=runner)
+        self.assertEqual(report['failed'], 1)
+        self.assertEqual(report['blocked'], 2)
+        self.assertEqual(self.planner.get_task('a').error, 'boom')
+        self.assertEqual(self.planner.get_task('c').status, TaskStatus.BLOCKED)
+        self.assertEqual(self.planner.get_task('d').status, TaskStatus.COMPLETED)
+
+
+if __name__ == '__main__':
+    unittest.main()
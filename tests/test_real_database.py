@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Daur-AI: Тесты пула соединений и пакетной записи RealDatabase
+"""
+
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+from src.database.real_database import INSERT_LOG_SQL, RealDatabase
+
+
+class TestRealDatabasePool(unittest.TestCase):
+    """Тесты RealDatabase с файловой базой"""
+
+    def setUp(self):
+        """Подготовка к тестам"""
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, 'test.db')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def test_wal_and_pool_reuse(self):
+        """Тест режима WAL и переиспользования соединений"""
+        db = RealDatabase(self.path, pool_size=2)
+        with db.get_connection() as conn:
+            self.assertEqual(conn.execute('PRAGMA journal_mode').fetchone()[0], 'wal')
+            # Вложенное использование в том же потоке не берет второе соединение
+            with db.get_connection() as nested:
+                self.assertIs(nested, conn)
+        for _ in range(20):
+            db.insert_log('INFO', 'message')
+        self.assertEqual(len(db._connections), 1)
+        db.close()
+
+    def test_concurrent_writers(self):
+        """Тест записи из нескольких потоков через пул"""
+        db = RealDatabase(self.path, pool_size=3)
+
+        def write(worker):
+            for i in range(50):
+                db.insert_log('INFO', f'{worker}:{i}')
+
+        threads = [threading.Thread(target=write, args=(n,)) for n in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(db.get_statistics()['logs'], 300)
+        self.assertLessEqual(len(db._connections), 3)
+        db.close()
+
+    def test_insert_many(self):
+        """Тест пакетной вставки"""
+        db = RealDatabase(self.path)
+        count = db.insert_hardware_metrics_many(
+            {'cpu_percent': i, 'memory_percent': 50.0, 'disk_percent': 10.0} for i in range(100)
+        )
+        self.assertEqual(count, 100)
+        self.assertEqual(db.insert_logs_many([{'level': 'INFO', 'message': 'a'},
+                                              {'level': 'ERROR', 'message': 'b'}]), 2)
+        self.assertEqual(db.insert_actions_many([{'action_type': 'click', 'action_data': '{}',
+                                                  'user_id': 1}]), 1)
+        stats = db.get_statistics()
+        self.assertEqual((stats['hardware_metrics'], stats['logs'], stats['user_actions']),
+                         (100, 2, 1))
+        self.assertEqual(db.get_logs(level='ERROR')[0]['message'], 'b')
+        db.close()
+
+    def test_write_behind(self):
+        """Тест фоновой пакетной записи"""
+        db = RealDatabase(self.path, write_behind=True, max_batch_size=64)
+        for i in range(500):
+            self.assertTrue(db.insert_hardware_metrics(i, 1.0, 2.0))
+        db.insert_action('click', '{}', 1)
+        db.flush()
+        stats = db.get_statistics()
+        self.assertEqual(stats['hardware_metrics'], 500)
+        self.assertEqual(stats['user_actions'], 1)
+        self.assertLess(db.write_stats['batches'], 500)
+        db.close()
+        self.assertFalse(db.insert_log('INFO', 'after close'))
+
+    def test_write_behind_rejects_only_bad_rows(self):
+        """Тест записи остальных строк пакета при ошибке в одной строке"""
+        db = RealDatabase(self.path, write_behind=True, max_batch_size=64)
+        db.insert_log('INFO', 'before')
+        db.enqueue_write(INSERT_LOG_SQL, ('2025-01-01T00:00:00', 'INFO', {'bad': 'type'}, None, ''))
+        db.insert_log('INFO', 'after')
+        db.flush()
+        self.assertEqual(db.get_statistics()['logs'], 2)
+        self.assertEqual(db.write_stats['rejected'], 1)
+        db.close()
+
+    def test_memory_database(self):
+        """Тест базы в памяти с пакетной записью"""
+        db = RealDatabase(':memory:', write_behind=True)
+        db.insert_log('INFO', 'queued')
+        db.flush()
+        self.assertEqual(db.get_statistics()['logs'], 1)
+        db.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -6,6 +6,9 @@ import unittest
 import json
 import os
 import time
+from unittest.mock import patch
+
+from src.database.metrics_store import MetricsStore
 from src.hardware.real_hardware_monitor import (
     RealHardwareMonitor,
     CPUMetrics,
@@ -315,6 +318,76 @@ class TestRealHardwareMonitor(unittest.TestCase):
         
         monitor1.cleanup()
         monitor2.cleanup()
+    
+    # ===== Snapshot Tests =====
+    
+    def test_snapshot_reads_while_monitoring(self):
+        """Тест чтения снимка без опроса системы при фоновом мониторинге"""
+        self.monitor.start_monitoring(interval=0.2)
+        time.sleep(0.5)
+        snapshot = self.monitor.get_snapshot()
+        self.assertIsNotNone(snapshot.cpu)
+        
+        start = time.perf_counter()
+        for _ in range(1000):
+            self.monitor.get_cpu_metrics()
+            self.monitor.get_memory_metrics()
+        elapsed = time.perf_counter() - start
+        self.assertLess(elapsed, 0.5)
+        self.assertIs(self.monitor.get_memory_metrics(), self.monitor.get_snapshot().memory)
+        
+        time.sleep(0.5)
+        self.assertGreater(self.monitor.get_snapshot().sequence, snapshot.sequence)
+        self.monitor.stop_monitoring()
+        self.assertIsNone(self.monitor._fresh_snapshot())
+    
+    def test_snapshot_is_immutable(self):
+        """Тест неизменяемости снимка"""
+        snapshot = self.monitor.sample()
+        with self.assertRaises(Exception):
+            snapshot.cpu = None
+        self.assertIsInstance(snapshot.disks, tuple)
+        self.assertIn('top_processes_cpu', snapshot.to_dict())
+    
+    def test_cpu_percent_without_blocking(self):
+        """Тест повторного замера CPU без ожидания"""
+        self.monitor.get_cpu_metrics()
+        start = time.perf_counter()
+        metrics = self.monitor.get_cpu_metrics()
+        self.assertLess(time.perf_counter() - start, 0.09)
+        self.assertGreaterEqual(metrics.percent, 0)
+        self.assertLessEqual(metrics.percent, 100)
+        self.assertEqual(len(metrics.percent_per_core), metrics.count_logical)
+    
+    def test_info_methods(self):
+        """Тест представлений для API"""
+        status = self.monitor.get_status()
+        self.assertIn('cpu', status)
+        self.assertIn('percent', self.monitor.get_cpu_info())
+        self.assertIn('total', self.monitor.get_memory_info())
+        self.assertIsInstance(self.monitor.get_gpu_info(), list)
+        self.assertIsInstance(self.monitor.get_network_info(), list)
+        battery = self.monitor.get_battery_info()
+        if battery is not None:
+            self.assertIn('is_plugged', battery)
+    
+    def test_sample_stores_gpu_series(self):
+        """Тест записи рядов GPU в хранилище при опросе снимка"""
+        store = MetricsStore()
+        monitor = RealHardwareMonitor(history_size=10, metrics_store=store)
+        gpu = GPUMetrics(timestamp='', index=0, name='Test GPU', memory_total=1000, memory_used=250,
+                         memory_free=750, temperature=60.0, power_draw=50.0, power_limit=100.0,
+                         utilization=40.0)
+        try:
+            with patch.object(monitor, '_probe_gpus', return_value=[gpu]):
+                monitor.sample()
+            now = time.time()
+            self.assertEqual(store.aggregate('gpu_percent:0', now - 60, now + 1)['max'], 40.0)
+            self.assertEqual(store.aggregate('gpu_memory_percent:0', now - 60, now + 1)['max'], 25.0)
+            self.assertEqual(store.aggregate('gpu_temperature:0', now - 60, now + 1)['count'], 1)
+        finally:
+            monitor.cleanup()
+            store.close()
 
 
 if __name__ == '__main__':
@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Daur-AI: Тесты двухуровневого кэша
+"""
+
+import threading
+import time
+import unittest
+
+try:
+    import fakeredis
+    FAKEREDIS_AVAILABLE = True
+except ImportError:
+    FAKEREDIS_AVAILABLE = False
+
+from src.caching.rate_limit_backend import MemoryRateLimitBackend, RedisRateLimitBackend
+from src.caching.redis_cache import QueryCache, RateLimitCache, RedisCache, TieredCache
+
+
+@unittest.skipUnless(FAKEREDIS_AVAILABLE, "fakeredis not installed")
+class TestTieredCache(unittest.TestCase):
+    """Тесты TieredCache"""
+
+    def setUp(self):
+        """Подготовка к тестам"""
+        self.client = fakeredis.FakeRedis(decode_responses=True)
+        self.l2 = RedisCache(client=self.client)
+        self.cache = TieredCache(self.l2, l1_size=100, l1_ttl=30)
+
+    def tearDown(self):
+        self.cache.l1.close()
+
+    def test_l1_and_l2_hits(self):
+        """Тест чтения из L2 с заполнением L1"""
+        self.l2.set("k", {"a": 1})
+        self.assertEqual(self.cache.get("k"), {"a": 1})
+        self.assertEqual(self.cache.get("k"), {"a": 1})
+        stats = self.cache.get_stats()
+        self.assertEqual((stats['l2_hits'], stats['l1_hits']), (1, 1))
+        self.assertIsNone(self.cache.get("missing"))
+        self.assertEqual(self.cache.get_stats()['misses'], 1)
+
+    def test_get_many_set_many(self):
+        """Тест пакетных операций"""
+        self.assertTrue(self.cache.set_many({"a": 1, "b": [2], "c": "x"}, ttl=60))
+        self.cache.l1.delete("b")
+        result = self.cache.get_many(["a", "b", "c", "d"])
+        self.assertEqual(result, {"a": 1, "b": [2], "c": "x"})
+        stats = self.cache.get_stats()
+        self.assertEqual((stats['l1_hits'], stats['l2_hits'], stats['misses']), (2, 1, 1))
+        self.assertGreater(self.client.ttl("a"), 0)
+
+    def test_coalesced_load(self):
+        """Тест объединения одновременных промахов по одному ключу"""
+        calls = []
+        started = threading.Event()
+
+        def loader():
+            calls.append(1)
+            started.set()
+            time.sleep(0.1)
+            return {"value": 42}
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(
+            self.cache.get_or_load("key", loader, ttl=60))) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, [{"value": 42}] * 8)
+        self.assertEqual(self.l2.get("key"), {"value": 42})
+
+    def test_loader_error_propagates(self):
+        """Тест передачи исключения загрузчика ожидающим вызовам"""
+        gate = threading.Event()
+        errors = []
+
+        def loader():
+            gate.wait(1)
+            raise RuntimeError("backend down")
+
+        def call():
+            try:
+                self.cache.get_or_load("key", loader)
+            except RuntimeError as e:
+                errors.append(str(e))
+
+        threads = [threading.Thread(target=call) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        time.sleep(0.05)
+        gate.set()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, ["backend down"] * 4)
+        self.assertIsNone(self.cache.get("key"))
+
+    def test_query_cache_stable_key(self):
+        """Тест стабильного ключа запроса"""
+        queries = QueryCache(self.cache)
+        calls = []
+        run = lambda: calls.append(1) or [1, 2]
+        self.assertEqual(queries.get_or_execute("SELECT 1", run), [1, 2])
+        self.assertEqual(queries.get_or_execute("SELECT 1", run), [1, 2])
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(queries._key("SELECT 1"), QueryCache(self.l2)._key("SELECT 1"))
+
+
+class RateLimitBackendChecks:
+    """Общие проверки для всех хранилищ лимитов"""
+
+    def test_sliding_window(self):
+        """Тест скользящего окна"""
+        results = [self.backend.sliding_window("u", 3, 10, now=100.0 + i) for i in range(4)]
+        self.assertEqual([r.allowed for r in results], [True, True, True, False])
+        self.assertEqual(results[2].remaining, 0)
+        self.assertAlmostEqual(results[3].retry_after, 7.0)
+        # Первый запрос выходит из окна
+        self.assertTrue(self.backend.sliding_window("u", 3, 10, now=110.5).allowed)
+        self.assertFalse(self.backend.sliding_window("u", 3, 10, now=110.6).allowed)
+
+    def test_token_bucket(self):
+        """Тест маркерной корзины"""
+        allowed = [self.backend.token_bucket("t", 5, 1.0, now=50.0).allowed for _ in range(6)]
+        self.assertEqual(allowed, [True] * 5 + [False])
+        result = self.backend.token_bucket("t", 5, 1.0, now=50.0)
+        self.assertAlmostEqual(result.retry_after, 1.0)
+        self.assertTrue(self.backend.token_bucket("t", 5, 1.0, now=52.0).allowed)
+
+    def test_reset(self):
+        """Тест сброса счетчика"""
+        self.assertTrue(self.backend.sliding_window("r", 1, 60, now=1.0).allowed)
+        self.assertFalse(self.backend.sliding_window("r", 1, 60, now=2.0).allowed)
+        self.backend.reset("r")
+        self.assertTrue(self.backend.sliding_window("r", 1, 60, now=3.0).allowed)
+
+
+    def test_algorithms_on_same_key_are_independent(self):
+        """Тест независимости окна и корзины с одним ключом"""
+        results = [self.backend.sliding_window("k", 3, 3600, now=100.0 + i) for i in range(4)]
+        self.assertFalse(results[-1].allowed)
+        self.backend.token_bucket("k", 5, 1.0, now=105.0)
+        self.backend.sliding_window("other", 1, 1, now=200.0)
+        self.assertFalse(self.backend.sliding_window("k", 3, 3600, now=201.0).allowed)
+
+    def test_token_bucket_rejects_non_positive_rate(self):
+        """Тест проверки скорости пополнения корзины"""
+        with self.assertRaises(ValueError):
+            self.backend.token_bucket("z", 5, 0)
+
+class TestMemoryRateLimitBackend(RateLimitBackendChecks, unittest.TestCase):
+    """Тесты хранилища лимитов в памяти"""
+
+    def setUp(self):
+        self.backend = MemoryRateLimitBackend()
+
+    def test_idle_eviction_only(self):
+        """Тест удаления только неактивных ключей"""
+        self.backend.sliding_window("long", 1, 3600, now=0)
+        self.backend.token_bucket("bucket", 2, 1.0, now=0)
+        for i in range(100):
+            self.backend.sliding_window(f"short{i}", 5, 1, now=i * 0.01)
+        self.backend.sliding_window("probe", 5, 1, now=10)
+        self.assertEqual(len(self.backend), 2)
+        self.assertFalse(self.backend.sliding_window("long", 1, 3600, now=11))
+
+    def test_max_keys_is_opt_in(self):
+        """Тест жесткой границы max_keys (вытесняет и активные ключи)"""
+        backend = MemoryRateLimitBackend(max_keys=10)
+        backend.sliding_window("victim", 1, 3600, now=0)
+        for i in range(20):
+            backend.sliding_window(f"key{i}", 1, 3600, now=1)
+        self.assertLessEqual(len(backend), 10)
+        self.assertTrue(backend.sliding_window("victim", 1, 3600, now=2))
+        self.assertGreater(backend.evictions, 0)
+
+
+@unittest.skipUnless(FAKEREDIS_AVAILABLE, "fakeredis not installed")
+class TestRedisRateLimitBackend(RateLimitBackendChecks, unittest.TestCase):
+    """Тесты хранилища лимитов в Redis"""
+
+    def setUp(self):
+        self.client = fakeredis.FakeRedis(decode_responses=True)
+        self.backend = RedisRateLimitBackend(self.client)
+
+    def test_shared_between_instances(self):
+        """Тест общего лимита для нескольких процессов"""
+        other = RateLimitCache(RedisCache(client=self.client))
+        limiter = RateLimitCache(RedisCache(client=self.client))
+        self.assertIsInstance(limiter.backend, RedisRateLimitBackend)
+        self.assertTrue(limiter.check_rate_limit("ip", 2, 60))
+        self.assertTrue(other.check_rate_limit("ip", 2, 60))
+        self.assertFalse(limiter.check_rate_limit("ip", 2, 60))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Daur-AI: Тесты постоянного кэша ответов моделей
+"""
+
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+
+import numpy as np
+
+from src.ai.ollama_model import OllamaConfig, OllamaModelManager
+from src.ai.openai_client import OpenAIClient
+from src.ai.optimized_model_manager import ModelType, OptimizedModelManager
+from src.ai.response_cache import (ResponseCache, cache_from_config, get_shared_cache,
+                                   normalize_prompt)
+
+VOCABULARY = ['open', 'launch', 'browser', 'chrome', 'close', 'file', 'report']
+
+
+def embed(text):
+    """Мешок слов, в котором open и launch - синонимы"""
+    words = text.replace('launch', 'open').split()
+    return [float(words.count(word)) for word in VOCABULARY]
+
+
+class TestResponseCache(unittest.TestCase):
+    """Тесты ResponseCache"""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'cache.db')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_normalized_key_and_persistence(self):
+        """Тест нормализации промпта и сохранения между запусками"""
+        cache = ResponseCache(self.path)
+        cache.set("Open  the\nBrowser ", "ollama:llama3.2", {"actions": ["app_open"]}, {"temperature": 0.7})
+        self.assertEqual(normalize_prompt("Open  the\nBrowser "), "open the browser")
+        cache.close()
+
+        cache = ResponseCache(self.path)
+        self.assertEqual(cache.get("open the browser", "ollama:llama3.2", {"temperature": 0.7}),
+                         {"actions": ["app_open"]})
+        self.assertIsNone(cache.get("open the browser", "ollama:llama3.2", {"temperature": 0.2}))
+        self.assertIsNone(cache.get("open the browser", "openai:gpt-4", {"temperature": 0.7}))
+        stats = cache.get_stats()
+        self.assertEqual((stats['hits'], stats['misses']), (1, 2))
+        cache.close()
+
+    def test_ttl(self):
+        """Тест истечения срока жизни ответа"""
+        cache = ResponseCache(':memory:', ttl=0.05)
+        cache.set("a", "m", "short")
+        cache.set("b", "m", "long", ttl=60)
+        time.sleep(0.1)
+        self.assertIsNone(cache.get("a", "m"))
+        self.assertEqual(cache.get("b", "m"), "long")
+        self.assertEqual(cache.get_stats()['expired'], 1)
+        self.assertEqual(len(cache), 1)
+
+    def test_eviction_by_count_and_size(self):
+        """Тест вытеснения давно не использованных ответов"""
+        cache = ResponseCache(':memory:', max_entries=3)
+        for prompt in "abc":
+            cache.set(prompt, "m", prompt * 10)
+            time.sleep(0.001)
+        cache.get("a", "m")
+        cache.set("d", "m", "d")
+        self.assertIsNone(cache.get("b", "m"))
+        self.assertEqual(cache.get("a", "m"), "a" * 10)
+        self.assertEqual(len(cache), 3)
+
+        cache = ResponseCache(':memory:', max_bytes=100)
+        for i in range(5):
+            cache.set(f"p{i}", "m", "x" * 38)
+            time.sleep(0.001)
+        self.assertLessEqual(cache.get_stats()['bytes'], 100)
+        self.assertEqual(cache.get("p4", "m"), "x" * 38)
+        self.assertIsNone(cache.get("p0", "m"))
+
+    def test_semantic_lookup(self):
+        """Тест поиска ответа на близкий по смыслу промпт"""
+        cache = ResponseCache(':memory:', embedder=embed, similarity_threshold=0.9)
+        cache.set("open chrome browser", "m", "opened", {"t": 1})
+        self.assertEqual(cache.get("Launch chrome browser", "m", {"t": 1}), "opened")
+        self.assertIsNone(cache.get("close chrome browser", "m", {"t": 1}))
+        self.assertIsNone(cache.get("launch chrome browser", "m", {"t": 2}))
+        self.assertEqual(cache.get_stats()['semantic_hits'], 1)
+
+        # Эмбеддинги пересчитываются после удаления
+        cache.clear()
+        self.assertIsNone(cache.get("launch chrome browser", "m", {"t": 1}))
+
+    def test_shared_cache(self):
+        """Тест общего кэша по пути к базе данных"""
+        cache = get_shared_cache(self.path)
+        self.assertIs(cache_from_config({'response_cache': self.path}), cache)
+        self.assertIs(cache_from_config({'response_cache': {'path': self.path}}), cache)
+        self.assertIs(cache_from_config({'response_cache': cache}), cache)
+        self.assertIsNone(cache_from_config({}))
+
+
+class CountingHandler(BaseHTTPRequestHandler):
+    """Сервер Ollama и OpenAI, считающий запросы генерации"""
+
+    def log_message(self, *args):
+        pass
+
+    def _reply(self, data):
+        body = json.dumps(data).encode()
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        self._reply({'models': []})
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers['Content-Length']))
+        self.server.calls += 1
+        if self.path.endswith('/api/generate'):
+            self._reply({'response': f"answer {self.server.calls}"})
+        else:
+            self._reply({'choices': [{'message': {'content': f"answer {self.server.calls}"}}]})
+
+
+class TestBackendCaching(unittest.TestCase):
+    """Тесты кэширования ответов менеджеров моделей"""
+
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), CountingHandler)
+        self.server.calls = 0
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self.cache = ResponseCache(':memory:')
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_ollama_generate_text(self):
+        """Тест кэширования OllamaModelManager"""
+        manager = OllamaModelManager(OllamaConfig(host=self.url, model='test'), response_cache=self.cache)
+        self.assertEqual(manager.generate_text("Hello"), "answer 1")
+        self.assertEqual(manager.generate_text("  hello "), "answer 1")
+        self.assertEqual(manager.generate_text("hello", max_tokens=10), "answer 2")
+        self.assertEqual(self.server.calls, 2)
+
+    def test_openai_client_chat(self):
+        """Тест кэширования OpenAIClient"""
+        client = OpenAIClient(api_key='test-key', response_cache=self.cache)
+        client.base_url = f"{self.url}/v1"
+        messages = [{'role': 'user', 'content': 'Hi'}]
+        self.assertEqual(client.chat(messages), "answer 1")
+        self.assertEqual(client.chat([{'role': 'user', 'content': 'hi'}]), "answer 1")
+        self.assertEqual(client.chat(messages, json_mode=True), "answer 2")
+        self.assertEqual(self.server.calls, 2)
+
+
+class TestOptimizedManagerPersistentCache(unittest.TestCase):
+    """Тесты второго уровня кэша OptimizedModelManager"""
+
+    class Manager(OptimizedModelManager):
+        def _initialize_models(self):
+            self.models[ModelType.SIMPLE] = self.active_model = self.model = self.Model()
+            self.active_model_type = ModelType.SIMPLE
+
+        class Model:
+            calls = 0
+
+            def generate_text(self, prompt, max_tokens=100):
+                type(self).calls += 1
+                return prompt[::-1]
+
+    def test_survives_restart(self):
+        """Тест ответа из постоянного кэша после перезапуска"""
+        directory = tempfile.mkdtemp()
+        config = {'ai_models': {'response_cache': {'path': os.path.join(directory, 'cache.db'), 'ttl': 60}}}
+        calls = self.Manager.Model.calls
+        try:
+            first = self.Manager(config)
+            self.assertFalse(first.generate_response("abc")['from_cache'])
+            first.shutdown()
+
+            second = self.Manager(config)
+            second.clear_cache()
+            result = second.generate_response("ABC")
+            second.shutdown()
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+        self.assertTrue(result['from_cache'])
+        self.assertEqual(result['response'], "cba")
+        self.assertEqual(self.Manager.Model.calls - calls, 1)
+        self.assertEqual(second.get_cache_stats()['persistent']['hits'], 1)
+
+    def test_keyed_by_model_name_and_max_tokens(self):
+        """Тест ключа постоянного кэша по имени модели и max_tokens"""
+        cache = ResponseCache(':memory:')
+        manager = self.Manager({'ai_models': {'response_cache': cache}})
+        manager.active_model.config = SimpleNamespace(model='tiny')
+        calls = self.Manager.Model.calls
+        self.assertFalse(manager.generate_response("xyz", max_tokens=10)['from_cache'])
+        self.assertFalse(manager.generate_response("xyz", max_tokens=20)['from_cache'])
+        self.assertTrue(manager.generate_response("xyz", max_tokens=10)['from_cache'])
+        self.assertTrue(manager.generate_response("xyz", max_tokens=20)['from_cache'])
+
+        # Ответ из постоянного кэша попадает в кэш в памяти под тем же ключом
+        restarted = self.Manager({'ai_models': {'response_cache': cache}})
+        restarted.active_model.config = SimpleNamespace(model='tiny')
+        self.assertTrue(restarted.generate_response("xyz", max_tokens=20)['from_cache'])
+        self.assertFalse(restarted.generate_response("xyz", max_tokens=30)['from_cache'])
+        manager.shutdown()
+        restarted.shutdown()
+
+        self.assertEqual(self.Manager.Model.calls - calls, 3)
+        self.assertEqual(cache.get("xyz", "simple:tiny", {'max_tokens': 10}), "zyx")
+        self.assertIsNone(cache.get("xyz", "simple", {'max_tokens': 10}))
+
+
+if __name__ == '__main__':
+    unittest.main()
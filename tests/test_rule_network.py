@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Daur-AI: Тесты сети правил LogicEngine и AutomationEngine
+"""
+
+import unittest
+
+from src.logic.rule_network import RecordingDict, RuleNetwork, when
+from src.logic.workflow_engine import AutomationEngine, LogicEngine, LogicRule
+
+
+def legacy_evaluate(rules, context):
+    """Прежний проход по правилам в порядке приоритета"""
+    result = context.copy()
+    for rule in sorted([r for r in rules if r.enabled], key=lambda r: r.priority, reverse=True):
+        try:
+            if rule.condition(result):
+                result = rule.action(result)
+        except Exception:
+            pass
+    return result
+
+
+def setter(key, value):
+    def action(context):
+        context[key] = value
+        return context
+    return action
+
+
+class TestRuleNetwork(unittest.TestCase):
+    """Тесты RuleNetwork"""
+
+    def test_condition_operators(self):
+        """Тест операторов условий"""
+        self.assertTrue(when('cpu', '>', 80)({'cpu': 90}))
+        self.assertFalse(when('cpu', '>', 80)({}))
+        self.assertTrue(when('mode', 'in', ('auto', 'eco'))({'mode': 'eco'}))
+        self.assertTrue(when('tags', 'contains', 'gpu')({'tags': ['gpu']}))
+        self.assertTrue(when('mode', '!=', 'auto')({}))
+        self.assertTrue(when('error', 'missing')({}))
+        self.assertFalse(when('cpu', '>', 80)({'cpu': 'n/a'}))
+        with self.assertRaises(ValueError):
+            when('cpu', '~', 1)
+
+    def test_shared_alphas(self):
+        """Тест объединения одинаковых проверок"""
+        network = RuleNetwork()
+        network.add('a', when('cpu', '>', 80) & when('mode', '==', 'auto'))
+        network.add('b', when('cpu', '>', 80) & when('mode', '==', 'eco'))
+        network.add('c', when('cpu', '>', 80))
+        self.assertEqual(network.alpha_count, 3)
+
+        memory, active = network.memory({'cpu': 90, 'mode': 'auto'})
+        self.assertEqual({node.rule_id for node in active}, {'a', 'c'})
+
+        network.remove('c')
+        network.remove('a')
+        self.assertEqual(network.alpha_count, 2)
+
+    def test_propagate_returns_readers(self):
+        """Тест пересчета только затронутых правил"""
+        network = RuleNetwork()
+        network.add('cpu', when('cpu', '>', 80))
+        network.add('disk', lambda c: c.get('disk', 0) > 90)
+        memory, active = network.memory({'cpu': 10, 'disk': 10})
+        self.assertEqual(active, set())
+
+        affected = network.propagate(memory, {'disk': 95})
+        self.assertEqual({node.rule_id for node in affected}, {'disk'})
+        self.assertTrue(network.is_active(memory, network.node('disk')))
+
+        # Значение не изменилось - правила не затронуты
+        self.assertEqual(network.propagate(memory, {'disk': 95}), set())
+
+    def test_recording_dict(self):
+        """Тест записи изменений контекста"""
+        context = RecordingDict({'a': 1, 'b': 2})
+        context['a'] = 3
+        context.pop('b')
+        context.update(c=4)
+        changes = context.take_changes()
+        self.assertEqual(changes['a'], 3)
+        self.assertEqual(changes['c'], 4)
+        self.assertNotIn('b', context)
+        self.assertIn('b', changes)
+        self.assertEqual(context.take_changes(), {})
+
+
+class TestLogicEngine(unittest.TestCase):
+    """Тесты LogicEngine"""
+
+    def build_rules(self, declarative):
+        cond = (lambda key, op, value: when(key, op, value)) if declarative else \
+            (lambda key, op, value: when(key, op, value).__call__)
+        return [
+            LogicRule('hot', 'hot', cond('cpu', '>', 80), setter('alert', 'hot'), priority=9),
+            LogicRule('alert', 'alert', cond('alert', '==', 'hot'), setter('fan', 'max'), priority=5),
+            LogicRule('late', 'late', cond('fan', '==', 'max'), setter('late', True), priority=7),
+            LogicRule('cool', 'cool', cond('cpu', '<=', 80), setter('fan', 'low'), priority=1),
+        ]
+
+    def test_evaluate_matches_legacy(self):
+        """Тест совпадения результата с последовательным проходом"""
+        for declarative in (False, True):
+            for cpu in (50, 90):
+                rules = self.build_rules(declarative)
+                engine = LogicEngine()
+                for rule in rules:
+                    engine.add_rule(rule)
+                context = {'cpu': cpu}
+                self.assertEqual(engine.evaluate(context), legacy_evaluate(rules, context))
+                self.assertEqual(context, {'cpu': cpu})
+
+    def test_failing_condition_is_skipped(self):
+        """Тест пропуска правила с ошибкой в условии"""
+        engine = LogicEngine()
+        engine.add_rule(LogicRule('bad', 'bad', lambda c: c['missing'] > 0, setter('bad', True), priority=5))
+        engine.add_rule(LogicRule('ok', 'ok', lambda c: True, setter('ok', True)))
+        self.assertEqual(engine.evaluate({}), {'ok': True})
+
+    def test_update_context_fires_affected_rules(self):
+        """Тест инкрементального обновления контекста"""
+        calls = []
+
+        def tracked(context):
+            calls.append('disk')
+            return context.get('disk', 0) > 90
+
+        engine = LogicEngine()
+        for rule in self.build_rules(declarative=True):
+            engine.add_rule(rule)
+        engine.add_rule(LogicRule('disk', 'disk', tracked, setter('disk_alert', True)))
+        engine.reset_context({'cpu': 50, 'disk': 10})
+        calls.clear()
+
+        result = engine.update_context({'cpu': 95})
+        self.assertEqual(result['alert'], 'hot')
+        self.assertEqual(result['fan'], 'max')
+        self.assertEqual(engine.last_fired, ['hot', 'alert', 'late'])
+        # Функция читает только disk и не вызывается при изменении cpu
+        self.assertEqual(calls, [])
+
+        result = engine.update_context({'disk': 99})
+        self.assertTrue(result['disk_alert'])
+        self.assertEqual(engine.last_fired, ['disk'])
+
+        result = engine.update_context({}, removed=['disk'])
+        self.assertNotIn('disk', result)
+        self.assertEqual(engine.last_fired, [])
+
+    def test_remove_and_disable_rule(self):
+        """Тест удаления и отключения правил"""
+        engine = LogicEngine()
+        rules = self.build_rules(declarative=True)
+        for rule in rules:
+            engine.add_rule(rule)
+        engine.remove_rule('late')
+        rules[1].enabled = False
+        result = engine.evaluate({'cpu': 90})
+        self.assertEqual(result, {'cpu': 90, 'alert': 'hot'})
+        self.assertEqual(engine.get_status()['rules'], 3)
+
+
+class TestAutomationEngine(unittest.TestCase):
+    """Тесты AutomationEngine"""
+
+    def test_check_and_update(self):
+        """Тест проверки и инкрементального обновления автоматизаций"""
+        engine = AutomationEngine()
+        engine.create_automation('hot', 'hot', when('cpu', '>', 80), lambda c: c['cpu'])
+        engine.create_automation('night', 'night', lambda c: c.get('hour', 12) < 6, lambda c: 'night')
+
+        self.assertEqual(engine.check_automations({'cpu': 90, 'hour': 3}), [('hot', 90), ('night', 'night')])
+        self.assertEqual(engine.check_automations({'cpu': 10}), [])
+
+        self.assertEqual(engine.update_context({'cpu': 95}), [('hot', 95)])
+        self.assertEqual(engine.update_context({'hour': 2}), [('night', 'night')])
+
+        self.assertTrue(engine.remove_automation('hot'))
+        self.assertEqual(engine.update_context({'cpu': 99}), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
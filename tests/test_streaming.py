@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Daur-AI: Тесты потоковой генерации
+"""
+
+import asyncio
+import json
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from src.ai.ollama_model import OllamaConfig, OllamaModelManager
+from src.ai.openai_client import OpenAIClient
+from src.ai.optimized_model_manager import ModelType, OptimizedModelManager
+from src.ai.streaming import StreamStats, TokenStream
+
+
+class StreamingHandler(BaseHTTPRequestHandler):
+    """Сервер с потоковыми ответами в форматах Ollama и OpenAI"""
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        body = json.dumps({'models': [{'name': 'test'}]}).encode()
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        payload = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        self.server.requests.append(payload)
+        self.send_response(200)
+        self.end_headers()
+
+        limit = payload.get('options', {}).get('num_predict') or payload.get('max_tokens')
+        sent = 0
+        try:
+            while sent < limit:
+                if self.path.endswith('/api/generate'):
+                    line = json.dumps({'response': f"t{sent} ", 'done': False})
+                else:
+                    line = 'data: ' + json.dumps({'choices': [{'delta': {'content': f"t{sent} "}}]})
+                self.wfile.write(line.encode() + b'\n')
+                self.wfile.flush()
+                sent += 1
+                time.sleep(self.server.delay)
+            if self.path.endswith('/api/generate'):
+                self.wfile.write(json.dumps({'response': '', 'done': True}).encode() + b'\n')
+            else:
+                self.wfile.write(b'data: [DONE]\n')
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            self.server.sent.append(sent)
+
+
+def consume(stream, limit=None):
+    async def run():
+        chunks = []
+        async with stream:
+            async for chunk in stream:
+                chunks.append(chunk)
+                if limit is not None and len(chunks) == limit:
+                    break
+        return chunks
+    return asyncio.run(run())
+
+
+class TestTokenStream(unittest.TestCase):
+    """Тесты TokenStream"""
+
+    def test_chunks_and_first_token_latency(self):
+        """Тест получения фрагментов и задержки первого токена"""
+        def produce(stream):
+            for i in range(5):
+                time.sleep(0.02)
+                yield f"c{i}"
+
+        stats = StreamStats()
+        stream = TokenStream(produce, on_finish=stats.record)
+        self.assertEqual(consume(stream), [f"c{i}" for i in range(5)])
+        self.assertLess(stream.metrics['time_to_first_token'], stream.metrics['total_time'] / 2)
+        self.assertEqual(stream.metrics['chunks'], 5)
+        self.assertEqual(stats.get_stats()['completed'], 1)
+
+    def test_cancel_stops_producer(self):
+        """Тест остановки генерации при выходе из async with"""
+        closed = threading.Event()
+
+        def produce(stream):
+            try:
+                while True:
+                    time.sleep(0.005)
+                    yield "x"
+            finally:
+                closed.set()
+
+        stats = StreamStats()
+        stream = TokenStream(produce, on_finish=stats.record)
+        self.assertEqual(len(consume(stream, limit=3)), 3)
+        self.assertTrue(closed.wait(2))
+        self.assertTrue(stream.finished.wait(2))
+        self.assertTrue(stream.metrics['cancelled'])
+        self.assertEqual(stats.get_stats()['cancelled'], 1)
+
+    def test_cancel_callback_unblocks_producer(self):
+        """Тест действия при отмене для заблокированного генератора"""
+        released = threading.Event()
+
+        def produce(stream):
+            stream.on_cancel(released.set)
+            yield "first"
+            released.wait()
+            raise ConnectionError("connection closed")
+
+        stream = TokenStream(produce)
+        self.assertEqual(consume(stream, limit=1), ["first"])
+        self.assertTrue(stream.finished.wait(2))
+        self.assertIsNone(stream.metrics['error'])
+
+    def test_error_propagates(self):
+        """Тест передачи ошибки генерации потребителю"""
+        def produce(stream):
+            yield "a"
+            raise RuntimeError("boom")
+
+        with self.assertRaises(RuntimeError):
+            consume(TokenStream(produce))
+
+    def test_task_cancellation(self):
+        """Тест отмены задачи asyncio, читающей поток"""
+        def produce(stream):
+            while not stream.cancelled.is_set():
+                time.sleep(0.005)
+            yield from ()
+
+        stream = TokenStream(produce)
+
+        async def run():
+            task = asyncio.ensure_future(stream.collect())
+            await asyncio.sleep(0.02)
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+
+        asyncio.run(run())
+        self.assertTrue(stream.finished.wait(2))
+
+
+class TestBackendStreaming(unittest.TestCase):
+    """Тесты потоковой генерации через HTTP"""
+
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), StreamingHandler)
+        self.server.daemon_threads = True
+        self.server.requests, self.server.sent, self.server.delay = [], [], 0.01
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def wait_sent(self):
+        deadline = time.time() + 5
+        while not self.server.sent and time.time() < deadline:
+            time.sleep(0.01)
+        return self.server.sent[0]
+
+    def test_ollama_stream(self):
+        """Тест потока Ollama"""
+        manager = OllamaModelManager(OllamaConfig(host=self.url, model='test'))
+        chunks = consume(manager.stream_generate("hi", max_tokens=4))
+        self.assertEqual(''.join(chunks), "t0 t1 t2 t3 ")
+        self.assertTrue(self.server.requests[0]['stream'])
+        self.assertEqual(manager.stream_stats.get_stats()['completed'], 1)
+
+    def test_ollama_cancel_closes_connection(self):
+        """Тест прекращения генерации на сервере после отмены"""
+        self.server.delay = 0.02
+        manager = OllamaModelManager(OllamaConfig(host=self.url, model='test'))
+        self.assertEqual(len(consume(manager.stream_generate("hi", max_tokens=1000), limit=2)), 2)
+        self.assertLess(self.wait_sent(), 100)
+
+    def test_openai_client_stream(self):
+        """Тест потока OpenAI (server-sent events)"""
+        client = OpenAIClient(api_key='test-key')
+        client.base_url = f"{self.url}/v1"
+        chunks = consume(client.stream_generate("hi", max_tokens=3))
+        self.assertEqual(''.join(chunks), "t0 t1 t2 ")
+        self.assertEqual(self.server.requests[0]['messages'], [{'role': 'user', 'content': 'hi'}])
+        self.assertIsNotNone(client.stream_stats.get_stats()['avg_time_to_first_token'])
+
+
+class TestOptimizedManagerStreaming(unittest.TestCase):
+    """Тесты stream_generate в OptimizedModelManager"""
+
+    class Manager(OptimizedModelManager):
+        def __init__(self, model):
+            self.fake_model = model
+            super().__init__({})
+
+        def _initialize_models(self):
+            self.models[ModelType.SIMPLE] = self.active_model = self.fake_model
+            self.active_model_type = ModelType.SIMPLE
+
+    def test_model_without_streaming(self):
+        """Тест ответа одним фрагментом для модели без потокового API"""
+        class Model:
+            def generate_text(self, prompt, max_tokens=100):
+                return prompt.upper()
+
+        manager = self.Manager(Model())
+        try:
+            self.assertEqual(consume(manager.stream_generate("abc")), ["ABC"])
+            # Второй запрос - из кэша
+            self.assertEqual(consume(manager.stream_generate("abc")), ["ABC"])
+            self.assertEqual(manager.get_cache_stats()['cache_hits'], 1)
+            self.assertEqual(manager.get_model_stats()['streaming']['completed'], 2)
+        finally:
+            manager.shutdown()
+
+    def test_delegates_to_model_stream(self):
+        """Тест использования потокового API модели"""
+        class Model:
+            def generate_text(self, prompt, max_tokens=100):
+                raise AssertionError("not used")
+
+            def stream_generate(self, prompt, max_tokens=100):
+                return TokenStream(lambda stream: iter(prompt.split()))
+
+        manager = self.Manager(Model())
+        try:
+            self.assertEqual(consume(manager.stream_generate("a b c")), ["a", "b", "c"])
+        finally:
+            manager.shutdown()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Daur-AI: Тесты потоковых агрегаторов метрик
+"""
+
+import json
+import random
+import unittest
+
+from src.monitoring.advanced_monitoring import MetricsCollector, PerformanceProfiler
+from src.monitoring.streaming_stats import EWMARate, QuantileSketch, StreamingStats, WindowedStats
+
+T0 = 1_700_000_000.0
+
+
+class TestQuantileSketch(unittest.TestCase):
+    """Тесты QuantileSketch"""
+
+    def setUp(self):
+        """Подготовка к тестам"""
+        rng = random.Random(7)
+        self.values = [rng.lognormvariate(-4, 1.5) for _ in range(50000)]
+        self.sketch = QuantileSketch(relative_accuracy=0.01)
+        for value in self.values:
+            self.sketch.add(value)
+        self.values.sort()
+
+    def exact(self, q):
+        return self.values[int(q * (len(self.values) - 1))]
+
+    def test_relative_accuracy(self):
+        """Тест относительной погрешности квантилей"""
+        for q in (0.01, 0.5, 0.9, 0.95, 0.99, 0.999):
+            self.assertAlmostEqual(self.sketch.quantile(q) / self.exact(q), 1.0, delta=0.011)
+        self.assertEqual(self.sketch.quantile(0), self.values[0])
+        self.assertEqual(self.sketch.quantile(1), self.values[-1])
+
+    def test_bounded_bins(self):
+        """Тест ограниченного числа корзин"""
+        self.assertLess(self.sketch.bin_count, 1500)
+        # Объединяются младшие корзины: верхние квантили остаются точными
+        small = QuantileSketch(max_bins=256)
+        for value in self.values:
+            small.add(value)
+        self.assertLessEqual(small.bin_count, 256)
+        self.assertAlmostEqual(small.quantile(0.99) / self.exact(0.99), 1.0, delta=0.011)
+
+    def test_merge_and_serialization(self):
+        """Тест слияния сериализованных скетчей"""
+        half = len(self.values) // 2
+        first, second = QuantileSketch(), QuantileSketch()
+        for value in self.values[:half]:
+            first.add(value)
+        for value in self.values[half:]:
+            second.add(value)
+        restored = QuantileSketch.from_dict(json.loads(json.dumps(second.to_dict())))
+        first.merge(restored)
+        self.assertEqual(first.count, self.sketch.count)
+        self.assertEqual(first.quantiles((0.5, 0.99)), self.sketch.quantiles((0.5, 0.99)))
+
+    def test_zero_and_negative_values(self):
+        """Тест нулевых и отрицательных значений"""
+        sketch = QuantileSketch()
+        for value in (-10, -1, 0, 0, 1, 10):
+            sketch.add(value)
+        self.assertAlmostEqual(sketch.quantile(0), -10)
+        self.assertEqual(sketch.quantile(0.5), 0.0)
+        self.assertAlmostEqual(sketch.quantile(1), 10)
+        self.assertIsNone(QuantileSketch().quantile(0.5))
+
+
+class TestRatesAndWindows(unittest.TestCase):
+    """Тесты EWMARate и WindowedStats"""
+
+    def test_ewma_converges(self):
+        """Тест сходимости частоты к постоянному потоку"""
+        rate = EWMARate(horizon=60)
+        for i in range(6000):
+            rate.update(1, T0 + i * 0.1)
+        self.assertAlmostEqual(rate.rate(T0 + 600), 10, delta=0.1)
+        self.assertLess(rate.rate(T0 + 900), 1)
+
+    def test_window_expires(self):
+        """Тест вытеснения устаревших сегментов окна"""
+        window = WindowedStats(window=60, slices=6)
+        for i in range(60):
+            window.add(1000.0, T0 + i)
+        for i in range(60):
+            window.add(1.0, T0 + 60 + i)
+        summary = window.summary(now=T0 + 119)
+        self.assertEqual(summary['count'], 60)
+        self.assertEqual(summary['max'], 1.0)
+        self.assertEqual(window.summary(now=T0 + 500)['count'], 0)
+
+    def test_streaming_stats_merge(self):
+        """Тест объединения статистики двух процессов"""
+        a, b = StreamingStats(), StreamingStats()
+        for i in range(100):
+            a.add(float(i), T0 + i)
+            b.add(float(i + 100), T0 + i + 0.5)
+        a.merge(StreamingStats.from_dict(b.to_dict()))
+        summary = a.summary(now=T0 + 100)
+        self.assertEqual(summary['count'], 200)
+        self.assertEqual(summary['max'], 199.0)
+        self.assertEqual(summary['latest'], 199.0)
+        self.assertAlmostEqual(summary['p50'], 99.5, delta=1.5)
+
+
+class TestMonitoringIntegration(unittest.TestCase):
+    """Тесты MetricsCollector и PerformanceProfiler"""
+
+    def test_collector_quantiles(self):
+        """Тест квантилей в статистике метрики"""
+        collector = MetricsCollector(max_samples=10)
+        for i in range(1, 1001):
+            collector.record('latency', float(i))
+        stats = collector.get_stats('latency')
+        self.assertEqual(stats['count'], 1000)
+        self.assertEqual(stats['min'], 1.0)
+        self.assertAlmostEqual(stats['p99'], 990, delta=10)
+        self.assertEqual(stats['window']['count'], 1000)
+        self.assertEqual(len(collector.metrics['latency']), 10)
+
+    def test_profiler_merge_state(self):
+        """Тест объединения профилировщиков разных воркеров"""
+        first, second = PerformanceProfiler(), PerformanceProfiler()
+        for _ in range(90):
+            first.measure('query', 0.01)
+        for _ in range(10):
+            second.measure('query', 1.0)
+        first.merge_state(json.loads(json.dumps(second.export_state())))
+        stats = first.get_performance_stats('query')
+        self.assertEqual(stats['count'], 100)
+        self.assertAlmostEqual(stats['p50'], 0.01, delta=0.001)
+        self.assertAlmostEqual(stats['p99'], 1.0, delta=0.02)
+        self.assertEqual(stats['window']['count'], 100)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Daur-AI: Тесты менеджера задач
+"""
+
+import threading
+import unittest
+from datetime import datetime, timedelta
+
+from src.planning.recurring_scheduler import RecurringScheduler, first_occurrence, next_occurrence
+from src.planning.task_scheduler import (
+    MisfirePolicy,
+    RecurrenceType,
+    TaskManager,
+    TaskPriority,
+    TaskStatus
+)
+
+
+class TestTaskManager(unittest.TestCase):
+    """Тесты TaskManager"""
+
+    def setUp(self):
+        """Подготовка к тестам"""
+        self.manager = TaskManager()
+
+    def test_priority_order(self):
+        """Тест порядка выдачи задач"""
+        self.manager.create_task('low', 'low', priority=TaskPriority.LOW)
+        self.manager.create_task('high', 'high', priority=TaskPriority.HIGH)
+        self.manager.create_task('high2', 'high2', priority=TaskPriority.HIGH)
+        self.manager.create_task('critical', 'critical', priority=TaskPriority.CRITICAL)
+
+        order = []
+        while True:
+            task = self.manager.get_next_task()
+            if task is None:
+                break
+            order.append(task.task_id)
+        self.assertEqual(order, ['critical', 'high', 'high2', 'low'])
+
+    def test_dependencies_gate_queue(self):
+        """Тест очереди готовых задач с зависимостями"""
+        self.manager.create_task('build', 'build')
+        self.manager.create_task('test', 'test', priority=TaskPriority.CRITICAL, dependencies=['build'])
+        self.manager.create_task('deploy', 'deploy', priority=TaskPriority.CRITICAL)
+        self.assertTrue(self.manager.add_dependency('deploy', 'test'))
+        self.assertEqual([t.task_id for t in self.manager.get_ready_tasks()], ['build'])
+
+        task = self.manager.get_next_task()
+        self.assertEqual(task.task_id, 'build')
+        self.assertIsNone(self.manager.get_next_task())
+
+        self.manager.update_task_status('build', TaskStatus.RUNNING)
+        self.manager.update_task_status('build', TaskStatus.COMPLETED, progress=100)
+        self.assertEqual(self.manager.get_next_task().task_id, 'test')
+
+        self.manager.update_task_status('test', TaskStatus.COMPLETED, progress=100)
+        self.assertEqual(self.manager.get_next_task().task_id, 'deploy')
+
+    def test_reopened_dependency_blocks_again(self):
+        """Тест повторной блокировки при возврате зависимости в работу"""
+        self.manager.create_task('a', 'a')
+        self.manager.create_task('b', 'b', dependencies=['a'])
+        self.manager.update_task_status('a', TaskStatus.COMPLETED)
+        self.assertEqual([t.task_id for t in self.manager.get_ready_tasks()], ['b'])
+
+        self.manager.update_task_status('a', TaskStatus.PENDING)
+        self.assertEqual([t.task_id for t in self.manager.get_ready_tasks()], ['a'])
+
+    def test_cycle_rejected(self):
+        """Тест запрета циклических зависимостей"""
+        self.manager.create_task('a', 'a')
+        self.manager.create_task('b', 'b', dependencies=['a'])
+        self.manager.create_task('c', 'c', dependencies=['b'])
+        self.assertFalse(self.manager.add_dependency('a', 'c'))
+        self.assertEqual(self.manager.tasks['a'].dependencies, [])
+
+    def test_indexes(self):
+        """Тест индексов по статусу, приоритету и сроку"""
+        now = datetime.now()
+        self.manager.create_task('old', 'old', due_date=now - timedelta(days=2))
+        self.manager.create_task('older', 'older', due_date=now - timedelta(days=3))
+        self.manager.create_task('future', 'future', due_date=now + timedelta(days=1))
+        self.manager.create_task('urgent', 'urgent', priority=TaskPriority.HIGH)
+
+        self.assertEqual([t.task_id for t in self.manager.get_overdue_tasks()], ['older', 'old'])
+        self.manager.update_task_status('old', TaskStatus.COMPLETED)
+        self.assertEqual([t.task_id for t in self.manager.get_overdue_tasks()], ['older'])
+        self.manager.update_task('future', due_date=now - timedelta(hours=1))
+        self.assertEqual([t.task_id for t in self.manager.get_overdue_tasks()], ['older', 'future'])
+
+        self.assertEqual([t.task_id for t in self.manager.get_tasks_by_status(TaskStatus.COMPLETED)], ['old'])
+        self.assertEqual(len(self.manager.get_tasks_by_status(TaskStatus.PENDING)), 3)
+        self.manager.update_task('urgent', priority=TaskPriority.LOW)
+        self.assertEqual(self.manager.get_tasks_by_priority(TaskPriority.HIGH), [])
+        self.assertEqual([t.task_id for t in self.manager.get_ready_tasks()][-1], 'urgent')
+
+        status = self.manager.get_status()
+        self.assertEqual(status['completed_tasks'], 1)
+        self.assertEqual(status['overdue_tasks'], 2)
+
+    def test_stale_entries_compacted(self):
+        """Тест ленивого удаления и сжатия очереди"""
+        for i in range(100):
+            self.manager.create_task(f"t{i}", f"t{i}")
+        for i in range(90):
+            self.manager.update_task_status(f"t{i}", TaskStatus.CANCELLED)
+        self.assertLess(len(self.manager.task_queue), 100)
+        self.assertEqual(self.manager.get_next_task().task_id, 't90')
+        self.assertEqual(self.manager.get_status()['ready_tasks'], 9)
+
+    def test_remove_task_unblocks_dependents(self):
+        """Тест удаления задачи"""
+        self.manager.create_task('a', 'a')
+        self.manager.create_task('b', 'b', dependencies=['a'])
+        self.assertTrue(self.manager.remove_task('a'))
+        self.assertEqual(self.manager.tasks['b'].dependencies, [])
+        self.assertEqual(self.manager.get_next_task().task_id, 'b')
+        self.assertFalse(self.manager.remove_task('a'))
+
+    def test_recreate_task_keeps_dependents(self):
+        """Тест замены задачи с тем же ID: зависимые задачи продолжают ее ждать"""
+        self.manager.create_task('a', 'a')
+        self.manager.create_task('b', 'b', dependencies=['a'])
+        self.manager.create_task('a', 'again')
+        self.assertEqual(self.manager.tasks['b'].dependencies, ['a'])
+        self.assertEqual([t.task_id for t in self.manager.get_ready_tasks()], ['a'])
+
+        self.manager.update_task_status('a', TaskStatus.COMPLETED)
+        self.assertEqual([t.task_id for t in self.manager.get_ready_tasks()], ['b'])
+        self.manager.create_task('a', 'reopened')
+        self.assertEqual([t.task_id for t in self.manager.get_ready_tasks()], ['a'])
+
+        self.manager.update_task_status('a', TaskStatus.COMPLETED)
+        self.assertEqual(self.manager.get_next_task().task_id, 'b')
+
+
+class TestRecurringScheduler(unittest.TestCase):
+    """Тесты RecurringScheduler"""
+
+    def setUp(self):
+        """Подготовка к тестам"""
+        self.manager = TaskManager()
+        self.scheduler = RecurringScheduler(self.manager)
+        self.start = datetime(2025, 1, 31, 8, 0)
+
+    def tearDown(self):
+        """Остановка планировщика"""
+        self.scheduler.stop()
+
+    def test_occurrences(self):
+        """Тест вычисления сроков"""
+        monthly = self.manager.create_recurring_task(
+            'report', 'report', RecurrenceType.MONTHLY, start_date=self.start, time_of_day='09:30')
+        self.assertEqual(monthly.next_occurrence, datetime(2025, 1, 31, 9, 30))
+        feb = next_occurrence(monthly, monthly.next_occurrence)
+        self.assertEqual(feb, datetime(2025, 2, 28, 9, 30))
+        self.assertEqual(next_occurrence(monthly, feb), datetime(2025, 3, 31, 9, 30))
+
+        daily = self.manager.create_recurring_task(
+            'late', 'late', RecurrenceType.DAILY, start_date=self.start, time_of_day='07:00')
+        self.assertEqual(first_occurrence(daily), datetime(2025, 2, 1, 7, 0))
+
+        once = self.manager.create_recurring_task('once', 'once', RecurrenceType.ONCE, start_date=self.start)
+        self.assertIsNone(next_occurrence(once, once.next_occurrence))
+
+    def test_monthly_anchor_after_time_of_day(self):
+        """Тест дня месяца, когда start_date позже time_of_day"""
+        end_of_month = self.manager.create_recurring_task(
+            'eom', 'eom', RecurrenceType.MONTHLY, start_date=datetime(2026, 1, 31, 10, 0), time_of_day='09:00')
+        self.assertEqual(end_of_month.next_occurrence, datetime(2026, 2, 1, 9, 0))
+        self.assertEqual(next_occurrence(end_of_month, end_of_month.next_occurrence), datetime(2026, 3, 1, 9, 0))
+
+        middle = self.manager.create_recurring_task(
+            'mid', 'mid', RecurrenceType.MONTHLY, start_date=datetime(2026, 1, 15, 10, 0), time_of_day='09:00')
+        self.assertEqual(middle.next_occurrence, datetime(2026, 1, 16, 9, 0))
+        self.assertEqual(next_occurrence(middle, middle.next_occurrence), datetime(2026, 2, 16, 9, 0))
+
+        yearly = self.manager.create_recurring_task(
+            'year', 'year', RecurrenceType.YEARLY, start_date=datetime(2026, 2, 28, 10, 0), time_of_day='09:00')
+        self.assertEqual(next_occurrence(yearly, yearly.next_occurrence), datetime(2027, 3, 1, 9, 0))
+
+    def test_run_pending_materializes_tasks(self):
+        """Тест создания задач для наступивших сроков"""
+        runs = []
+        self.manager.create_recurring_task(
+            'ping', 'ping', RecurrenceType.CUSTOM, interval=10, start_date=self.start,
+            action=lambda task: runs.append(task.task_id))
+        self.manager.create_recurring_task(
+            'backup', 'backup', RecurrenceType.DAILY, start_date=self.start, time_of_day='08:00')
+
+        self.assertEqual(self.scheduler.run_pending(self.start + timedelta(seconds=5)), 2)
+        self.assertEqual(runs, ['ping@2025-01-31T08:00:00'])
+        self.assertEqual(self.manager.tasks['ping@2025-01-31T08:00:00'].status, TaskStatus.COMPLETED)
+        # Задача без действия ждет исполнителя в очереди готовых задач
+        self.assertEqual(self.manager.get_next_task().task_id, 'backup@2025-01-31T08:00:00')
+
+        self.assertEqual(self.scheduler.run_pending(self.start + timedelta(seconds=9)), 0)
+        self.assertEqual(self.scheduler.run_pending(self.start + timedelta(seconds=10)), 1)
+        self.assertEqual(self.manager.recurring_tasks['ping'].run_count, 2)
+
+    def test_misfire_policies(self):
+        """Тест обработки пропущенных запусков"""
+        for policy in MisfirePolicy:
+            self.manager.create_recurring_task(
+                policy.value, policy.value, RecurrenceType.CUSTOM, interval=60,
+                start_date=self.start, misfire_policy=policy, misfire_grace_time=5)
+
+        # Планировщик не работал 5 минут: пропущено 6 сроков
+        self.scheduler.run_pending(self.start + timedelta(minutes=5, seconds=30))
+        counts = {policy: sum(1 for task_id in self.manager.tasks if task_id.startswith(policy.value + '@'))
+                  for policy in MisfirePolicy}
+        self.assertEqual(counts[MisfirePolicy.FIRE_ALL], 6)
+        self.assertEqual(counts[MisfirePolicy.FIRE_ONCE], 1)
+        self.assertEqual(counts[MisfirePolicy.SKIP], 0)
+
+        # Следующий срок у всех - после текущего времени
+        for policy in MisfirePolicy:
+            self.assertEqual(self.manager.recurring_tasks[policy.value].next_occurrence,
+                             self.start + timedelta(minutes=6))
+
+    def test_jitter_and_end_date(self):
+        """Тест случайной задержки и окончания повторений"""
+        recurring = self.manager.create_recurring_task(
+            'sync', 'sync', RecurrenceType.CUSTOM, interval=60, start_date=self.start,
+            end_date=self.start + timedelta(minutes=1), jitter=30)
+        self.assertEqual(recurring.next_occurrence, self.start)
+        self.assertEqual(self.scheduler.run_pending(self.start + timedelta(seconds=31)), 1)
+        self.assertEqual(self.scheduler.run_pending(self.start + timedelta(minutes=2)), 1)
+        self.assertEqual(self.scheduler.get_status()['scheduled'], 0)
+
+    def test_remove_recurring_task(self):
+        """Тест удаления повторяющейся задачи"""
+        self.manager.create_recurring_task('a', 'a', RecurrenceType.CUSTOM, start_date=self.start)
+        self.assertTrue(self.manager.remove_recurring_task('a'))
+        self.assertEqual(self.scheduler.run_pending(self.start + timedelta(hours=1)), 0)
+        self.assertFalse(self.manager.remove_recurring_task('a'))
+
+    def test_retention_of_finished_runs(self):
+        """Тест удаления завершенных запусков сверх keep_runs и старше keep_for"""
+        scheduler = RecurringScheduler(self.manager, keep_runs=3)
+        self.manager.create_recurring_task(
+            'tick', 'tick', RecurrenceType.CUSTOM, interval=1, start_date=self.start, action=lambda task: None)
+        self.manager.create_recurring_task(
+            'todo', 'todo', RecurrenceType.CUSTOM, interval=1, start_date=self.start)
+        for second in range(50):
+            scheduler.run_pending(self.start + timedelta(seconds=second))
+
+        ticks = sorted(task_id for task_id in self.manager.tasks if task_id.startswith('tick@'))
+        self.assertEqual(ticks, [f'tick@2025-01-31T08:00:{second}' for second in (47, 48, 49)])
+        # Незавершенные запуски без действия ждут исполнителя и не удаляются
+        self.assertEqual(sum(1 for task_id in self.manager.tasks if task_id.startswith('todo@')), 50)
+        self.assertEqual(scheduler.get_status()['pruned'], 47)
+
+        scheduler.keep_runs = None
+        scheduler.keep_for = timedelta(seconds=1)
+        self.assertEqual(scheduler.prune(now=self.start + timedelta(seconds=49)), 1)
+        self.assertNotIn('tick@2025-01-31T08:00:47', self.manager.tasks)
+
+    def test_background_thread(self):
+        """Тест запуска в фоновом потоке"""
+        fired = threading.Event()
+        self.scheduler.start()
+        self.manager.create_recurring_task(
+            'soon', 'soon', RecurrenceType.CUSTOM, interval=3600,
+            start_date=datetime.now() + timedelta(seconds=0.2), action=lambda task: fired.set())
+        self.assertTrue(fired.wait(timeout=5))
+        self.scheduler.stop()
+        status = self.scheduler.get_status()
+        self.assertFalse(status['running'])
+        self.assertEqual(status['fired'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -281,6 +281,38 @@ class TestAdvancedRateLimiter(unittest.TestCase):
         self.assertTrue(self.limiter.whitelist_ip(ip))
         self.assertIn(ip, self.limiter.whitelist_ips)
     
+    def test_check_limit(self):
+        """Тест проверки лимита"""
+        from src.security.advanced_rate_limiter import RateLimitRule
+        self.limiter.add_rule(RateLimitRule(name="burst", max_requests=2, time_window=60,
+                                            algorithm="token_bucket"))
+        results = [self.limiter.check_limit("burst", "user1")[0] for _ in range(3)]
+        self.assertEqual(results, [True, True, False])
+        self.assertTrue(self.limiter.check_limit("burst", "user2")[0])
+        
+        for _ in range(5):
+            self.limiter.check_limit("register", "10.0.0.1", "10.0.0.1")
+        self.assertFalse(self.limiter.check_limit("register", "10.0.0.1", "10.0.0.1")[0])
+        self.assertTrue(self.limiter.is_ip_blocked("10.0.0.1"))
+    
+    def test_idle_eviction(self):
+        """Тест ограничения числа отслеживаемых идентификаторов"""
+        limiter = AdvancedRateLimiter(max_history=50)
+        for i in range(500):
+            limiter.check_limit("api", f"user{i}")
+        self.assertEqual(len(limiter.user_tracker), 50)
+        self.assertIn("user499", limiter.user_tracker)
+    
+    def test_new_identifiers_do_not_reset_limits(self):
+        """Тест: поток новых идентификаторов не сбрасывает активные лимиты"""
+        limiter = AdvancedRateLimiter(max_history=100)
+        for _ in range(10):
+            limiter.check_limit("login", "attacker")
+        self.assertFalse(limiter.check_limit("login", "attacker")[0])
+        for i in range(200):
+            limiter.check_limit("login", f"fake{i}")
+        self.assertFalse(limiter.check_limit("login", "attacker")[0])
+    
     def test_get_statistics(self):
         """Тест получения статистики"""
         stats = self.limiter.get_statistics()
@@ -322,6 +354,29 @@ class TestDDoSDetector(unittest.TestCase):
         self.assertIn('total_requests', stats)
         self.assertIn('unique_ips', stats)
         self.assertIn('under_attack', stats)
+    
+    def test_memory_bounded_mode(self):
+        """Тест приближенного подсчета с ограниченной памятью"""
+        detector = DDoSDetector(window_size=60, threshold=100, memory_bounded=True, top_k=10)
+        for i in range(2000):
+            detector.record_request(f"10.0.{i // 256}.{i % 256}")
+            if i % 4 == 0:
+                detector.record_request("192.168.1.1")
+        
+        suspicious = detector.get_suspicious_ips(1)
+        self.assertEqual(suspicious[0][0], "192.168.1.1")
+        self.assertGreaterEqual(suspicious[0][1], 500)
+        self.assertEqual(len(detector.request_history), 0)
+        self.assertEqual(detector.get_statistics()['total_requests'], 2500)
+        self.assertTrue(detector.detect_attack())
+    
+    def test_history_overflow_keeps_counts_bounded(self):
+        """Тест согласованности счетчиков при переполнении истории"""
+        for i in range(1000):
+            self.detector.record_request(f"10.0.{i // 256}.{i % 256}")
+        self.assertEqual(len(self.detector.ip_request_count), 200)
+        self.assertEqual(sum(self.detector.ip_request_count.values()),
+                         len(self.detector.request_history))
 
 
 class TestSecurityMonitor(unittest.TestCase):
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Daur-AI: Тесты векторной памяти агента
+"""
+
+import shutil
+import tempfile
+import time
+import unittest
+
+try:
+    import numpy as np
+    from src.ai.vector_memory import VectorMemory, MemoryEntry
+    FAISS_AVAILABLE = True
+except ImportError:
+    FAISS_AVAILABLE = False
+
+
+@unittest.skipUnless(FAISS_AVAILABLE, "faiss/numpy not installed")
+class TestVectorMemory(unittest.TestCase):
+    """Тесты VectorMemory"""
+
+    DIM = 16
+
+    def setUp(self):
+        """Подготовка к тестам"""
+        rng = np.random.default_rng(42)
+        self.vectors = rng.random((300, self.DIM), dtype=np.float32)
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def _entries(self, timestamp=None):
+        now = timestamp if timestamp is not None else time.time()
+        return [
+            MemoryEntry(text=f"m{i}", embedding=v, timestamp=now, metadata={'i': i})
+            for i, v in enumerate(self.vectors)
+        ]
+
+    def test_search_empty(self):
+        """Тест поиска в пустой памяти"""
+        memory = VectorMemory(dimension=self.DIM)
+        self.assertEqual(memory.search(self.vectors[0]), [])
+
+    def test_upgrade_to_ann_index(self):
+        """Тест перехода на ANN-индекс после порога обучения"""
+        for index_type in ('ivf', 'hnsw'):
+            memory = VectorMemory(dimension=self.DIM, index_type=index_type,
+                                  train_threshold=100)
+            memory.add_memories(self._entries()[:50])
+            self.assertEqual(memory.active_index_type, 'flat')
+            memory.add_memories(self._entries()[50:])
+            self.assertEqual(memory.active_index_type, index_type)
+            self.assertEqual(memory.search(self.vectors[7], k=1)[0].text, "m7")
+
+    def test_search_batch(self):
+        """Тест пакетного поиска"""
+        memory = VectorMemory(dimension=self.DIM)
+        memory.add_memories(self._entries())
+        results = memory.search_batch(self.vectors[:3], k=2)
+        self.assertEqual([r[0].text for r in results], ["m0", "m1", "m2"])
+
+    def test_remove(self):
+        """Тест удаления записей по идентификатору"""
+        for index_type in ('flat', 'hnsw'):
+            memory = VectorMemory(dimension=self.DIM, index_type=index_type,
+                                  train_threshold=10)
+            ids = memory.add_memories(self._entries())
+            self.assertEqual(memory.remove([ids[5]]), 1)
+            self.assertEqual(len(memory), 299)
+            texts = [e.text for e in memory.search(self.vectors[5], k=5)]
+            self.assertNotIn("m5", texts)
+            self.assertEqual(len(texts), 5)
+
+    def test_ttl_expiry(self):
+        """Тест истечения срока жизни записей"""
+        memory = VectorMemory(dimension=self.DIM, ttl=60)
+        memory.add_memories(self._entries(timestamp=time.time() - 120)[:10])
+        memory.add_memories(self._entries()[10:20])
+        self.assertEqual(memory.expire(), 10)
+        self.assertEqual(len(memory), 10)
+
+    def test_save_load_mmap(self):
+        """Тест сохранения и загрузки через mmap"""
+        memory = VectorMemory(dimension=self.DIM, index_type='hnsw', train_threshold=100)
+        memory.add_memories(self._entries())
+        memory.save(self.tmpdir)
+
+        restored = VectorMemory.load(self.tmpdir, mmap=True)
+        self.assertEqual(len(restored), 300)
+        self.assertEqual(restored.active_index_type, 'hnsw')
+        self.assertEqual(restored.search(self.vectors[3], k=1)[0].metadata, {'i': 3})
+
+        # Изменение отображённого индекса перестраивает его в памяти
+        restored.remove([3])
+        self.assertNotEqual(restored.search(self.vectors[3], k=1)[0].text, "m3")
+
+    def test_metadata_filter(self):
+        """Тест поиска с фильтром по метаданным"""
+        memory = VectorMemory(dimension=self.DIM, exact_search_limit=10)
+        entries = self._entries()
+        for entry in entries:
+            entry.metadata['kind'] = 'even' if entry.metadata['i'] % 2 == 0 else 'odd'
+        memory.add_memories(entries)
+
+        # Малое множество кандидатов - точный перебор, большое - IDSelector faiss
+        results = memory.search(self.vectors[3], k=3, filters={'i': {'gte': 100, 'lt': 105}})
+        self.assertTrue(all(100 <= e.metadata['i'] < 105 for e in results))
+        results = memory.search(self.vectors[3], k=5, filters={'kind': 'even'})
+        self.assertEqual(len(results), 5)
+        self.assertTrue(all(e.metadata['kind'] == 'even' for e in results))
+        results = memory.search(self.vectors[3], k=5, filters={'kind': 'odd', 'i': [3, 4, 5]})
+        self.assertEqual(sorted(e.text for e in results), ["m3", "m5"])
+
+        memory.remove([3])
+        results = memory.search(self.vectors[3], k=5, filters={'i': 3})
+        self.assertEqual(results, [])
+
+    def test_time_filter_and_decay(self):
+        """Тест фильтра по времени и ранжирования по свежести"""
+        memory = VectorMemory(dimension=self.DIM)
+        old = MemoryEntry(text="old", embedding=self.vectors[0], timestamp=1000.0, metadata={})
+        new = MemoryEntry(text="new", embedding=self.vectors[0] + 0.01,
+                          timestamp=5000.0, metadata={})
+        memory.add_memories([old, new])
+
+        self.assertEqual(memory.search(self.vectors[0], k=1)[0].text, "old")
+        results = memory.search(self.vectors[0], k=1, decay_half_life=100, now=5000.0)
+        self.assertEqual(results[0].text, "new")
+        results = memory.search(self.vectors[0], k=2, until=2000.0)
+        self.assertEqual([e.text for e in results], ["old"])
+
+
+if __name__ == '__main__':
+    unittest.main()
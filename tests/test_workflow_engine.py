@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Daur-AI: Тесты движка рабочих процессов
+"""
+
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+
+from src.logic.workflow_engine import StepStatus, WorkflowEngine, WorkflowState, WorkflowStep
+from src.logic.workflow_journal import WorkflowJournal
+
+
+def sleeper(duration, log=None, name=None):
+    def action(data):
+        if log is not None:
+            log.append(('start', name))
+        time.sleep(duration)
+        if log is not None:
+            log.append(('end', name))
+        return {'slept': duration}
+    return action
+
+
+class TestWorkflowEngine(unittest.TestCase):
+    """Тесты WorkflowEngine"""
+
+    def setUp(self):
+        """Подготовка к тестам"""
+        self.engine = WorkflowEngine(max_concurrency=4)
+        self.engine.create_workflow('wf', 'Test workflow')
+
+    def add(self, step_id, action=None, **kwargs):
+        step = WorkflowStep(step_id, step_id, action=action, **kwargs)
+        self.engine.add_step('wf', step)
+        return step
+
+    def test_sequential_by_default(self):
+        """Тест последовательного выполнения шагов без зависимостей"""
+        log = []
+        for name in ('a', 'b', 'c'):
+            self.add(name, sleeper(0.01, log, name))
+        self.assertTrue(self.engine.execute_workflow('wf'))
+        self.assertEqual(log, [('start', 'a'), ('end', 'a'), ('start', 'b'), ('end', 'b'),
+                               ('start', 'c'), ('end', 'c')])
+
+    def test_independent_steps_run_in_parallel(self):
+        """Тест параллельного выполнения независимых шагов"""
+        for name in ('a', 'b', 'c', 'd'):
+            self.add(name, sleeper(0.2), depends_on=[])
+        self.add('join', sleeper(0.1), depends_on=['a', 'b', 'c', 'd'])
+        start = time.monotonic()
+        self.assertTrue(self.engine.execute_workflow('wf'))
+        elapsed = time.monotonic() - start
+        self.assertLess(elapsed, 0.55)
+
+        status = self.engine.get_workflow_status('wf')
+        self.assertEqual(status['state'], 'completed')
+        self.assertEqual(status['completed_steps'], 5)
+        self.assertEqual(status['critical_path'][-1], 'join')
+        self.assertEqual(len(status['critical_path']), 2)
+        self.assertAlmostEqual(status['critical_path_duration'], 0.3, delta=0.1)
+        self.assertGreater(status['total_step_time'], 0.85)
+
+    def test_concurrency_cap(self):
+        """Тест ограничения параллелизма"""
+        active = []
+        peak = []
+        lock = threading.Lock()
+
+        def action(data):
+            with lock:
+                active.append(1)
+                peak.append(len(active))
+            time.sleep(0.05)
+            with lock:
+                active.pop()
+
+        for i in range(8):
+            self.add(f's{i}', action, depends_on=[])
+        self.assertTrue(self.engine.execute_workflow('wf', max_concurrency=2))
+        self.assertLessEqual(max(peak), 2)
+
+    def test_retry_with_backoff(self):
+        """Тест повторов с экспоненциальной задержкой"""
+        calls = []
+
+        def flaky(data):
+            calls.append(time.monotonic())
+            if len(calls) < 3:
+                raise RuntimeError("temporary")
+            return {'ok': True}
+
+        step = self.add('flaky', flaky, retry_delay=0.05, max_retries=3)
+        self.assertTrue(self.engine.execute_workflow('wf'))
+        self.assertEqual(step.retry_count, 2)
+        self.assertEqual(step.output_data, {'ok': True})
+        self.assertGreaterEqual(calls[1] - calls[0], 0.045)
+        self.assertGreaterEqual(calls[2] - calls[1], 0.095)
+
+    def test_timeout_fails_step_and_skips_dependents(self):
+        """Тест таймаута шага и пропуска зависимых шагов"""
+        slow = self.add('slow', sleeper(1.0), timeout=0.1, max_retries=0, depends_on=[])
+        after = self.add('after', sleeper(0.01), depends_on=['slow'])
+        start = time.monotonic()
+        self.assertFalse(self.engine.execute_workflow('wf'))
+        self.assertLess(time.monotonic() - start, 0.5)
+        self.assertEqual(slow.status, StepStatus.FAILED)
+        self.assertIn('таймаут', slow.error)
+        self.assertEqual(after.status, StepStatus.SKIPPED)
+        self.assertEqual(self.engine.workflows['wf'].state, WorkflowState.FAILED)
+
+    def test_retry_after_timeout_with_single_slot(self):
+        """Тест повтора после таймаута при max_concurrency=1"""
+        log = []
+
+        def hanging_once(data):
+            attempt = sum(1 for event, _ in log if event == 'start')
+            log.append(('start', attempt))
+            time.sleep(0.5 if attempt == 0 else 0.01)
+            log.append(('end', attempt))
+            return {'attempt': attempt}
+
+        step = self.add('hang', hanging_once, timeout=0.3, max_retries=1, retry_delay=0.01, depends_on=[])
+        other = self.add('other', sleeper(0.2), timeout=0.3, max_retries=0, depends_on=[])
+        self.assertTrue(self.engine.execute_workflow('wf', max_concurrency=1))
+        self.assertEqual(step.output_data, {'attempt': 1})
+        self.assertEqual(other.status, StepStatus.COMPLETED)
+        # Повтор начался только после завершения снятой по таймауту попытки
+        self.assertEqual(log, [('start', 0), ('end', 0), ('start', 1), ('end', 1)])
+
+    def test_invalid_graph(self):
+        """Тест циклических и неизвестных зависимостей"""
+        self.add('a', depends_on=['b'])
+        self.add('b', depends_on=['a'])
+        self.assertFalse(self.engine.execute_workflow('wf'))
+
+        self.engine.create_workflow('wf2', 'Unknown dependency')
+        self.engine.add_step('wf2', WorkflowStep('x', 'x', depends_on=['missing']))
+        self.assertFalse(self.engine.execute_workflow('wf2'))
+
+
+
+class TestWorkflowJournal(unittest.TestCase):
+    """Тесты журнала и возобновления рабочих процессов"""
+
+    def setUp(self):
+        """Подготовка к тестам"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.temp_dir, 'workflows.db')
+        self.calls = []
+
+    def tearDown(self):
+        """Очистка после тестов"""
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def action(self, name, fail=False):
+        def run(data):
+            self.calls.append(name)
+            if fail:
+                raise RuntimeError(f"{name} crashed")
+            return {'result': f"{name}:{data.get('x')}"}
+        return run
+
+    def build(self, engine, fail_step=None):
+        engine.create_workflow('wf', 'Resumable')
+        for name, deps in (('fetch', []), ('parse', ['fetch']), ('model', ['fetch']),
+                           ('report', ['parse', 'model'])):
+            engine.add_step('wf', WorkflowStep(name, name, action=self.action(name, name == fail_step),
+                                               input_data={'x': name}, depends_on=deps, max_retries=0))
+
+    def test_resume_after_restart_skips_completed_steps(self):
+        """Тест возобновления после перезапуска движка"""
+        journal = WorkflowJournal(self.db_path)
+        engine = WorkflowEngine(journal=journal)
+        self.build(engine, fail_step='report')
+        self.assertFalse(engine.execute_workflow('wf'))
+        journal.close()
+        self.assertEqual(sorted(self.calls), ['fetch', 'model', 'parse', 'report'])
+
+        # Новый процесс: рабочий процесс восстанавливается из журнала
+        self.calls.clear()
+        journal = WorkflowJournal(self.db_path)
+        engine = WorkflowEngine(journal=journal)
+        actions = {name: self.action(name) for name in ('fetch', 'parse', 'model', 'report')}
+        self.assertTrue(engine.resume_workflow('wf', actions))
+        self.assertEqual(self.calls, ['report'])
+
+        workflow = engine.workflows['wf']
+        self.assertEqual(workflow.steps[0].output_data, {'result': 'fetch:fetch'})
+        self.assertEqual(workflow.state, WorkflowState.COMPLETED)
+        self.assertEqual(journal.load_workflow('wf')['state'], 'completed')
+        events = [(e['step_id'], e['event']) for e in journal.get_events('wf')]
+        self.assertIn(('report', 'failed'), events)
+        self.assertIn(('report', 'completed'), events)
+        journal.close()
+
+    def test_changed_input_reruns_step(self):
+        """Тест повторного выполнения шага с измененными входными данными"""
+        journal = WorkflowJournal(self.db_path)
+        engine = WorkflowEngine(journal=journal)
+        self.build(engine, fail_step='report')
+        engine.execute_workflow('wf')
+
+        self.calls.clear()
+        workflow = engine.workflows['wf']
+        workflow.steps[2].input_data = {'x': 'other'}
+        workflow.steps[3].action = self.action('report')
+        self.assertTrue(engine.resume_workflow('wf'))
+        self.assertEqual(self.calls, ['model', 'report'])
+        self.assertEqual(workflow.steps[2].output_data, {'result': 'model:other'})
+        journal.close()
+
+    def test_missing_actions_after_restart(self):
+        """Тест возобновления без действий для невыполненных шагов"""
+        journal = WorkflowJournal(self.db_path)
+        engine = WorkflowEngine(journal=journal)
+        self.build(engine, fail_step='parse')
+        engine.execute_workflow('wf')
+
+        restarted = WorkflowEngine(journal=journal)
+        self.assertFalse(restarted.resume_workflow('wf'))
+        self.assertFalse(WorkflowEngine().resume_workflow('wf'))
+        journal.close()
+
+    def test_new_execution_resets_journal(self):
+        """Тест сброса сохраненных результатов при новом запуске"""
+        journal = WorkflowJournal(':memory:')
+        engine = WorkflowEngine(journal=journal)
+        self.build(engine)
+        self.assertTrue(engine.execute_workflow('wf'))
+        self.calls.clear()
+        self.assertTrue(engine.execute_workflow('wf'))
+        self.assertEqual(len(self.calls), 4)
+        steps = journal.load_workflow('wf')['steps']
+        self.assertTrue(all(step['status'] == 'completed' for step in steps))
+
+
+if __name__ == '__main__':
+    unittest.main()